@@ -0,0 +1,140 @@
+//! Program inputs for the scanning commands: files, directories and
+//! length-prefixed buffers on stdin.
+
+use std::fs::{self, File};
+use std::io::{self, BufRead, BufReader, Read};
+use std::path::{Path, PathBuf};
+
+use memmap2::Mmap;
+
+/// Largest stdin frame accepted, so a corrupt length cannot exhaust memory.
+pub const MAX_FRAME_LEN: usize = 256 * 1024 * 1024;
+
+pub enum Data {
+    Mapped(Mmap),
+    Owned(Vec<u8>),
+}
+
+/// One program to scan. Inputs that could not be read carry the error so it
+/// is reported in order with the scan results.
+pub struct Program {
+    pub source: String,
+    pub data: Result<Data, String>,
+}
+
+impl AsRef<[u8]> for Data {
+    fn as_ref(&self) -> &[u8] {
+        match self {
+            Data::Mapped(map) => map,
+            Data::Owned(buf) => buf,
+        }
+    }
+}
+
+impl AsRef<[u8]> for Program {
+    fn as_ref(&self) -> &[u8] {
+        self.data.as_ref().map_or(&[], Data::as_ref)
+    }
+}
+
+/// Maps a file read-only. Empty files cannot be mapped and are returned as
+/// an empty buffer.
+pub fn map_file(path: &Path) -> io::Result<Data> {
+    let file = File::open(path)?;
+    if file.metadata()?.len() == 0 {
+        return Ok(Data::Owned(Vec::new()));
+    }
+    // Safety: the mapping is read-only and only lives for one scan; a file
+    // truncated underneath us is an accepted risk of scanning from disk.
+    unsafe { Mmap::map(&file) }.map(Data::Mapped)
+}
+
+/// Lazily expands input paths into programs. Directories are walked
+/// recursively in name order and `-` reads frames of a little-endian `u32`
+/// length followed by that many bytes from stdin.
+pub struct Inputs {
+    pending: Vec<PathBuf>,
+    stdin: Option<(BufReader<io::Stdin>, u64)>,
+}
+
+impl Inputs {
+    pub fn new(mut paths: Vec<PathBuf>) -> Self {
+        paths.reverse();
+        Self { pending: paths, stdin: None }
+    }
+
+    fn next_frame(&mut self) -> Option<Program> {
+        let (reader, index) = self.stdin.as_mut()?;
+        let source = format!("stdin:{}", index);
+        *index += 1;
+
+        // End of input is only clean on a frame boundary.
+        match reader.fill_buf() {
+            Ok([]) => {
+                self.stdin = None;
+                return None;
+            }
+            Ok(_) => {}
+            Err(e) => {
+                self.stdin = None;
+                return Some(Program { source, data: Err(e.to_string()) });
+            }
+        }
+        let mut len = [0u8; 4];
+        if let Err(e) = reader.read_exact(&mut len) {
+            self.stdin = None;
+            return Some(Program { source, data: Err(e.to_string()) });
+        }
+
+        let len = u32::from_le_bytes(len) as usize;
+        if len > MAX_FRAME_LEN {
+            // The stream cannot be resynchronized after a bad length.
+            self.stdin = None;
+            return Some(Program { source, data: Err(format!("frame of {} bytes exceeds limit", len)) });
+        }
+        let mut buf = vec![0u8; len];
+        let data = match reader.read_exact(&mut buf) {
+            Ok(()) => Ok(Data::Owned(buf)),
+            Err(e) => {
+                self.stdin = None;
+                Err(e.to_string())
+            }
+        };
+        Some(Program { source, data })
+    }
+}
+
+impl Iterator for Inputs {
+    type Item = Program;
+
+    fn next(&mut self) -> Option<Program> {
+        loop {
+            if self.stdin.is_some() {
+                match self.next_frame() {
+                    Some(program) => return Some(program),
+                    None => continue,
+                }
+            }
+
+            let path = self.pending.pop()?;
+            if path.as_os_str() == "-" {
+                self.stdin = Some((BufReader::new(io::stdin()), 0));
+                continue;
+            }
+
+            let source = path.display().to_string();
+            match fs::symlink_metadata(&path) {
+                Ok(meta) if meta.is_dir() => match fs::read_dir(&path) {
+                    Ok(entries) => {
+                        let mut children: Vec<PathBuf> = entries.flatten().map(|e| e.path()).collect();
+                        children.sort_unstable_by(|a, b| b.cmp(a));
+                        self.pending.extend(children);
+                    }
+                    Err(e) => return Some(Program { source, data: Err(e.to_string()) }),
+                },
+                Ok(_) => return Some(Program { data: map_file(&path).map_err(|e| e.to_string()), source }),
+                Err(e) => return Some(Program { source, data: Err(e.to_string()) }),
+            }
+        }
+    }
+}
@@ -1,12 +1,587 @@
-use clap::Parser;
+use std::fs;
+use std::io::{self, Write};
+use std::path::PathBuf;
+use std::process;
+use std::sync::Arc;
+use std::time::Duration;
+
+use clap::{Args, Parser, Subcommand};
+use lenz_core::benchmark::{self, BenchReport};
+use lenz_core::imports::{self, syscall_hash};
+use lenz_core::ingest::Outcome;
+use lenz_core::metrics;
+use lenz_core::{
+    corpus, AuditEngine, BatchConfig, IndexBuilder, IngestConfig, LenzError, Pubkey, ReplayFile, ScanCache,
+    SignatureDatabase, SimilarityIndex, SCAN_TIMEOUT_MS,
+};
+
+mod input;
+mod serve;
+
+use input::Inputs;
+
+#[cfg(feature = "bench")]
+#[global_allocator]
+static ALLOC: lenz_core::benchmark::CountingAllocator = lenz_core::benchmark::CountingAllocator;
 
 #[derive(Parser)]
 #[command(author, version, about, long_about = None)]
 struct Cli {
     #[arg(short, long)]
-    address: String,
+    address: Option<String>,
+
+    /// Print per-phase scan timings and allocations to stderr on exit
+    #[arg(long, global = true)]
+    profile: bool,
+
+    #[command(subcommand)]
+    command: Option<Command>,
+}
+
+#[derive(Subcommand)]
+enum Command {
+    /// Scan many program files in parallel, printing reports as they finish
+    Batch {
+        /// Program account dumps or ELF files
+        #[arg(required = true)]
+        paths: Vec<PathBuf>,
+
+        /// Worker threads (defaults to the number of CPUs)
+        #[arg(short, long)]
+        workers: Option<usize>,
+
+        /// Signature database to use instead of the builtin one
+        #[arg(long)]
+        signatures: Option<PathBuf>,
+
+        /// Known-bad family index built with `lenz-cli families`
+        #[arg(long)]
+        families: Option<PathBuf>,
+    },
+    /// Stream programs through the engine, writing one JSON report per line
+    Scan {
+        /// Program files, directories, or `-` for length-prefixed buffers on stdin
+        #[arg(required = true)]
+        inputs: Vec<PathBuf>,
+
+        /// Worker threads (defaults to the number of CPUs)
+        #[arg(short, long)]
+        workers: Option<usize>,
+
+        /// Maximum programs queued ahead of the workers
+        #[arg(long)]
+        max_in_flight: Option<usize>,
+
+        /// MiB of program data per scan; larger programs are scanned in chunks
+        #[arg(long)]
+        memory_budget: Option<usize>,
+
+        /// Signature database to use instead of the builtin one
+        #[arg(long)]
+        signatures: Option<PathBuf>,
+
+        /// Known-bad family index built with `lenz-cli families`
+        #[arg(long)]
+        families: Option<PathBuf>,
+    },
+    /// Scan recorded deployment events, one JSON line per event
+    Ingest(IngestArgs),
+    /// List the syscalls, CPI sites and known program ids of programs
+    Imports(ImportsArgs),
+    /// Build a known-bad family index for clone detection
+    Families {
+        /// Family members as NAME=PATH; directories add every file in them
+        #[arg(required = true)]
+        members: Vec<String>,
+
+        /// Known benign programs whose shared code is ignored when matching
+        #[arg(long)]
+        benign: Vec<PathBuf>,
+
+        /// Where to write the index
+        #[arg(short, long)]
+        out: PathBuf,
+    },
+    /// Run a scan daemon with a warm engine over HTTP/JSON
+    Serve(ServeArgs),
+    /// Benchmark the scan pipeline on the synthetic corpus
+    Bench {
+        /// Timed runs per program
+        #[arg(short, long, default_value_t = 20)]
+        iterations: usize,
+
+        /// Write the report as JSON for later comparison
+        #[arg(long)]
+        save: Option<PathBuf>,
+
+        /// Compare against a previously saved report
+        #[arg(long)]
+        baseline: Option<PathBuf>,
+
+        /// Slowdown in percent that counts as a regression
+        #[arg(long, default_value_t = 10.0)]
+        threshold: f64,
+    },
+}
+
+#[derive(Args)]
+struct IngestArgs {
+    /// Replay file of deployment and upgrade events
+    replay: PathBuf,
+
+    /// File to save progress to and resume from
+    #[arg(long)]
+    checkpoint: Option<PathBuf>,
+
+    /// Events handled between checkpoint writes
+    #[arg(long, default_value_t = 256)]
+    checkpoint_every: usize,
+
+    /// Program hashes remembered to skip redeployed code
+    #[arg(long, default_value_t = 1 << 16)]
+    dedupe: usize,
+
+    /// Worker threads (defaults to the number of CPUs)
+    #[arg(short, long)]
+    workers: Option<usize>,
+
+    /// Maximum events queued ahead of the workers
+    #[arg(long)]
+    max_in_flight: Option<usize>,
+
+    /// MiB of program data per scan; larger programs are scanned in chunks
+    #[arg(long)]
+    memory_budget: Option<usize>,
+
+    /// Signature database to use instead of the builtin one
+    #[arg(long)]
+    signatures: Option<PathBuf>,
+
+    /// Known-bad family index built with `lenz-cli families`
+    #[arg(long)]
+    families: Option<PathBuf>,
+}
+
+#[derive(Args)]
+struct ImportsArgs {
+    /// Program files, directories, or `-` for length-prefixed buffers on stdin
+    #[arg(required = true)]
+    inputs: Vec<PathBuf>,
+
+    /// Only list programs that call this syscall
+    #[arg(long)]
+    syscall: Vec<String>,
+
+    /// Only list programs whose `.rodata` holds this program id
+    #[arg(long)]
+    references: Vec<String>,
+
+    /// Only list programs that invoke other programs
+    #[arg(long)]
+    cpi: bool,
+}
+
+#[derive(Args)]
+struct ServeArgs {
+    /// Address to listen on
+    #[arg(long, default_value = "127.0.0.1:7878")]
+    listen: String,
+
+    /// Listen on a Unix socket instead of TCP
+    #[cfg(unix)]
+    #[arg(long)]
+    unix: Option<PathBuf>,
+
+    /// Signature database to use instead of the builtin one
+    #[arg(long)]
+    signatures: Option<PathBuf>,
+
+    /// Known-bad family index built with `lenz-cli families`
+    #[arg(long)]
+    families: Option<PathBuf>,
+
+    /// Reports kept in the in-memory cache
+    #[arg(long, default_value_t = 4096)]
+    cache_size: usize,
+
+    /// Directory to persist cached reports in
+    #[arg(long)]
+    cache_dir: Option<PathBuf>,
+
+    /// Worker threads for batch requests (defaults to the number of CPUs)
+    #[arg(short, long)]
+    workers: Option<usize>,
+
+    /// Largest request body accepted, in bytes
+    #[arg(long, default_value_t = 64 * 1024 * 1024)]
+    max_body: usize,
+
+    /// Concurrent connections before new ones are refused
+    #[arg(long, default_value_t = 256)]
+    max_connections: usize,
+
+    /// Per-scan budget in milliseconds; slower programs get partial reports
+    #[arg(long, default_value_t = SCAN_TIMEOUT_MS)]
+    timeout_ms: u64,
+
+    /// MiB of program data per scan; larger programs are scanned in chunks
+    #[arg(long)]
+    memory_budget: Option<usize>,
+
+    /// Seconds an idle keep-alive connection is held open
+    #[arg(long, default_value_t = 30)]
+    idle_timeout: u64,
+}
+
+/// Applies `--memory-budget`, given in MiB.
+fn with_memory_budget(engine: AuditEngine, mib: Option<usize>) -> AuditEngine {
+    match mib {
+        Some(mib) => engine.with_memory_budget(mib.saturating_mul(1 << 20)),
+        None => engine,
+    }
+}
+
+fn load_engine(signatures: Option<PathBuf>, families: Option<PathBuf>) -> AuditEngine {
+    let engine = match signatures {
+        Some(path) => match SignatureDatabase::load(&path) {
+            Ok(db) => AuditEngine::new(db),
+            Err(e) => {
+                eprintln!("error: {}: {}", path.display(), e);
+                process::exit(2);
+            }
+        },
+        None => AuditEngine::default(),
+    };
+    let Some(path) = families else { return engine };
+    let index = input::map_file(&path)
+        .map_err(|e| e.to_string())
+        .and_then(|data| SimilarityIndex::from_bytes(data).map_err(|e| e.to_string()));
+    match index {
+        Ok(index) => engine.with_families(index),
+        Err(e) => {
+            eprintln!("error: {}: {}", path.display(), e);
+            process::exit(2);
+        }
+    }
+}
+
+fn batch(paths: Vec<PathBuf>, workers: Option<usize>, signatures: Option<PathBuf>, families: Option<PathBuf>) -> i32 {
+    let engine = load_engine(signatures, families);
+    let config = workers.map_or_else(BatchConfig::default, BatchConfig::with_workers);
+
+    let mut failed = 0;
+    let scanned = engine.scan_batch(Inputs::new(paths), &config, |result| {
+        let report = match result.program.data {
+            Ok(_) => result.report,
+            Err(e) => Err(LenzError::Io(e)),
+        };
+        match report {
+            Ok(report) => println!(
+                "[{:>3}] {} {}",
+                report.risk_score,
+                result.program.source,
+                report.primary_risk_description()
+            ),
+            Err(e) => {
+                failed += 1;
+                eprintln!("error: {}: {}", result.program.source, e);
+            }
+        }
+    });
+    eprintln!("scanned {} programs ({} failed)", scanned, failed);
+    (failed > 0) as i32
+}
+
+fn scan(
+    inputs: Vec<PathBuf>,
+    workers: Option<usize>,
+    max_in_flight: Option<usize>,
+    memory_budget: Option<usize>,
+    signatures: Option<PathBuf>,
+    families: Option<PathBuf>,
+) -> i32 {
+    let engine = with_memory_budget(load_engine(signatures, families), memory_budget);
+    let mut config = workers.map_or_else(BatchConfig::default, BatchConfig::with_workers);
+    if let Some(depth) = max_in_flight {
+        config.queue_depth = depth.max(1);
+    }
+
+    let stdout = io::stdout();
+    let mut failed = 0;
+    engine.scan_batch(Inputs::new(inputs), &config, |result| {
+        let source = serde_json::Value::String(result.program.source);
+        let line = match (result.program.data, result.report) {
+            (Ok(_), Ok(report)) => {
+                let mut value = serde_json::to_value(&report).expect("report serializes");
+                value["source"] = source;
+                value
+            }
+            (Err(e), _) => {
+                failed += 1;
+                serde_json::json!({ "source": source, "error": e })
+            }
+            (Ok(_), Err(e)) => {
+                failed += 1;
+                serde_json::json!({ "source": source, "error": e.to_string() })
+            }
+        };
+        if let Err(e) = writeln!(stdout.lock(), "{}", line) {
+            // The reader went away, e.g. `lenz-cli scan dir | head`.
+            if e.kind() == io::ErrorKind::BrokenPipe {
+                process::exit(0);
+            }
+            eprintln!("error: {}", e);
+            process::exit(2);
+        }
+    });
+    (failed > 0) as i32
+}
+
+fn ingest(args: IngestArgs) -> i32 {
+    let engine = with_memory_budget(load_engine(args.signatures, args.families), args.memory_budget);
+    let mut batch = args.workers.map_or_else(BatchConfig::default, BatchConfig::with_workers);
+    if let Some(depth) = args.max_in_flight {
+        batch.queue_depth = depth.max(1);
+    }
+    let config = IngestConfig {
+        batch,
+        dedupe_capacity: args.dedupe,
+        checkpoint: args.checkpoint,
+        checkpoint_every: args.checkpoint_every,
+    };
+    let source = match ReplayFile::open(&args.replay) {
+        Ok(source) => source,
+        Err(e) => {
+            eprintln!("error: {}: {}", args.replay.display(), e);
+            return 2;
+        }
+    };
+
+    let stdout = io::stdout();
+    let result = engine.ingest(source, &config, |result| {
+        let mut line = match result.outcome {
+            Outcome::Scanned(Ok(report)) => serde_json::to_value(&report).expect("report serializes"),
+            Outcome::Scanned(Err(e)) => serde_json::json!({ "error": e.to_string() }),
+            Outcome::Duplicate => serde_json::json!({ "duplicate": true }),
+        };
+        line["program"] = result.event.program.into();
+        line["kind"] = serde_json::to_value(result.event.kind).expect("kind serializes");
+        line["slot"] = result.event.slot.into();
+        line["hash"] = result.hash.to_string().into();
+        if let Err(e) = writeln!(stdout.lock(), "{}", line) {
+            if e.kind() == io::ErrorKind::BrokenPipe {
+                process::exit(0);
+            }
+            eprintln!("error: {}", e);
+            process::exit(2);
+        }
+    });
+    match result {
+        Ok(stats) => {
+            eprintln!(
+                "ingested {} events ({} duplicates, {} failed)",
+                stats.events, stats.duplicates, stats.failed
+            );
+            (stats.failed > 0) as i32
+        }
+        Err(e) => {
+            eprintln!("error: {}", e);
+            2
+        }
+    }
+}
+
+fn imports(args: ImportsArgs) -> i32 {
+    let references: Vec<Pubkey> = match args.references.iter().map(|a| a.parse()).collect() {
+        Ok(keys) => keys,
+        Err(e) => {
+            eprintln!("error: {}", e);
+            return 2;
+        }
+    };
+    let syscalls: Vec<u32> = args.syscall.iter().map(|name| syscall_hash(name)).collect();
+    let engine = AuditEngine::default();
+
+    let stdout = io::stdout();
+    let mut failed = 0;
+    for program in Inputs::new(args.inputs) {
+        let index = match program.data.and_then(|data| engine.imports(data.as_ref()).map_err(|e| e.to_string())) {
+            Ok(index) => index,
+            Err(e) => {
+                failed += 1;
+                eprintln!("error: {}: {}", program.source, e);
+                continue;
+            }
+        };
+        if (args.cpi && !index.may_invoke())
+            || syscalls.iter().any(|&h| index.calls(h).is_empty())
+            || references.iter().any(|k| index.references(k).is_empty())
+        {
+            continue;
+        }
+
+        let mut calls: Vec<_> = index.syscalls().collect();
+        calls.sort_unstable_by_key(|&(_, sites)| sites[0]);
+        let mut pubkeys: Vec<_> = index.pubkeys().collect();
+        pubkeys.sort_unstable_by_key(|&(_, at)| at[0]);
+        let line = serde_json::json!({
+            "source": program.source,
+            "syscalls": calls.iter().map(|&(hash, sites)| serde_json::json!({
+                "name": imports::syscall_name(hash),
+                "hash": format!("0x{:08x}", hash),
+                "calls": sites,
+            })).collect::<Vec<_>>(),
+            "cpi": index.cpi_sites(),
+            "programs": pubkeys.iter().map(|&(key, at)| serde_json::json!({
+                "address": key.to_string(),
+                "name": imports::program_name(key),
+                "offsets": at,
+            })).collect::<Vec<_>>(),
+        });
+        if let Err(e) = writeln!(stdout.lock(), "{}", line) {
+            if e.kind() == io::ErrorKind::BrokenPipe {
+                process::exit(0);
+            }
+            eprintln!("error: {}", e);
+            process::exit(2);
+        }
+    }
+    (failed > 0) as i32
+}
+
+fn serve(args: ServeArgs) -> i32 {
+    let mut cache = ScanCache::new(args.cache_size);
+    if let Some(dir) = args.cache_dir {
+        cache = cache.with_disk(dir);
+    }
+    let engine = with_memory_budget(load_engine(args.signatures, args.families), args.memory_budget)
+        .with_cache(cache)
+        .with_timeout(Duration::from_millis(args.timeout_ms));
+    let config = serve::ServeConfig {
+        max_body: args.max_body,
+        max_connections: args.max_connections,
+        idle_timeout: Duration::from_secs(args.idle_timeout),
+        batch: args.workers.map_or_else(BatchConfig::default, BatchConfig::with_workers),
+    };
+    let server = Arc::new(serve::Server::new(engine, config));
+
+    #[cfg(unix)]
+    let result = match args.unix {
+        Some(path) => server.serve_unix(&path),
+        None => server.serve_tcp(&args.listen),
+    };
+    #[cfg(not(unix))]
+    let result = server.serve_tcp(&args.listen);
+
+    match result {
+        Ok(()) => 0,
+        Err(e) => {
+            eprintln!("error: {}", e);
+            2
+        }
+    }
+}
+
+fn families(members: Vec<String>, benign: Vec<PathBuf>, out: PathBuf) -> i32 {
+    let mut builder = IndexBuilder::new();
+    let mut groups: Vec<(Option<String>, Vec<PathBuf>)> = Vec::new();
+    for member in members {
+        let Some((name, path)) = member.split_once('=') else {
+            eprintln!("error: {}: expected NAME=PATH", member);
+            return 2;
+        };
+        groups.push((Some(name.to_string()), vec![PathBuf::from(path)]));
+    }
+    if !benign.is_empty() {
+        groups.push((None, benign));
+    }
+
+    let mut programs = 0;
+    for (family, paths) in groups {
+        for program in Inputs::new(paths) {
+            let added = match (&program.data, &family) {
+                (Err(e), _) => Err(e.clone()),
+                (Ok(data), Some(name)) => builder.add_family(name, data.as_ref()).map_err(|e| e.to_string()),
+                (Ok(data), None) => builder.add_benign(data.as_ref()).map_err(|e| e.to_string()),
+            };
+            if let Err(e) = added {
+                eprintln!("error: {}: {}", program.source, e);
+                return 2;
+            }
+            programs += 1;
+        }
+    }
+    if let Err(e) = builder.write(&out) {
+        eprintln!("error: {}: {}", out.display(), e);
+        return 2;
+    }
+    eprintln!("indexed {} programs into {}", programs, out.display());
+    0
+}
+
+fn bench(iterations: usize, save: Option<PathBuf>, baseline: Option<PathBuf>, threshold: f64) -> i32 {
+    let engine = AuditEngine::default();
+    let report = match benchmark::run(&engine, &corpus::standard(), iterations) {
+        Ok(report) => report,
+        Err(e) => {
+            eprintln!("error: {}", e);
+            return 2;
+        }
+    };
+    print!("{}", report);
+
+    if let Some(path) = save {
+        let json = serde_json::to_vec_pretty(&report).expect("report serializes");
+        if let Err(e) = fs::write(&path, json) {
+            eprintln!("error: {}: {}", path.display(), e);
+            return 2;
+        }
+    }
+
+    let Some(path) = baseline else { return 0 };
+    let baseline: BenchReport = match fs::read(&path).map_err(|e| e.to_string()).and_then(|b| {
+        serde_json::from_slice(&b).map_err(|e| e.to_string())
+    }) {
+        Ok(baseline) => baseline,
+        Err(e) => {
+            eprintln!("error: {}: {}", path.display(), e);
+            return 2;
+        }
+    };
+    let regressions = report.compare(&baseline, threshold);
+    if regressions.is_empty() {
+        println!("no regressions against {} (threshold {}%)", path.display(), threshold);
+        return 0;
+    }
+    println!("regressions against {}:", path.display());
+    for r in &regressions {
+        println!("  {}", r);
+    }
+    1
 }
 
 fn main() {
-    println!("LENZ CLI v0.1.0");
-}
\ No newline at end of file
+    let cli = Cli::parse();
+    if cli.profile && !metrics::ENABLED {
+        eprintln!("warning: --profile has no effect, lenz-cli was built without the `metrics` feature");
+    }
+    let code = match cli.command {
+        Some(Command::Batch { paths, workers, signatures, families }) => batch(paths, workers, signatures, families),
+        Some(Command::Scan { inputs, workers, max_in_flight, memory_budget, signatures, families }) => {
+            scan(inputs, workers, max_in_flight, memory_budget, signatures, families)
+        }
+        Some(Command::Ingest(args)) => ingest(args),
+        Some(Command::Imports(args)) => imports(args),
+        Some(Command::Families { members, benign, out }) => families(members, benign, out),
+        Some(Command::Serve(args)) => serve(args),
+        Some(Command::Bench { iterations, save, baseline, threshold }) => bench(iterations, save, baseline, threshold),
+        None => {
+            println!("LENZ CLI v0.1.0");
+            0
+        }
+    };
+    if cli.profile && metrics::ENABLED {
+        eprint!("{}", metrics::snapshot());
+    }
+    process::exit(code);
+}
@@ -0,0 +1,448 @@
+//! `lenz-cli serve`: a long-running scan daemon with a warm engine.
+//!
+//! Speaks a small subset of HTTP/1.1 over TCP or a Unix socket. Connections
+//! are kept alive and requests may be pipelined; responses are written in
+//! request order and flushed once no further requests are buffered.
+//!
+//! - `GET /health` engine and signature versions
+//! - `GET /stats` cache statistics
+//! - `GET /metrics` per-phase scan metrics in the Prometheus text format
+//! - `POST /scan` body is one program, returns a `RiskReport`
+//! - `POST /scan/batch` body is a sequence of little-endian `u32`
+//!   length-prefixed programs, returns an array of `{report}` / `{error}`,
+//!   or a binary batch (`lenz_core::wire`) when the request accepts it
+
+use std::io::{self, BufRead, BufReader, BufWriter, Read, Write};
+use std::net::TcpListener;
+use std::panic::{self, AssertUnwindSafe};
+use std::sync::atomic::{AtomicUsize, Ordering};
+use std::sync::Arc;
+use std::thread;
+use std::time::Duration;
+
+use lenz_core::{metrics, wire, AuditEngine, BatchConfig, LenzError, RiskReport};
+use serde_json::{json, Value};
+
+/// Longest request line or header line accepted.
+const MAX_LINE: usize = 8 * 1024;
+const MAX_HEADERS: usize = 64;
+
+pub struct ServeConfig {
+    pub max_body: usize,
+    pub max_connections: usize,
+    pub idle_timeout: Duration,
+    pub batch: BatchConfig,
+}
+
+struct Request {
+    method: String,
+    path: String,
+    keep_alive: bool,
+    /// The client accepts binary report batches.
+    accepts_wire: bool,
+    body: Vec<u8>,
+}
+
+struct Response {
+    status: u16,
+    content_type: &'static str,
+    body: Vec<u8>,
+}
+
+impl Response {
+    fn json(status: u16, body: &Value) -> Self {
+        let body = serde_json::to_vec(body).expect("response serializes");
+        Self { status, content_type: "application/json", body }
+    }
+
+    fn ok(body: Value) -> Self {
+        Self::json(200, &body)
+    }
+
+    fn error(status: u16, message: impl Into<String>) -> Self {
+        Self::json(status, &json!({ "error": message.into() }))
+    }
+
+    fn text(body: String) -> Self {
+        Self { status: 200, content_type: "text/plain; version=0.0.4", body: body.into_bytes() }
+    }
+
+    fn wire(body: Vec<u8>) -> Self {
+        Self { status: 200, content_type: wire::CONTENT_TYPE, body }
+    }
+}
+
+fn reason(status: u16) -> &'static str {
+    match status {
+        200 => "OK",
+        400 => "Bad Request",
+        404 => "Not Found",
+        405 => "Method Not Allowed",
+        411 => "Length Required",
+        413 => "Payload Too Large",
+        431 => "Request Header Fields Too Large",
+        503 => "Service Unavailable",
+        _ => "Internal Server Error",
+    }
+}
+
+fn read_line<R: BufRead>(reader: &mut R, line: &mut String) -> Result<usize, Response> {
+    line.clear();
+    let n = reader
+        .take(MAX_LINE as u64 + 1)
+        .read_line(line)
+        .map_err(|e| Response::error(400, e.to_string()))?;
+    if n > MAX_LINE {
+        return Err(Response::error(431, "header line too long"));
+    }
+    Ok(n)
+}
+
+/// Reads one request. `Ok(None)` means the peer closed the connection
+/// between requests.
+fn read_request<R: BufRead>(reader: &mut R, max_body: usize) -> Result<Option<Request>, Response> {
+    let mut line = String::new();
+    // Tolerate blank lines between pipelined requests.
+    loop {
+        if read_line(reader, &mut line)? == 0 {
+            return Ok(None);
+        }
+        if !line.trim().is_empty() {
+            break;
+        }
+    }
+
+    let mut parts = line.split_whitespace();
+    let (Some(method), Some(path), Some(version)) = (parts.next(), parts.next(), parts.next()) else {
+        return Err(Response::error(400, "malformed request line"));
+    };
+    let mut request = Request {
+        method: method.to_string(),
+        path: path.to_string(),
+        keep_alive: version == "HTTP/1.1",
+        accepts_wire: false,
+        body: Vec::new(),
+    };
+
+    let mut content_length = None;
+    for _ in 0..=MAX_HEADERS {
+        if read_line(reader, &mut line)? == 0 {
+            return Err(Response::error(400, "unexpected end of headers"));
+        }
+        let header = line.trim_end();
+        if header.is_empty() {
+            let len = content_length.unwrap_or(0);
+            if len > max_body {
+                return Err(Response::error(413, format!("body exceeds {} bytes", max_body)));
+            }
+            request.body = vec![0; len];
+            reader.read_exact(&mut request.body).map_err(|e| Response::error(400, e.to_string()))?;
+            return Ok(Some(request));
+        }
+
+        let Some((name, value)) = header.split_once(':') else {
+            return Err(Response::error(400, "malformed header"));
+        };
+        let value = value.trim();
+        if name.eq_ignore_ascii_case("content-length") {
+            content_length = Some(value.parse().map_err(|_| Response::error(400, "invalid content-length"))?);
+        } else if name.eq_ignore_ascii_case("accept") {
+            request.accepts_wire |= value
+                .split(',')
+                .any(|t| t.split(';').next().unwrap_or("").trim().eq_ignore_ascii_case(wire::CONTENT_TYPE));
+        } else if name.eq_ignore_ascii_case("transfer-encoding") {
+            return Err(Response::error(411, "chunked bodies are not supported"));
+        } else if name.eq_ignore_ascii_case("connection") {
+            if value.eq_ignore_ascii_case("close") {
+                request.keep_alive = false;
+            } else if value.eq_ignore_ascii_case("keep-alive") {
+                request.keep_alive = true;
+            }
+        }
+    }
+    Err(Response::error(431, "too many headers"))
+}
+
+fn write_response<W: Write>(writer: &mut W, response: &Response, keep_alive: bool) -> io::Result<()> {
+    write!(
+        writer,
+        "HTTP/1.1 {} {}\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n",
+        response.status,
+        reason(response.status),
+        response.content_type,
+        response.body.len(),
+        if keep_alive { "keep-alive" } else { "close" }
+    )?;
+    writer.write_all(&response.body)
+}
+
+/// Splits a batch body into its length-prefixed programs.
+fn frames(mut body: &[u8]) -> Result<Vec<&[u8]>, Response> {
+    let mut out = Vec::new();
+    while !body.is_empty() {
+        let Some((len, rest)) = body.split_first_chunk::<4>() else {
+            return Err(Response::error(400, "truncated frame header"));
+        };
+        let len = u32::from_le_bytes(*len) as usize;
+        if rest.len() < len {
+            return Err(Response::error(400, "truncated frame"));
+        }
+        out.push(&rest[..len]);
+        body = &rest[len..];
+    }
+    Ok(out)
+}
+
+pub struct Server {
+    engine: AuditEngine,
+    config: ServeConfig,
+    connections: AtomicUsize,
+}
+
+impl Server {
+    pub fn new(engine: AuditEngine, config: ServeConfig) -> Self {
+        Self { engine, config, connections: AtomicUsize::new(0) }
+    }
+
+    fn route(&self, request: &Request) -> Response {
+        match (request.method.as_str(), request.path.as_str()) {
+            ("GET", "/health") => {
+                let version = self.engine.cache_version();
+                Response::ok(json!({
+                    "status": "ok",
+                    "engine_version": version.engine,
+                    "signatures_version": version.signatures,
+                    "timeout_ms": self.engine.timeout().map(|t| t.as_millis() as u64),
+                    "families_version": version.families,
+                }))
+            }
+            ("GET", "/stats") => {
+                let stats = self.engine.cache().map(|c| c.stats()).unwrap_or_default();
+                Response::ok(json!({
+                    "cache_hits": stats.hits,
+                    "cache_misses": stats.misses,
+                    "cache_entries": self.engine.cache().map_or(0, |c| c.len()),
+                    "connections": self.connections.load(Ordering::Relaxed),
+                }))
+            }
+            ("GET", "/metrics") => Response::text(metrics::snapshot().to_prometheus()),
+            // A program that crashes the analysis fails its request, not the daemon.
+            ("POST", "/scan") => match panic::catch_unwind(AssertUnwindSafe(|| self.engine.audit(&request.body))) {
+                Ok(Ok(report)) => Response::ok(serde_json::to_value(report).expect("report serializes")),
+                Ok(Err(e)) => Response::error(400, e.to_string()),
+                Err(_) => Response::error(500, "analysis panicked"),
+            },
+            ("POST", "/scan/batch") => match frames(&request.body) {
+                Ok(programs) => self.scan_batch(programs, request.accepts_wire),
+                Err(response) => response,
+            },
+            (_, "/health" | "/stats" | "/metrics" | "/scan" | "/scan/batch") => {
+                Response::error(405, "method not allowed")
+            }
+            _ => Response::error(404, "not found"),
+        }
+    }
+
+    fn scan_batch(&self, programs: Vec<&[u8]>, wire: bool) -> Response {
+        let mut results: Vec<Option<Result<RiskReport, LenzError>>> = vec![None; programs.len()];
+        self.engine.scan_batch(programs, &self.config.batch, |result| {
+            results[result.index] = Some(result.report);
+        });
+        let results = results.into_iter().map(|r| r.expect("every program is scanned"));
+        if wire {
+            let messages: Vec<_> = results.map(|r| r.map_err(|e| e.to_string())).collect();
+            return Response::wire(wire::encode(messages.iter().map(|r| r.as_ref().map_err(String::as_str))));
+        }
+        Response::ok(Value::Array(
+            results
+                .map(|r| match r {
+                    Ok(report) => json!({ "report": report }),
+                    Err(e) => json!({ "error": e.to_string() }),
+                })
+                .collect(),
+        ))
+    }
+
+    /// Serves requests on one connection until it closes or errs.
+    fn handle<S>(&self, stream: &S) -> io::Result<()>
+    where
+        for<'a> &'a S: Read + Write,
+    {
+        let mut reader = BufReader::new(stream);
+        let mut writer = BufWriter::new(stream);
+        loop {
+            let (response, keep_alive) = match read_request(&mut reader, self.config.max_body) {
+                Ok(None) => break,
+                Ok(Some(request)) => (self.route(&request), request.keep_alive),
+                // The stream position is unknown after a bad request.
+                Err(response) => (response, false),
+            };
+            write_response(&mut writer, &response, keep_alive)?;
+            // Pipelined requests already buffered are answered before flushing.
+            if !keep_alive || reader.buffer().is_empty() {
+                writer.flush()?;
+            }
+            if !keep_alive {
+                break;
+            }
+        }
+        writer.flush()
+    }
+
+    fn accept<S>(self: &Arc<Self>, stream: S)
+    where
+        S: Send + 'static,
+        for<'a> &'a S: Read + Write,
+    {
+        let slot = ConnectionSlot::take(self);
+        if slot.others >= self.config.max_connections {
+            drop(slot);
+            let _ = write_response(&mut &stream, &Response::error(503, "too many connections"), false);
+            return;
+        }
+        thread::spawn(move || {
+            let _ = slot.server.handle(&stream);
+        });
+    }
+
+    pub fn serve_tcp(self: Arc<Self>, addr: &str) -> io::Result<()> {
+        let listener = TcpListener::bind(addr)?;
+        eprintln!("listening on http://{}", listener.local_addr()?);
+        for stream in listener.incoming() {
+            let stream = match stream {
+                Ok(stream) => stream,
+                Err(e) => {
+                    eprintln!("error: accept: {}", e);
+                    continue;
+                }
+            };
+            let _ = stream.set_nodelay(true);
+            let _ = stream.set_read_timeout(Some(self.config.idle_timeout));
+            self.accept(stream);
+        }
+        Ok(())
+    }
+
+    #[cfg(unix)]
+    pub fn serve_unix(self: Arc<Self>, path: &std::path::Path) -> io::Result<()> {
+        use std::os::unix::net::UnixListener;
+
+        // A stale socket from a previous run would make bind fail.
+        if path.exists() {
+            std::fs::remove_file(path)?;
+        }
+        let listener = UnixListener::bind(path)?;
+        eprintln!("listening on unix:{}", path.display());
+        for stream in listener.incoming() {
+            let stream = match stream {
+                Ok(stream) => stream,
+                Err(e) => {
+                    eprintln!("error: accept: {}", e);
+                    continue;
+                }
+            };
+            let _ = stream.set_read_timeout(Some(self.config.idle_timeout));
+            self.accept(stream);
+        }
+        Ok(())
+    }
+}
+
+/// One counted connection, released when dropped, even by a connection
+/// thread that panicked.
+struct ConnectionSlot {
+    server: Arc<Server>,
+    /// Connections open before this one.
+    others: usize,
+}
+
+impl ConnectionSlot {
+    fn take(server: &Arc<Server>) -> Self {
+        let others = server.connections.fetch_add(1, Ordering::AcqRel);
+        Self { server: Arc::clone(server), others }
+    }
+}
+
+impl Drop for ConnectionSlot {
+    fn drop(&mut self) {
+        self.server.connections.fetch_sub(1, Ordering::AcqRel);
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_reads_pipelined_requests() {
+        let raw = b"GET /health HTTP/1.1\r\nHost: x\r\n\r\nPOST /scan HTTP/1.1\r\nContent-Length: 3\r\n\r\nabcGET /x HTTP/1.0\r\n\r\n";
+        let mut reader = BufReader::new(&raw[..]);
+
+        let first = read_request(&mut reader, 1024).ok().flatten().unwrap();
+        assert_eq!((first.method.as_str(), first.path.as_str(), first.keep_alive), ("GET", "/health", true));
+        let second = read_request(&mut reader, 1024).ok().flatten().unwrap();
+        assert_eq!(second.body, b"abc");
+        let third = read_request(&mut reader, 1024).ok().flatten().unwrap();
+        assert!(!third.keep_alive && !third.accepts_wire);
+        assert!(read_request(&mut reader, 1024).ok().unwrap().is_none());
+    }
+
+    #[test]
+    fn test_negotiates_wire_batches() {
+        let raw = b"POST /scan/batch HTTP/1.1\r\nAccept: application/vnd.lenz.reports;q=1, application/json\r\n\r\n";
+        let request = read_request(&mut BufReader::new(&raw[..]), 1024).ok().flatten().unwrap();
+        assert!(request.accepts_wire);
+    }
+
+    #[test]
+    fn test_rejects_oversized_body() {
+        let raw = b"POST /scan HTTP/1.1\r\nContent-Length: 2048\r\n\r\n";
+        let err = read_request(&mut BufReader::new(&raw[..]), 1024).err().unwrap();
+        assert_eq!(err.status, 413);
+    }
+
+    /// A connection whose reads panic.
+    struct Crash;
+
+    impl Read for &Crash {
+        fn read(&mut self, _: &mut [u8]) -> io::Result<usize> {
+            panic!("connection crashed")
+        }
+    }
+
+    impl Write for &Crash {
+        fn write(&mut self, buf: &[u8]) -> io::Result<usize> {
+            Ok(buf.len())
+        }
+
+        fn flush(&mut self) -> io::Result<()> {
+            Ok(())
+        }
+    }
+
+    #[test]
+    fn test_panicking_connection_releases_its_slot() {
+        let config = ServeConfig {
+            max_body: 1024,
+            max_connections: 1,
+            idle_timeout: Duration::from_secs(1),
+            batch: BatchConfig::default(),
+        };
+        let server = Arc::new(Server::new(AuditEngine::default(), config));
+        for _ in 0..3 {
+            server.accept(Crash);
+            let deadline = std::time::Instant::now() + Duration::from_secs(5);
+            while server.connections.load(Ordering::Acquire) != 0 {
+                assert!(std::time::Instant::now() < deadline, "connection slot leaked");
+                thread::sleep(Duration::from_millis(1));
+            }
+        }
+    }
+
+    #[test]
+    fn test_splits_batch_frames() {
+        let body = [2, 0, 0, 0, 0xaa, 0xbb, 0, 0, 0, 0];
+        assert_eq!(frames(&body).ok().unwrap(), vec![&[0xaa, 0xbb][..], &[][..]]);
+        assert!(frames(&body[..3]).is_err());
+    }
+}
@@ -0,0 +1,40 @@
+use criterion::{black_box, criterion_group, criterion_main, BenchmarkId, Criterion, Throughput};
+use lenz_core::benchmark::CountingAllocator;
+use lenz_core::corpus;
+use lenz_core::disassembler::Disassembler;
+use lenz_core::AuditEngine;
+
+#[global_allocator]
+static ALLOC: CountingAllocator = CountingAllocator;
+
+fn bench_decode(c: &mut Criterion) {
+    let mut group = c.benchmark_group("disassembler_parse");
+    for program in corpus::standard() {
+        let text = AuditEngine::program_text(&program.data).unwrap();
+        group.throughput(Throughput::Bytes(text.len() as u64));
+        group.bench_with_input(BenchmarkId::from_parameter(&program.name), text, |b, text| {
+            b.iter(|| Disassembler::parse(black_box(text)).unwrap())
+        });
+    }
+    group.finish();
+}
+
+fn bench_scan(c: &mut Criterion) {
+    let engine = AuditEngine::default();
+    let mut group = c.benchmark_group("audit_engine_scan");
+    for program in corpus::standard() {
+        group.throughput(Throughput::Bytes(program.data.len() as u64));
+        group.bench_with_input(BenchmarkId::from_parameter(&program.name), &program.data, |b, data| {
+            b.iter(|| engine.audit(black_box(data)).unwrap())
+        });
+
+        let (before, _) = CountingAllocator::counts();
+        engine.audit(&program.data).unwrap();
+        let (after, _) = CountingAllocator::counts();
+        println!("{}: {} allocations per scan", program.name, after - before);
+    }
+    group.finish();
+}
+
+criterion_group!(benches, bench_decode, bench_scan);
+criterion_main!(benches);
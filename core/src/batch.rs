@@ -0,0 +1,93 @@
+use std::panic::{self, AssertUnwindSafe};
+use std::sync::{mpsc, Arc, Mutex};
+use std::thread;
+
+use crate::error::{LenzError, Result};
+use crate::risk::RiskReport;
+use crate::scanner::AuditEngine;
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct BatchConfig {
+    /// Number of scanning threads.
+    pub workers: usize,
+    /// Maximum number of programs queued ahead of the workers.
+    pub queue_depth: usize,
+}
+
+impl Default for BatchConfig {
+    fn default() -> Self {
+        Self::with_workers(thread::available_parallelism().map_or(1, |n| n.get()))
+    }
+}
+
+impl BatchConfig {
+    pub fn with_workers(workers: usize) -> Self {
+        let workers = workers.max(1);
+        Self { workers, queue_depth: workers * 4 }
+    }
+}
+
+/// Outcome of one program in a batch, handed back with the program itself.
+#[derive(Debug)]
+pub struct BatchResult<T> {
+    /// Position of the program in the input sequence.
+    pub index: usize,
+    pub program: T,
+    pub report: Result<RiskReport>,
+}
+
+impl AuditEngine {
+    /// Scans many programs on a pool of worker threads.
+    ///
+    /// Programs are pulled lazily from `programs` into a bounded queue that
+    /// idle workers drain, so slow programs never hold up the rest of the
+    /// batch. Results are passed to `sink` on the calling thread in
+    /// completion order; a failing program only yields an error for its own
+    /// item. Returns the number of programs scanned.
+    pub fn scan_batch<I, T, F>(&self, programs: I, config: &BatchConfig, mut sink: F) -> usize
+    where
+        I: IntoIterator<Item = T>,
+        I::IntoIter: Send,
+        T: AsRef<[u8]> + Send,
+        F: FnMut(BatchResult<T>),
+    {
+        let programs = programs.into_iter();
+        let (job_tx, job_rx) = mpsc::sync_channel::<(usize, T)>(config.queue_depth.max(1));
+        let (result_tx, result_rx) = mpsc::sync_channel::<BatchResult<T>>(config.queue_depth.max(1));
+        // Owned by the workers only: if `sink` panics, the workers stop on
+        // the closed result channel and drop it, which unblocks the feeder.
+        let job_rx = Arc::new(Mutex::new(job_rx));
+
+        thread::scope(|s| {
+            s.spawn(move || {
+                for job in programs.enumerate() {
+                    if job_tx.send(job).is_err() {
+                        break;
+                    }
+                }
+            });
+
+            for _ in 0..config.workers.max(1) {
+                let result_tx = result_tx.clone();
+                let job_rx = Arc::clone(&job_rx);
+                s.spawn(move || loop {
+                    let job = job_rx.lock().unwrap().recv();
+                    let Ok((index, program)) = job else { break };
+                    let report = panic::catch_unwind(AssertUnwindSafe(|| self.audit(program.as_ref())))
+                        .unwrap_or_else(|_| Err(LenzError::Internal(format!("analysis panicked on item {}", index))));
+                    if result_tx.send(BatchResult { index, program, report }).is_err() {
+                        break;
+                    }
+                });
+            }
+            drop((result_tx, job_rx));
+
+            let mut count = 0;
+            for result in result_rx {
+                sink(result);
+                count += 1;
+            }
+            count
+        })
+    }
+}
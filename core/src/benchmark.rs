@@ -0,0 +1,227 @@
+//! Scan pipeline benchmark with a machine-readable report, used by
+//! `lenz-cli bench` to detect performance regressions between builds.
+
+use std::alloc::{GlobalAlloc, Layout, System};
+use std::cell::Cell;
+use std::fmt;
+use std::sync::atomic::{AtomicU64, Ordering};
+use std::time::{Duration, Instant};
+
+use serde::{Deserialize, Serialize};
+
+use crate::constants::ENGINE_VERSION;
+use crate::corpus::CorpusProgram;
+use crate::disassembler::Disassembler;
+use crate::error::Result;
+use crate::scanner::AuditEngine;
+
+static ALLOCATIONS: AtomicU64 = AtomicU64::new(0);
+static ALLOCATED_BYTES: AtomicU64 = AtomicU64::new(0);
+
+thread_local! {
+    // Const-initialized without a destructor, so the allocator can touch it
+    // without allocating itself.
+    static THREAD_ALLOCATIONS: Cell<u64> = const { Cell::new(0) };
+}
+
+fn count_thread_allocation() {
+    let _ = THREAD_ALLOCATIONS.try_with(|n| n.set(n.get() + 1));
+}
+
+/// Global allocator wrapper that counts allocations. Binaries opt in with
+/// `#[global_allocator] static A: CountingAllocator = CountingAllocator;`.
+pub struct CountingAllocator;
+
+unsafe impl GlobalAlloc for CountingAllocator {
+    unsafe fn alloc(&self, layout: Layout) -> *mut u8 {
+        ALLOCATIONS.fetch_add(1, Ordering::Relaxed);
+        ALLOCATED_BYTES.fetch_add(layout.size() as u64, Ordering::Relaxed);
+        count_thread_allocation();
+        System.alloc(layout)
+    }
+
+    unsafe fn dealloc(&self, ptr: *mut u8, layout: Layout) {
+        System.dealloc(ptr, layout)
+    }
+
+    unsafe fn realloc(&self, ptr: *mut u8, layout: Layout, new_size: usize) -> *mut u8 {
+        ALLOCATIONS.fetch_add(1, Ordering::Relaxed);
+        ALLOCATED_BYTES.fetch_add(new_size as u64, Ordering::Relaxed);
+        count_thread_allocation();
+        System.realloc(ptr, layout, new_size)
+    }
+}
+
+impl CountingAllocator {
+    /// Allocations and bytes allocated so far by the process.
+    pub fn counts() -> (u64, u64) {
+        (ALLOCATIONS.load(Ordering::Relaxed), ALLOCATED_BYTES.load(Ordering::Relaxed))
+    }
+
+    /// Allocations made so far by the calling thread.
+    pub fn thread_allocations() -> u64 {
+        THREAD_ALLOCATIONS.try_with(Cell::get).unwrap_or(0)
+    }
+
+    /// Whether the counting allocator is installed as the global allocator.
+    pub fn is_active() -> bool {
+        let before = ALLOCATIONS.load(Ordering::Relaxed);
+        drop(std::hint::black_box(Box::new(0u64)));
+        ALLOCATIONS.load(Ordering::Relaxed) != before
+    }
+}
+
+#[derive(Debug, Clone, PartialEq, Serialize, Deserialize)]
+pub struct BenchResult {
+    pub name: String,
+    pub bytes: usize,
+    pub instructions: usize,
+    /// Median `Disassembler::parse` time.
+    pub decode_ns: u64,
+    /// Median end-to-end `AuditEngine::audit` time.
+    pub scan_ns: u64,
+    /// Allocations per scan, if the counting allocator is installed.
+    pub allocs_per_scan: Option<u64>,
+}
+
+impl BenchResult {
+    pub fn decode_mb_s(&self) -> f64 {
+        mb_per_s(self.bytes, self.decode_ns)
+    }
+
+    pub fn scan_mb_s(&self) -> f64 {
+        mb_per_s(self.bytes, self.scan_ns)
+    }
+}
+
+fn mb_per_s(bytes: usize, ns: u64) -> f64 {
+    if ns == 0 {
+        return 0.0;
+    }
+    bytes as f64 / (1024.0 * 1024.0) / (ns as f64 / 1e9)
+}
+
+#[derive(Debug, Clone, PartialEq, Serialize, Deserialize)]
+pub struct BenchReport {
+    pub engine_version: u32,
+    pub iterations: usize,
+    pub results: Vec<BenchResult>,
+}
+
+#[derive(Debug, Clone, PartialEq)]
+pub struct Regression {
+    pub name: String,
+    pub metric: &'static str,
+    pub baseline: f64,
+    pub current: f64,
+}
+
+impl Regression {
+    pub fn change_pct(&self) -> f64 {
+        (self.current - self.baseline) / self.baseline * 100.0
+    }
+}
+
+fn median(mut samples: Vec<Duration>) -> u64 {
+    samples.sort_unstable();
+    samples.get(samples.len() / 2).map_or(0, |d| d.as_nanos() as u64)
+}
+
+/// Benchmarks decoding and end-to-end scanning of every corpus program.
+pub fn run(engine: &AuditEngine, corpus: &[CorpusProgram], iterations: usize) -> Result<BenchReport> {
+    let iterations = iterations.max(1);
+    let counting = CountingAllocator::is_active();
+    let mut results = Vec::with_capacity(corpus.len());
+
+    for program in corpus {
+        let text = AuditEngine::program_text(&program.data)?;
+        let instructions = Disassembler::parse(text)?.len();
+        engine.audit(&program.data)?;
+
+        let mut decode = Vec::with_capacity(iterations);
+        let mut scan = Vec::with_capacity(iterations);
+        let (allocs_before, _) = CountingAllocator::counts();
+        for _ in 0..iterations {
+            let start = Instant::now();
+            std::hint::black_box(engine.audit(&program.data)?);
+            scan.push(start.elapsed());
+        }
+        let (allocs_after, _) = CountingAllocator::counts();
+        for _ in 0..iterations {
+            let start = Instant::now();
+            std::hint::black_box(Disassembler::parse(text)?);
+            decode.push(start.elapsed());
+        }
+
+        results.push(BenchResult {
+            name: program.name.clone(),
+            bytes: program.data.len(),
+            instructions,
+            decode_ns: median(decode),
+            scan_ns: median(scan),
+            allocs_per_scan: counting.then(|| (allocs_after - allocs_before) / iterations as u64),
+        });
+    }
+
+    Ok(BenchReport { engine_version: ENGINE_VERSION, iterations, results })
+}
+
+impl BenchReport {
+    /// Metrics that got worse than `baseline` by more than `threshold_pct`.
+    pub fn compare(&self, baseline: &BenchReport, threshold_pct: f64) -> Vec<Regression> {
+        let mut out = Vec::new();
+        for cur in &self.results {
+            let Some(base) = baseline.results.iter().find(|b| b.name == cur.name) else { continue };
+            let mut check = |metric, baseline: f64, current: f64| {
+                if baseline > 0.0 && (current - baseline) / baseline * 100.0 > threshold_pct {
+                    out.push(Regression { name: cur.name.clone(), metric, baseline, current });
+                }
+            };
+            check("decode_ns", base.decode_ns as f64, cur.decode_ns as f64);
+            check("scan_ns", base.scan_ns as f64, cur.scan_ns as f64);
+            if let (Some(b), Some(c)) = (base.allocs_per_scan, cur.allocs_per_scan) {
+                check("allocs_per_scan", b as f64, c as f64);
+            }
+        }
+        out
+    }
+}
+
+impl fmt::Display for BenchReport {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        writeln!(
+            f,
+            "{:<24} {:>10} {:>9} {:>11} {:>11} {:>10} {:>10} {:>8}",
+            "program", "bytes", "insns", "decode", "scan", "dec MB/s", "scan MB/s", "allocs"
+        )?;
+        for r in &self.results {
+            writeln!(
+                f,
+                "{:<24} {:>10} {:>9} {:>9.3}ms {:>9.3}ms {:>10.1} {:>10.1} {:>8}",
+                r.name,
+                r.bytes,
+                r.instructions,
+                r.decode_ns as f64 / 1e6,
+                r.scan_ns as f64 / 1e6,
+                r.decode_mb_s(),
+                r.scan_mb_s(),
+                r.allocs_per_scan.map_or("-".to_string(), |a| a.to_string())
+            )?;
+        }
+        Ok(())
+    }
+}
+
+impl fmt::Display for Regression {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        write!(
+            f,
+            "{} {}: {:.0} -> {:.0} ({:+.1}%)",
+            self.name,
+            self.metric,
+            self.baseline,
+            self.current,
+            self.change_pct()
+        )
+    }
+}
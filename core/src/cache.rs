@@ -0,0 +1,338 @@
+use std::collections::HashMap;
+use std::fmt;
+use std::fs;
+use std::hash::Hash;
+use std::path::{Path, PathBuf};
+use std::sync::atomic::{AtomicU64, Ordering};
+use std::sync::{Arc, Mutex};
+
+use serde::{Deserialize, Serialize};
+use sha3::{Digest, Sha3_256};
+
+use crate::elf::{ElfFile, PROGRAMDATA_HEADER_LEN};
+use crate::error::{LenzError, Result};
+use crate::imports::ImportIndex;
+use crate::risk::RiskReport;
+
+/// SHA3-256 of a program's code, used as a content address.
+#[derive(Debug, Clone, Copy, PartialEq, Eq, Hash, PartialOrd, Ord, Serialize, Deserialize)]
+pub struct ProgramHash(pub [u8; 32]);
+
+impl ProgramHash {
+    pub fn of(data: &[u8]) -> Self {
+        let digest = Sha3_256::digest(data);
+        let mut out = [0u8; 32];
+        out.copy_from_slice(&digest);
+        Self(out)
+    }
+
+    /// Hashes a program account, ignoring the `ProgramData` metadata header so
+    /// identical code deployed under different authorities shares one entry.
+    pub fn of_program(bytecode: &[u8]) -> Self {
+        if !bytecode.starts_with(&crate::elf::ELF_MAGIC) && ElfFile::detect(bytecode) {
+            Self::of(&bytecode[PROGRAMDATA_HEADER_LEN..])
+        } else {
+            Self::of(bytecode)
+        }
+    }
+}
+
+impl fmt::Display for ProgramHash {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        self.0.iter().try_for_each(|b| write!(f, "{:02x}", b))
+    }
+}
+
+const NIL: usize = usize::MAX;
+
+struct Node<K, V> {
+    key: K,
+    value: V,
+    prev: usize,
+    next: usize,
+}
+
+/// Fixed-capacity least-recently-used map with O(1) operations.
+///
+/// Entries live in a slab and are threaded on an index-based doubly linked
+/// list, most recently used first.
+pub struct LruCache<K, V> {
+    map: HashMap<K, usize>,
+    nodes: Vec<Node<K, V>>,
+    head: usize,
+    tail: usize,
+    capacity: usize,
+}
+
+impl<K: Hash + Eq + Clone, V> LruCache<K, V> {
+    pub fn new(capacity: usize) -> Self {
+        let capacity = capacity.max(1);
+        Self { map: HashMap::with_capacity(capacity), nodes: Vec::new(), head: NIL, tail: NIL, capacity }
+    }
+
+    pub fn len(&self) -> usize {
+        self.map.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.map.is_empty()
+    }
+
+    pub fn capacity(&self) -> usize {
+        self.capacity
+    }
+
+    fn unlink(&mut self, i: usize) {
+        let (prev, next) = (self.nodes[i].prev, self.nodes[i].next);
+        match prev {
+            NIL => self.head = next,
+            p => self.nodes[p].next = next,
+        }
+        match next {
+            NIL => self.tail = prev,
+            n => self.nodes[n].prev = prev,
+        }
+    }
+
+    fn push_front(&mut self, i: usize) {
+        self.nodes[i].prev = NIL;
+        self.nodes[i].next = self.head;
+        if self.head != NIL {
+            self.nodes[self.head].prev = i;
+        }
+        self.head = i;
+        if self.tail == NIL {
+            self.tail = i;
+        }
+    }
+
+    pub fn get(&mut self, key: &K) -> Option<&V> {
+        let i = *self.map.get(key)?;
+        self.unlink(i);
+        self.push_front(i);
+        Some(&self.nodes[i].value)
+    }
+
+    pub fn insert(&mut self, key: K, value: V) {
+        if let Some(&i) = self.map.get(&key) {
+            self.nodes[i].value = value;
+            self.unlink(i);
+            self.push_front(i);
+            return;
+        }
+
+        let i = if self.nodes.len() < self.capacity {
+            self.nodes.push(Node { key: key.clone(), value, prev: NIL, next: NIL });
+            self.nodes.len() - 1
+        } else {
+            // Reuse the least recently used slot.
+            let i = self.tail;
+            self.unlink(i);
+            let old = std::mem::replace(&mut self.nodes[i], Node { key: key.clone(), value, prev: NIL, next: NIL });
+            self.map.remove(&old.key);
+            i
+        };
+        self.map.insert(key, i);
+        self.push_front(i);
+    }
+
+    pub fn clear(&mut self) {
+        self.map.clear();
+        self.nodes.clear();
+        self.head = NIL;
+        self.tail = NIL;
+    }
+}
+
+/// Identifies the analysis that produced cached results. Reports computed by
+/// a different engine or signature database version are never served.
+#[derive(Debug, Clone, Copy, Default, PartialEq, Eq, Hash, Serialize, Deserialize)]
+pub struct CacheVersion {
+    pub engine: u32,
+    pub signatures: u32,
+    /// Similarity index version, 0 when none is configured.
+    #[serde(default)]
+    pub families: u32,
+    /// Whether the import pre-filter may skip the dataflow tier.
+    #[serde(default)]
+    pub prefilter: bool,
+}
+
+impl CacheVersion {
+    fn namespace(&self) -> String {
+        let mut namespace = match self.families {
+            0 => format!("e{}-s{}", self.engine, self.signatures),
+            f => format!("e{}-s{}-f{:08x}", self.engine, self.signatures, f),
+        };
+        if self.prefilter {
+            namespace.push_str("-p");
+        }
+        namespace
+    }
+
+    /// Parses a directory name produced by `namespace`, so that pruning
+    /// never touches entries lenz did not create.
+    fn from_namespace(name: &str) -> Option<Self> {
+        let (base, prefilter) = match name.strip_suffix("-p") {
+            Some(base) => (base, true),
+            None => (name, false),
+        };
+        let mut parts = base.split('-');
+        let engine = parts.next()?.strip_prefix('e')?.parse().ok()?;
+        let signatures = parts.next()?.strip_prefix('s')?.parse().ok()?;
+        let families = match parts.next() {
+            Some(part) => u32::from_str_radix(part.strip_prefix('f')?, 16).ok()?,
+            None => 0,
+        };
+        let version = Self { engine, signatures, families, prefilter };
+        // Round-trip to reject look-alikes such as `e01-s1` or `e1-s1-f1`.
+        (parts.next().is_none() && version.namespace() == name).then_some(version)
+    }
+}
+
+#[derive(Debug, Clone, Copy, Default, PartialEq, Eq)]
+pub struct CacheStats {
+    pub hits: u64,
+    pub misses: u64,
+}
+
+/// Content-addressed cache of scan results.
+///
+/// Lookups go to a bounded in-memory LRU first and then, if configured, to a
+/// directory of JSON reports namespaced by `CacheVersion`. Import indexes
+/// depend only on the code and are kept in memory across versions.
+pub struct ScanCache {
+    memory: Mutex<(CacheVersion, LruCache<ProgramHash, RiskReport>)>,
+    imports: Mutex<LruCache<ProgramHash, Arc<ImportIndex>>>,
+    disk: Option<PathBuf>,
+    hits: AtomicU64,
+    misses: AtomicU64,
+}
+
+impl ScanCache {
+    pub fn new(capacity: usize) -> Self {
+        Self {
+            memory: Mutex::new((CacheVersion::default(), LruCache::new(capacity))),
+            imports: Mutex::new(LruCache::new(capacity)),
+            disk: None,
+            hits: AtomicU64::new(0),
+            misses: AtomicU64::new(0),
+        }
+    }
+
+    /// Persists reports under `dir` in addition to the in-memory LRU.
+    pub fn with_disk(mut self, dir: impl Into<PathBuf>) -> Self {
+        self.disk = Some(dir.into());
+        self
+    }
+
+    /// Binds the cache to an analysis version, dropping in-memory entries
+    /// produced by any other version.
+    pub fn set_version(&self, version: CacheVersion) {
+        let mut memory = self.memory.lock().unwrap();
+        if memory.0 != version {
+            memory.0 = version;
+            memory.1.clear();
+        }
+    }
+
+    pub fn version(&self) -> CacheVersion {
+        self.memory.lock().unwrap().0
+    }
+
+    pub fn stats(&self) -> CacheStats {
+        CacheStats { hits: self.hits.load(Ordering::Relaxed), misses: self.misses.load(Ordering::Relaxed) }
+    }
+
+    pub fn len(&self) -> usize {
+        self.memory.lock().unwrap().1.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.len() == 0
+    }
+
+    fn disk_path(&self, version: CacheVersion, hash: &ProgramHash) -> Option<PathBuf> {
+        self.disk.as_ref().map(|dir| dir.join(version.namespace()).join(format!("{}.json", hash)))
+    }
+
+    pub fn get(&self, hash: &ProgramHash) -> Option<RiskReport> {
+        let version = {
+            let mut memory = self.memory.lock().unwrap();
+            if let Some(report) = memory.1.get(hash) {
+                self.hits.fetch_add(1, Ordering::Relaxed);
+                return Some(report.clone());
+            }
+            memory.0
+        };
+
+        let report = self
+            .disk_path(version, hash)
+            .and_then(|path| fs::read(path).ok())
+            .and_then(|bytes| serde_json::from_slice::<RiskReport>(&bytes).ok());
+        match report {
+            Some(report) => {
+                self.hits.fetch_add(1, Ordering::Relaxed);
+                self.memory.lock().unwrap().1.insert(*hash, report.clone());
+                Some(report)
+            }
+            None => {
+                self.misses.fetch_add(1, Ordering::Relaxed);
+                None
+            }
+        }
+    }
+
+    pub fn insert(&self, hash: ProgramHash, report: &RiskReport) -> Result<()> {
+        let version = {
+            let mut memory = self.memory.lock().unwrap();
+            memory.1.insert(hash, report.clone());
+            memory.0
+        };
+
+        if let Some(path) = self.disk_path(version, &hash) {
+            write_atomic(&path, report).map_err(|e| LenzError::Io(e.to_string()))?;
+        }
+        Ok(())
+    }
+
+    pub fn imports(&self, hash: &ProgramHash) -> Option<Arc<ImportIndex>> {
+        self.imports.lock().unwrap().get(hash).cloned()
+    }
+
+    pub fn insert_imports(&self, hash: ProgramHash, imports: Arc<ImportIndex>) {
+        self.imports.lock().unwrap().insert(hash, imports);
+    }
+
+    /// Removes on-disk namespaces left behind by other analysis versions.
+    /// Anything else in the cache directory is left alone.
+    pub fn prune(&self) -> Result<()> {
+        let Some(dir) = &self.disk else { return Ok(()) };
+        let current = self.version().namespace();
+        let entries = match fs::read_dir(dir) {
+            Ok(entries) => entries,
+            Err(e) if e.kind() == std::io::ErrorKind::NotFound => return Ok(()),
+            Err(e) => return Err(LenzError::Io(e.to_string())),
+        };
+        for entry in entries.flatten() {
+            let stale = entry
+                .file_name()
+                .to_str()
+                .is_some_and(|name| name != current && CacheVersion::from_namespace(name).is_some());
+            if stale && entry.path().is_dir() {
+                fs::remove_dir_all(entry.path()).map_err(|e| LenzError::Io(e.to_string()))?;
+            }
+        }
+        Ok(())
+    }
+}
+
+fn write_atomic(path: &Path, report: &RiskReport) -> std::io::Result<()> {
+    if let Some(parent) = path.parent() {
+        fs::create_dir_all(parent)?;
+    }
+    static SEQ: AtomicU64 = AtomicU64::new(0);
+    let tmp = path.with_extension(format!("tmp{}-{}", std::process::id(), SEQ.fetch_add(1, Ordering::Relaxed)));
+    fs::write(&tmp, serde_json::to_vec(report)?)?;
+    fs::rename(tmp, path)
+}
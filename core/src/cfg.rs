@@ -0,0 +1,457 @@
+use std::cell::OnceCell;
+use std::ops::Range;
+
+use crate::disassembler::{Instruction, OpKind};
+
+pub type BlockId = u32;
+
+/// Sentinel for "no block" (unreachable blocks have no dominator).
+pub const NO_BLOCK: BlockId = u32::MAX;
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct BasicBlock {
+    /// Index of the first instruction in the decoded instruction vector.
+    pub first: u32,
+    /// One past the last instruction index.
+    pub last: u32,
+    succ_start: u32,
+    succ_end: u32,
+}
+
+impl BasicBlock {
+    pub fn insns(&self) -> Range<usize> {
+        self.first as usize..self.last as usize
+    }
+}
+
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct NaturalLoop {
+    pub header: BlockId,
+    pub latch: BlockId,
+    pub body: Vec<BlockId>,
+}
+
+/// Rank/select bitset over instruction slots, used to map a slot index to the
+/// basic block that starts at or before it in O(1).
+struct LeaderSet {
+    bits: Vec<u64>,
+    ranks: Vec<u32>,
+}
+
+impl LeaderSet {
+    fn new(slots: usize) -> Self {
+        Self { bits: vec![0; slots / 64 + 1], ranks: Vec::new() }
+    }
+
+    fn set(&mut self, slot: usize) {
+        if let Some(word) = self.bits.get_mut(slot / 64) {
+            *word |= 1 << (slot % 64);
+        }
+    }
+
+    fn get(&self, slot: usize) -> bool {
+        self.bits.get(slot / 64).map_or(false, |w| w & (1 << (slot % 64)) != 0)
+    }
+
+    fn and(&mut self, other: &LeaderSet) {
+        for (a, b) in self.bits.iter_mut().zip(&other.bits) {
+            *a &= b;
+        }
+    }
+
+    fn finish(&mut self) {
+        let mut total = 0;
+        self.ranks = self
+            .bits
+            .iter()
+            .map(|w| {
+                let r = total;
+                total += w.count_ones();
+                r
+            })
+            .collect();
+    }
+
+    /// Number of leaders strictly before `slot`.
+    fn rank(&self, slot: usize) -> u32 {
+        let (word, bit) = (slot / 64, slot % 64);
+        let mask = (1u64 << bit) - 1;
+        self.ranks[word] + (self.bits[word] & mask).count_ones()
+    }
+}
+
+/// Control-flow graph over a decoded instruction stream.
+///
+/// Blocks and edges live in flat vectors addressed by `BlockId`; predecessor
+/// lists, dominators and loops are derived on first use.
+pub struct ControlFlowGraph {
+    blocks: Vec<BasicBlock>,
+    succs: Vec<BlockId>,
+    roots: Vec<BlockId>,
+    entries: Vec<BlockId>,
+    calls: Vec<(BlockId, BlockId)>,
+    invalid_targets: u32,
+    indirect_calls: u32,
+    leaders: LeaderSet,
+    preds: OnceCell<(Vec<u32>, Vec<BlockId>)>,
+    idom: OnceCell<Vec<BlockId>>,
+    loops: OnceCell<Vec<NaturalLoop>>,
+}
+
+impl ControlFlowGraph {
+    /// Graph of a program that starts at slot 0.
+    pub fn build(insns: &[Instruction]) -> Self {
+        Self::build_with_roots(insns, &[])
+    }
+
+    /// Graph of a program that may also start at each slot in `roots`, e.g.
+    /// the ELF entrypoint and exported functions.
+    pub fn build_with_roots(insns: &[Instruction], roots: &[u32]) -> Self {
+        let slots = insns.last().map_or(0, |i| (i.pc + i.slots()) as usize);
+        let in_range = |t: i64| t >= 0 && (t as usize) < slots;
+
+        let mut starts = LeaderSet::new(slots);
+        let mut leaders = LeaderSet::new(slots);
+        let mut root_slots = vec![0usize];
+        root_slots.extend(roots.iter().map(|&r| r as usize).filter(|&r| r < slots));
+        for &slot in &root_slots {
+            leaders.set(slot);
+        }
+        let mut entry_slots = root_slots.clone();
+        for insn in insns {
+            starts.set(insn.pc as usize);
+            let next = (insn.pc + insn.slots()) as usize;
+            match insn.kind() {
+                OpKind::Jump | OpKind::Branch | OpKind::Exit => {
+                    leaders.set(next);
+                    if let Some(t) = insn.jump_target().filter(|&t| in_range(t)) {
+                        leaders.set(t as usize);
+                    }
+                }
+                OpKind::Call => {
+                    if let Some(t) = insn.call_target().filter(|&t| in_range(t)) {
+                        leaders.set(t as usize);
+                        entry_slots.push(t as usize);
+                    }
+                }
+                _ => {}
+            }
+        }
+        leaders.and(&starts);
+        leaders.finish();
+
+        let block_of = |slot: i64| -> Option<BlockId> {
+            (in_range(slot) && leaders.get(slot as usize)).then(|| leaders.rank(slot as usize))
+        };
+
+        let mut blocks: Vec<BasicBlock> = Vec::new();
+        let mut succs = Vec::new();
+        let mut calls = Vec::new();
+        let mut invalid_targets = 0;
+        let mut indirect_calls = 0;
+        for (idx, insn) in insns.iter().enumerate() {
+            if leaders.get(insn.pc as usize) {
+                if let Some(prev) = blocks.last_mut() {
+                    prev.last = idx as u32;
+                }
+                blocks.push(BasicBlock { first: idx as u32, last: idx as u32 + 1, succ_start: 0, succ_end: 0 });
+            }
+            let id = blocks.len() as BlockId - 1;
+            match insn.kind() {
+                OpKind::Call => {
+                    if let Some(t) = insn.call_target() {
+                        match block_of(t) {
+                            Some(callee) => calls.push((id, callee)),
+                            None => invalid_targets += 1,
+                        }
+                    }
+                }
+                OpKind::CallReg => indirect_calls += 1,
+                _ => {}
+            }
+        }
+        if let Some(last) = blocks.last_mut() {
+            last.last = insns.len() as u32;
+        }
+
+        let count = blocks.len() as BlockId;
+        for id in 0..count {
+            let block = &blocks[id as usize];
+            let start = succs.len() as u32;
+            let tail = &insns[block.last as usize - 1];
+            let fallthrough = (id + 1 < count).then_some(id + 1);
+            match tail.kind() {
+                OpKind::Exit => {}
+                OpKind::Jump | OpKind::Branch => {
+                    match tail.jump_target().and_then(block_of) {
+                        Some(t) => succs.push(t),
+                        None => invalid_targets += 1,
+                    }
+                    if tail.kind() == OpKind::Branch {
+                        succs.extend(fallthrough);
+                    }
+                }
+                _ => succs.extend(fallthrough),
+            }
+            let block = &mut blocks[id as usize];
+            block.succ_start = start;
+            block.succ_end = succs.len() as u32;
+        }
+
+        let blocks_of = |slots: Vec<usize>| -> Vec<BlockId> {
+            let mut ids: Vec<BlockId> = if blocks.is_empty() {
+                Vec::new()
+            } else {
+                slots.into_iter().filter_map(|s| block_of(s as i64)).collect()
+            };
+            ids.sort_unstable();
+            ids.dedup();
+            ids
+        };
+        let roots = blocks_of(root_slots);
+        let entries = blocks_of(entry_slots);
+
+        Self {
+            blocks,
+            succs,
+            roots,
+            entries,
+            calls,
+            invalid_targets,
+            indirect_calls,
+            leaders,
+            preds: OnceCell::new(),
+            idom: OnceCell::new(),
+            loops: OnceCell::new(),
+        }
+    }
+
+    pub fn blocks(&self) -> &[BasicBlock] {
+        &self.blocks
+    }
+
+    pub fn block(&self, id: BlockId) -> &BasicBlock {
+        &self.blocks[id as usize]
+    }
+
+    pub fn len(&self) -> usize {
+        self.blocks.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.blocks.is_empty()
+    }
+
+    pub fn successors(&self, id: BlockId) -> &[BlockId] {
+        let b = &self.blocks[id as usize];
+        &self.succs[b.succ_start as usize..b.succ_end as usize]
+    }
+
+    pub fn predecessors(&self, id: BlockId) -> &[BlockId] {
+        let (offsets, preds) = self.preds.get_or_init(|| self.compute_predecessors());
+        &preds[offsets[id as usize] as usize..offsets[id as usize + 1] as usize]
+    }
+
+    /// Blocks execution can start at: slot 0 and the roots the graph was
+    /// built with. The input pointer arrives in `r1` at each of them.
+    pub fn roots(&self) -> &[BlockId] {
+        &self.roots
+    }
+
+    /// Function entry blocks: the roots plus every internal call target.
+    pub fn entries(&self) -> &[BlockId] {
+        &self.entries
+    }
+
+    /// Internal call sites as `(calling block, callee entry block)` pairs.
+    pub fn calls(&self) -> &[(BlockId, BlockId)] {
+        &self.calls
+    }
+
+    /// Jumps and calls whose target is outside the program or inside an `lddw`.
+    pub fn invalid_targets(&self) -> u32 {
+        self.invalid_targets
+    }
+
+    pub fn indirect_calls(&self) -> u32 {
+        self.indirect_calls
+    }
+
+    /// Block containing the instruction at slot `pc`.
+    pub fn block_at(&self, pc: u32) -> Option<BlockId> {
+        let slot = pc as usize;
+        if self.blocks.is_empty() || slot >= self.leaders.bits.len() * 64 {
+            return None;
+        }
+        let rank = self.leaders.rank(slot) + self.leaders.get(slot) as u32;
+        rank.checked_sub(1).filter(|&id| (id as usize) < self.blocks.len())
+    }
+
+    /// Entry block of the function an internal call at `insn` enters. Like
+    /// the edges in `calls`, targets outside the program or inside a block
+    /// have none.
+    pub fn callee(&self, insn: &Instruction) -> Option<BlockId> {
+        let slot = usize::try_from(insn.call_target()?).ok()?;
+        // Leaders only ever mark in-range instruction starts.
+        (!self.blocks.is_empty() && self.leaders.get(slot)).then(|| self.leaders.rank(slot))
+    }
+
+    fn compute_predecessors(&self) -> (Vec<u32>, Vec<BlockId>) {
+        let n = self.blocks.len();
+        let mut offsets = vec![0u32; n + 1];
+        for &s in &self.succs {
+            offsets[s as usize + 1] += 1;
+        }
+        for i in 0..n {
+            offsets[i + 1] += offsets[i];
+        }
+        let mut fill = offsets.clone();
+        let mut preds = vec![0; self.succs.len()];
+        for id in 0..n as BlockId {
+            for &s in self.successors(id) {
+                preds[fill[s as usize] as usize] = id;
+                fill[s as usize] += 1;
+            }
+        }
+        (offsets, preds)
+    }
+
+    /// Blocks reachable from the function entries, in reverse postorder.
+    pub fn reverse_postorder(&self) -> Vec<BlockId> {
+        let mut visited = vec![false; self.blocks.len()];
+        let mut order = Vec::with_capacity(self.blocks.len());
+        let mut stack: Vec<(BlockId, usize)> = Vec::new();
+        for &entry in self.entries.iter().rev() {
+            if visited[entry as usize] {
+                continue;
+            }
+            visited[entry as usize] = true;
+            stack.push((entry, 0));
+            while let Some(top) = stack.last_mut() {
+                let (id, next) = *top;
+                if let Some(&s) = self.successors(id).get(next) {
+                    top.1 += 1;
+                    if !visited[s as usize] {
+                        visited[s as usize] = true;
+                        stack.push((s, 0));
+                    }
+                } else {
+                    order.push(id);
+                    stack.pop();
+                }
+            }
+        }
+        order.reverse();
+        order
+    }
+
+    /// Immediate dominator of every block. Function entries are their own
+    /// immediate dominator; unreachable blocks map to `NO_BLOCK`.
+    pub fn dominators(&self) -> &[BlockId] {
+        self.idom.get_or_init(|| self.compute_dominators())
+    }
+
+    fn compute_dominators(&self) -> Vec<BlockId> {
+        let n = self.blocks.len();
+        let order = self.reverse_postorder();
+        let mut rpo = vec![u32::MAX; n];
+        for (i, &b) in order.iter().enumerate() {
+            rpo[b as usize] = i as u32;
+        }
+
+        // Entries hang off a virtual root so that every function shares one tree.
+        let root = n as BlockId;
+        let mut idom = vec![NO_BLOCK; n + 1];
+        idom[root as usize] = root;
+        for &e in &self.entries {
+            idom[e as usize] = root;
+        }
+        let rank = |b: BlockId| if b == root { 0 } else { rpo[b as usize] + 1 };
+
+        let mut changed = true;
+        while changed {
+            changed = false;
+            for &b in &order {
+                if idom[b as usize] == root {
+                    continue;
+                }
+                let mut new = NO_BLOCK;
+                for &p in self.predecessors(b) {
+                    if idom[p as usize] == NO_BLOCK {
+                        continue;
+                    }
+                    new = if new == NO_BLOCK {
+                        p
+                    } else {
+                        let (mut x, mut y) = (p, new);
+                        while x != y {
+                            while rank(x) > rank(y) {
+                                x = idom[x as usize];
+                            }
+                            while rank(y) > rank(x) {
+                                y = idom[y as usize];
+                            }
+                        }
+                        x
+                    };
+                }
+                if new != NO_BLOCK && idom[b as usize] != new {
+                    idom[b as usize] = new;
+                    changed = true;
+                }
+            }
+        }
+
+        idom.truncate(n);
+        for &e in &self.entries {
+            idom[e as usize] = e;
+        }
+        idom
+    }
+
+    /// Whether block `a` dominates block `b`.
+    pub fn dominates(&self, a: BlockId, mut b: BlockId) -> bool {
+        let idom = self.dominators();
+        loop {
+            if a == b {
+                return true;
+            }
+            let up = idom[b as usize];
+            if up == NO_BLOCK || up == b {
+                return false;
+            }
+            b = up;
+        }
+    }
+
+    /// Natural loops, one per back edge.
+    pub fn loops(&self) -> &[NaturalLoop] {
+        self.loops.get_or_init(|| self.compute_loops())
+    }
+
+    fn compute_loops(&self) -> Vec<NaturalLoop> {
+        let mut loops = Vec::new();
+        // Visit marks are stamped with the loop number so they never need clearing.
+        let mut seen = vec![u32::MAX; self.blocks.len()];
+        for latch in 0..self.blocks.len() as BlockId {
+            for &header in self.successors(latch) {
+                if !self.dominates(header, latch) {
+                    continue;
+                }
+                let stamp = loops.len() as u32;
+                seen[header as usize] = stamp;
+                let mut body = vec![header];
+                let mut work = vec![latch];
+                while let Some(b) = work.pop() {
+                    if std::mem::replace(&mut seen[b as usize], stamp) != stamp {
+                        body.push(b);
+                        work.extend_from_slice(self.predecessors(b));
+                    }
+                }
+                body.sort_unstable();
+                loops.push(NaturalLoop { header, latch, body });
+            }
+        }
+        loops
+    }
+}
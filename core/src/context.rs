@@ -0,0 +1,91 @@
+use std::cell::OnceCell;
+use std::sync::Arc;
+
+use crate::cfg::ControlFlowGraph;
+use crate::disassembler::{Disassembler, Instruction};
+use crate::elf::ElfFile;
+use crate::error::{LenzError, Result};
+use crate::imports::ImportIndex;
+
+/// Per-program analysis state shared by every heuristic.
+///
+/// The program is decoded once; the control-flow graph and the import index
+/// are built on first request and then reused by all passes of the same scan.
+pub struct ScanContext<'a> {
+    pub bytecode: &'a [u8],
+    pub elf: Option<ElfFile<'a>>,
+    pub text: &'a [u8],
+    pub instructions: Vec<Instruction>,
+    /// Slots besides 0 execution can start at, see `ElfFile::entry_points`.
+    pub roots: Vec<u32>,
+    cfg: OnceCell<ControlFlowGraph>,
+    imports: OnceCell<Arc<ImportIndex>>,
+}
+
+impl<'a> ScanContext<'a> {
+    pub fn new(bytecode: &'a [u8]) -> Result<Self> {
+        if bytecode.is_empty() {
+            return Err(LenzError::EmptyBytecode);
+        }
+
+        let elf = if ElfFile::detect(bytecode) { Some(ElfFile::parse(bytecode)?) } else { None };
+        let text = match &elf {
+            Some(elf) => elf.text()?,
+            None => bytecode,
+        };
+        let instructions = Disassembler::parse(text)?;
+        let roots = elf.as_ref().map_or_else(Vec::new, ElfFile::entry_points);
+
+        Ok(Self { bytecode, elf, text, instructions, roots, cfg: OnceCell::new(), imports: OnceCell::new() })
+    }
+
+    /// Context for the whole-program passes over instructions decoded
+    /// elsewhere, e.g. by a streaming scan. `bytecode` and `text` are empty.
+    pub fn from_instructions(instructions: Vec<Instruction>, roots: Vec<u32>) -> Self {
+        Self {
+            bytecode: &[],
+            elf: None,
+            text: &[],
+            instructions,
+            roots,
+            cfg: OnceCell::new(),
+            imports: OnceCell::new(),
+        }
+    }
+
+    pub fn cfg(&self) -> &ControlFlowGraph {
+        self.cfg.get_or_init(|| ControlFlowGraph::build_with_roots(&self.instructions, &self.roots))
+    }
+
+    /// Whether the CFG has been built yet.
+    pub fn has_cfg(&self) -> bool {
+        self.cfg.get().is_some()
+    }
+
+    /// Imported syscalls, CPI sites and known program ids. Shared so a
+    /// cache can keep it past the scan.
+    pub fn imports(&self) -> &Arc<ImportIndex> {
+        self.imports.get_or_init(|| Arc::new(ImportIndex::build(self)))
+    }
+
+    pub fn has_imports(&self) -> bool {
+        self.imports.get().is_some()
+    }
+
+    /// Uses an index built by an earlier scan of the same code. Ignored
+    /// once the index has been built.
+    pub fn set_imports(&self, imports: Arc<ImportIndex>) {
+        let _ = self.imports.set(imports);
+    }
+
+    /// Splits the program into functions: contiguous instruction ranges
+    /// starting at each CFG entry. Returns the first instruction index of each.
+    pub fn function_starts(&self) -> Vec<usize> {
+        let cfg = self.cfg();
+        let mut starts: Vec<usize> = cfg.entries().iter().map(|&b| cfg.block(b).first as usize).collect();
+        if starts.first() != Some(&0) && !self.instructions.is_empty() {
+            starts.insert(0, 0);
+        }
+        starts
+    }
+}
@@ -0,0 +1,252 @@
+//! Deterministic generator of synthetic SBF programs for benchmarks and
+//! load tests.
+
+use crate::disassembler::INSN_SIZE;
+
+/// Small xorshift64* generator so corpora are reproducible from a seed
+/// without an external RNG dependency.
+#[derive(Debug, Clone)]
+pub struct Rng(u64);
+
+impl Rng {
+    pub fn new(seed: u64) -> Self {
+        Self(seed ^ 0x9e37_79b9_7f4a_7c15 | 1)
+    }
+
+    pub fn next_u64(&mut self) -> u64 {
+        let mut x = self.0;
+        x ^= x >> 12;
+        x ^= x << 25;
+        x ^= x >> 27;
+        self.0 = x;
+        x.wrapping_mul(0x2545_f491_4f6c_dd1d)
+    }
+
+    pub fn below(&mut self, n: u64) -> u64 {
+        self.next_u64() % n.max(1)
+    }
+
+    pub fn chance(&mut self, p: f32) -> bool {
+        ((self.next_u64() >> 40) as f32 / (1u64 << 24) as f32) < p
+    }
+}
+
+/// Malicious code shapes that can be planted into a synthetic program.
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub enum Plant {
+    /// Transfer gated on the signer matching a hardcoded key.
+    HardcodedKeyGate,
+    /// Rejection when the signer matches a hardcoded key.
+    HardcodedKeyMatch,
+    /// Serialization of a Token `MintTo` instruction.
+    MintTo,
+}
+
+#[derive(Debug, Clone)]
+pub struct ProgramSpec {
+    pub seed: u64,
+    /// Target size of `.text` in bytes.
+    pub size: usize,
+    /// Probability that an instruction is a conditional branch.
+    pub branch_density: f32,
+    /// Probability that an instruction is an internal call.
+    pub call_density: f32,
+    pub plants: Vec<Plant>,
+    /// Wrap the code in an ELF image instead of emitting raw `.text`.
+    pub elf: bool,
+}
+
+impl ProgramSpec {
+    pub fn new(seed: u64, size: usize) -> Self {
+        Self { seed, size, branch_density: 0.1, call_density: 0.01, plants: Vec::new(), elf: true }
+    }
+}
+
+fn insn(opcode: u8, dst: u8, src: u8, off: i16, imm: i32) -> [u8; INSN_SIZE] {
+    let mut raw = [opcode, (src << 4) | (dst & 0x0f), 0, 0, 0, 0, 0, 0];
+    raw[2..4].copy_from_slice(&off.to_le_bytes());
+    raw[4..8].copy_from_slice(&imm.to_le_bytes());
+    raw
+}
+
+fn plant_code(plant: Plant, rng: &mut Rng) -> Vec<[u8; INSN_SIZE]> {
+    let mut out = Vec::new();
+    match plant {
+        Plant::HardcodedKeyGate | Plant::HardcodedKeyMatch => {
+            let branch = if plant == Plant::HardcodedKeyGate { 0x5d } else { 0x1d };
+            for chunk in 0..4 {
+                let key = rng.next_u64();
+                out.push(insn(0x79, 2, 1, chunk * 8, 0));
+                out.push(insn(0x18, 3, 0, 0, key as i32));
+                out.push(insn(0x00, 0, 0, 0, (key >> 32) as i32));
+                // Branch to the abort sequence after the `ja` below.
+                out.push(insn(branch, 2, 3, 13 - chunk * 4, 0));
+            }
+            out.push(insn(0x05, 0, 0, 2, 0));
+            out.push(insn(0xb7, 0, 0, 0, 1));
+            out.push(insn(0x95, 0, 0, 0, 0));
+        }
+        Plant::MintTo => {
+            out.push(insn(0x72, 10, 0, -16, 7));
+            out.push(insn(0x7b, 10, 6, -15, 0));
+        }
+    }
+    out
+}
+
+const BRANCHES: [u8; 5] = [0x15, 0x55, 0x25, 0xa5, 0x05];
+
+/// Far jump window, kept well inside the 16-bit `off` field.
+const FAR: u64 = 32_000;
+
+/// Generates one program. The output always decodes cleanly and every jump
+/// lands on an instruction boundary.
+pub fn generate(spec: &ProgramSpec) -> Vec<u8> {
+    let mut rng = Rng::new(spec.seed);
+    let slots = (spec.size / INSN_SIZE).max(2);
+    let mut code: Vec<[u8; INSN_SIZE]> = Vec::with_capacity(slots);
+    let mut patch = Vec::new();
+
+    // Plants are spread evenly through the program.
+    let mut plants = spec
+        .plants
+        .iter()
+        .enumerate()
+        .map(|(k, &p)| ((k + 1) * slots / (spec.plants.len() + 1), p))
+        .peekable();
+
+    while code.len() + 1 < slots {
+        if let Some(&(at, plant)) = plants.peek() {
+            if code.len() >= at {
+                plants.next();
+                code.extend(plant_code(plant, &mut rng));
+                continue;
+            }
+        }
+
+        let dst = rng.below(10) as u8;
+        let src = rng.below(10) as u8;
+        if rng.chance(spec.branch_density) {
+            patch.push(code.len());
+            code.push(insn(BRANCHES[rng.below(5) as usize], dst, src, 0, rng.below(64) as i32));
+        } else if rng.chance(spec.call_density) {
+            patch.push(code.len());
+            code.push(insn(0x85, 0, 1, 0, 0));
+        } else if rng.chance(0.05) && code.len() + 2 < slots {
+            let imm = rng.next_u64();
+            code.push(insn(0x18, dst, 0, 0, imm as i32));
+            code.push(insn(0x00, 0, 0, 0, (imm >> 32) as i32));
+        } else {
+            code.push(match rng.below(6) {
+                0 => insn(0x79, dst, src, (rng.below(32) * 8) as i16, 0),
+                1 => insn(0x7b, 10, src, -((rng.below(32) as i16 + 1) * 8), 0),
+                2 => insn(0xbf, dst, src, 0, 0),
+                3 => insn(0xb7, dst, 0, 0, rng.below(1 << 16) as i32),
+                4 => insn(0x0f, dst, src, 0, 0),
+                _ => insn(0x57, dst, 0, 0, rng.below(256) as i32),
+            });
+        }
+    }
+    code.push(insn(0x95, 0, 0, 0, 0));
+
+    // Opcode 0x00 only ever appears as the second slot of an `lddw`.
+    let n = code.len() as i64;
+    for pc in patch {
+        let from = pc as i64;
+        // Mostly short forward jumps, sometimes anywhere within `off` range.
+        let mut target = if rng.chance(0.8) {
+            from + 1 + rng.below(32) as i64
+        } else {
+            from - FAR as i64 + rng.below(2 * FAR) as i64
+        };
+        target = target.clamp(0, n - 1);
+        while code[target as usize][0] == 0x00 {
+            target += 1;
+        }
+        let rel = target - from - 1;
+        if code[pc][0] == 0x85 {
+            code[pc][4..8].copy_from_slice(&(rel as i32).to_le_bytes());
+        } else {
+            code[pc][2..4].copy_from_slice(&(rel as i16).to_le_bytes());
+        }
+    }
+
+    let text: Vec<u8> = code.concat();
+    if spec.elf {
+        wrap_elf(&text, &[])
+    } else {
+        text
+    }
+}
+
+/// Wraps `.text` and `.rodata` into a minimal SBF ELF shared object.
+pub fn wrap_elf(text: &[u8], rodata: &[u8]) -> Vec<u8> {
+    const SHSTRTAB: &[u8] = b"\0.text\0.rodata\0.shstrtab\0";
+    let text_off = 64;
+    let rodata_off = text_off + text.len();
+    let strtab_off = rodata_off + rodata.len();
+    let shoff = (strtab_off + SHSTRTAB.len() + 7) & !7;
+
+    let mut elf = vec![0u8; 64];
+    elf[..4].copy_from_slice(&crate::elf::ELF_MAGIC);
+    elf[4] = 2;
+    elf[5] = 1;
+    elf[6] = 1;
+    elf[16..18].copy_from_slice(&3u16.to_le_bytes());
+    elf[18..20].copy_from_slice(&247u16.to_le_bytes());
+    elf[20..24].copy_from_slice(&1u32.to_le_bytes());
+    elf[24..32].copy_from_slice(&(text_off as u64).to_le_bytes());
+    elf[40..48].copy_from_slice(&(shoff as u64).to_le_bytes());
+    elf[52..54].copy_from_slice(&64u16.to_le_bytes());
+    elf[58..60].copy_from_slice(&64u16.to_le_bytes());
+    elf[60..62].copy_from_slice(&4u16.to_le_bytes());
+    elf[62..64].copy_from_slice(&3u16.to_le_bytes());
+    elf.extend_from_slice(text);
+    elf.extend_from_slice(rodata);
+    elf.extend_from_slice(SHSTRTAB);
+    elf.resize(shoff, 0);
+
+    let mut section = |name: u32, kind: u32, flags: u64, offset: usize, size: usize| {
+        let mut sh = [0u8; 64];
+        sh[0..4].copy_from_slice(&name.to_le_bytes());
+        sh[4..8].copy_from_slice(&kind.to_le_bytes());
+        sh[8..16].copy_from_slice(&flags.to_le_bytes());
+        sh[16..24].copy_from_slice(&(offset as u64).to_le_bytes());
+        sh[24..32].copy_from_slice(&(offset as u64).to_le_bytes());
+        sh[32..40].copy_from_slice(&(size as u64).to_le_bytes());
+        elf.extend_from_slice(&sh);
+    };
+    section(0, 0, 0, 0, 0);
+    section(1, 1, 0x6, text_off, text.len());
+    section(7, 1, 0x2, rodata_off, rodata.len());
+    section(15, crate::elf::SHT_STRTAB, 0, strtab_off, SHSTRTAB.len());
+    elf
+}
+
+#[derive(Debug, Clone)]
+pub struct CorpusProgram {
+    pub name: String,
+    pub data: Vec<u8>,
+}
+
+/// The standard benchmark corpus: small to mainnet-sized programs with
+/// straight-line, branch-heavy and call-heavy shapes.
+pub fn standard() -> Vec<CorpusProgram> {
+    let mut corpus = Vec::new();
+    for (i, &(kib, branch, call)) in [
+        (16usize, 0.05f32, 0.01f32),
+        (128, 0.10, 0.01),
+        (300, 0.20, 0.02),
+        (900, 0.10, 0.05),
+    ]
+    .iter()
+    .enumerate()
+    {
+        let mut spec = ProgramSpec::new(0x5eed + i as u64, kib * 1024);
+        spec.branch_density = branch;
+        spec.call_density = call;
+        spec.plants = vec![Plant::HardcodedKeyGate, Plant::MintTo];
+        corpus.push(CorpusProgram { name: format!("{}k-b{}-c{}", kib, branch, call), data: generate(&spec) });
+    }
+    corpus
+}
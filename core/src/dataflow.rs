@@ -0,0 +1,366 @@
+//! Sparse dataflow analysis over the control-flow graph.
+//!
+//! Every register and the low stack slots of a frame hold a `Value`, a small
+//! bitset describing where the value may have come from. Block input states
+//! are joined by union and only blocks whose input grew are revisited, so a
+//! block is processed at most once per lattice bit per location and the
+//! analysis stays linear in program size; in practice blocks settle after two
+//! or three visits. Calls pass argument registers to the callee entry,
+//! context-insensitively.
+//!
+//! `solve` can also run over part of a program, taking the states that flow
+//! in from the rest as given; incremental rescans use it to analyze only
+//! the functions that changed.
+
+use serde::{Deserialize, Serialize};
+
+use crate::cfg::BlockId;
+use crate::context::ScanContext;
+use crate::deadline::Deadline;
+use crate::disassembler::{Instruction, OpKind};
+
+/// Origins a value may have. The empty set means "not yet reached".
+#[derive(Debug, Clone, Copy, Default, PartialEq, Eq)]
+pub struct Value(u8);
+
+impl Value {
+    /// Pointer into the program input (accounts and instruction data).
+    pub const INPUT: Value = Value(1 << 0);
+    /// Read from memory through an input-derived pointer, e.g. an account key.
+    pub const LOADED: Value = Value(1 << 1);
+    /// A 64-bit constant that does not fit an immediate, e.g. a key chunk.
+    pub const KEY: Value = Value(1 << 2);
+    /// Anything else.
+    pub const OTHER: Value = Value(1 << 3);
+
+    pub fn contains(self, other: Value) -> bool {
+        self.0 & other.0 == other.0
+    }
+
+    fn join(self, other: Value) -> Value {
+        Value(self.0 | other.0)
+    }
+
+    /// Reading a location that has no value yet yields an unknown value.
+    fn read(self) -> Value {
+        if self.0 == 0 {
+            Value::OTHER
+        } else {
+            self
+        }
+    }
+}
+
+const REGS: usize = 11;
+const FP: u8 = 10;
+/// Stack slots tracked per frame, counted down from the frame pointer.
+/// Spills further away are treated as unknown.
+const STACK_SLOTS: usize = 64;
+const BITS: usize = 4;
+const WORDS: usize = ((REGS + STACK_SLOTS) * BITS).div_ceil(64);
+/// Blocks processed between deadline checks.
+const POLL_INTERVAL: u32 = 256;
+
+/// Values of every register and tracked stack slot, packed four bits per
+/// location so joins and comparisons are a handful of word operations.
+#[derive(Debug, Clone, Copy, PartialEq, Eq, PartialOrd, Ord, Hash, Serialize, Deserialize)]
+pub struct State([u64; WORDS]);
+
+impl State {
+    pub(crate) const BOTTOM: State = State([0; WORDS]);
+
+    /// State at a program root: the input pointer in `r1`.
+    pub(crate) fn entry() -> State {
+        let mut state = State::BOTTOM;
+        state.set(1, Value::INPUT);
+        state
+    }
+
+    /// Joins `other` into `self`, returning whether anything changed.
+    fn join(&mut self, other: &State) -> bool {
+        let mut changed = 0;
+        for (a, b) in self.0.iter_mut().zip(&other.0) {
+            changed |= b & !*a;
+            *a |= b;
+        }
+        changed != 0
+    }
+
+    fn get(&self, loc: usize) -> Value {
+        let bit = loc * BITS;
+        Value((self.0[bit / 64] >> (bit % 64)) as u8 & 0xf)
+    }
+
+    fn put(&mut self, loc: usize, v: Value) {
+        let bit = loc * BITS;
+        let word = &mut self.0[bit / 64];
+        *word = *word & !(0xf << (bit % 64)) | (v.0 as u64) << (bit % 64);
+    }
+
+    fn reg(&self, r: u8) -> Value {
+        if (r as usize) < REGS {
+            self.get(r as usize).read()
+        } else {
+            Value::OTHER
+        }
+    }
+
+    fn set(&mut self, r: u8, v: Value) {
+        if (r as usize) < REGS {
+            self.put(r as usize, v);
+        }
+    }
+
+    fn stack(&self, off: i16) -> Value {
+        Self::slot(off).map_or(Value::OTHER, |s| self.get(REGS + s).read())
+    }
+
+    fn spill(&mut self, off: i16, v: Value) {
+        if let Some(s) = Self::slot(off) {
+            self.put(REGS + s, v);
+        }
+    }
+
+    fn slot(off: i16) -> Option<usize> {
+        let depth = -(off as i32);
+        (depth > 0 && depth % 8 == 0).then(|| depth as usize / 8 - 1).filter(|&s| s < STACK_SLOTS)
+    }
+
+    /// State at a callee entry: the argument registers and a fresh frame.
+    fn arguments(&self) -> State {
+        let mut args = State::BOTTOM;
+        for r in 1..=5 {
+            args.put(r, self.get(r));
+        }
+        args
+    }
+}
+
+/// A register-to-register equality branch between a value read from the
+/// input and a 64-bit constant.
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct KeyComparison {
+    /// Slot of the branch instruction.
+    pub pc: u32,
+    pub opcode: u8,
+    /// Entry block of the function containing the branch.
+    pub function: BlockId,
+}
+
+impl KeyComparison {
+    /// Whether execution falls through only when the values are equal
+    /// (`jne` to a reject path), as opposed to branching away on a match.
+    pub fn requires_match(&self) -> bool {
+        self.opcode == 0x5d
+    }
+}
+
+fn is_key_comparison(insn: &Instruction, state: &State) -> bool {
+    if insn.kind() != OpKind::Branch || !insn.uses_src_reg() || !matches!(insn.opcode, 0x1d | 0x5d) {
+        return false;
+    }
+    let (a, b) = (state.reg(insn.dst), state.reg(insn.src));
+    (a.contains(Value::LOADED) && b.contains(Value::KEY)) || (a.contains(Value::KEY) && b.contains(Value::LOADED))
+}
+
+/// Applies one non-branching instruction to `state`.
+fn transfer(insn: &Instruction, state: &mut State) {
+    match insn.kind() {
+        OpKind::LoadImm64 => {
+            let wide = insn.imm != insn.imm as i32 as i64;
+            state.set(insn.dst, if wide { Value::KEY } else { Value::OTHER });
+        }
+        OpKind::Load => {
+            let v = if insn.src == FP {
+                state.stack(insn.off)
+            } else if state.reg(insn.src).0 & (Value::INPUT.0 | Value::LOADED.0) != 0 {
+                Value::LOADED
+            } else {
+                Value::OTHER
+            };
+            state.set(insn.dst, v);
+        }
+        OpKind::Store if insn.dst == FP => state.spill(insn.off, Value::OTHER),
+        OpKind::StoreReg if insn.dst == FP => state.spill(insn.off, state.reg(insn.src)),
+        OpKind::Alu64 => {
+            let v = match (insn.opcode, insn.uses_src_reg()) {
+                (0xbf, _) => state.reg(insn.src),
+                (0xb7, _) => Value::OTHER,
+                // Derived values keep every origin of their operands.
+                (_, true) => state.reg(insn.dst).join(state.reg(insn.src)),
+                (_, false) => state.reg(insn.dst),
+            };
+            state.set(insn.dst, v);
+        }
+        // 32-bit results cannot carry a pointer or a whole key chunk.
+        OpKind::Alu32 => state.set(insn.dst, Value::OTHER),
+        OpKind::Call | OpKind::CallReg => {
+            for r in 0..=5 {
+                state.set(r, Value::OTHER);
+            }
+        }
+        _ => {}
+    }
+}
+
+/// Index of the first set bit at or after `from`.
+fn next_set_bit(bits: &[u64], from: usize) -> Option<usize> {
+    let mut w = from / 64;
+    let mut word = *bits.get(w)? & (!0u64 << (from % 64));
+    while word == 0 {
+        w += 1;
+        word = *bits.get(w)?;
+    }
+    Some(w * 64 + word.trailing_zeros() as usize)
+}
+
+/// Runs block `id` from `state`. Reports every key comparison to `hit` and
+/// every state leaving the block to `flow` as `(instruction, is_call,
+/// target, state)`: the arguments of each call and the final state to each
+/// successor.
+pub(crate) fn run_block(
+    ctx: &ScanContext,
+    id: BlockId,
+    mut state: State,
+    mut hit: impl FnMut(usize),
+    mut flow: impl FnMut(usize, bool, BlockId, &State),
+) {
+    let cfg = ctx.cfg();
+    let block = cfg.block(id);
+    for idx in block.insns() {
+        let insn = &ctx.instructions[idx];
+        if is_key_comparison(insn, &state) {
+            hit(idx);
+        }
+        if let Some(callee) = cfg.callee(insn) {
+            flow(idx, true, callee, &state.arguments());
+        }
+        transfer(insn, &mut state);
+    }
+    for &succ in cfg.successors(id) {
+        flow(block.last as usize - 1, false, succ, &state);
+    }
+}
+
+/// Fixpoint of the analysis over some of the blocks of a program.
+pub(crate) struct Solution {
+    input: Vec<State>,
+    reached: Vec<bool>,
+    /// Instructions that compare a key, by index.
+    pub hits: Vec<bool>,
+}
+
+impl Solution {
+    /// Input state of `block`, or `None` if it was never reached.
+    pub fn input(&self, block: BlockId) -> Option<State> {
+        self.reached[block as usize].then(|| self.input[block as usize])
+    }
+}
+
+/// Analyzes the blocks for which `active` holds, starting from `seeds`.
+/// States flowing into other blocks are dropped.
+///
+/// Returns `None` when `deadline` passes before the analysis converges.
+pub(crate) fn solve(
+    ctx: &ScanContext,
+    active: impl Fn(BlockId) -> bool,
+    seeds: &[(BlockId, State)],
+    deadline: &Deadline,
+) -> Option<Solution> {
+    let cfg = ctx.cfg();
+    let order = cfg.reverse_postorder();
+    let mut rank = vec![u32::MAX; cfg.len()];
+    for (i, &b) in order.iter().enumerate() {
+        rank[b as usize] = i as u32;
+    }
+
+    let mut work = Worklist {
+        input: vec![State::BOTTOM; cfg.len()],
+        reached: vec![false; cfg.len()],
+        dirty: vec![0u64; cfg.len().div_ceil(64)],
+        rank,
+    };
+    for &(to, ref state) in seeds.iter().filter(|(to, _)| active(*to)) {
+        work.flow(to, state);
+    }
+
+    let mut hits = vec![false; ctx.instructions.len()];
+    let mut visits = 0u32;
+    let mut sweeping = true;
+    while std::mem::take(&mut sweeping) {
+        let mut cursor = 0;
+        while let Some(r) = next_set_bit(&work.dirty, cursor) {
+            work.dirty[r / 64] &= !(1 << (r % 64));
+            cursor = r + 1;
+            sweeping = true;
+            visits += 1;
+            if visits % POLL_INTERVAL == 0 && deadline.expired() {
+                return None;
+            }
+
+            let id = order[r];
+            let state = work.input[id as usize];
+            run_block(ctx, id, state, |idx| hits[idx] = true, |_, _, to, out| {
+                if active(to) {
+                    work.flow(to, out);
+                }
+            });
+        }
+    }
+    Some(Solution { input: work.input, reached: work.reached, hits })
+}
+
+/// Block input states and the blocks waiting to be visited.
+///
+/// The worklist is a bitset over reverse-postorder ranks, swept front to
+/// back: most blocks see all their predecessors before they are visited,
+/// and blocks dirtied behind the sweep wait for the next one.
+struct Worklist {
+    input: Vec<State>,
+    reached: Vec<bool>,
+    dirty: Vec<u64>,
+    rank: Vec<u32>,
+}
+
+impl Worklist {
+    /// Joins `out` into the input of `to`, queueing it if that changed the
+    /// input or first reached it. Blocks outside the reverse postorder are
+    /// never analyzed.
+    fn flow(&mut self, to: BlockId, out: &State) {
+        if self.rank[to as usize] == u32::MAX {
+            return;
+        }
+        let first = !std::mem::replace(&mut self.reached[to as usize], true);
+        if self.input[to as usize].join(out) || first {
+            let r = self.rank[to as usize] as usize;
+            self.dirty[r / 64] |= 1 << (r % 64);
+        }
+    }
+}
+
+/// Finds every key comparison reachable from the program roots.
+///
+/// Returns `None` when `deadline` passes before the analysis converges.
+pub fn key_comparisons(ctx: &ScanContext, deadline: &Deadline) -> Option<Vec<KeyComparison>> {
+    let seeds: Vec<(BlockId, State)> = ctx.cfg().roots().iter().map(|&r| (r, State::entry())).collect();
+    let solution = solve(ctx, |_| true, &seeds, deadline)?;
+    let hits = solution.hits.iter().enumerate().filter(|(_, &hit)| hit).map(|(idx, _)| idx);
+    Some(comparisons(ctx, hits))
+}
+
+/// Key comparisons at the instructions with indices `hits`.
+pub(crate) fn comparisons(ctx: &ScanContext, hits: impl IntoIterator<Item = usize>) -> Vec<KeyComparison> {
+    let cfg = ctx.cfg();
+    let entries = cfg.entries();
+    let function_of = |block: BlockId| {
+        let i = entries.partition_point(|&e| e <= block);
+        entries[i.saturating_sub(1)]
+    };
+    hits.into_iter()
+        .map(|idx| {
+            let insn = &ctx.instructions[idx];
+            let function = cfg.block_at(insn.pc).map_or(0, function_of);
+            KeyComparison { pc: insn.pc, opcode: insn.opcode, function }
+        })
+        .collect()
+}
@@ -0,0 +1,32 @@
+use std::time::{Duration, Instant};
+
+/// Point in time by which a scan must produce a report.
+///
+/// Deeper analysis tiers poll it cooperatively and stop early once it has
+/// passed, leaving a partial report.
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct Deadline(Option<Instant>);
+
+impl Deadline {
+    /// A deadline that never expires.
+    pub const NONE: Deadline = Deadline(None);
+
+    pub fn after(budget: Duration) -> Self {
+        Self(Instant::now().checked_add(budget))
+    }
+
+    pub fn expired(&self) -> bool {
+        self.0.is_some_and(|at| Instant::now() >= at)
+    }
+
+    /// Time left, `None` if unbounded.
+    pub fn remaining(&self) -> Option<Duration> {
+        self.0.map(|at| at.saturating_duration_since(Instant::now()))
+    }
+}
+
+impl Default for Deadline {
+    fn default() -> Self {
+        Self::NONE
+    }
+}
@@ -1,18 +1,327 @@
+use std::fmt;
+
 use crate::error::{LenzError, Result};
 
+/// Size of one SBF instruction slot in bytes.
+pub const INSN_SIZE: usize = 8;
+
+pub const LD_DW_IMM: u8 = 0x18;
+pub const CALL_IMM: u8 = 0x85;
+pub const CALL_REG: u8 = 0x8d;
+pub const EXIT: u8 = 0x95;
+pub const JA: u8 = 0x05;
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub enum OpKind {
+    Invalid,
+    LoadImm64,
+    Load,
+    Store,
+    StoreReg,
+    Alu32,
+    Alu64,
+    Jump,
+    Branch,
+    Call,
+    CallReg,
+    Exit,
+}
+
+#[derive(Debug, Clone, Copy)]
+pub struct OpInfo {
+    pub mnemonic: &'static str,
+    pub kind: OpKind,
+}
+
+const fn op(mnemonic: &'static str, kind: OpKind) -> OpInfo {
+    OpInfo { mnemonic, kind }
+}
+
+const INVALID: OpInfo = op("invalid", OpKind::Invalid);
+
+const fn decode_op(opcode: u8) -> OpInfo {
+    use OpKind::*;
+    match opcode {
+        0x18 => op("lddw", LoadImm64),
+
+        0x61 => op("ldxw", Load),
+        0x69 => op("ldxh", Load),
+        0x71 => op("ldxb", Load),
+        0x79 => op("ldxdw", Load),
+
+        0x62 => op("stw", Store),
+        0x6a => op("sth", Store),
+        0x72 => op("stb", Store),
+        0x7a => op("stdw", Store),
+
+        0x63 => op("stxw", StoreReg),
+        0x6b => op("stxh", StoreReg),
+        0x73 => op("stxb", StoreReg),
+        0x7b => op("stxdw", StoreReg),
+
+        0x04 | 0x0c => op("add32", Alu32),
+        0x14 | 0x1c => op("sub32", Alu32),
+        0x24 | 0x2c => op("mul32", Alu32),
+        0x34 | 0x3c => op("div32", Alu32),
+        0x44 | 0x4c => op("or32", Alu32),
+        0x54 | 0x5c => op("and32", Alu32),
+        0x64 | 0x6c => op("lsh32", Alu32),
+        0x74 | 0x7c => op("rsh32", Alu32),
+        0x84 => op("neg32", Alu32),
+        0x94 | 0x9c => op("mod32", Alu32),
+        0xa4 | 0xac => op("xor32", Alu32),
+        0xb4 | 0xbc => op("mov32", Alu32),
+        0xc4 | 0xcc => op("arsh32", Alu32),
+        0xd4 => op("le", Alu32),
+        0xdc => op("be", Alu32),
+
+        0x07 | 0x0f => op("add64", Alu64),
+        0x17 | 0x1f => op("sub64", Alu64),
+        0x27 | 0x2f => op("mul64", Alu64),
+        0x37 | 0x3f => op("div64", Alu64),
+        0x47 | 0x4f => op("or64", Alu64),
+        0x57 | 0x5f => op("and64", Alu64),
+        0x67 | 0x6f => op("lsh64", Alu64),
+        0x77 | 0x7f => op("rsh64", Alu64),
+        0x87 => op("neg64", Alu64),
+        0x97 | 0x9f => op("mod64", Alu64),
+        0xa7 | 0xaf => op("xor64", Alu64),
+        0xb7 | 0xbf => op("mov64", Alu64),
+        0xc7 | 0xcf => op("arsh64", Alu64),
+
+        0x05 => op("ja", Jump),
+        0x15 | 0x1d => op("jeq", Branch),
+        0x25 | 0x2d => op("jgt", Branch),
+        0x35 | 0x3d => op("jge", Branch),
+        0x45 | 0x4d => op("jset", Branch),
+        0x55 | 0x5d => op("jne", Branch),
+        0x65 | 0x6d => op("jsgt", Branch),
+        0x75 | 0x7d => op("jsge", Branch),
+        0xa5 | 0xad => op("jlt", Branch),
+        0xb5 | 0xbd => op("jle", Branch),
+        0xc5 | 0xcd => op("jslt", Branch),
+        0xd5 | 0xdd => op("jsle", Branch),
+
+        0x85 => op("call", Call),
+        0x8d => op("callx", CallReg),
+        0x95 => op("exit", Exit),
+
+        _ => INVALID,
+    }
+}
+
+const fn build_table() -> [OpInfo; 256] {
+    let mut table = [INVALID; 256];
+    let mut i = 0;
+    while i < 256 {
+        table[i] = decode_op(i as u8);
+        i += 1;
+    }
+    table
+}
+
+/// Opcode lookup table indexed by the raw opcode byte.
+pub static OPCODES: [OpInfo; 256] = build_table();
+
+/// A single decoded SBF instruction.
+///
+/// `pc` is the slot index of the instruction within the decoded buffer, so
+/// jump targets can be resolved without keeping byte offsets around.
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct Instruction {
+    pub pc: u32,
+    pub opcode: u8,
+    pub dst: u8,
+    pub src: u8,
+    pub off: i16,
+    pub imm: i64,
+}
+
+impl Instruction {
+    #[inline]
+    pub fn info(&self) -> &'static OpInfo {
+        &OPCODES[self.opcode as usize]
+    }
+
+    #[inline]
+    pub fn kind(&self) -> OpKind {
+        self.info().kind
+    }
+
+    #[inline]
+    pub fn mnemonic(&self) -> &'static str {
+        self.info().mnemonic
+    }
+
+    /// Number of 8-byte slots the instruction occupies.
+    #[inline]
+    pub fn slots(&self) -> u32 {
+        if self.opcode == LD_DW_IMM { 2 } else { 1 }
+    }
+
+    /// Byte offset of the instruction within the decoded buffer.
+    #[inline]
+    pub fn offset(&self) -> usize {
+        self.pc as usize * INSN_SIZE
+    }
+
+    /// Whether the second operand is a register rather than an immediate.
+    #[inline]
+    pub fn uses_src_reg(&self) -> bool {
+        self.opcode & 0x08 != 0
+    }
+
+    /// Slot index targeted by a jump or branch, if any.
+    #[inline]
+    pub fn jump_target(&self) -> Option<i64> {
+        match self.kind() {
+            OpKind::Jump | OpKind::Branch => Some(self.pc as i64 + self.off as i64 + 1),
+            _ => None,
+        }
+    }
+
+    /// Slot index targeted by a pc-relative internal call (`src == 1`).
+    #[inline]
+    pub fn call_target(&self) -> Option<i64> {
+        if self.opcode == CALL_IMM && self.src == 1 {
+            Some(self.pc as i64 + self.imm + 1)
+        } else {
+            None
+        }
+    }
+}
+
+impl fmt::Display for Instruction {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        let m = self.mnemonic();
+        match self.kind() {
+            OpKind::Invalid => write!(f, "{} 0x{:02x}", m, self.opcode),
+            OpKind::LoadImm64 => write!(f, "{} r{}, 0x{:x}", m, self.dst, self.imm),
+            OpKind::Load => write!(f, "{} r{}, [r{}{:+}]", m, self.dst, self.src, self.off),
+            OpKind::Store => write!(f, "{} [r{}{:+}], {}", m, self.dst, self.off, self.imm),
+            OpKind::StoreReg => write!(f, "{} [r{}{:+}], r{}", m, self.dst, self.off, self.src),
+            OpKind::Alu32 | OpKind::Alu64 => {
+                if matches!(self.opcode, 0x84 | 0x87) {
+                    write!(f, "{} r{}", m, self.dst)
+                } else if matches!(self.opcode, 0xd4 | 0xdc) {
+                    write!(f, "{}{} r{}", m, self.imm, self.dst)
+                } else if self.uses_src_reg() {
+                    write!(f, "{} r{}, r{}", m, self.dst, self.src)
+                } else {
+                    write!(f, "{} r{}, {}", m, self.dst, self.imm)
+                }
+            }
+            OpKind::Jump => write!(f, "{} {:+}", m, self.off),
+            OpKind::Branch => {
+                if self.uses_src_reg() {
+                    write!(f, "{} r{}, r{}, {:+}", m, self.dst, self.src, self.off)
+                } else {
+                    write!(f, "{} r{}, {}, {:+}", m, self.dst, self.imm, self.off)
+                }
+            }
+            OpKind::Call => write!(f, "{} 0x{:x}", m, self.imm as u32),
+            OpKind::CallReg => write!(f, "{} r{}", m, self.imm),
+            OpKind::Exit => f.write_str(m),
+        }
+    }
+}
+
+/// Streaming decoder over a borrowed `.text` buffer.
+///
+/// Yields one `Instruction` per instruction without allocating; an `lddw`
+/// is a single `Instruction` spanning two slots. Decoding stops after the
+/// first error.
+pub struct Instructions<'a> {
+    data: &'a [u8],
+    pos: usize,
+}
+
+impl<'a> Instructions<'a> {
+    pub fn new(data: &'a [u8]) -> Self {
+        Self { data, pos: 0 }
+    }
+
+    /// Byte offset of the next instruction to decode.
+    pub fn position(&self) -> usize {
+        self.pos
+    }
+
+    fn fail(&mut self, offset: usize) -> Option<Result<Instruction>> {
+        self.pos = self.data.len();
+        Some(Err(LenzError::ParseError(offset)))
+    }
+}
+
+#[inline]
+fn read_slot(data: &[u8], pos: usize) -> &[u8; INSN_SIZE] {
+    data[pos..pos + INSN_SIZE].try_into().unwrap()
+}
+
+impl<'a> Iterator for Instructions<'a> {
+    type Item = Result<Instruction>;
+
+    #[inline]
+    fn next(&mut self) -> Option<Self::Item> {
+        let pos = self.pos;
+        let remaining = self.data.len() - pos;
+        if remaining == 0 {
+            return None;
+        }
+        if remaining < INSN_SIZE {
+            return self.fail(pos);
+        }
+
+        let slot = read_slot(self.data, pos);
+        let opcode = slot[0];
+        if OPCODES[opcode as usize].kind == OpKind::Invalid {
+            return self.fail(pos);
+        }
+
+        let mut imm = i32::from_le_bytes([slot[4], slot[5], slot[6], slot[7]]) as i64;
+        let mut len = INSN_SIZE;
+        if opcode == LD_DW_IMM {
+            if remaining < 2 * INSN_SIZE {
+                return self.fail(pos);
+            }
+            let hi = read_slot(self.data, pos + INSN_SIZE);
+            let hi_imm = u32::from_le_bytes([hi[4], hi[5], hi[6], hi[7]]);
+            imm = ((hi_imm as u64) << 32 | (imm as u32 as u64)) as i64;
+            len = 2 * INSN_SIZE;
+        }
+
+        self.pos += len;
+        Some(Ok(Instruction {
+            pc: (pos / INSN_SIZE) as u32,
+            opcode,
+            dst: slot[1] & 0x0f,
+            src: slot[1] >> 4,
+            off: i16::from_le_bytes([slot[2], slot[3]]),
+            imm,
+        }))
+    }
+
+    fn size_hint(&self) -> (usize, Option<usize>) {
+        // Any remaining byte yields at least an error, after which the
+        // iterator is fused.
+        let remaining = self.data.len() - self.pos;
+        (remaining.min(1), Some(remaining.div_ceil(INSN_SIZE)))
+    }
+}
+
 pub struct Disassembler;
 
 impl Disassembler {
-    pub fn parse(data: &[u8]) -> Result<Vec<String>> {
-        if data.len() < 4 {
-            // Minimal mock check
-            return Ok(vec!["NO_OP".to_string()]);
-        }
-        // Placeholder for SBF parsing logic
-        Ok(vec![
-            "LD_DW_IMM".to_string(),
-            "ALU64_ADD_K".to_string(),
-            "EXIT".to_string()
-        ])
+    /// Returns a streaming, non-allocating decoder over `data`.
+    pub fn iter(data: &[u8]) -> Instructions<'_> {
+        Instructions::new(data)
+    }
+
+    /// Decodes the whole buffer into a single preallocated vector.
+    pub fn parse(data: &[u8]) -> Result<Vec<Instruction>> {
+        let mut out = Vec::with_capacity(data.len() / INSN_SIZE);
+        for insn in Self::iter(data) {
+            out.push(insn?);
+        }
+        Ok(out)
     }
 }
@@ -0,0 +1,340 @@
+use std::cell::OnceCell;
+use std::ops::Range;
+
+use crate::disassembler::INSN_SIZE;
+use crate::error::{LenzError, Result};
+
+pub const ELF_MAGIC: [u8; 4] = [0x7f, b'E', b'L', b'F'];
+
+/// Length of the upgradeable loader `ProgramData` metadata that precedes the
+/// ELF image in a program data account (tag, slot, optional authority).
+pub const PROGRAMDATA_HEADER_LEN: usize = 45;
+
+pub(crate) const EHDR_SIZE: usize = 64;
+pub(crate) const SHDR_SIZE: usize = 64;
+pub(crate) const SYM_SIZE: usize = 24;
+const REL_SIZE: usize = 16;
+
+const ELFCLASS64: u8 = 2;
+const ELFDATA2LSB: u8 = 1;
+const EM_BPF: u16 = 247;
+const EM_SBF: u16 = 263;
+
+pub const SHT_STRTAB: u32 = 3;
+pub const SHT_NOBITS: u32 = 8;
+pub const SHT_REL: u32 = 9;
+pub const SHT_DYNSYM: u32 = 11;
+
+const STT_FUNC: u8 = 2;
+
+#[inline]
+fn u16_at(data: &[u8], off: usize) -> u16 {
+    u16::from_le_bytes([data[off], data[off + 1]])
+}
+
+#[inline]
+fn u32_at(data: &[u8], off: usize) -> u32 {
+    u32::from_le_bytes(data[off..off + 4].try_into().unwrap())
+}
+
+#[inline]
+fn u64_at(data: &[u8], off: usize) -> u64 {
+    u64::from_le_bytes(data[off..off + 8].try_into().unwrap())
+}
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct ElfHeader {
+    pub machine: u16,
+    pub entry: u64,
+    pub shoff: u64,
+    pub shentsize: u16,
+    pub shnum: u16,
+    pub shstrndx: u16,
+}
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct SectionHeader {
+    pub name: u32,
+    pub kind: u32,
+    pub flags: u64,
+    pub addr: u64,
+    pub offset: u64,
+    pub size: u64,
+    pub link: u32,
+    pub entsize: u64,
+}
+
+impl SectionHeader {
+    pub(crate) fn parse(raw: &[u8]) -> Self {
+        Self {
+            name: u32_at(raw, 0),
+            kind: u32_at(raw, 4),
+            flags: u64_at(raw, 8),
+            addr: u64_at(raw, 16),
+            offset: u64_at(raw, 24),
+            size: u64_at(raw, 32),
+            link: u32_at(raw, 40),
+            entsize: u64_at(raw, 56),
+        }
+    }
+
+    /// File range covered by the section; empty for `SHT_NOBITS` sections,
+    /// which take no space in the file, and for ranges past `usize::MAX`.
+    pub fn file_range(&self) -> Range<usize> {
+        let end = self.offset.checked_add(self.size).and_then(|end| usize::try_from(end).ok());
+        match end {
+            Some(end) if self.kind != SHT_NOBITS => self.offset as usize..end,
+            _ => 0..0,
+        }
+    }
+
+    /// Instruction slot of virtual address `addr`, if it falls on an
+    /// instruction inside this section.
+    pub fn slot_of(&self, addr: u64) -> Option<u32> {
+        let offset = addr.checked_sub(self.addr).filter(|&o| o < self.size && o % INSN_SIZE as u64 == 0)?;
+        u32::try_from(offset / INSN_SIZE as u64).ok()
+    }
+}
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct Symbol<'a> {
+    pub name: &'a str,
+    pub info: u8,
+    pub shndx: u16,
+    pub value: u64,
+    pub size: u64,
+}
+
+impl Symbol<'_> {
+    /// Whether the symbol is a function defined in this object.
+    pub fn is_function(&self) -> bool {
+        is_defined_function(self.info, self.shndx)
+    }
+}
+
+fn is_defined_function(info: u8, shndx: u16) -> bool {
+    info & 0xf == STT_FUNC && shndx != 0
+}
+
+/// Address of a raw dynamic symbol table entry, if it is a defined function.
+pub(crate) fn function_address(raw: &[u8]) -> Option<u64> {
+    is_defined_function(raw[4], u16_at(raw, 6)).then(|| u64_at(raw, 8))
+}
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct Relocation {
+    pub offset: u64,
+    pub kind: u32,
+    pub symbol: u32,
+}
+
+/// Borrowed view over an SBF ELF shared object.
+///
+/// Only the file header is validated up front. Section headers, dynamic
+/// symbols and relocations are indexed on first use and never copied out of
+/// the underlying buffer.
+pub struct ElfFile<'a> {
+    data: &'a [u8],
+    header: ElfHeader,
+    sections: OnceCell<Result<Vec<SectionHeader>>>,
+    dynsyms: OnceCell<Result<Vec<Symbol<'a>>>>,
+    relocations: OnceCell<Result<Vec<Relocation>>>,
+}
+
+impl<'a> ElfFile<'a> {
+    /// Returns true if `data` is an ELF image, either bare or wrapped in a
+    /// `ProgramData` account.
+    pub fn detect(data: &[u8]) -> bool {
+        Self::image_offset(data).is_some()
+    }
+
+    fn image_offset(data: &[u8]) -> Option<usize> {
+        if data.starts_with(&ELF_MAGIC) {
+            Some(0)
+        } else if data.len() > PROGRAMDATA_HEADER_LEN
+            && data[..4] == [3, 0, 0, 0]
+            && data[PROGRAMDATA_HEADER_LEN..].starts_with(&ELF_MAGIC)
+        {
+            Some(PROGRAMDATA_HEADER_LEN)
+        } else {
+            None
+        }
+    }
+
+    /// Parses the ELF file header of a program account or bare ELF image.
+    pub fn parse(data: &'a [u8]) -> Result<Self> {
+        let start = Self::image_offset(data).ok_or(LenzError::InvalidElf("bad magic"))?;
+        let data = &data[start..];
+        if data.len() < EHDR_SIZE {
+            return Err(LenzError::InvalidElf("truncated header"));
+        }
+        if data[4] != ELFCLASS64 || data[5] != ELFDATA2LSB {
+            return Err(LenzError::InvalidElf("not a 64-bit little-endian object"));
+        }
+
+        let header = ElfHeader {
+            machine: u16_at(data, 18),
+            entry: u64_at(data, 24),
+            shoff: u64_at(data, 40),
+            shentsize: u16_at(data, 58),
+            shnum: u16_at(data, 60),
+            shstrndx: u16_at(data, 62),
+        };
+        if header.machine != EM_BPF && header.machine != EM_SBF {
+            return Err(LenzError::InvalidElf("unsupported machine"));
+        }
+        if header.shnum > 0 && header.shentsize as usize != SHDR_SIZE {
+            return Err(LenzError::InvalidElf("unexpected section header size"));
+        }
+
+        Ok(Self {
+            data,
+            header,
+            sections: OnceCell::new(),
+            dynsyms: OnceCell::new(),
+            relocations: OnceCell::new(),
+        })
+    }
+
+    pub fn header(&self) -> &ElfHeader {
+        &self.header
+    }
+
+    /// The ELF image, without any `ProgramData` prefix.
+    pub fn data(&self) -> &'a [u8] {
+        self.data
+    }
+
+    pub fn sections(&self) -> Result<&[SectionHeader]> {
+        self.sections
+            .get_or_init(|| self.index_sections())
+            .as_deref()
+            .map_err(Clone::clone)
+    }
+
+    fn index_sections(&self) -> Result<Vec<SectionHeader>> {
+        let start = self.header.shoff as usize;
+        let len = self.header.shnum as usize * SHDR_SIZE;
+        let table = start
+            .checked_add(len)
+            .and_then(|end| self.data.get(start..end))
+            .ok_or(LenzError::InvalidElf("section headers out of bounds"))?;
+
+        let sections: Vec<SectionHeader> = table.chunks_exact(SHDR_SIZE).map(SectionHeader::parse).collect();
+        for s in sections.iter().filter(|s| s.kind != SHT_NOBITS) {
+            if s.offset.checked_add(s.size).map_or(true, |end| end > self.data.len() as u64) {
+                return Err(LenzError::InvalidElf("section out of bounds"));
+            }
+        }
+        Ok(sections)
+    }
+
+    fn section_bytes(&self, s: &SectionHeader) -> &'a [u8] {
+        self.data.get(s.file_range()).unwrap_or(&[])
+    }
+
+    fn str_at(&self, table: &SectionHeader, off: u32) -> Option<&'a str> {
+        let bytes = self.section_bytes(table).get(off as usize..)?;
+        let end = bytes.iter().position(|&b| b == 0)?;
+        std::str::from_utf8(&bytes[..end]).ok()
+    }
+
+    pub fn section_name(&self, s: &SectionHeader) -> Result<&'a str> {
+        let sections = self.sections()?;
+        let strtab = sections
+            .get(self.header.shstrndx as usize)
+            .ok_or(LenzError::InvalidElf("missing section name table"))?;
+        self.str_at(strtab, s.name).ok_or(LenzError::InvalidElf("bad section name"))
+    }
+
+    pub fn section_by_name(&self, name: &str) -> Result<Option<&SectionHeader>> {
+        for s in self.sections()? {
+            if self.section_name(s)? == name {
+                return Ok(Some(s));
+            }
+        }
+        Ok(None)
+    }
+
+    /// Header of the `.text` section.
+    pub fn text_section(&self) -> Result<&SectionHeader> {
+        self.section_by_name(".text")?.ok_or(LenzError::InvalidElf("missing .text"))
+    }
+
+    /// Borrowed `.text` bytes, ready to hand to the `Disassembler`.
+    pub fn text(&self) -> Result<&'a [u8]> {
+        self.text_section().map(|s| self.section_bytes(s))
+    }
+
+    /// `.text` slots execution can start at: the ELF entrypoint and every
+    /// function defined in the dynamic symbol table, which may be reached
+    /// only through `callx`. Addresses outside `.text` are skipped.
+    pub fn entry_points(&self) -> Vec<u32> {
+        let Ok(text) = self.text_section() else {
+            return Vec::new();
+        };
+        let mut roots: Vec<u32> = text.slot_of(self.header.entry).into_iter().collect();
+        if let Ok(symbols) = self.dynamic_symbols() {
+            roots.extend(symbols.iter().filter(|s| s.is_function()).filter_map(|s| text.slot_of(s.value)));
+        }
+        roots
+    }
+
+    /// Borrowed `.rodata` bytes, or an empty slice if the section is absent.
+    pub fn rodata(&self) -> Result<&'a [u8]> {
+        Ok(self.section_by_name(".rodata")?.map_or(&[][..], |s| self.section_bytes(s)))
+    }
+
+    pub fn dynamic_symbols(&self) -> Result<&[Symbol<'a>]> {
+        self.dynsyms
+            .get_or_init(|| self.index_dynsyms())
+            .as_deref()
+            .map_err(Clone::clone)
+    }
+
+    fn index_dynsyms(&self) -> Result<Vec<Symbol<'a>>> {
+        let sections = self.sections()?;
+        let Some(symtab) = sections.iter().find(|s| s.kind == SHT_DYNSYM) else {
+            return Ok(Vec::new());
+        };
+        let strtab = sections
+            .get(symtab.link as usize)
+            .filter(|s| s.kind == SHT_STRTAB)
+            .ok_or(LenzError::InvalidElf("missing dynamic string table"))?;
+
+        self.section_bytes(symtab)
+            .chunks_exact(SYM_SIZE)
+            .map(|raw| {
+                Ok(Symbol {
+                    name: self.str_at(strtab, u32_at(raw, 0)).ok_or(LenzError::InvalidElf("bad symbol name"))?,
+                    info: raw[4],
+                    shndx: u16_at(raw, 6),
+                    value: u64_at(raw, 8),
+                    size: u64_at(raw, 16),
+                })
+            })
+            .collect()
+    }
+
+    pub fn relocations(&self) -> Result<&[Relocation]> {
+        self.relocations
+            .get_or_init(|| self.index_relocations())
+            .as_deref()
+            .map_err(Clone::clone)
+    }
+
+    fn index_relocations(&self) -> Result<Vec<Relocation>> {
+        let mut out = Vec::new();
+        for s in self.sections()?.iter().filter(|s| s.kind == SHT_REL) {
+            out.extend(self.section_bytes(s).chunks_exact(REL_SIZE).map(|raw| {
+                let info = u64_at(raw, 8);
+                Relocation {
+                    offset: u64_at(raw, 0),
+                    kind: info as u32,
+                    symbol: (info >> 32) as u32,
+                }
+            }));
+        }
+        Ok(out)
+    }
+}
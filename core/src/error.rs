@@ -8,11 +8,26 @@ pub enum LenzError {
     #[error("Failed to parse instruction at offset {0}")]
     ParseError(usize),
 
+    #[error("Invalid ELF: {0}")]
+    InvalidElf(&'static str),
+
+    #[error("Invalid signature: {0}")]
+    InvalidSignature(String),
+
+    #[error("Invalid address: {0}")]
+    InvalidAddress(String),
+
+    #[error("IO error: {0}")]
+    Io(String),
+
     #[error("Serialization error: {0}")]
     SerializationError(String),
 
     #[error("RPC Error: {0}")]
     RpcError(String),
+
+    #[error("Internal error: {0}")]
+    Internal(String),
 }
 
 pub type Result<T> = std::result::Result<T, LenzError>;
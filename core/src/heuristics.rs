@@ -0,0 +1,86 @@
+use crate::context::ScanContext;
+use crate::dataflow::{self, KeyComparison};
+use crate::deadline::Deadline;
+use crate::disassembler::INSN_SIZE;
+use crate::risk::RiskFlag;
+use crate::signatures::{SignatureDatabase, SignatureMatch};
+
+/// A single risk indicator raised by an analysis pass.
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct Finding {
+    pub flag: RiskFlag,
+    pub weight: u8,
+    /// Byte offset in `.text` of the code that triggered the finding.
+    pub offset: Option<u32>,
+}
+
+/// Control-flow heuristics. All of them read the shared CFG of the context.
+pub fn control_flow(ctx: &ScanContext, findings: &mut Vec<Finding>) {
+    let cfg = ctx.cfg();
+    if cfg.indirect_calls() > 0 {
+        findings.push(Finding { flag: RiskFlag::IndirectControlFlow, weight: 15, offset: None });
+    }
+    if cfg.invalid_targets() > 0 {
+        findings.push(Finding { flag: RiskFlag::MalformedControlFlow, weight: 25, offset: None });
+    }
+}
+
+/// Comparisons per function that together cover a 32-byte public key.
+const KEY_CHUNKS: usize = 4;
+
+/// Authority heuristics from the dataflow analysis: a function that compares
+/// a whole input key against hardcoded constants either admits a single
+/// signer (a honeypot gate) or rejects specific ones (a blacklist).
+///
+/// Flags already raised by an earlier pass are not raised again. Returns
+/// `false` when `deadline` passed before the analysis finished.
+pub fn authority(ctx: &ScanContext, deadline: &Deadline, findings: &mut Vec<Finding>) -> bool {
+    let Some(comparisons) = dataflow::key_comparisons(ctx, deadline) else {
+        return false;
+    };
+    authority_findings(comparisons, findings);
+    true
+}
+
+/// Authority findings from the key comparisons of a program.
+pub fn authority_findings(mut comparisons: Vec<KeyComparison>, findings: &mut Vec<Finding>) {
+    comparisons.sort_by_key(|c| (c.function, c.requires_match(), c.pc));
+    for group in comparisons.chunk_by(|a, b| (a.function, a.requires_match()) == (b.function, b.requires_match())) {
+        if group.len() < KEY_CHUNKS {
+            continue;
+        }
+        let (flag, weight) = if group[0].requires_match() {
+            (RiskFlag::HoneypotPattern, 45)
+        } else {
+            (RiskFlag::BlacklistCheck, 30)
+        };
+        if !findings.iter().any(|f| f.flag == flag) {
+            findings.push(Finding { flag, weight, offset: Some(group[0].pc * INSN_SIZE as u32) });
+        }
+    }
+}
+
+/// Signature matches, one finding per matched signature.
+pub fn signatures(ctx: &ScanContext, db: &SignatureDatabase, findings: &mut Vec<Finding>) {
+    signature_findings(db, db.scan(ctx.text, &ctx.instructions), findings);
+}
+
+/// One finding per signature, at its earliest match in `matches`. Findings
+/// are ordered by offset, whatever order the matches come in.
+pub fn signature_findings(
+    db: &SignatureDatabase,
+    matches: impl IntoIterator<Item = SignatureMatch>,
+    findings: &mut Vec<Finding>,
+) {
+    let mut first: Vec<Option<usize>> = vec![None; db.len()];
+    for m in matches {
+        let slot = &mut first[m.signature as usize];
+        *slot = Some(slot.map_or(m.offset, |o| o.min(m.offset)));
+    }
+    let mut hits: Vec<(usize, usize)> = first.iter().enumerate().filter_map(|(sig, o)| Some(((*o)?, sig))).collect();
+    hits.sort_unstable();
+    for (offset, sig) in hits {
+        let sig = &db.signatures()[sig];
+        findings.push(Finding { flag: sig.category.flag(), weight: sig.weight, offset: Some(offset as u32) });
+    }
+}
@@ -0,0 +1,244 @@
+//! Per-program index of imported syscalls, cross-program invocation sites
+//! and well-known program ids embedded in `.rodata`.
+//!
+//! Syscalls are keyed by the murmur3 hash of their name, the same key the
+//! runtime resolves them by: statically linked programs carry it in the
+//! `call` immediate, dynamically linked ones in an `R_BPF_64_32` relocation
+//! against an undefined symbol. The index is built in one pass over the
+//! decoded instructions and `.rodata`; every query is a hash lookup.
+
+use std::collections::HashMap;
+use std::fmt;
+use std::str::FromStr;
+use std::sync::OnceLock;
+
+use crate::context::ScanContext;
+use crate::disassembler::{CALL_IMM, INSN_SIZE};
+use crate::error::{LenzError, Result};
+
+/// `R_BPF_64_32`, the relocation type of `call` instructions.
+const R_BPF_64_32: u32 = 10;
+
+/// Murmur3 (32-bit, seed 0) of a syscall name, as used by the runtime to
+/// resolve `call` immediates.
+pub const fn syscall_hash(name: &str) -> u32 {
+    const C1: u32 = 0xcc9e_2d51;
+    const C2: u32 = 0x1b87_3593;
+    const fn mix(k: u32) -> u32 {
+        k.wrapping_mul(C1).rotate_left(15).wrapping_mul(C2)
+    }
+
+    let bytes = name.as_bytes();
+    let mut h = 0u32;
+    let mut i = 0;
+    while i + 4 <= bytes.len() {
+        h ^= mix(u32::from_le_bytes([bytes[i], bytes[i + 1], bytes[i + 2], bytes[i + 3]]));
+        h = h.rotate_left(13).wrapping_mul(5).wrapping_add(0xe654_6b64);
+        i += 4;
+    }
+    let mut k = 0u32;
+    let mut j = bytes.len();
+    while j > i {
+        j -= 1;
+        k = k << 8 | bytes[j] as u32;
+    }
+    if bytes.len() > i {
+        h ^= mix(k);
+    }
+
+    h ^= bytes.len() as u32;
+    h ^= h >> 16;
+    h = h.wrapping_mul(0x85eb_ca6b);
+    h ^= h >> 13;
+    h = h.wrapping_mul(0xc2b2_ae35);
+    h ^ h >> 16
+}
+
+pub const SOL_INVOKE_SIGNED_C: u32 = syscall_hash("sol_invoke_signed_c");
+pub const SOL_INVOKE_SIGNED_RUST: u32 = syscall_hash("sol_invoke_signed_rust");
+
+/// Syscalls the index can name; any other hash is reported as unknown.
+pub const SYSCALLS: [&str; 37] = [
+    "abort",
+    "sol_panic_",
+    "sol_log_",
+    "sol_log_64_",
+    "sol_log_compute_units_",
+    "sol_log_pubkey",
+    "sol_log_data",
+    "sol_create_program_address",
+    "sol_try_find_program_address",
+    "sol_sha256",
+    "sol_keccak256",
+    "sol_blake3",
+    "sol_poseidon",
+    "sol_secp256k1_recover",
+    "sol_curve_validate_point",
+    "sol_curve_group_op",
+    "sol_curve_multiscalar_mul",
+    "sol_alt_bn128_group_op",
+    "sol_alt_bn128_compression",
+    "sol_big_mod_exp",
+    "sol_get_clock_sysvar",
+    "sol_get_epoch_schedule_sysvar",
+    "sol_get_fees_sysvar",
+    "sol_get_rent_sysvar",
+    "sol_get_epoch_rewards_sysvar",
+    "sol_get_last_restart_slot",
+    "sol_get_sysvar",
+    "sol_memcpy_",
+    "sol_memmove_",
+    "sol_memcmp_",
+    "sol_memset_",
+    "sol_invoke_signed_c",
+    "sol_invoke_signed_rust",
+    "sol_set_return_data",
+    "sol_get_return_data",
+    "sol_get_stack_height",
+    "sol_remaining_compute_units",
+];
+
+/// Name of a known syscall hash.
+pub fn syscall_name(hash: u32) -> Option<&'static str> {
+    SYSCALLS.into_iter().find(|name| syscall_hash(name) == hash)
+}
+
+/// A 32-byte account address.
+#[derive(Debug, Clone, Copy, PartialEq, Eq, Hash, PartialOrd, Ord)]
+pub struct Pubkey(pub [u8; 32]);
+
+impl fmt::Display for Pubkey {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        f.write_str(&bs58::encode(self.0).into_string())
+    }
+}
+
+impl FromStr for Pubkey {
+    type Err = LenzError;
+
+    fn from_str(s: &str) -> Result<Self> {
+        let mut key = [0u8; 32];
+        match bs58::decode(s).onto(&mut key) {
+            Ok(32) => Ok(Self(key)),
+            _ => Err(LenzError::InvalidAddress(s.to_string())),
+        }
+    }
+}
+
+/// Program ids looked for in `.rodata`. The system program (all zeros) is
+/// left out, as zero runs are everywhere in data.
+pub const KNOWN_PROGRAMS: [(&str, &str); 6] = [
+    ("spl-token", "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"),
+    ("spl-token-2022", "TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb"),
+    ("spl-associated-token-account", "ATokenGPvbdGVxr1b2hvZbsiqW5xWH25efTNsLJA8knL"),
+    ("bpf-loader-upgradeable", "BPFLoaderUpgradeab1e11111111111111111111111"),
+    ("compute-budget", "ComputeBudget111111111111111111111111111111"),
+    ("mpl-token-metadata", "metaqbxxUerdq28cj1RbAWkYQm3ybzjb6a8bt518x1s"),
+];
+
+fn known_programs() -> &'static [(Pubkey, &'static str)] {
+    static KEYS: OnceLock<Vec<(Pubkey, &'static str)>> = OnceLock::new();
+    KEYS.get_or_init(|| {
+        KNOWN_PROGRAMS.iter().map(|&(name, address)| (address.parse().expect("valid program id"), name)).collect()
+    })
+}
+
+/// Name of a program id in `KNOWN_PROGRAMS`.
+pub fn program_name(key: &Pubkey) -> Option<&'static str> {
+    known_programs().iter().find(|(k, _)| k == key).map(|&(_, name)| name)
+}
+
+/// Imports of one program. Offsets are byte offsets into `.text` for call
+/// sites and into `.rodata` for program ids.
+#[derive(Debug, Clone, Default, PartialEq, Eq)]
+pub struct ImportIndex {
+    syscalls: HashMap<u32, Vec<u32>>,
+    cpi: Vec<u32>,
+    pubkeys: HashMap<Pubkey, Vec<u32>>,
+}
+
+impl ImportIndex {
+    pub fn build(ctx: &ScanContext) -> Self {
+        let mut index = Self::default();
+        let mut relocated = HashMap::new();
+        if let Some(elf) = &ctx.elf {
+            // Relocations against undefined symbols are syscalls; the ones
+            // against defined functions are internal calls.
+            if let (Ok(text), Ok(relocations), Ok(symbols)) =
+                (elf.text_section(), elf.relocations(), elf.dynamic_symbols())
+            {
+                for r in relocations.iter().filter(|r| r.kind == R_BPF_64_32) {
+                    let Some(symbol) = symbols.get(r.symbol as usize).filter(|s| s.shndx == 0) else {
+                        continue;
+                    };
+                    if let Some(offset) = r.offset.checked_sub(text.addr).filter(|&o| o < text.size) {
+                        relocated.insert(offset as u32, syscall_hash(symbol.name));
+                    }
+                }
+            }
+            if let Ok(rodata) = elf.rodata() {
+                index.find_pubkeys(rodata);
+            }
+        }
+
+        for insn in ctx.instructions.iter().filter(|i| i.opcode == CALL_IMM && i.src == 0) {
+            let offset = insn.pc * INSN_SIZE as u32;
+            let hash = match relocated.get(&offset) {
+                Some(&hash) => hash,
+                // Unresolved `call -1` sites without a relocation name nothing.
+                None if insn.imm == -1 => continue,
+                None => insn.imm as u32,
+            };
+            if hash == SOL_INVOKE_SIGNED_C || hash == SOL_INVOKE_SIGNED_RUST {
+                index.cpi.push(offset);
+            }
+            index.syscalls.entry(hash).or_default().push(offset);
+        }
+        index
+    }
+
+    fn find_pubkeys(&mut self, rodata: &[u8]) {
+        let known = known_programs();
+        for (at, window) in rodata.windows(32).enumerate() {
+            if let Some((key, _)) = known.iter().find(|(k, _)| k.0[..8] == window[..8] && k.0 == window) {
+                self.pubkeys.entry(*key).or_default().push(at as u32);
+            }
+        }
+    }
+
+    /// Call sites of the syscall with `hash`.
+    pub fn calls(&self, hash: u32) -> &[u32] {
+        self.syscalls.get(&hash).map_or(&[], Vec::as_slice)
+    }
+
+    pub fn calls_syscall(&self, name: &str) -> bool {
+        self.syscalls.contains_key(&syscall_hash(name))
+    }
+
+    /// Every imported syscall hash with its call sites, in no particular order.
+    pub fn syscalls(&self) -> impl Iterator<Item = (u32, &[u32])> {
+        self.syscalls.iter().map(|(&hash, sites)| (hash, sites.as_slice()))
+    }
+
+    /// Cross-program invocation sites, in program order.
+    pub fn cpi_sites(&self) -> &[u32] {
+        &self.cpi
+    }
+
+    /// `.rodata` offsets at which `key` appears, if it is a known program id.
+    pub fn references(&self, key: &Pubkey) -> &[u32] {
+        self.pubkeys.get(key).map_or(&[], Vec::as_slice)
+    }
+
+    /// Known program ids found in `.rodata`, in no particular order.
+    pub fn pubkeys(&self) -> impl Iterator<Item = (&Pubkey, &[u32])> {
+        self.pubkeys.iter().map(|(key, at)| (key, at.as_slice()))
+    }
+
+    /// Whether the program can invoke other programs at all. A program
+    /// without a CPI site can not reach the Token program, so none of its
+    /// authority instructions.
+    pub fn may_invoke(&self) -> bool {
+        !self.cpi.is_empty()
+    }
+}
@@ -0,0 +1,427 @@
+//! Incremental rescans of upgraded programs.
+//!
+//! A `ProgramSnapshot` records a fingerprint and the per-function analysis
+//! results of every function in a program. Rescanning an upgrade against
+//! the previous snapshot matches signatures only in functions whose
+//! fingerprint changed, plus their direct callers, and runs the dataflow
+//! tier only over changed functions and those whose incoming dataflow
+//! states changed; everything else is carried over. Decoding and the CFG
+//! always run in full, and the report goes through the same family match,
+//! tiers and deadline as `AuditEngine::audit`.
+
+use std::collections::{HashMap, HashSet};
+use std::fs;
+use std::io::Cursor;
+use std::path::Path;
+
+use serde::{Deserialize, Serialize};
+
+use crate::cache::{CacheVersion, ProgramHash};
+use crate::cfg::BlockId;
+use crate::context::ScanContext;
+use crate::dataflow::{self, State};
+use crate::deadline::Deadline;
+use crate::disassembler::{Instruction, OpKind, CALL_IMM, INSN_SIZE};
+use crate::error::{LenzError, Result};
+use crate::heuristics;
+use crate::risk::RiskReport;
+use crate::scanner::AuditEngine;
+use crate::signatures::SignatureMatch;
+
+/// Analysis state of one function, with offsets relative to its entry.
+#[derive(Debug, Clone, PartialEq, Eq, Serialize, Deserialize)]
+pub struct FunctionRecord {
+    /// Slot of the first instruction.
+    pub entry: u32,
+    pub fingerprint: u64,
+    /// Signature matches as (signature index, byte offset from `entry`).
+    pub matches: Vec<(u32, u32)>,
+    /// Dataflow results; `None` when the dataflow tier did not run.
+    #[serde(default, skip_serializing_if = "Option::is_none")]
+    pub flow: Option<FunctionFlow>,
+}
+
+/// Where a dataflow state leaves a function: the arguments of the call at
+/// `offset`, or the final state of the block ending at `offset`.
+#[derive(Debug, Clone, Copy, PartialEq, Eq, PartialOrd, Ord, Hash, Serialize, Deserialize)]
+pub struct FlowExit {
+    /// Instruction offset from the first instruction of the function.
+    pub offset: u32,
+    pub call: bool,
+}
+
+/// Dataflow results of one function, with instruction offsets from its
+/// first instruction. They stay valid while neither the function nor any
+/// state flowing into it changes.
+#[derive(Debug, Clone, PartialEq, Eq, Serialize, Deserialize)]
+pub struct FunctionFlow {
+    /// Fingerprint of the function as the dataflow tier sees it.
+    pub fingerprint: u64,
+    /// States entering the function as (offset of the entered block,
+    /// sender, state), sorted. The sender is the `fingerprint` and exit of
+    /// the sending function, or `None` at a program root.
+    pub inflow: Vec<(u32, Option<(u64, FlowExit)>, State)>,
+    /// States leaving the reached blocks of the function, sorted by exit.
+    pub outflow: Vec<(FlowExit, State)>,
+    /// Offsets of the key comparisons in the function.
+    pub comparisons: Vec<u32>,
+}
+
+/// Everything needed to rescan the next version of a program.
+#[derive(Debug, Clone, PartialEq, Serialize, Deserialize)]
+pub struct ProgramSnapshot {
+    pub version: CacheVersion,
+    pub hash: ProgramHash,
+    pub functions: Vec<FunctionRecord>,
+    pub report: RiskReport,
+}
+
+impl ProgramSnapshot {
+    pub fn save(&self, path: impl AsRef<Path>) -> Result<()> {
+        let json = serde_json::to_vec(self).map_err(|e| LenzError::SerializationError(e.to_string()))?;
+        fs::write(path, json).map_err(|e| LenzError::Io(e.to_string()))
+    }
+
+    pub fn load(path: impl AsRef<Path>) -> Result<Self> {
+        let json = fs::read(path).map_err(|e| LenzError::Io(e.to_string()))?;
+        serde_json::from_slice(&json).map_err(|e| LenzError::SerializationError(e.to_string()))
+    }
+}
+
+#[derive(Debug, Clone, Copy, Default, PartialEq, Eq)]
+pub struct RescanStats {
+    pub functions: usize,
+    /// Functions analyzed from scratch by at least one tier.
+    pub reanalyzed: usize,
+}
+
+/// FNV-1a, stable across builds so persisted fingerprints stay valid.
+fn hash_code(insns: &[Instruction], imm: impl Fn(&Instruction) -> i64) -> u64 {
+    let mut hash: u64 = 0xcbf2_9ce4_8422_2325;
+    let mut feed = |bytes: &[u8]| {
+        for &b in bytes {
+            hash = (hash ^ b as u64).wrapping_mul(0x0100_0000_01b3);
+        }
+    };
+    for insn in insns {
+        feed(&[insn.opcode, insn.dst, insn.src]);
+        feed(&insn.off.to_le_bytes());
+        feed(&imm(insn).to_le_bytes());
+    }
+    hash
+}
+
+fn fingerprint(insns: &[Instruction]) -> u64 {
+    // Internal call offsets move whenever code before the callee changes
+    // size, so they are left out of the fingerprint.
+    hash_code(insns, |insn| if insn.opcode == CALL_IMM && insn.src == 1 { 0 } else { insn.imm })
+}
+
+/// Fingerprint of what the dataflow tier sees of a function. Immediates
+/// only matter to it as far as an `lddw` loads a key-sized constant.
+fn flow_fingerprint(insns: &[Instruction]) -> u64 {
+    hash_code(insns, |insn| (insn.kind() == OpKind::LoadImm64 && insn.imm != insn.imm as i32 as i64) as i64)
+}
+
+impl AuditEngine {
+    /// Full scan that also records the per-function state needed by
+    /// `rescan`.
+    pub fn snapshot(&self, bytecode: &[u8]) -> Result<ProgramSnapshot> {
+        self.rescan_from(None, bytecode).map(|(snapshot, _)| snapshot)
+    }
+
+    /// Scans a new version of a program, re-analyzing only functions that
+    /// differ from `previous`. Falls back to a full scan when the snapshot
+    /// was produced by another engine or signature version.
+    pub fn rescan(&self, previous: &ProgramSnapshot, bytecode: &[u8]) -> Result<(ProgramSnapshot, RescanStats)> {
+        self.rescan_from(Some(previous), bytecode)
+    }
+
+    fn rescan_from(&self, previous: Option<&ProgramSnapshot>, bytecode: &[u8]) -> Result<(ProgramSnapshot, RescanStats)> {
+        let version = self.cache_version();
+        let hash = ProgramHash::of_program(bytecode);
+        let previous = previous.filter(|p| p.version == version);
+        // Partial reports depend on the deadline and are never reused.
+        if let Some(previous) = previous.filter(|p| p.hash == hash && p.report.is_complete()) {
+            let stats = RescanStats { functions: previous.functions.len(), reanalyzed: 0 };
+            return Ok((previous.clone(), stats));
+        }
+
+        // Reports settled before any per-function analysis leave no
+        // functions to carry over, so the next rescan runs in full.
+        let deadline = self.timeout().map_or(Deadline::NONE, Deadline::after);
+        let settled = |report| (ProgramSnapshot { version, hash, functions: Vec::new(), report }, RescanStats::default());
+        if let Some(config) = self.memory_budget().filter(|c| !c.fits(bytecode.len())) {
+            return Ok(settled(self.scan_reader_within(Cursor::new(bytecode), config, &deadline)?));
+        }
+        let ctx = ScanContext::new(bytecode)?;
+        if let Some(report) = self.match_family(&ctx, &deadline) {
+            return Ok(settled(report));
+        }
+
+        let starts = ctx.function_starts();
+        let bounds = |i: usize| starts[i]..starts.get(i + 1).copied().unwrap_or(ctx.instructions.len());
+        let prints: Vec<u64> = (0..starts.len()).map(|i| fingerprint(&ctx.instructions[bounds(i)])).collect();
+
+        // Functions are dirty when new or changed, and so are their callers.
+        let known: HashMap<u64, &FunctionRecord> =
+            previous.map_or_else(HashMap::new, |p| p.functions.iter().map(|f| (f.fingerprint, f)).collect());
+        let mut dirty: HashSet<usize> = (0..starts.len()).filter(|&i| !known.contains_key(&prints[i])).collect();
+        let cfg = ctx.cfg();
+        let function_of = |insn: usize| starts.partition_point(|&s| s <= insn) - 1;
+        let callers: Vec<usize> = cfg
+            .calls()
+            .iter()
+            .map(|&(caller, callee)| (function_of(cfg.block(caller).first as usize), function_of(cfg.block(callee).first as usize)))
+            .filter(|(_, callee)| dirty.contains(callee))
+            .map(|(caller, _)| caller)
+            .collect();
+        dirty.extend(callers);
+
+        let mut functions = Vec::with_capacity(starts.len());
+        for (i, &fingerprint) in prints.iter().enumerate() {
+            let range = bounds(i);
+            let entry = ctx.instructions[range.start].pc;
+            let matches = match known.get(&fingerprint) {
+                Some(old) if !dirty.contains(&i) => old.matches.clone(),
+                _ => {
+                    let base = entry as usize * INSN_SIZE;
+                    self.signatures()
+                        .scan_range(ctx.text, &ctx.instructions, range)
+                        .into_iter()
+                        .map(|m| (m.signature, (m.offset - base) as u32))
+                        .collect()
+                }
+            };
+            functions.push(FunctionRecord { entry, fingerprint, matches, flow: None });
+        }
+
+        let db = self.signatures();
+        let mut matches: Vec<SignatureMatch> = functions
+            .iter()
+            .flat_map(|f| {
+                let base = f.entry as usize * INSN_SIZE;
+                f.matches.iter().map(move |&(signature, offset)| SignatureMatch { signature, offset: base + offset as usize })
+            })
+            .collect();
+        // Matches straddling a function boundary belong to no function, so
+        // the instructions around every boundary are always rescanned.
+        let span = db.max_span();
+        for &start in starts.iter().skip(1) {
+            let window = start.saturating_sub(span.saturating_sub(1))..(start + span).min(ctx.instructions.len());
+            matches.extend(db.scan_range(ctx.text, &ctx.instructions, window));
+        }
+        let mut findings = Vec::new();
+        heuristics::signature_findings(db, matches, &mut findings);
+
+        let flow_prints: Vec<u64> = (0..starts.len()).map(|i| flow_fingerprint(&ctx.instructions[bounds(i)])).collect();
+        let flows_known: HashMap<u64, &FunctionFlow> = previous.map_or_else(HashMap::new, |p| {
+            p.functions.iter().filter_map(|f| f.flow.as_ref()).map(|f| (f.fingerprint, f)).collect()
+        });
+        let reuse: Vec<Option<&FunctionFlow>> = flow_prints.iter().map(|p| flows_known.get(p).copied()).collect();
+        let mut flows = None;
+        let report = self.deeper_tiers_with(&ctx, findings, &deadline, version.prefilter, Some(&hash), |findings| {
+            let Some((results, analyzed)) = incremental_dataflow(&ctx, &starts, &flow_prints, &reuse, &deadline) else {
+                return false;
+            };
+            let hits = results.iter().zip(&starts).flat_map(|(r, &s)| r.comparisons.iter().map(move |&o| s + o as usize));
+            heuristics::authority_findings(dataflow::comparisons(&ctx, hits), findings);
+            dirty.extend((0..analyzed.len()).filter(|&i| analyzed[i]));
+            flows = Some(results);
+            true
+        });
+        if let Some(flows) = flows {
+            for (f, flow) in functions.iter_mut().zip(flows) {
+                f.flow = Some(flow);
+            }
+        }
+
+        let stats = RescanStats { functions: functions.len(), reanalyzed: dirty.len() };
+        Ok((ProgramSnapshot { version, hash, functions, report }, stats))
+    }
+}
+
+/// A dataflow state crossing from function `from` into block `to`: the
+/// arguments of every call, and the final state of every block that jumps
+/// or falls through into another function.
+struct Crossing {
+    from: usize,
+    exit: FlowExit,
+    to: BlockId,
+}
+
+/// Dataflow tier over the functions starting at `starts`, reusing `reuse[i]`
+/// for function `i` while its inflow is unchanged. Returns the results of
+/// every function and which ones were analyzed, or `None` when `deadline`
+/// passes first.
+///
+/// Changed functions are analyzed together, seeded with the stored states
+/// flowing in from the rest. A reused function whose inflow turns out to
+/// differ joins them and the analysis reruns. Functions on a flow cycle with
+/// an analyzed function are always analyzed too: a stored state could
+/// otherwise keep itself alive around the cycle after its source is gone.
+fn incremental_dataflow(
+    ctx: &ScanContext,
+    starts: &[usize],
+    prints: &[u64],
+    reuse: &[Option<&FunctionFlow>],
+    deadline: &Deadline,
+) -> Option<(Vec<FunctionFlow>, Vec<bool>)> {
+    let cfg = ctx.cfg();
+    let n = starts.len();
+    let function_of = |insn: usize| starts.partition_point(|&s| s <= insn) - 1;
+    let owner: Vec<usize> = cfg.blocks().iter().map(|b| function_of(b.first as usize)).collect();
+    let offset = |block: BlockId| cfg.block(block).first - starts[owner[block as usize]] as u32;
+    let exit = |from: usize, idx: usize, call: bool| FlowExit { offset: (idx - starts[from]) as u32, call };
+
+    // Mirrors the flows of `dataflow::run_block`.
+    let mut crossings = Vec::new();
+    for id in 0..cfg.len() as BlockId {
+        let from = owner[id as usize];
+        let block = cfg.block(id);
+        for idx in block.insns() {
+            if let Some(to) = cfg.callee(&ctx.instructions[idx]) {
+                crossings.push(Crossing { from, exit: exit(from, idx, true), to });
+            }
+        }
+        for &to in cfg.successors(id).iter().filter(|&&to| owner[to as usize] != from) {
+            crossings.push(Crossing { from, exit: exit(from, block.last as usize - 1, false), to });
+        }
+    }
+    let edges: Vec<(usize, usize)> = crossings.iter().map(|c| (c.from, owner[c.to as usize])).collect();
+    let component = components(n, &edges);
+
+    let find = |out: &[(FlowExit, State)], exit: FlowExit| {
+        out.binary_search_by_key(&exit, |&(e, _)| e).ok().map(|i| out[i].1)
+    };
+    let stored = |f: usize, exit: FlowExit| find(&reuse[f]?.outflow, exit);
+
+    let mut analyzed: Vec<bool> = reuse.iter().map(Option::is_none).collect();
+    loop {
+        let cyclic: HashSet<usize> = (0..n).filter(|&f| analyzed[f]).map(|f| component[f]).collect();
+        for f in 0..n {
+            analyzed[f] |= cyclic.contains(&component[f]);
+        }
+
+        let mut seeds: Vec<(BlockId, State)> = cfg.roots().iter().map(|&r| (r, State::entry())).collect();
+        seeds.extend(
+            crossings
+                .iter()
+                .filter(|c| !analyzed[c.from])
+                .filter_map(|c| Some((c.to, stored(c.from, c.exit)?))),
+        );
+        let solution = dataflow::solve(ctx, |b| analyzed[owner[b as usize]], &seeds, deadline)?;
+
+        let mut outflow: Vec<Vec<(FlowExit, State)>> = vec![Vec::new(); n];
+        for id in 0..cfg.len() as BlockId {
+            let from = owner[id as usize];
+            let Some(state) = solution.input(id).filter(|_| analyzed[from]) else {
+                continue;
+            };
+            dataflow::run_block(ctx, id, state, |_| {}, |idx, call, to, out| {
+                if call || owner[to as usize] != from {
+                    outflow[from].push((exit(from, idx, call), *out));
+                }
+            });
+        }
+        for out in &mut outflow {
+            out.sort_unstable();
+            out.dedup();
+        }
+
+        let mut inflow: Vec<Vec<(u32, Option<(u64, FlowExit)>, State)>> = vec![Vec::new(); n];
+        for &root in cfg.roots() {
+            inflow[owner[root as usize]].push((offset(root), None, State::entry()));
+        }
+        for c in &crossings {
+            let sent = if analyzed[c.from] { find(&outflow[c.from], c.exit) } else { stored(c.from, c.exit) };
+            if let Some(state) = sent {
+                inflow[owner[c.to as usize]].push((offset(c.to), Some((prints[c.from], c.exit)), state));
+            }
+        }
+        for states in &mut inflow {
+            states.sort_unstable();
+            states.dedup();
+        }
+
+        let mut stale = false;
+        for f in 0..n {
+            if !analyzed[f] && reuse[f].map_or(true, |r| r.inflow != inflow[f]) {
+                analyzed[f] = true;
+                stale = true;
+            }
+        }
+        if stale {
+            continue;
+        }
+
+        let results = (0..n)
+            .map(|f| match reuse[f] {
+                Some(reused) if !analyzed[f] => reused.clone(),
+                _ => {
+                    let end = starts.get(f + 1).copied().unwrap_or(ctx.instructions.len());
+                    FunctionFlow {
+                        fingerprint: prints[f],
+                        inflow: std::mem::take(&mut inflow[f]),
+                        outflow: std::mem::take(&mut outflow[f]),
+                        comparisons: (starts[f]..end)
+                            .filter(|&i| solution.hits[i])
+                            .map(|i| (i - starts[f]) as u32)
+                            .collect(),
+                    }
+                }
+            })
+            .collect();
+        return Some((results, analyzed));
+    }
+}
+
+/// Strongly connected component of every node of a directed graph, named
+/// by one of its members.
+fn components(n: usize, edges: &[(usize, usize)]) -> Vec<usize> {
+    let mut succs = vec![Vec::new(); n];
+    let mut preds = vec![Vec::new(); n];
+    for &(a, b) in edges {
+        succs[a].push(b);
+        preds[b].push(a);
+    }
+
+    // Kosaraju: finish order on the graph, then components on its reverse.
+    let mut visited = vec![false; n];
+    let mut order = Vec::with_capacity(n);
+    for root in 0..n {
+        if std::mem::replace(&mut visited[root], true) {
+            continue;
+        }
+        let mut stack = vec![(root, 0)];
+        while let Some(top) = stack.last_mut() {
+            let (node, next) = *top;
+            if let Some(&s) = succs[node].get(next) {
+                top.1 += 1;
+                if !std::mem::replace(&mut visited[s], true) {
+                    stack.push((s, 0));
+                }
+            } else {
+                order.push(node);
+                stack.pop();
+            }
+        }
+    }
+    let mut component = vec![usize::MAX; n];
+    for &root in order.iter().rev() {
+        if component[root] != usize::MAX {
+            continue;
+        }
+        component[root] = root;
+        let mut stack = vec![root];
+        while let Some(node) = stack.pop() {
+            for &p in &preds[node] {
+                if component[p] == usize::MAX {
+                    component[p] = root;
+                    stack.push(p);
+                }
+            }
+        }
+    }
+    component
+}
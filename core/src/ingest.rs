@@ -0,0 +1,479 @@
+//! Ingestion of program deployment events.
+//!
+//! Events are pulled from an `EventSource` on a reader thread, deduplicated
+//! by program hash and handed to scanning workers through a bounded queue:
+//! when the workers fall behind, the reader blocks instead of buffering, so
+//! memory stays flat through deployment bursts. Progress is checkpointed as
+//! the source position below which every event has been handled, together
+//! with the hashes already scanned, so a restarted run resumes where the
+//! previous one stopped without rescanning.
+//!
+//! Replay files record events for offline runs:
+//!
+//! ```text
+//! header   magic
+//! event    u32 length + JSON {"program", "kind", "slot"},
+//!          u32 length + program data
+//! ```
+
+use std::collections::{BTreeMap, HashMap, HashSet, VecDeque};
+use std::fs::{self, File};
+use std::io::{self, BufRead, BufReader, BufWriter, Read, Seek, SeekFrom, Write};
+use std::panic::{self, AssertUnwindSafe};
+use std::path::{Path, PathBuf};
+use std::sync::{mpsc, Arc, Mutex};
+use std::thread;
+
+use serde::{Deserialize, Serialize};
+
+use crate::batch::BatchConfig;
+use crate::cache::ProgramHash;
+use crate::error::{LenzError, Result};
+use crate::risk::RiskReport;
+use crate::scanner::AuditEngine;
+
+const REPLAY_MAGIC: [u8; 8] = *b"LNZRPL\x00\x01";
+const CHECKPOINT_MAGIC: [u8; 8] = *b"LNZCKP\x00\x01";
+/// Largest event metadata record accepted from a replay file.
+const MAX_META_LEN: usize = 64 * 1024;
+/// Largest program accepted from a replay file, so a corrupt length cannot
+/// exhaust memory.
+pub const MAX_PROGRAM_LEN: usize = 64 * 1024 * 1024;
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq, Serialize, Deserialize)]
+#[serde(rename_all = "snake_case")]
+pub enum EventKind {
+    Deploy,
+    Upgrade,
+}
+
+/// A program deployed or upgraded on chain.
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct DeployEvent {
+    /// Base58 program address.
+    pub program: String,
+    pub kind: EventKind,
+    pub slot: u64,
+    /// Program account data or ELF image.
+    pub data: Vec<u8>,
+}
+
+#[derive(Serialize, Deserialize)]
+struct EventMeta {
+    program: String,
+    kind: EventKind,
+    slot: u64,
+}
+
+/// A stream of deployment events.
+pub trait EventSource: Send {
+    /// Blocks for the next event; `None` ends the stream.
+    fn next_event(&mut self) -> Result<Option<DeployEvent>>;
+
+    /// Cursor just past the last event returned.
+    fn position(&self) -> u64;
+
+    /// Continues after a cursor previously returned by `position`. Sources
+    /// that cannot rewind, such as live subscriptions, ignore it.
+    fn seek(&mut self, position: u64) -> Result<()> {
+        let _ = position;
+        Ok(())
+    }
+}
+
+fn io_error(e: io::Error) -> LenzError {
+    LenzError::Io(e.to_string())
+}
+
+/// Events recorded with `ReplayWriter`. Positions are byte offsets.
+pub struct ReplayFile {
+    reader: BufReader<File>,
+    position: u64,
+}
+
+impl ReplayFile {
+    pub fn open(path: impl AsRef<Path>) -> Result<Self> {
+        let mut reader = BufReader::new(File::open(path).map_err(io_error)?);
+        let mut magic = [0u8; 8];
+        reader.read_exact(&mut magic).map_err(io_error)?;
+        if magic != REPLAY_MAGIC {
+            return Err(LenzError::SerializationError("not a replay file".to_string()));
+        }
+        Ok(Self { reader, position: REPLAY_MAGIC.len() as u64 })
+    }
+
+    fn read_len(&mut self, max: usize) -> Result<usize> {
+        let mut len = [0u8; 4];
+        self.reader.read_exact(&mut len).map_err(io_error)?;
+        let len = u32::from_le_bytes(len) as usize;
+        if len > max {
+            return Err(LenzError::SerializationError(format!("replay record of {} bytes exceeds limit", len)));
+        }
+        Ok(len)
+    }
+}
+
+impl EventSource for ReplayFile {
+    fn next_event(&mut self) -> Result<Option<DeployEvent>> {
+        // End of input is only clean on a record boundary.
+        if self.reader.fill_buf().map_err(io_error)?.is_empty() {
+            return Ok(None);
+        }
+        let mut meta = vec![0u8; self.read_len(MAX_META_LEN)?];
+        self.reader.read_exact(&mut meta).map_err(io_error)?;
+        let mut data = vec![0u8; self.read_len(MAX_PROGRAM_LEN)?];
+        self.reader.read_exact(&mut data).map_err(io_error)?;
+
+        self.position += (8 + meta.len() + data.len()) as u64;
+        let meta: EventMeta =
+            serde_json::from_slice(&meta).map_err(|e| LenzError::SerializationError(e.to_string()))?;
+        Ok(Some(DeployEvent { program: meta.program, kind: meta.kind, slot: meta.slot, data }))
+    }
+
+    fn position(&self) -> u64 {
+        self.position
+    }
+
+    fn seek(&mut self, position: u64) -> Result<()> {
+        let position = position.max(REPLAY_MAGIC.len() as u64);
+        self.reader.seek(SeekFrom::Start(position)).map_err(io_error)?;
+        self.position = position;
+        Ok(())
+    }
+}
+
+/// Records events into a replay file.
+pub struct ReplayWriter {
+    writer: BufWriter<File>,
+}
+
+impl ReplayWriter {
+    pub fn create(path: impl AsRef<Path>) -> Result<Self> {
+        let mut writer = BufWriter::new(File::create(path).map_err(io_error)?);
+        writer.write_all(&REPLAY_MAGIC).map_err(io_error)?;
+        Ok(Self { writer })
+    }
+
+    pub fn append(&mut self, event: &DeployEvent) -> Result<()> {
+        let meta = EventMeta { program: event.program.clone(), kind: event.kind, slot: event.slot };
+        let meta = serde_json::to_vec(&meta).map_err(|e| LenzError::SerializationError(e.to_string()))?;
+        if event.data.len() > MAX_PROGRAM_LEN {
+            return Err(LenzError::SerializationError(format!(
+                "program of {} bytes exceeds limit",
+                event.data.len()
+            )));
+        }
+        for part in [&meta, &event.data] {
+            self.writer.write_all(&(part.len() as u32).to_le_bytes()).map_err(io_error)?;
+            self.writer.write_all(part).map_err(io_error)?;
+        }
+        Ok(())
+    }
+
+    pub fn finish(mut self) -> Result<()> {
+        self.writer.flush().map_err(io_error)
+    }
+}
+
+/// Events pushed by another thread, e.g. an RPC subscription. Positions
+/// count received events; a restarted channel cannot rewind.
+pub struct ChannelSource {
+    events: mpsc::Receiver<DeployEvent>,
+    received: u64,
+}
+
+impl ChannelSource {
+    pub fn new(events: mpsc::Receiver<DeployEvent>) -> Self {
+        Self { events, received: 0 }
+    }
+}
+
+impl EventSource for ChannelSource {
+    fn next_event(&mut self) -> Result<Option<DeployEvent>> {
+        let event = self.events.recv().ok();
+        self.received += event.is_some() as u64;
+        Ok(event)
+    }
+
+    fn position(&self) -> u64 {
+        self.received
+    }
+}
+
+/// Progress of an ingestion run, persisted across restarts.
+#[derive(Debug, Clone, Default, PartialEq, Eq)]
+pub struct Checkpoint {
+    /// Source position below which every event has been handled.
+    pub position: u64,
+    /// Programs already scanned, oldest first.
+    pub seen: Vec<ProgramHash>,
+}
+
+impl Checkpoint {
+    pub fn to_bytes(&self) -> Vec<u8> {
+        let mut out = Vec::with_capacity(20 + self.seen.len() * 32);
+        out.extend_from_slice(&CHECKPOINT_MAGIC);
+        out.extend_from_slice(&self.position.to_le_bytes());
+        out.extend_from_slice(&(self.seen.len() as u32).to_le_bytes());
+        self.seen.iter().for_each(|h| out.extend_from_slice(&h.0));
+        out
+    }
+
+    pub fn from_bytes(bytes: &[u8]) -> Result<Self> {
+        let invalid = || LenzError::SerializationError("malformed checkpoint".to_string());
+        let (magic, rest) = bytes.split_first_chunk::<8>().ok_or_else(invalid)?;
+        let (position, rest) = rest.split_first_chunk::<8>().ok_or_else(invalid)?;
+        let (count, rest) = rest.split_first_chunk::<4>().ok_or_else(invalid)?;
+        if *magic != CHECKPOINT_MAGIC || rest.len() != u32::from_le_bytes(*count) as usize * 32 {
+            return Err(invalid());
+        }
+        Ok(Self {
+            position: u64::from_le_bytes(*position),
+            seen: rest.chunks_exact(32).map(|h| ProgramHash(h.try_into().unwrap())).collect(),
+        })
+    }
+
+    /// Reads a checkpoint, `None` if none has been written yet.
+    pub fn load(path: impl AsRef<Path>) -> Result<Option<Self>> {
+        match fs::read(path) {
+            Ok(bytes) => Self::from_bytes(&bytes).map(Some),
+            Err(e) if e.kind() == io::ErrorKind::NotFound => Ok(None),
+            Err(e) => Err(io_error(e)),
+        }
+    }
+
+    /// Replaces the checkpoint at `path` atomically.
+    pub fn save(&self, path: impl AsRef<Path>) -> Result<()> {
+        let path = path.as_ref();
+        let tmp = path.with_extension(format!("tmp{}", std::process::id()));
+        fs::write(&tmp, self.to_bytes()).and_then(|()| fs::rename(&tmp, path)).map_err(io_error)
+    }
+}
+
+#[derive(Debug, Clone)]
+pub struct IngestConfig {
+    /// Scanning threads and the depth of the queue ahead of them.
+    pub batch: BatchConfig,
+    /// Program hashes remembered for deduplication; the oldest are
+    /// forgotten first.
+    pub dedupe_capacity: usize,
+    /// Where progress is saved and resumed from.
+    pub checkpoint: Option<PathBuf>,
+    /// Handled events between checkpoint writes.
+    pub checkpoint_every: usize,
+}
+
+impl Default for IngestConfig {
+    fn default() -> Self {
+        Self { batch: BatchConfig::default(), dedupe_capacity: 1 << 16, checkpoint: None, checkpoint_every: 256 }
+    }
+}
+
+#[derive(Debug)]
+pub enum Outcome {
+    Scanned(Result<RiskReport>),
+    /// The same code was already scanned.
+    Duplicate,
+}
+
+/// One handled event, passed back with the event itself.
+#[derive(Debug)]
+pub struct IngestResult {
+    pub event: DeployEvent,
+    pub hash: ProgramHash,
+    pub outcome: Outcome,
+}
+
+#[derive(Debug, Clone, Copy, Default, PartialEq, Eq, Serialize, Deserialize)]
+pub struct IngestStats {
+    pub events: u64,
+    pub duplicates: u64,
+    pub scanned: u64,
+    pub failed: u64,
+}
+
+/// Hashes seen so far, with those whose event is not yet covered by the
+/// checkpoint position so they are left out of saved checkpoints.
+struct Dedupe {
+    order: VecDeque<ProgramHash>,
+    seen: HashSet<ProgramHash>,
+    capacity: usize,
+    uncommitted: HashMap<ProgramHash, u32>,
+}
+
+impl Dedupe {
+    fn new(capacity: usize, seen: Vec<ProgramHash>) -> Self {
+        let mut dedupe = Self {
+            order: VecDeque::new(),
+            seen: HashSet::new(),
+            capacity: capacity.max(1),
+            uncommitted: HashMap::new(),
+        };
+        for hash in seen {
+            dedupe.insert(hash);
+        }
+        dedupe
+    }
+
+    fn insert(&mut self, hash: ProgramHash) -> bool {
+        if !self.seen.insert(hash) {
+            return false;
+        }
+        self.order.push_back(hash);
+        if self.order.len() > self.capacity {
+            let oldest = self.order.pop_front().unwrap();
+            self.seen.remove(&oldest);
+        }
+        true
+    }
+
+    fn commit(&mut self, hash: &ProgramHash) {
+        if let Some(n) = self.uncommitted.get_mut(hash) {
+            *n -= 1;
+            if *n == 0 {
+                self.uncommitted.remove(hash);
+            }
+        }
+    }
+
+    fn checkpoint(&self, position: u64) -> Checkpoint {
+        let seen = self.order.iter().filter(|h| !self.uncommitted.contains_key(h)).copied().collect();
+        Checkpoint { position, seen }
+    }
+}
+
+struct Item {
+    seq: u64,
+    /// Source position after the event.
+    end: u64,
+    hash: ProgramHash,
+    event: DeployEvent,
+}
+
+impl AuditEngine {
+    /// Scans deployment events from `source` until it ends.
+    ///
+    /// Programs whose code was already scanned are reported as duplicates
+    /// without scanning. Results are passed to `sink` on the calling thread
+    /// in completion order. With a checkpoint configured, the run resumes
+    /// from it and saves progress every `checkpoint_every` events and on
+    /// exit. A source error stops reading; events already read are still
+    /// completed and checkpointed before it is returned.
+    pub fn ingest<S, F>(&self, mut source: S, config: &IngestConfig, mut sink: F) -> Result<IngestStats>
+    where
+        S: EventSource,
+        F: FnMut(IngestResult),
+    {
+        let resumed = match &config.checkpoint {
+            Some(path) => Checkpoint::load(path)?,
+            None => None,
+        };
+        let mut position = resumed.as_ref().map_or(0, |c| c.position);
+        if resumed.is_some() {
+            source.seek(position)?;
+        }
+        let dedupe = Mutex::new(Dedupe::new(config.dedupe_capacity, resumed.map(|c| c.seen).unwrap_or_default()));
+
+        let depth = config.batch.queue_depth.max(1);
+        let (job_tx, job_rx) = mpsc::sync_channel::<Item>(depth);
+        let (result_tx, result_rx) = mpsc::sync_channel::<(Item, Outcome)>(depth);
+        // Owned by the workers only, as in `scan_batch`, so a panicking
+        // `sink` unblocks the reader.
+        let job_rx = Arc::new(Mutex::new(job_rx));
+
+        let mut stats = IngestStats::default();
+        let mut save_error = None;
+        let read = thread::scope(|s| {
+            let duplicates = result_tx.clone();
+            let dedupe_ref = &dedupe;
+            let reader = s.spawn(move || -> Result<()> {
+                for seq in 0.. {
+                    let Some(event) = source.next_event()? else { return Ok(()) };
+                    let hash = ProgramHash::of_program(&event.data);
+                    let item = Item { seq, end: source.position(), hash, event };
+                    let fresh = {
+                        let mut dedupe = dedupe_ref.lock().unwrap();
+                        let fresh = dedupe.insert(hash);
+                        if fresh {
+                            *dedupe.uncommitted.entry(hash).or_default() += 1;
+                        }
+                        fresh
+                    };
+                    let sent = if fresh {
+                        job_tx.send(item).is_ok()
+                    } else {
+                        duplicates.send((item, Outcome::Duplicate)).is_ok()
+                    };
+                    if !sent {
+                        break;
+                    }
+                }
+                Ok(())
+            });
+
+            for _ in 0..config.batch.workers.max(1) {
+                let result_tx = result_tx.clone();
+                let job_rx = Arc::clone(&job_rx);
+                s.spawn(move || loop {
+                    let job = job_rx.lock().unwrap().recv();
+                    let Ok(item) = job else { break };
+                    let report = panic::catch_unwind(AssertUnwindSafe(|| self.audit(&item.event.data)))
+                        .unwrap_or_else(|_| Err(LenzError::Internal(format!("analysis panicked on {}", item.event.program))));
+                    if result_tx.send((item, Outcome::Scanned(report))).is_err() {
+                        break;
+                    }
+                });
+            }
+            drop((result_tx, job_rx));
+
+            // Events complete out of order; the checkpoint only advances over
+            // a contiguous prefix of handled events.
+            let mut handled: BTreeMap<u64, (u64, Option<ProgramHash>)> = BTreeMap::new();
+            let mut next_seq = 0;
+            let mut since_checkpoint = 0;
+            for (item, outcome) in result_rx {
+                stats.events += 1;
+                let fresh = match &outcome {
+                    Outcome::Duplicate => {
+                        stats.duplicates += 1;
+                        None
+                    }
+                    Outcome::Scanned(report) => {
+                        stats.scanned += 1;
+                        stats.failed += report.is_err() as u64;
+                        Some(item.hash)
+                    }
+                };
+                handled.insert(item.seq, (item.end, fresh));
+                while let Some((end, fresh)) = handled.remove(&next_seq) {
+                    position = end;
+                    next_seq += 1;
+                    since_checkpoint += 1;
+                    if let Some(hash) = fresh {
+                        dedupe.lock().unwrap().commit(&hash);
+                    }
+                }
+                sink(IngestResult { event: item.event, hash: item.hash, outcome });
+
+                if let Some(path) = &config.checkpoint {
+                    if since_checkpoint >= config.checkpoint_every.max(1) {
+                        since_checkpoint = 0;
+                        // Keep draining on failure so the workers and reader
+                        // can finish; the error is returned at the end.
+                        let checkpoint = dedupe.lock().unwrap().checkpoint(position);
+                        if let Err(e) = checkpoint.save(path) {
+                            save_error.get_or_insert(e);
+                        }
+                    }
+                }
+            }
+            reader.join().expect("ingest reader panicked")
+        });
+
+        if let Some(path) = &config.checkpoint {
+            dedupe.lock().unwrap().checkpoint(position).save(path)?;
+        }
+        read?;
+        save_error.map_or(Ok(stats), Err)
+    }
+}
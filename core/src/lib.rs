@@ -1,13 +1,43 @@
 pub mod error;
 pub mod scanner;
+pub mod batch;
+pub mod cache;
+pub mod deadline;
+pub mod incremental;
+pub mod ingest;
+pub mod stream;
 pub mod disassembler;
+pub mod elf;
+pub mod cfg;
+pub mod imports;
+pub mod dataflow;
+pub mod context;
+pub mod heuristics;
+pub mod signatures;
+pub mod similarity;
 pub mod risk;
+pub mod wire;
 pub mod constants;
 pub mod utils;
+pub mod corpus;
+pub mod benchmark;
+pub mod metrics;
+#[cfg(feature = "wasm")]
+pub mod wasm;
 
 pub use error::{LenzError, Result};
 pub use scanner::AuditEngine;
-pub use risk::RiskReport;
+pub use batch::{BatchConfig, BatchResult};
+pub use cache::{ProgramHash, ScanCache};
+pub use deadline::Deadline;
+pub use incremental::ProgramSnapshot;
+pub use ingest::{DeployEvent, EventSource, IngestConfig, ReplayFile};
+pub use risk::{AnalysisTier, AnalysisTiers, RiskFlag, RiskFlags, RiskReport};
+pub use stream::StreamConfig;
+pub use elf::ElfFile;
+pub use imports::{ImportIndex, Pubkey};
+pub use signatures::SignatureDatabase;
+pub use similarity::{FamilyMatch, IndexBuilder, SimilarityIndex};
 pub use constants::*;
 
 #[cfg(test)]
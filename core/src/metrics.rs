@@ -0,0 +1,294 @@
+//! Per-phase scan instrumentation.
+//!
+//! With the `metrics` feature every scan phase records its latency into a
+//! process-wide log2 histogram along with the allocations it made (when the
+//! `CountingAllocator` is installed), and scans count the bytes and
+//! instructions they decoded. Without the feature `Span` is a zero-sized type
+//! whose constructor and drop are empty, so the instrumentation compiles away
+//! and `snapshot` returns empty stats.
+
+use std::fmt;
+use std::fmt::Write as _;
+
+use serde::{Deserialize, Serialize};
+
+/// Stages of a scan, in pipeline order.
+#[derive(Debug, Clone, Copy, PartialEq, Eq, Hash, Serialize, Deserialize)]
+#[serde(rename_all = "snake_case")]
+pub enum Phase {
+    /// ELF parsing and instruction decoding.
+    Decode,
+    /// Control-flow graph construction.
+    Cfg,
+    /// Syscall and CPI import indexing.
+    Imports,
+    /// Known-family similarity lookup.
+    Similarity,
+    Signatures,
+    ControlFlow,
+    Dataflow,
+    Score,
+}
+
+impl Phase {
+    pub const ALL: [Phase; 8] = [
+        Phase::Decode,
+        Phase::Cfg,
+        Phase::Imports,
+        Phase::Similarity,
+        Phase::Signatures,
+        Phase::ControlFlow,
+        Phase::Dataflow,
+        Phase::Score,
+    ];
+
+    pub fn name(self) -> &'static str {
+        match self {
+            Phase::Decode => "decode",
+            Phase::Cfg => "cfg",
+            Phase::Imports => "imports",
+            Phase::Similarity => "similarity",
+            Phase::Signatures => "signatures",
+            Phase::ControlFlow => "control_flow",
+            Phase::Dataflow => "dataflow",
+            Phase::Score => "score",
+        }
+    }
+}
+
+/// Histogram buckets. Bucket `i` counts durations up to `2^(i + 10)` ns,
+/// from about 1µs to about 1s; the last bucket also takes everything slower.
+pub const BUCKETS: usize = 21;
+
+/// Upper bound of bucket `i` in nanoseconds.
+pub fn bucket_bound_ns(i: usize) -> u64 {
+    1 << (i + 10)
+}
+
+#[derive(Debug, Clone, PartialEq, Serialize, Deserialize)]
+pub struct PhaseStats {
+    pub phase: Phase,
+    pub count: u64,
+    pub total_ns: u64,
+    pub allocations: u64,
+    /// Non-cumulative counts per histogram bucket.
+    pub buckets: Vec<u64>,
+}
+
+impl PhaseStats {
+    pub fn mean_ns(&self) -> u64 {
+        self.total_ns.checked_div(self.count).unwrap_or(0)
+    }
+
+    /// Upper bound of the bucket holding quantile `q`, in nanoseconds.
+    pub fn quantile_ns(&self, q: f64) -> u64 {
+        let rank = (q.clamp(0.0, 1.0) * self.count as f64).ceil().max(1.0) as u64;
+        let mut seen = 0;
+        for (i, &n) in self.buckets.iter().enumerate() {
+            seen += n;
+            if seen >= rank {
+                return bucket_bound_ns(i);
+            }
+        }
+        0
+    }
+}
+
+#[derive(Debug, Clone, Default, PartialEq, Serialize, Deserialize)]
+pub struct Stats {
+    pub scans: u64,
+    pub bytes: u64,
+    pub instructions: u64,
+    pub phases: Vec<PhaseStats>,
+}
+
+impl Stats {
+    pub fn phase(&self, phase: Phase) -> Option<&PhaseStats> {
+        self.phases.iter().find(|p| p.phase == phase)
+    }
+
+    /// Renders the stats in the Prometheus text exposition format.
+    pub fn to_prometheus(&self) -> String {
+        let mut out = String::new();
+        for (name, help, value) in [
+            ("lenz_scans_total", "Programs analyzed.", self.scans),
+            ("lenz_scanned_bytes_total", "Bytes of code decoded.", self.bytes),
+            ("lenz_scanned_instructions_total", "Instructions decoded.", self.instructions),
+        ] {
+            let _ = writeln!(out, "# HELP {} {}\n# TYPE {} counter\n{} {}", name, help, name, name, value);
+        }
+
+        let _ = writeln!(out, "# HELP lenz_phase_allocations_total Heap allocations made during each scan phase.");
+        let _ = writeln!(out, "# TYPE lenz_phase_allocations_total counter");
+        for p in &self.phases {
+            let phase = p.phase.name();
+            let _ = writeln!(out, "lenz_phase_allocations_total{{phase=\"{}\"}} {}", phase, p.allocations);
+        }
+
+        let _ = writeln!(out, "# HELP lenz_phase_duration_seconds Time spent in each scan phase.");
+        let _ = writeln!(out, "# TYPE lenz_phase_duration_seconds histogram");
+        for p in &self.phases {
+            let phase = p.phase.name();
+            let mut cumulative = 0;
+            for (i, &n) in p.buckets.iter().enumerate().take(BUCKETS - 1) {
+                cumulative += n;
+                let le = bucket_bound_ns(i) as f64 / 1e9;
+                let _ = writeln!(out, "lenz_phase_duration_seconds_bucket{{phase=\"{}\",le=\"{}\"}} {}", phase, le, cumulative);
+            }
+            let _ = writeln!(out, "lenz_phase_duration_seconds_bucket{{phase=\"{}\",le=\"+Inf\"}} {}", phase, p.count);
+            let _ = writeln!(out, "lenz_phase_duration_seconds_sum{{phase=\"{}\"}} {}", phase, p.total_ns as f64 / 1e9);
+            let _ = writeln!(out, "lenz_phase_duration_seconds_count{{phase=\"{}\"}} {}", phase, p.count);
+        }
+        out
+    }
+}
+
+impl fmt::Display for Stats {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        writeln!(f, "{} scans, {} bytes, {} instructions", self.scans, self.bytes, self.instructions)?;
+        writeln!(
+            f,
+            "{:<14} {:>8} {:>11} {:>11} {:>11} {:>11} {:>10}",
+            "phase", "count", "total", "mean", "p50 <=", "p99 <=", "allocs"
+        )?;
+        for p in self.phases.iter().filter(|p| p.count > 0) {
+            writeln!(
+                f,
+                "{:<14} {:>8} {:>9.3}ms {:>9.3}ms {:>9.3}ms {:>9.3}ms {:>10}",
+                p.phase.name(),
+                p.count,
+                p.total_ns as f64 / 1e6,
+                p.mean_ns() as f64 / 1e6,
+                p.quantile_ns(0.5) as f64 / 1e6,
+                p.quantile_ns(0.99) as f64 / 1e6,
+                p.allocations
+            )?;
+        }
+        Ok(())
+    }
+}
+
+#[cfg(feature = "metrics")]
+mod enabled {
+    use std::sync::atomic::{AtomicU64, Ordering};
+    use std::time::Instant;
+
+    use super::{Phase, PhaseStats, Stats, BUCKETS};
+    use crate::benchmark::CountingAllocator;
+
+    struct PhaseMetrics {
+        count: AtomicU64,
+        total_ns: AtomicU64,
+        allocations: AtomicU64,
+        buckets: [AtomicU64; BUCKETS],
+    }
+
+    impl PhaseMetrics {
+        const fn new() -> Self {
+            const ZERO: AtomicU64 = AtomicU64::new(0);
+            Self { count: ZERO, total_ns: ZERO, allocations: ZERO, buckets: [ZERO; BUCKETS] }
+        }
+    }
+
+    static PHASES: [PhaseMetrics; Phase::ALL.len()] = {
+        const PHASE: PhaseMetrics = PhaseMetrics::new();
+        [PHASE; Phase::ALL.len()]
+    };
+    static SCANS: AtomicU64 = AtomicU64::new(0);
+    static BYTES: AtomicU64 = AtomicU64::new(0);
+    static INSTRUCTIONS: AtomicU64 = AtomicU64::new(0);
+
+    /// Times one phase from creation until drop.
+    pub struct Span {
+        phase: Phase,
+        start: Instant,
+        allocations: u64,
+    }
+
+    #[inline]
+    pub fn span(phase: Phase) -> Span {
+        Span { phase, start: Instant::now(), allocations: CountingAllocator::thread_allocations() }
+    }
+
+    impl Drop for Span {
+        fn drop(&mut self) {
+            let ns = self.start.elapsed().as_nanos().min(u64::MAX as u128) as u64;
+            let bucket = (64 - ns.leading_zeros() as usize).saturating_sub(10).min(BUCKETS - 1);
+            let m = &PHASES[self.phase as usize];
+            m.count.fetch_add(1, Ordering::Relaxed);
+            m.total_ns.fetch_add(ns, Ordering::Relaxed);
+            m.buckets[bucket].fetch_add(1, Ordering::Relaxed);
+            let allocations = CountingAllocator::thread_allocations() - self.allocations;
+            m.allocations.fetch_add(allocations, Ordering::Relaxed);
+        }
+    }
+
+    #[inline]
+    pub fn record_scan(bytes: usize, instructions: usize) {
+        SCANS.fetch_add(1, Ordering::Relaxed);
+        BYTES.fetch_add(bytes as u64, Ordering::Relaxed);
+        INSTRUCTIONS.fetch_add(instructions as u64, Ordering::Relaxed);
+    }
+
+    pub fn snapshot() -> Stats {
+        let load = |a: &AtomicU64| a.load(Ordering::Relaxed);
+        Stats {
+            scans: load(&SCANS),
+            bytes: load(&BYTES),
+            instructions: load(&INSTRUCTIONS),
+            phases: Phase::ALL
+                .iter()
+                .zip(&PHASES)
+                .map(|(&phase, m)| PhaseStats {
+                    phase,
+                    count: load(&m.count),
+                    total_ns: load(&m.total_ns),
+                    allocations: load(&m.allocations),
+                    buckets: m.buckets.iter().map(load).collect(),
+                })
+                .collect(),
+        }
+    }
+
+    pub fn reset() {
+        for m in &PHASES {
+            for a in [&m.count, &m.total_ns, &m.allocations].into_iter().chain(&m.buckets) {
+                a.store(0, Ordering::Relaxed);
+            }
+        }
+        for a in [&SCANS, &BYTES, &INSTRUCTIONS] {
+            a.store(0, Ordering::Relaxed);
+        }
+    }
+}
+
+#[cfg(not(feature = "metrics"))]
+mod disabled {
+    use super::{Phase, Stats};
+
+    /// Times one phase from creation until drop.
+    pub struct Span;
+
+    #[inline(always)]
+    pub fn span(_phase: Phase) -> Span {
+        Span
+    }
+
+    #[inline(always)]
+    pub fn record_scan(_bytes: usize, _instructions: usize) {}
+
+    pub fn snapshot() -> Stats {
+        Stats::default()
+    }
+
+    pub fn reset() {}
+}
+
+#[cfg(feature = "metrics")]
+pub use enabled::{record_scan, reset, snapshot, span, Span};
+
+#[cfg(not(feature = "metrics"))]
+pub use disabled::{record_scan, reset, snapshot, span, Span};
+
+/// Whether instrumentation was compiled in.
+pub const ENABLED: bool = cfg!(feature = "metrics");
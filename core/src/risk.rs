@@ -1,11 +1,301 @@
-use serde::{Serialize, Deserialize};
+use std::fmt;
 
-#[derive(Debug, Serialize, Deserialize, Clone)]
+use serde::de::{self, SeqAccess, Visitor};
+use serde::{Deserialize, Deserializer, Serialize, Serializer};
+
+use crate::similarity::FamilyMatch;
+
+/// Known risk findings. The discriminant is the bit index in `RiskFlags`
+/// and must never be reused.
+#[derive(Debug, Clone, Copy, PartialEq, Eq, Hash, PartialOrd, Ord)]
+#[repr(u8)]
+pub enum RiskFlag {
+    HoneypotPattern = 0,
+    BlacklistCheck = 1,
+    HiddenMint = 2,
+    SuspiciousPattern = 3,
+    IndirectControlFlow = 4,
+    MalformedControlFlow = 5,
+    KnownMaliciousFamily = 6,
+}
+
+impl RiskFlag {
+    pub const ALL: [RiskFlag; 7] = [
+        RiskFlag::HoneypotPattern,
+        RiskFlag::BlacklistCheck,
+        RiskFlag::HiddenMint,
+        RiskFlag::SuspiciousPattern,
+        RiskFlag::IndirectControlFlow,
+        RiskFlag::MalformedControlFlow,
+        RiskFlag::KnownMaliciousFamily,
+    ];
+
+    pub fn description(self) -> &'static str {
+        match self {
+            RiskFlag::HoneypotPattern => "Honeypot Pattern",
+            RiskFlag::BlacklistCheck => "Blacklist Check",
+            RiskFlag::HiddenMint => "Hidden Mint Logic",
+            RiskFlag::SuspiciousPattern => "Suspicious Code Pattern",
+            RiskFlag::IndirectControlFlow => "Indirect Control Flow",
+            RiskFlag::MalformedControlFlow => "Malformed Control Flow",
+            RiskFlag::KnownMaliciousFamily => "Known Malicious Family",
+        }
+    }
+
+    pub fn from_description(s: &str) -> Option<Self> {
+        Self::ALL.into_iter().find(|f| f.description() == s)
+    }
+
+    pub fn from_bit(bit: u8) -> Option<Self> {
+        Self::ALL.get(bit as usize).copied()
+    }
+}
+
+impl fmt::Display for RiskFlag {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        f.write_str(self.description())
+    }
+}
+
+impl Serialize for RiskFlag {
+    fn serialize<S: Serializer>(&self, s: S) -> Result<S::Ok, S::Error> {
+        s.serialize_str(self.description())
+    }
+}
+
+impl<'de> Deserialize<'de> for RiskFlag {
+    fn deserialize<D: Deserializer<'de>>(d: D) -> Result<Self, D::Error> {
+        let s = std::borrow::Cow::<'de, str>::deserialize(d)?;
+        RiskFlag::from_description(&s).ok_or_else(|| de::Error::unknown_variant(&s, &[]))
+    }
+}
+
+/// Set of `RiskFlag`s packed into a single word.
+///
+/// Serializes as a list of flag descriptions, matching the historical
+/// `Vec<String>` JSON shape.
+#[derive(Debug, Clone, Copy, Default, PartialEq, Eq, Hash)]
+pub struct RiskFlags(pub u64);
+
+impl RiskFlags {
+    pub fn insert(&mut self, flag: RiskFlag) {
+        self.0 |= 1 << flag as u8;
+    }
+
+    pub fn contains(&self, flag: RiskFlag) -> bool {
+        self.0 & (1 << flag as u8) != 0
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.0 == 0
+    }
+
+    pub fn len(&self) -> usize {
+        self.0.count_ones() as usize
+    }
+
+    pub fn iter(&self) -> impl Iterator<Item = RiskFlag> + '_ {
+        RiskFlag::ALL.into_iter().filter(|f| self.contains(*f))
+    }
+}
+
+impl FromIterator<RiskFlag> for RiskFlags {
+    fn from_iter<I: IntoIterator<Item = RiskFlag>>(iter: I) -> Self {
+        let mut flags = RiskFlags::default();
+        iter.into_iter().for_each(|f| flags.insert(f));
+        flags
+    }
+}
+
+impl Serialize for RiskFlags {
+    fn serialize<S: Serializer>(&self, s: S) -> Result<S::Ok, S::Error> {
+        s.collect_seq(self.iter().map(RiskFlag::description))
+    }
+}
+
+impl<'de> Deserialize<'de> for RiskFlags {
+    fn deserialize<D: Deserializer<'de>>(d: D) -> Result<Self, D::Error> {
+        struct FlagsVisitor;
+
+        impl<'de> Visitor<'de> for FlagsVisitor {
+            type Value = RiskFlags;
+
+            fn expecting(&self, f: &mut fmt::Formatter) -> fmt::Result {
+                f.write_str("a list of risk flag descriptions")
+            }
+
+            // Unknown descriptions come from newer producers and are skipped.
+            fn visit_seq<A: SeqAccess<'de>>(self, mut seq: A) -> Result<RiskFlags, A::Error> {
+                let mut flags = RiskFlags::default();
+                while let Some(s) = seq.next_element::<std::borrow::Cow<'de, str>>()? {
+                    if let Some(flag) = RiskFlag::from_description(&s) {
+                        flags.insert(flag);
+                    }
+                }
+                Ok(flags)
+            }
+        }
+
+        d.deserialize_seq(FlagsVisitor)
+    }
+}
+
+/// Analysis stages in the order they run. The first tier always completes;
+/// deeper tiers are skipped or abandoned when the scan deadline passes.
+#[derive(Debug, Clone, Copy, PartialEq, Eq, Hash, PartialOrd, Ord, Serialize, Deserialize)]
+#[serde(rename_all = "snake_case")]
+pub enum AnalysisTier {
+    /// Decoding and signature matching.
+    Signatures,
+    /// Control-flow graph heuristics.
+    ControlFlow,
+    /// Register and stack dataflow: authority checks.
+    Dataflow,
+}
+
+impl AnalysisTier {
+    pub const ALL: [AnalysisTier; 3] = [AnalysisTier::Signatures, AnalysisTier::ControlFlow, AnalysisTier::Dataflow];
+
+    pub fn name(self) -> &'static str {
+        match self {
+            AnalysisTier::Signatures => "signatures",
+            AnalysisTier::ControlFlow => "control_flow",
+            AnalysisTier::Dataflow => "dataflow",
+        }
+    }
+
+    pub fn from_name(s: &str) -> Option<Self> {
+        Self::ALL.into_iter().find(|t| t.name() == s)
+    }
+}
+
+/// Set of `AnalysisTier`s packed into a byte, bit `tier as u8` per tier.
+///
+/// Serializes as a list of tier names, like `Vec<AnalysisTier>`.
+#[derive(Debug, Clone, Copy, Default, PartialEq, Eq, Hash)]
+pub struct AnalysisTiers(pub u8);
+
+impl AnalysisTiers {
+    pub const ALL: AnalysisTiers = AnalysisTiers((1 << AnalysisTier::ALL.len()) - 1);
+
+    pub fn insert(&mut self, tier: AnalysisTier) {
+        self.0 |= 1 << tier as u8;
+    }
+
+    pub fn contains(&self, tier: AnalysisTier) -> bool {
+        self.0 & (1 << tier as u8) != 0
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.0 == 0
+    }
+
+    pub fn len(&self) -> usize {
+        self.0.count_ones() as usize
+    }
+
+    pub fn iter(&self) -> impl Iterator<Item = AnalysisTier> + '_ {
+        AnalysisTier::ALL.into_iter().filter(|t| self.contains(*t))
+    }
+}
+
+impl From<AnalysisTier> for AnalysisTiers {
+    fn from(tier: AnalysisTier) -> Self {
+        AnalysisTiers(1 << tier as u8)
+    }
+}
+
+impl FromIterator<AnalysisTier> for AnalysisTiers {
+    fn from_iter<I: IntoIterator<Item = AnalysisTier>>(iter: I) -> Self {
+        let mut tiers = AnalysisTiers::default();
+        iter.into_iter().for_each(|t| tiers.insert(t));
+        tiers
+    }
+}
+
+impl Serialize for AnalysisTiers {
+    fn serialize<S: Serializer>(&self, s: S) -> Result<S::Ok, S::Error> {
+        s.collect_seq(self.iter().map(AnalysisTier::name))
+    }
+}
+
+impl<'de> Deserialize<'de> for AnalysisTiers {
+    fn deserialize<D: Deserializer<'de>>(d: D) -> Result<Self, D::Error> {
+        struct TiersVisitor;
+
+        impl<'de> Visitor<'de> for TiersVisitor {
+            type Value = AnalysisTiers;
+
+            fn expecting(&self, f: &mut fmt::Formatter) -> fmt::Result {
+                f.write_str("a list of analysis tier names")
+            }
+
+            // Tiers added by newer producers are skipped.
+            fn visit_seq<A: SeqAccess<'de>>(self, mut seq: A) -> Result<AnalysisTiers, A::Error> {
+                let mut tiers = AnalysisTiers::default();
+                while let Some(s) = seq.next_element::<std::borrow::Cow<'de, str>>()? {
+                    if let Some(tier) = AnalysisTier::from_name(&s) {
+                        tiers.insert(tier);
+                    }
+                }
+                Ok(tiers)
+            }
+        }
+
+        d.deserialize_seq(TiersVisitor)
+    }
+}
+
+/// Location in `.text` that triggered a flag.
+#[derive(Debug, Clone, Copy, PartialEq, Eq, Serialize, Deserialize)]
+pub struct Evidence {
+    pub flag: RiskFlag,
+    pub offset: u32,
+}
+
+mod primary_risk {
+    use super::RiskFlag;
+    use serde::{Deserialize, Deserializer, Serializer};
+
+    pub fn serialize<S: Serializer>(v: &Option<RiskFlag>, s: S) -> Result<S::Ok, S::Error> {
+        s.serialize_str(v.map_or("None", RiskFlag::description))
+    }
+
+    pub fn deserialize<'de, D: Deserializer<'de>>(d: D) -> Result<Option<RiskFlag>, D::Error> {
+        let s = std::borrow::Cow::<'de, str>::deserialize(d)?;
+        Ok(RiskFlag::from_description(&s))
+    }
+}
+
+#[derive(Debug, Serialize, Deserialize, Clone, PartialEq, Eq)]
 pub struct RiskReport {
     pub risk_score: u8,
     pub is_safe: bool,
-    pub primary_risk: String,
-    pub flags: Vec<String>,
+    #[serde(with = "primary_risk")]
+    pub primary_risk: Option<RiskFlag>,
+    pub flags: RiskFlags,
+    #[serde(default, skip_serializing_if = "Vec::is_empty")]
+    pub evidence: Vec<Evidence>,
+    /// Tiers that ran to completion; fewer than `AnalysisTier::ALL` marks a
+    /// partial report cut short by the scan deadline.
+    #[serde(default, skip_serializing_if = "AnalysisTiers::is_empty")]
+    pub tiers_completed: AnalysisTiers,
+    /// Known-bad family the program is a close clone of.
+    #[serde(default, skip_serializing_if = "Option::is_none")]
+    pub family: Option<FamilyMatch>,
+}
+
+impl RiskReport {
+    /// Human readable primary risk, `"None"` for clean programs.
+    pub fn primary_risk_description(&self) -> &'static str {
+        self.primary_risk.map_or("None", RiskFlag::description)
+    }
+
+    /// Whether every analysis tier ran, or a family match settled the
+    /// verdict without them.
+    pub fn is_complete(&self) -> bool {
+        self.family.is_some() || self.tiers_completed == AnalysisTiers::ALL
+    }
 }
 
 impl Default for RiskReport {
@@ -13,8 +303,11 @@ impl Default for RiskReport {
         Self {
             risk_score: 0,
             is_safe: true,
-            primary_risk: "None".to_string(),
-            flags: vec![],
+            primary_risk: None,
+            flags: RiskFlags::default(),
+            evidence: Vec::new(),
+            tiers_completed: AnalysisTiers::default(),
+            family: None,
         }
     }
 }
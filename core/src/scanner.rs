@@ -1,28 +1,325 @@
-use crate::error::{LenzError, Result};
-use crate::risk::RiskReport;
-use crate::disassembler::Disassembler;
+use crate::error::Result;
+use crate::risk::{AnalysisTier, AnalysisTiers, Evidence, RiskFlag, RiskFlags, RiskReport};
+use crate::context::ScanContext;
+use crate::elf::ElfFile;
+use crate::heuristics::{self, Finding};
+use crate::imports::ImportIndex;
+use crate::constants::{ENGINE_VERSION, MAX_RISK_SCORE, SCAN_TIMEOUT_MS};
+use crate::cache::{CacheVersion, ProgramHash, ScanCache};
+use crate::deadline::Deadline;
+use crate::metrics::{self, Phase};
+use crate::signatures::SignatureDatabase;
+use crate::similarity::{FamilyMatch, SimilarityIndex};
+use crate::stream::StreamConfig;
+use std::io::Cursor;
+use std::sync::{Arc, OnceLock};
+use std::time::Duration;
 
-pub struct AuditEngine;
+const BASE_SCORE: u8 = 10;
+const MAX_EVIDENCE: usize = 32;
+
+pub struct AuditEngine {
+    signatures: SignatureDatabase,
+    cache: Option<ScanCache>,
+    timeout: Option<Duration>,
+    families: Option<SimilarityIndex>,
+    prefilter: bool,
+    memory: Option<StreamConfig>,
+}
+
+impl Default for AuditEngine {
+    fn default() -> Self {
+        Self::new(SignatureDatabase::builtin())
+    }
+}
 
 impl AuditEngine {
+    pub fn new(signatures: SignatureDatabase) -> Self {
+        Self { signatures, cache: None, timeout: None, families: None, prefilter: false, memory: None }
+    }
+
+    /// Serves repeated scans of byte-identical programs from `cache`.
+    pub fn with_cache(mut self, cache: ScanCache) -> Self {
+        cache.set_version(self.cache_version());
+        self.cache = Some(cache);
+        self
+    }
+
+    /// Bounds every `audit` call by `timeout`, returning a partial report
+    /// when deeper tiers do not fit.
+    pub fn with_timeout(mut self, timeout: Duration) -> Self {
+        self.timeout = Some(timeout);
+        self
+    }
+
+    /// Scans programs whose decoded code would not fit `budget` bytes in
+    /// chunks, within the budget; their reports only cover the signature
+    /// tier.
+    pub fn with_memory_budget(mut self, budget: usize) -> Self {
+        self.memory = Some(StreamConfig::with_budget(budget));
+        self
+    }
+
+    pub fn memory_budget(&self) -> Option<&StreamConfig> {
+        self.memory.as_ref()
+    }
+
+    /// Reports programs that closely match a known-bad family in `index`
+    /// as high risk without running the analysis tiers.
+    pub fn with_families(mut self, index: SimilarityIndex) -> Self {
+        self.families = Some(index);
+        if let Some(cache) = &self.cache {
+            cache.set_version(self.cache_version());
+        }
+        self
+    }
+
+    /// Skips the dataflow tier for programs without a single CPI site. Such
+    /// programs can not call the Token program, so a signer gate in them
+    /// can not hold tokens hostage; the exception is code the Token program
+    /// calls into, such as Token-2022 transfer hooks, which this screening
+    /// mode does not analyze.
+    pub fn with_prefilter(mut self) -> Self {
+        self.prefilter = true;
+        if let Some(cache) = &self.cache {
+            cache.set_version(self.cache_version());
+        }
+        self
+    }
+
+    pub fn families(&self) -> Option<&SimilarityIndex> {
+        self.families.as_ref()
+    }
+
+    pub fn timeout(&self) -> Option<Duration> {
+        self.timeout
+    }
+
+    pub fn cache(&self) -> Option<&ScanCache> {
+        self.cache.as_ref()
+    }
+
+    pub fn cache_version(&self) -> CacheVersion {
+        CacheVersion {
+            engine: ENGINE_VERSION,
+            signatures: self.signatures.version,
+            families: self.families.as_ref().map_or(0, |f| f.version()),
+            prefilter: self.prefilter,
+        }
+    }
+
+    /// Shared engine using the builtin signature database, bounded by
+    /// `SCAN_TIMEOUT_MS`.
+    pub fn global() -> &'static AuditEngine {
+        static ENGINE: OnceLock<AuditEngine> = OnceLock::new();
+        ENGINE.get_or_init(|| AuditEngine::default().with_timeout(Duration::from_millis(SCAN_TIMEOUT_MS)))
+    }
+
     pub fn scan(bytecode: &[u8]) -> Result<RiskReport> {
-        if bytecode.is_empty() {
-            return Err(LenzError::EmptyBytecode);
+        Self::global().audit(bytecode)
+    }
+
+    pub fn signatures(&self) -> &SignatureDatabase {
+        &self.signatures
+    }
+
+    pub fn audit(&self, bytecode: &[u8]) -> Result<RiskReport> {
+        self.audit_within(bytecode, self.timeout.map_or(Deadline::NONE, Deadline::after))
+    }
+
+    /// Scans with an explicit deadline. The signature tier always completes;
+    /// deeper tiers run only while time remains and the report lists the
+    /// tiers that finished. A close clone of a known family settles the
+    /// report before any tier runs.
+    pub fn audit_within(&self, bytecode: &[u8], deadline: Deadline) -> Result<RiskReport> {
+        let Some(cache) = &self.cache else {
+            return self.analyze(bytecode, &deadline, None);
+        };
+        let hash = ProgramHash::of_program(bytecode);
+        if let Some(report) = cache.get(&hash) {
+            return Ok(report);
+        }
+        let report = self.analyze(bytecode, &deadline, Some(&hash))?;
+        // Partial reports depend on the budget and are never cached. The cache
+        // is best effort: a failed disk write must not fail the scan.
+        if report.is_complete() {
+            let _ = cache.insert(hash, &report);
+        }
+        Ok(report)
+    }
+
+    /// Import index of a program, served from the cache when one is
+    /// configured.
+    pub fn imports(&self, bytecode: &[u8]) -> Result<Arc<ImportIndex>> {
+        let hash = self.cache.as_ref().map(|_| ProgramHash::of_program(bytecode));
+        if let Some(imports) = hash.as_ref().and_then(|h| self.cache.as_ref()?.imports(h)) {
+            return Ok(imports);
         }
+        let ctx = ScanContext::new(bytecode)?;
+        Ok(self.imports_of(&ctx, hash.as_ref()).clone())
+    }
 
-        let _instructions = Disassembler::parse(bytecode)?;
-        
-        // Mock analysis logic
-        // In production, this analyzes control flow graphs
-        let score = 10; 
-        
-        Ok(RiskReport {
+    fn imports_of<'c>(&self, ctx: &'c ScanContext, hash: Option<&ProgramHash>) -> &'c Arc<ImportIndex> {
+        if !ctx.has_imports() {
+            let cache = self.cache.as_ref().zip(hash);
+            match cache.and_then(|(cache, hash)| cache.imports(hash)) {
+                Some(imports) => ctx.set_imports(imports),
+                None => {
+                    let _span = metrics::span(Phase::Imports);
+                    let imports = ctx.imports();
+                    if let Some((cache, hash)) = cache {
+                        cache.insert_imports(*hash, imports.clone());
+                    }
+                }
+            }
+        }
+        ctx.imports()
+    }
+
+    fn analyze(&self, bytecode: &[u8], deadline: &Deadline, hash: Option<&ProgramHash>) -> Result<RiskReport> {
+        if let Some(config) = self.memory.as_ref().filter(|c| !c.fits(bytecode.len())) {
+            return self.scan_reader_within(Cursor::new(bytecode), config, deadline);
+        }
+        let ctx = {
+            let _span = metrics::span(Phase::Decode);
+            ScanContext::new(bytecode)?
+        };
+        metrics::record_scan(ctx.text.len(), ctx.instructions.len());
+        if let Some(report) = self.match_family(&ctx, deadline) {
+            return Ok(report);
+        }
+
+        let mut findings = Vec::new();
+        {
+            let _span = metrics::span(Phase::Signatures);
+            heuristics::signatures(&ctx, &self.signatures, &mut findings);
+        }
+        Ok(self.deeper_tiers(&ctx, findings, deadline, self.prefilter, hash))
+    }
+
+    /// Report of a close clone of a known family, if `ctx` is one. Matching
+    /// is skipped or abandoned once `deadline` passes.
+    pub(crate) fn match_family(&self, ctx: &ScanContext, deadline: &Deadline) -> Option<RiskReport> {
+        let index = self.families.as_ref()?;
+        if deadline.expired() {
+            return None;
+        }
+        build_cfg(ctx);
+        let _span = metrics::span(Phase::Similarity);
+        let family = index.nearest_within(ctx, deadline)?.filter(|m| m.similarity >= index.threshold())?;
+        Some(Self::known_family(family))
+    }
+
+    /// Runs the tiers after the signature tier while time remains and
+    /// scores all findings.
+    pub(crate) fn deeper_tiers(
+        &self,
+        ctx: &ScanContext,
+        findings: Vec<Finding>,
+        deadline: &Deadline,
+        prefilter: bool,
+        hash: Option<&ProgramHash>,
+    ) -> RiskReport {
+        self.deeper_tiers_with(ctx, findings, deadline, prefilter, hash, |findings| {
+            heuristics::authority(ctx, deadline, findings)
+        })
+    }
+
+    /// `deeper_tiers` with the dataflow tier run by `authority`, which
+    /// returns `false` when it did not finish before `deadline`.
+    pub(crate) fn deeper_tiers_with(
+        &self,
+        ctx: &ScanContext,
+        mut findings: Vec<Finding>,
+        deadline: &Deadline,
+        prefilter: bool,
+        hash: Option<&ProgramHash>,
+        mut authority: impl FnMut(&mut Vec<Finding>) -> bool,
+    ) -> RiskReport {
+        let mut tiers = AnalysisTiers::from(AnalysisTier::Signatures);
+        for tier in &AnalysisTier::ALL[1..] {
+            if deadline.expired() {
+                break;
+            }
+            let before = findings.len();
+            let completed = match tier {
+                AnalysisTier::Signatures => true,
+                AnalysisTier::ControlFlow => {
+                    build_cfg(ctx);
+                    let _span = metrics::span(Phase::ControlFlow);
+                    heuristics::control_flow(ctx, &mut findings);
+                    true
+                }
+                AnalysisTier::Dataflow if prefilter && !self.imports_of(ctx, hash).may_invoke() => true,
+                AnalysisTier::Dataflow => {
+                    let _span = metrics::span(Phase::Dataflow);
+                    authority(&mut findings)
+                }
+            };
+            if !completed {
+                // Findings of an abandoned tier may be inconsistent.
+                findings.truncate(before);
+                break;
+            }
+            tiers.insert(*tier);
+        }
+        Self::report(&findings, tiers)
+    }
+
+    pub(crate) fn report(findings: &[Finding], tiers: AnalysisTiers) -> RiskReport {
+        let _span = metrics::span(Phase::Score);
+        let mut report = Self::score(findings);
+        report.tiers_completed = tiers;
+        // An unfinished scan can not vouch for a program.
+        report.is_safe &= report.is_complete();
+        report
+    }
+
+    fn known_family(family: FamilyMatch) -> RiskReport {
+        let finding = Finding { flag: RiskFlag::KnownMaliciousFamily, weight: MAX_RISK_SCORE, offset: None };
+        RiskReport { family: Some(family), ..Self::score(&[finding]) }
+    }
+
+    pub(crate) fn score(findings: &[Finding]) -> RiskReport {
+        let total = findings.iter().fold(BASE_SCORE as u32, |acc, f| acc + f.weight as u32);
+        let score = total.min(MAX_RISK_SCORE as u32) as u8;
+        let primary = findings.iter().max_by_key(|f| f.weight);
+
+        RiskReport {
             risk_score: score,
             is_safe: score < 50,
-            primary_risk: "None".to_string(),
-            flags: vec!["Verified Source".to_string()],
-        })
+            primary_risk: primary.map(|f| f.flag),
+            flags: findings.iter().map(|f| f.flag).collect::<RiskFlags>(),
+            evidence: findings
+                .iter()
+                .filter_map(|f| Some(Evidence { flag: f.flag, offset: f.offset? }))
+                .take(MAX_EVIDENCE)
+                .collect(),
+            tiers_completed: AnalysisTiers::default(),
+            family: None,
+        }
+    }
+
+    /// Returns the executable code of a program account.
+    ///
+    /// ELF images (bare or inside a `ProgramData` account) are reduced to their
+    /// borrowed `.text` section; anything else is treated as raw instructions.
+    pub fn program_text(bytecode: &[u8]) -> Result<&[u8]> {
+        if ElfFile::detect(bytecode) {
+            ElfFile::parse(bytecode)?.text()
+        } else {
+            Ok(bytecode)
+        }
+    }
+}
+
+/// Builds the CFG of `ctx` if no pass has yet. It is built lazily by its
+/// first user; timing it separately keeps it out of that user's phase.
+fn build_cfg(ctx: &ScanContext) {
+    if !ctx.has_cfg() {
+        let _span = metrics::span(Phase::Cfg);
+        ctx.cfg();
     }
 }
 
-// Performance: Zero-copy scanning enabled
\ No newline at end of file
+// Performance: Zero-copy scanning enabled
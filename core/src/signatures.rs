@@ -0,0 +1,508 @@
+use std::collections::VecDeque;
+use std::ops::Range;
+use std::path::Path;
+
+use serde::Deserialize;
+
+use crate::disassembler::{Instruction, INSN_SIZE};
+use crate::error::{LenzError, Result};
+use crate::risk::RiskFlag;
+
+const BUILTIN: &str = include_str!("../signatures/default.json");
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq, Deserialize)]
+#[serde(rename_all = "snake_case")]
+pub enum SignatureCategory {
+    Honeypot,
+    Blacklist,
+    HiddenMint,
+    Suspicious,
+}
+
+impl SignatureCategory {
+    pub fn flag(&self) -> RiskFlag {
+        match self {
+            SignatureCategory::Honeypot => RiskFlag::HoneypotPattern,
+            SignatureCategory::Blacklist => RiskFlag::BlacklistCheck,
+            SignatureCategory::HiddenMint => RiskFlag::HiddenMint,
+            SignatureCategory::Suspicious => RiskFlag::SuspiciousPattern,
+        }
+    }
+
+    pub fn default_weight(&self) -> u8 {
+        match self {
+            SignatureCategory::Honeypot => 45,
+            SignatureCategory::Blacklist => 30,
+            SignatureCategory::HiddenMint => 40,
+            SignatureCategory::Suspicious => 15,
+        }
+    }
+}
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub enum PatternKind {
+    /// Raw bytes of the `.text` section.
+    Bytes,
+    /// Opcode bytes of consecutive decoded instructions.
+    Opcodes,
+}
+
+#[derive(Deserialize)]
+struct SignatureSpec {
+    id: String,
+    category: SignatureCategory,
+    #[serde(default)]
+    weight: Option<u8>,
+    #[serde(default)]
+    bytes: Option<String>,
+    #[serde(default)]
+    opcodes: Option<String>,
+}
+
+#[derive(Deserialize)]
+struct SignatureFile {
+    version: u32,
+    signatures: Vec<SignatureSpec>,
+}
+
+#[derive(Debug, Clone)]
+pub struct Signature {
+    pub id: String,
+    pub category: SignatureCategory,
+    pub weight: u8,
+    pub kind: PatternKind,
+    /// Pattern bytes; `None` is a single-byte wildcard (`??`).
+    pub pattern: Vec<Option<u8>>,
+    anchor: usize,
+    anchor_len: usize,
+}
+
+impl Signature {
+    fn new(spec: SignatureSpec) -> Result<Self> {
+        let (kind, text) = match (spec.bytes, spec.opcodes) {
+            (Some(b), None) => (PatternKind::Bytes, b),
+            (None, Some(o)) => (PatternKind::Opcodes, o),
+            _ => {
+                return Err(LenzError::InvalidSignature(format!(
+                    "{}: exactly one of `bytes` or `opcodes` is required",
+                    spec.id
+                )))
+            }
+        };
+
+        let pattern = text
+            .split_whitespace()
+            .map(|tok| match tok {
+                "??" => Ok(None),
+                _ => u8::from_str_radix(tok, 16).map(Some),
+            })
+            .collect::<std::result::Result<Vec<_>, _>>()
+            .map_err(|_| LenzError::InvalidSignature(format!("{}: malformed pattern", spec.id)))?;
+
+        // Longest run of literal bytes; only this part goes into the automaton.
+        let (mut anchor, mut anchor_len, mut run_start) = (0, 0, 0);
+        for (i, b) in pattern.iter().enumerate() {
+            if b.is_none() {
+                run_start = i + 1;
+            } else if i + 1 - run_start > anchor_len {
+                anchor = run_start;
+                anchor_len = i + 1 - run_start;
+            }
+        }
+        if anchor_len == 0 {
+            return Err(LenzError::InvalidSignature(format!("{}: pattern has no literal bytes", spec.id)));
+        }
+
+        Ok(Self {
+            weight: spec.weight.unwrap_or_else(|| spec.category.default_weight()),
+            id: spec.id,
+            category: spec.category,
+            kind,
+            pattern,
+            anchor,
+            anchor_len,
+        })
+    }
+
+    fn anchor_bytes(&self) -> impl Iterator<Item = u8> + '_ {
+        self.pattern[self.anchor..self.anchor + self.anchor_len].iter().map(|b| b.unwrap())
+    }
+
+    fn verify(&self, start: usize, at: impl Fn(usize) -> Option<u8>) -> bool {
+        self.pattern
+            .iter()
+            .enumerate()
+            .all(|(i, p)| match (p, at(start + i)) {
+                (_, None) => false,
+                (None, Some(_)) => true,
+                (Some(p), Some(b)) => *p == b,
+            })
+    }
+}
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct SignatureMatch {
+    /// Index into `SignatureDatabase::signatures`.
+    pub signature: u32,
+    /// Byte offset of the match within `.text`.
+    pub offset: usize,
+}
+
+/// Aho-Corasick automaton compiled into a dense DFA over byte classes.
+#[derive(Debug, Clone)]
+struct Automaton {
+    classes: [u16; 256],
+    stride: usize,
+    next: Vec<u32>,
+    out_start: Vec<u32>,
+    outputs: Vec<u32>,
+}
+
+impl Automaton {
+    fn build<'s>(patterns: impl Iterator<Item = (u32, &'s Signature)> + Clone) -> Self {
+        let mut used = [false; 256];
+        for (_, sig) in patterns.clone() {
+            for b in sig.anchor_bytes() {
+                used[b as usize] = true;
+            }
+        }
+        let mut classes = [0u16; 256];
+        let mut stride = 1;
+        for b in 0..256 {
+            if used[b] {
+                classes[b] = stride as u16;
+                stride += 1;
+            }
+        }
+
+        // Trie
+        let mut goto: Vec<Vec<(u16, u32)>> = vec![Vec::new()];
+        let mut outs: Vec<Vec<u32>> = vec![Vec::new()];
+        for (id, sig) in patterns {
+            let mut state = 0usize;
+            for b in sig.anchor_bytes() {
+                let c = classes[b as usize];
+                state = match goto[state].iter().find(|(k, _)| *k == c) {
+                    Some(&(_, s)) => s as usize,
+                    None => {
+                        goto.push(Vec::new());
+                        outs.push(Vec::new());
+                        let s = goto.len() - 1;
+                        goto[state].push((c, s as u32));
+                        s
+                    }
+                };
+            }
+            outs[state].push(id);
+        }
+
+        // Breadth-first failure links, folded directly into DFA transitions.
+        let n = goto.len();
+        let mut next = vec![0u32; n * stride];
+        let mut fail = vec![0u32; n];
+        let mut queue = VecDeque::new();
+        for &(c, s) in &goto[0] {
+            next[c as usize] = s;
+            queue.push_back(s);
+        }
+        while let Some(state) = queue.pop_front() {
+            let state = state as usize;
+            let f = fail[state] as usize;
+            let inherited = outs[f].clone();
+            outs[state].extend(inherited);
+            for c in 0..stride {
+                next[state * stride + c] = next[f * stride + c];
+            }
+            for &(c, s) in &goto[state] {
+                fail[s as usize] = next[f * stride + c as usize];
+                next[state * stride + c as usize] = s;
+                queue.push_back(s);
+            }
+        }
+
+        let mut out_start = Vec::with_capacity(n + 1);
+        let mut outputs = Vec::new();
+        for o in outs {
+            out_start.push(outputs.len() as u32);
+            outputs.extend(o);
+        }
+        out_start.push(outputs.len() as u32);
+
+        Self { classes, stride, next, out_start, outputs }
+    }
+
+    /// Feeds `input` through the DFA, reporting `(pattern, end)` for every
+    /// anchor occurrence, where `end` is the index one past its last byte.
+    #[inline]
+    fn run(&self, input: impl Iterator<Item = u8>, hit: impl FnMut(u32, usize)) {
+        self.resume(0, 0, input, hit);
+    }
+
+    /// Continues a run from `state` with `input` starting at index `base`,
+    /// returning the state after the last byte.
+    #[inline]
+    fn resume(&self, mut state: usize, base: usize, input: impl Iterator<Item = u8>, mut hit: impl FnMut(u32, usize)) -> usize {
+        for (i, b) in input.enumerate() {
+            state = self.next[state * self.stride + self.classes[b as usize] as usize] as usize;
+            let (lo, hi) = (self.out_start[state], self.out_start[state + 1]);
+            for &id in &self.outputs[lo as usize..hi as usize] {
+                hit(id, base + i + 1);
+            }
+        }
+        state
+    }
+}
+
+/// Compiled set of malicious code signatures.
+///
+/// All byte signatures share one automaton over `.text` and all opcode
+/// signatures share one over the decoded opcode stream, so matching cost does
+/// not grow with the number of signatures.
+#[derive(Debug, Clone)]
+pub struct SignatureDatabase {
+    pub version: u32,
+    signatures: Vec<Signature>,
+    bytes: Automaton,
+    opcodes: Automaton,
+}
+
+impl SignatureDatabase {
+    pub fn from_json(json: &str) -> Result<Self> {
+        let file: SignatureFile =
+            serde_json::from_str(json).map_err(|e| LenzError::SerializationError(e.to_string()))?;
+        let signatures = file
+            .signatures
+            .into_iter()
+            .map(Signature::new)
+            .collect::<Result<Vec<_>>>()?;
+
+        let of_kind = |kind| {
+            signatures
+                .iter()
+                .enumerate()
+                .filter(move |(_, s)| s.kind == kind)
+                .map(|(i, s)| (i as u32, s))
+        };
+        let bytes = Automaton::build(of_kind(PatternKind::Bytes));
+        let opcodes = Automaton::build(of_kind(PatternKind::Opcodes));
+
+        Ok(Self { version: file.version, signatures, bytes, opcodes })
+    }
+
+    pub fn load(path: impl AsRef<Path>) -> Result<Self> {
+        let json = std::fs::read_to_string(path).map_err(|e| LenzError::Io(e.to_string()))?;
+        Self::from_json(&json)
+    }
+
+    /// The signature set shipped with the crate.
+    pub fn builtin() -> Self {
+        Self::from_json(BUILTIN).expect("builtin signature database is valid")
+    }
+
+    pub fn signatures(&self) -> &[Signature] {
+        &self.signatures
+    }
+
+    pub fn len(&self) -> usize {
+        self.signatures.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.signatures.is_empty()
+    }
+
+    /// Most instructions a single match can span.
+    pub fn max_span(&self) -> usize {
+        self.signatures
+            .iter()
+            .map(|s| match s.kind {
+                // An unaligned byte match touches one more instruction.
+                PatternKind::Bytes => s.pattern.len().div_ceil(INSN_SIZE) + 1,
+                PatternKind::Opcodes => s.pattern.len(),
+            })
+            .max()
+            .unwrap_or(0)
+    }
+
+    /// Like `scan`, restricted to the instructions in `range`. Offsets remain
+    /// relative to the start of `.text`; patterns that straddle the range
+    /// boundary are not reported.
+    pub fn scan_range(&self, text: &[u8], instructions: &[Instruction], range: Range<usize>) -> Vec<SignatureMatch> {
+        let insns = &instructions[range];
+        let (Some(first), Some(last)) = (insns.first(), insns.last()) else { return Vec::new() };
+        let start = first.offset();
+        let end = ((last.pc + last.slots()) as usize * INSN_SIZE).min(text.len());
+        let mut matches = self.scan(&text[start..end], insns);
+        for m in &mut matches {
+            if self.signatures[m.signature as usize].kind == PatternKind::Bytes {
+                m.offset += start;
+            }
+        }
+        matches
+    }
+
+    /// Matches every signature against a program in a single pass over
+    /// `.text` and a single pass over its instructions.
+    pub fn scan(&self, text: &[u8], instructions: &[Instruction]) -> Vec<SignatureMatch> {
+        let mut matches = Vec::new();
+
+        self.bytes.run(text.iter().copied(), |id, end| {
+            let sig = &self.signatures[id as usize];
+            let Some(start) = end.checked_sub(sig.anchor + sig.anchor_len) else { return };
+            if sig.verify(start, |i| text.get(i).copied()) {
+                matches.push(SignatureMatch { signature: id, offset: start });
+            }
+        });
+
+        self.opcodes.run(instructions.iter().map(|i| i.opcode), |id, end| {
+            let sig = &self.signatures[id as usize];
+            let Some(start) = end.checked_sub(sig.anchor + sig.anchor_len) else { return };
+            if sig.verify(start, |i| instructions.get(i).map(|insn| insn.opcode)) {
+                matches.push(SignatureMatch { signature: id, offset: instructions[start].offset() });
+            }
+        });
+
+        matches
+    }
+}
+
+/// Automaton state and the most recent input of one pattern kind.
+struct Window<T> {
+    state: usize,
+    /// The last `keep` items, the first of them at index `base`.
+    tail: VecDeque<T>,
+    base: usize,
+    keep: usize,
+    /// Candidates whose pattern extends past the input seen so far.
+    pending: Vec<(u32, usize)>,
+}
+
+impl<T: Copy> Window<T> {
+    fn new(keep: usize) -> Self {
+        Self { state: 0, tail: VecDeque::with_capacity(keep), base: 0, keep, pending: Vec::new() }
+    }
+
+    fn get(&self, i: usize) -> Option<T> {
+        self.tail.get(i.checked_sub(self.base)?).copied()
+    }
+
+    fn push(&mut self, item: T) {
+        if self.keep == 0 {
+            self.base += 1;
+            return;
+        }
+        if self.tail.len() == self.keep {
+            self.tail.pop_front();
+            self.base += 1;
+        }
+        self.tail.push_back(item);
+    }
+}
+
+/// Matches signatures against a program fed in pieces: `.text` in order
+/// through `feed_text` and its decoded instructions in order through
+/// `feed_instruction`. Between calls only the automaton states and the last
+/// bytes and opcodes a pattern can span are kept, so memory does not grow
+/// with the program.
+pub struct SignatureStream<'a> {
+    db: &'a SignatureDatabase,
+    text: Window<u8>,
+    text_len: usize,
+    opcodes: Window<(u8, usize)>,
+    opcode_count: usize,
+    /// First match of every signature with its position in `scan` order.
+    first: Vec<Option<((bool, usize), SignatureMatch)>>,
+}
+
+impl<'a> SignatureStream<'a> {
+    pub fn new(db: &'a SignatureDatabase) -> Self {
+        let longest = |kind| db.signatures.iter().filter(|s| s.kind == kind).map(|s| s.pattern.len()).max().unwrap_or(0);
+        Self {
+            db,
+            text: Window::new(longest(PatternKind::Bytes)),
+            text_len: 0,
+            opcodes: Window::new(longest(PatternKind::Opcodes)),
+            opcode_count: 0,
+            first: vec![None; db.len()],
+        }
+    }
+
+    fn record(first: &mut [Option<((bool, usize), SignatureMatch)>], key: (bool, usize), m: SignatureMatch) {
+        let slot = &mut first[m.signature as usize];
+        if slot.map_or(true, |(k, _)| key < k) {
+            *slot = Some((key, m));
+        }
+    }
+
+    /// Feeds the next piece of `.text`.
+    pub fn feed_text(&mut self, chunk: &[u8]) {
+        let (db, w, first) = (self.db, &mut self.text, &mut self.first);
+        let base = self.text_len;
+        let end = base + chunk.len();
+        let carried = std::mem::take(&mut w.pending);
+        let at = |i: usize| if i >= base { chunk.get(i - base).copied() } else { w.get(i) };
+        let mut check = |id: u32, start: usize, pending: &mut Vec<(u32, usize)>| {
+            let sig = &db.signatures[id as usize];
+            if start + sig.pattern.len() > end {
+                pending.push((id, start));
+            } else if sig.verify(start, at) {
+                let m = SignatureMatch { signature: id, offset: start };
+                Self::record(first, (false, start + sig.anchor + sig.anchor_len), m);
+            }
+        };
+
+        let mut pending = Vec::new();
+        for (id, start) in carried {
+            check(id, start, &mut pending);
+        }
+        let state = db.bytes.resume(w.state, base, chunk.iter().copied(), |id, anchor_end| {
+            let sig = &db.signatures[id as usize];
+            if let Some(start) = anchor_end.checked_sub(sig.anchor + sig.anchor_len) {
+                check(id, start, &mut pending);
+            }
+        });
+
+        w.state = state;
+        w.pending = pending;
+        for &b in &chunk[chunk.len().saturating_sub(w.keep)..] {
+            w.push(b);
+        }
+        w.base = end - w.tail.len();
+        self.text_len = end;
+    }
+
+    /// Feeds the next decoded instruction.
+    pub fn feed_instruction(&mut self, insn: &Instruction) {
+        let (db, w, first) = (self.db, &mut self.opcodes, &mut self.first);
+        let index = self.opcode_count;
+        w.push((insn.opcode, insn.offset()));
+        self.opcode_count += 1;
+
+        let mut candidates = std::mem::take(&mut w.pending);
+        w.state = db.opcodes.resume(w.state, index, std::iter::once(insn.opcode), |id, anchor_end| {
+            let sig = &db.signatures[id as usize];
+            if let Some(start) = anchor_end.checked_sub(sig.anchor + sig.anchor_len) {
+                candidates.push((id, start));
+            }
+        });
+        for (id, start) in candidates {
+            let sig = &db.signatures[id as usize];
+            if start + sig.pattern.len() > self.opcode_count {
+                w.pending.push((id, start));
+            } else if sig.verify(start, |i| w.get(i).map(|(op, _)| op)) {
+                let offset = w.get(start).map_or(0, |(_, offset)| offset);
+                let m = SignatureMatch { signature: id, offset };
+                Self::record(first, (true, start + sig.anchor + sig.anchor_len), m);
+            }
+        }
+    }
+
+    /// The first match of every matched signature, in the order `scan`
+    /// would report them. Patterns cut off by the end of the input do not
+    /// match.
+    pub fn finish(self) -> Vec<SignatureMatch> {
+        let mut first: Vec<_> = self.first.into_iter().flatten().collect();
+        first.sort_by_key(|&(key, m)| (key, m.signature));
+        first.into_iter().map(|(_, m)| m).collect()
+    }
+}
@@ -0,0 +1,379 @@
+//! Code-family similarity index for clone detection.
+//!
+//! Every function of at least `MIN_FUNCTION_INSNS` instructions is reduced to
+//! a MinHash signature over n-grams of normalized instructions (opcode and
+//! registers; immediates and offsets are dropped, so re-skinned constants,
+//! keys and relocated jumps do not matter). Signatures are split into bands
+//! for locality-sensitive lookup: functions sharing any band are candidates,
+//! and the fraction of equal MinHash values estimates their Jaccard
+//! similarity.
+//!
+//! The index is a flat little-endian file read in place, so it can be backed
+//! by a memory map and opened without parsing the function table:
+//!
+//! ```text
+//! header      magic, version, family/function/band counts
+//! names       u32 length + UTF-8 bytes per family, padded to 8
+//! functions   family u32, instructions u32, MinHash [u32; HASHES]
+//! bands       key u64, function u32, padding u32, sorted by key
+//! ```
+
+use std::collections::HashMap;
+use std::fs;
+use std::path::Path;
+
+use serde::{Deserialize, Serialize};
+
+use crate::context::ScanContext;
+use crate::deadline::Deadline;
+use crate::disassembler::{Instruction, CALL_IMM};
+use crate::error::{LenzError, Result};
+
+const MAGIC: [u8; 8] = *b"LNZFAM\x00\x01";
+const HEADER_LEN: usize = 24;
+
+/// MinHash values per function signature.
+pub const HASHES: usize = 64;
+const ROWS: usize = 4;
+const BANDS: usize = HASHES / ROWS;
+const NGRAM: usize = 4;
+/// Shorter functions are glue shared by unrelated programs.
+pub const MIN_FUNCTION_INSNS: usize = 24;
+/// Estimated similarity at which two functions count as the same code.
+const FUNCTION_MATCH: f32 = 0.5;
+/// Candidates examined per band, bounding lookups in crowded buckets.
+const MAX_BUCKET: usize = 64;
+/// Default share of a program that must match one family.
+pub const DEFAULT_THRESHOLD: u8 = 80;
+
+const FUNCTION_LEN: usize = 8 + 4 * HASHES;
+const BAND_LEN: usize = 16;
+/// Family id of functions indexed as known benign, e.g. shared library code.
+const BENIGN: u32 = u32::MAX;
+
+type MinHash = [u32; HASHES];
+
+/// Closest known family of a scanned program.
+#[derive(Debug, Clone, PartialEq, Eq, Serialize, Deserialize)]
+pub struct FamilyMatch {
+    pub family: String,
+    /// Percentage of the program's code that matches the family.
+    pub similarity: u8,
+}
+
+#[inline]
+fn mix(mut x: u64) -> u64 {
+    x ^= x >> 33;
+    x = x.wrapping_mul(0xff51_afd7_ed55_8ccd);
+    x ^= x >> 33;
+    x = x.wrapping_mul(0xc4ce_b9fe_1a85_ec53);
+    x ^ (x >> 33)
+}
+
+fn token(insn: &Instruction) -> u64 {
+    // Syscalls are identified by the hash in `imm`, which is stable across
+    // builds; every other immediate is program-specific.
+    let imm = if insn.opcode == CALL_IMM && insn.src == 0 { insn.imm as u32 as u64 } else { 0 };
+    (insn.opcode as u64) | (insn.dst as u64) << 8 | (insn.src as u64) << 12 | imm << 16
+}
+
+/// MinHash of a function's instruction n-grams. The `HASHES` hash functions
+/// are derived from two base hashes per n-gram (`h1 + i * h2`).
+fn minhash(insns: &[Instruction]) -> MinHash {
+    let mut sig = [u32::MAX; HASHES];
+    let tokens: Vec<u64> = insns.iter().map(token).collect();
+    for gram in tokens.windows(NGRAM) {
+        let h = gram.iter().fold(0x9e37_79b9_7f4a_7c15u64, |h, &t| mix(h ^ t));
+        let (h1, h2) = (h, mix(h) | 1);
+        for (i, slot) in sig.iter_mut().enumerate() {
+            let v = (h1.wrapping_add((i as u64).wrapping_mul(h2)) >> 32) as u32;
+            *slot = (*slot).min(v);
+        }
+    }
+    sig
+}
+
+fn band_key(band: usize, sig: &MinHash) -> u64 {
+    sig[band * ROWS..(band + 1) * ROWS].iter().fold(mix(band as u64 + 1), |h, &v| mix(h ^ v as u64))
+}
+
+fn agreement(a: &MinHash, b: &MinHash) -> f32 {
+    a.iter().zip(b).filter(|(x, y)| x == y).count() as f32 / HASHES as f32
+}
+
+/// Signatures of every function long enough to index, with their lengths,
+/// computed as the iterator advances.
+fn functions<'c>(ctx: &'c ScanContext) -> impl Iterator<Item = (u32, MinHash)> + 'c {
+    let insns: &'c [Instruction] = &ctx.instructions;
+    let starts = ctx.function_starts();
+    let ends: Vec<usize> = starts.iter().skip(1).copied().chain([insns.len()]).collect();
+    starts
+        .into_iter()
+        .zip(ends)
+        .filter(|&(start, end)| end - start >= MIN_FUNCTION_INSNS)
+        .map(move |(start, end)| ((end - start) as u32, minhash(&insns[start..end])))
+}
+
+fn read_u32(data: &[u8], at: usize) -> u32 {
+    u32::from_le_bytes(data[at..at + 4].try_into().unwrap())
+}
+
+fn read_u64(data: &[u8], at: usize) -> u64 {
+    u64::from_le_bytes(data[at..at + 8].try_into().unwrap())
+}
+
+/// Collects known-bad families and writes them out as an index.
+#[derive(Debug, Default)]
+pub struct IndexBuilder {
+    names: Vec<String>,
+    functions: Vec<(u32, u32, MinHash)>,
+}
+
+impl IndexBuilder {
+    pub fn new() -> Self {
+        Self::default()
+    }
+
+    /// Indexes the functions of `bytecode` as members of `family`.
+    pub fn add_family(&mut self, family: &str, bytecode: &[u8]) -> Result<()> {
+        let id = match self.names.iter().position(|n| n == family) {
+            Some(id) => id as u32,
+            None => {
+                self.names.push(family.to_string());
+                self.names.len() as u32 - 1
+            }
+        };
+        self.add(id, bytecode)
+    }
+
+    /// Indexes the functions of a known benign program. Code it shares with
+    /// a scanned program is left out of that program's family score.
+    pub fn add_benign(&mut self, bytecode: &[u8]) -> Result<()> {
+        self.add(BENIGN, bytecode)
+    }
+
+    fn add(&mut self, family: u32, bytecode: &[u8]) -> Result<()> {
+        let ctx = ScanContext::new(bytecode)?;
+        self.functions.extend(functions(&ctx).map(|(len, sig)| (family, len, sig)));
+        Ok(())
+    }
+
+    pub fn build(&self) -> Vec<u8> {
+        let mut body = Vec::new();
+        for name in &self.names {
+            body.extend_from_slice(&(name.len() as u32).to_le_bytes());
+            body.extend_from_slice(name.as_bytes());
+        }
+        body.resize((HEADER_LEN + body.len()).next_multiple_of(8) - HEADER_LEN, 0);
+
+        let mut bands = Vec::with_capacity(self.functions.len() * BANDS);
+        for (i, (family, len, sig)) in self.functions.iter().enumerate() {
+            body.extend_from_slice(&family.to_le_bytes());
+            body.extend_from_slice(&len.to_le_bytes());
+            sig.iter().for_each(|v| body.extend_from_slice(&v.to_le_bytes()));
+            bands.extend((0..BANDS).map(|b| (band_key(b, sig), i as u32)));
+        }
+        bands.sort_unstable();
+        for (key, function) in bands {
+            body.extend_from_slice(&key.to_le_bytes());
+            body.extend_from_slice(&function.to_le_bytes());
+            body.extend_from_slice(&[0; 4]);
+        }
+
+        // The version identifies the index contents for report caching.
+        let version = (mix(body.iter().fold(0, |h, &b| h.wrapping_mul(0x0100_0000_01b3) ^ b as u64)) as u32) | 1;
+        let mut out = Vec::with_capacity(HEADER_LEN + body.len());
+        out.extend_from_slice(&MAGIC);
+        out.extend_from_slice(&version.to_le_bytes());
+        out.extend_from_slice(&(self.names.len() as u32).to_le_bytes());
+        out.extend_from_slice(&(self.functions.len() as u32).to_le_bytes());
+        out.extend_from_slice(&((self.functions.len() * BANDS) as u32).to_le_bytes());
+        out.extend_from_slice(&body);
+        out
+    }
+
+    pub fn write(&self, path: impl AsRef<Path>) -> Result<()> {
+        fs::write(path, self.build()).map_err(|e| LenzError::Io(e.to_string()))
+    }
+}
+
+/// Read-only view of a built index over any byte storage, e.g. a `Vec<u8>`
+/// or a memory map.
+pub struct SimilarityIndex {
+    data: Box<dyn AsRef<[u8]> + Send + Sync>,
+    version: u32,
+    names: Vec<String>,
+    functions: usize,
+    functions_at: usize,
+    bands: usize,
+    bands_at: usize,
+    threshold: u8,
+}
+
+impl SimilarityIndex {
+    pub fn from_bytes(data: impl AsRef<[u8]> + Send + Sync + 'static) -> Result<Self> {
+        let invalid = || LenzError::SerializationError("malformed similarity index".to_string());
+        let bytes = data.as_ref();
+        if bytes.len() < HEADER_LEN || bytes[..8] != MAGIC {
+            return Err(invalid());
+        }
+        let version = read_u32(bytes, 8);
+        let families = read_u32(bytes, 12) as usize;
+        let functions = read_u32(bytes, 16) as usize;
+        let bands = read_u32(bytes, 20) as usize;
+
+        let mut at = HEADER_LEN;
+        let mut names = Vec::with_capacity(families.min(bytes.len() / 4));
+        for _ in 0..families {
+            let len = bytes.get(at..at + 4).map(|_| read_u32(bytes, at) as usize).ok_or_else(invalid)?;
+            let name = bytes.get(at + 4..at + 4 + len).ok_or_else(invalid)?;
+            names.push(String::from_utf8(name.to_vec()).map_err(|_| invalid())?);
+            at += 4 + len;
+        }
+        let functions_at = at.next_multiple_of(8);
+        let bands_at = functions_at + functions * FUNCTION_LEN;
+        if bands != functions * BANDS || bytes.len() != bands_at + bands * BAND_LEN {
+            return Err(invalid());
+        }
+        Ok(Self {
+            data: Box::new(data),
+            version,
+            names,
+            functions,
+            functions_at,
+            bands,
+            bands_at,
+            threshold: DEFAULT_THRESHOLD,
+        })
+    }
+
+    pub fn load(path: impl AsRef<Path>) -> Result<Self> {
+        Self::from_bytes(fs::read(path).map_err(|e| LenzError::Io(e.to_string()))?)
+    }
+
+    /// Percentage of a program that must match one family for a verdict.
+    pub fn with_threshold(mut self, percent: u8) -> Self {
+        self.threshold = percent.min(100);
+        self
+    }
+
+    pub fn threshold(&self) -> u8 {
+        self.threshold
+    }
+
+    /// Fingerprint of the index contents.
+    pub fn version(&self) -> u32 {
+        self.version
+    }
+
+    pub fn families(&self) -> &[String] {
+        &self.names
+    }
+
+    /// Number of indexed functions.
+    pub fn len(&self) -> usize {
+        self.functions
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.functions == 0
+    }
+
+    fn bytes(&self) -> &[u8] {
+        (*self.data).as_ref()
+    }
+
+    /// Family id of function `f`, `None` for benign code. Ids are not
+    /// validated on open, so out-of-range ones are treated as benign too.
+    fn family_of(&self, f: usize) -> Option<u32> {
+        Some(read_u32(self.bytes(), self.functions_at + f * FUNCTION_LEN)).filter(|&id| (id as usize) < self.names.len())
+    }
+
+    fn signature(&self, f: usize) -> MinHash {
+        let at = self.functions_at + f * FUNCTION_LEN + 8;
+        std::array::from_fn(|i| read_u32(self.bytes(), at + 4 * i))
+    }
+
+    fn band_entry(&self, i: usize) -> (u64, u32) {
+        let at = self.bands_at + i * BAND_LEN;
+        (read_u64(self.bytes(), at), read_u32(self.bytes(), at + 8))
+    }
+
+    /// Most similar indexed function to `sig` and their estimated similarity.
+    fn nearest_function(&self, sig: &MinHash) -> Option<(usize, f32)> {
+        let mut candidates = Vec::new();
+        for band in 0..BANDS {
+            let key = band_key(band, sig);
+            let start = self.partition(key);
+            for i in start..self.bands.min(start + MAX_BUCKET) {
+                let (k, f) = self.band_entry(i);
+                if k != key {
+                    break;
+                }
+                candidates.push(f as usize);
+            }
+        }
+        candidates.sort_unstable();
+        candidates.dedup();
+        candidates
+            .into_iter()
+            .map(|f| (f, agreement(sig, &self.signature(f))))
+            .max_by(|a, b| a.1.total_cmp(&b.1))
+    }
+
+    /// First band entry whose key is not below `key`.
+    fn partition(&self, key: u64) -> usize {
+        let (mut lo, mut hi) = (0, self.bands);
+        while lo < hi {
+            let mid = (lo + hi) / 2;
+            if self.band_entry(mid).0 < key {
+                lo = mid + 1;
+            } else {
+                hi = mid;
+            }
+        }
+        lo
+    }
+
+    /// Closest family to an already decoded program, by the share of its
+    /// non-benign code matching that family's functions.
+    pub fn nearest(&self, ctx: &ScanContext) -> Option<FamilyMatch> {
+        self.nearest_within(ctx, &Deadline::NONE).flatten()
+    }
+
+    /// `nearest`, or `None` when `deadline` passes first.
+    pub fn nearest_within(&self, ctx: &ScanContext, deadline: &Deadline) -> Option<Option<FamilyMatch>> {
+        if self.is_empty() {
+            return Some(None);
+        }
+        let mut total = 0f32;
+        let mut credit: HashMap<u32, f32> = HashMap::new();
+        for (len, sig) in functions(ctx) {
+            if deadline.expired() {
+                return None;
+            }
+            let len = len as f32;
+            match self.nearest_function(&sig).filter(|&(_, s)| s >= FUNCTION_MATCH) {
+                Some((f, similarity)) => {
+                    // Shared library code says nothing about the family.
+                    if let Some(family) = self.family_of(f) {
+                        total += len;
+                        *credit.entry(family).or_default() += len * similarity;
+                    }
+                }
+                None => total += len,
+            }
+        }
+        let Some((family, score)) = credit.into_iter().max_by(|a, b| a.1.total_cmp(&b.1)) else {
+            return Some(None);
+        };
+        Some(Some(FamilyMatch {
+            family: self.names[family as usize].clone(),
+            similarity: (100.0 * score / total).round() as u8,
+        }))
+    }
+
+    pub fn nearest_program(&self, bytecode: &[u8]) -> Result<Option<FamilyMatch>> {
+        Ok(self.nearest(&ScanContext::new(bytecode)?))
+    }
+}
@@ -0,0 +1,231 @@
+//! Memory-bounded scanning of programs read in chunks.
+//!
+//! `.text` is read `chunk_size` bytes at a time. Each chunk is decoded and fed
+//! through the signature automata; only an instruction cut by the chunk end
+//! and the last bytes and opcodes a pattern can span are carried over. The
+//! decoded instructions are kept for the whole-program tiers only if all of
+//! them fit the budget next to the chunk buffer. Otherwise the report covers
+//! the signature tier alone, like a scan that ran out of time.
+
+use std::io::{self, Read, Seek, SeekFrom};
+use std::mem::size_of;
+use std::ops::Range;
+
+use crate::context::ScanContext;
+use crate::deadline::Deadline;
+use crate::disassembler::{Instruction, Instructions, INSN_SIZE, LD_DW_IMM};
+use crate::elf::{
+    self, ElfFile, SectionHeader, ELF_MAGIC, EHDR_SIZE, PROGRAMDATA_HEADER_LEN, SHDR_SIZE, SHT_DYNSYM, SYM_SIZE,
+};
+use crate::error::{LenzError, Result};
+use crate::heuristics;
+use crate::metrics;
+use crate::risk::{AnalysisTier, RiskReport};
+use crate::scanner::AuditEngine;
+use crate::signatures::SignatureStream;
+
+pub const DEFAULT_CHUNK_SIZE: usize = 1 << 20;
+const MIN_CHUNK_SIZE: usize = 4096;
+/// Most of the section name table read to find `.text`.
+const MAX_SECTION_NAMES: u64 = 64 * 1024;
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct StreamConfig {
+    /// Bytes of `.text` read and decoded at a time.
+    pub chunk_size: usize,
+    /// Bytes a scan may hold for the program: the chunk buffer plus the
+    /// decoded instructions kept for the whole-program tiers.
+    pub budget: usize,
+}
+
+impl Default for StreamConfig {
+    fn default() -> Self {
+        Self::with_budget(256 << 20)
+    }
+}
+
+impl StreamConfig {
+    pub fn with_budget(budget: usize) -> Self {
+        Self { chunk_size: DEFAULT_CHUNK_SIZE.min(budget / 8).max(MIN_CHUNK_SIZE), budget }
+    }
+
+    /// Whether a fully decoded scan of `text_len` bytes of code fits the
+    /// budget.
+    pub fn fits(&self, text_len: usize) -> bool {
+        (text_len / INSN_SIZE).saturating_mul(size_of::<Instruction>()).saturating_add(self.chunk_size) <= self.budget
+    }
+}
+
+fn io_error(e: io::Error) -> LenzError {
+    LenzError::Io(e.to_string())
+}
+
+fn read_at<R: Read + Seek>(reader: &mut R, offset: u64, len: u64) -> Result<Vec<u8>> {
+    reader.seek(SeekFrom::Start(offset)).map_err(io_error)?;
+    let mut out = Vec::with_capacity(len as usize);
+    reader.take(len).read_to_end(&mut out).map_err(io_error)?;
+    if out.len() as u64 != len {
+        return Err(LenzError::InvalidElf("section out of bounds"));
+    }
+    Ok(out)
+}
+
+/// Where the code of a program is and where execution can start in it.
+struct Layout {
+    text: Range<u64>,
+    /// See `ElfFile::entry_points`.
+    roots: Vec<u32>,
+}
+
+/// Locates the code in a program account, bare ELF image or raw instruction
+/// stream, reading only the headers and dynamic symbols.
+fn layout<R: Read + Seek>(reader: &mut R) -> Result<Layout> {
+    let len = reader.seek(SeekFrom::End(0)).map_err(io_error)?;
+    if len == 0 {
+        return Err(LenzError::EmptyBytecode);
+    }
+    let head = read_at(reader, 0, len.min((PROGRAMDATA_HEADER_LEN + EHDR_SIZE) as u64))?;
+    if !ElfFile::detect(&head) {
+        return Ok(Layout { text: 0..len, roots: Vec::new() });
+    }
+    let start = if head.starts_with(&ELF_MAGIC) { 0 } else { PROGRAMDATA_HEADER_LEN as u64 };
+    let header = *ElfFile::parse(&head)?.header();
+
+    // Offsets come straight from the file, so every sum is checked.
+    let table_len = header.shnum as u64 * SHDR_SIZE as u64;
+    let table_at = start
+        .checked_add(header.shoff)
+        .filter(|at| at.checked_add(table_len).is_some_and(|end| end <= len))
+        .ok_or(LenzError::InvalidElf("section headers out of bounds"))?;
+    let table = read_at(reader, table_at, table_len)?;
+    let sections: Vec<SectionHeader> = table.chunks_exact(SHDR_SIZE).map(SectionHeader::parse).collect();
+    let names = sections
+        .get(header.shstrndx as usize)
+        .ok_or(LenzError::InvalidElf("missing section name table"))?;
+    let names_at = start
+        .checked_add(names.offset)
+        .filter(|&at| at <= len)
+        .ok_or(LenzError::InvalidElf("section out of bounds"))?;
+    let names = read_at(reader, names_at, names.size.min(MAX_SECTION_NAMES).min(len - names_at))?;
+    let is_text = |s: &&SectionHeader| names.get(s.name as usize..).is_some_and(|n| n.starts_with(b".text\0"));
+    let text = sections.iter().find(is_text).ok_or(LenzError::InvalidElf("missing .text"))?;
+    let range = start
+        .checked_add(text.offset)
+        .and_then(|at| Some(at..at.checked_add(text.size)?))
+        .filter(|range| range.end <= len)
+        .ok_or(LenzError::InvalidElf("section out of bounds"))?;
+
+    let mut roots: Vec<u32> = text.slot_of(header.entry).into_iter().collect();
+    if let Some(symbols) = sections.iter().find(|s| s.kind == SHT_DYNSYM) {
+        // Read a bounded number of symbols at a time; only function slots
+        // are kept.
+        let at = start.saturating_add(symbols.offset);
+        let size = symbols.size.min(len.saturating_sub(at));
+        let step = (MAX_SECTION_NAMES / SYM_SIZE as u64) * SYM_SIZE as u64;
+        for piece in (0..size).step_by(step as usize) {
+            let raw = read_at(reader, at + piece, step.min(size - piece))?;
+            let functions = raw.chunks_exact(SYM_SIZE).filter_map(elf::function_address);
+            roots.extend(functions.filter_map(|addr| text.slot_of(addr)));
+        }
+    }
+    Ok(Layout { text: range, roots })
+}
+
+/// Fills `buf` from `reader`, returning how much was read; less than
+/// `buf.len()` only at the end of the input.
+fn read_full<R: Read>(reader: &mut R, buf: &mut [u8]) -> Result<usize> {
+    let mut n = 0;
+    while n < buf.len() {
+        match reader.read(&mut buf[n..]) {
+            Ok(0) => break,
+            Ok(k) => n += k,
+            Err(e) if e.kind() == io::ErrorKind::Interrupted => {}
+            Err(e) => return Err(io_error(e)),
+        }
+    }
+    Ok(n)
+}
+
+impl AuditEngine {
+    /// Scans a program from `reader` within `config.budget` bytes of program
+    /// data, however large it is. Reports match `audit` when the decoded
+    /// program fits the budget; otherwise only the signature tier runs.
+    pub fn scan_reader<R: Read + Seek>(&self, reader: R, config: &StreamConfig) -> Result<RiskReport> {
+        self.scan_reader_within(reader, config, &self.timeout().map_or(Deadline::NONE, Deadline::after))
+    }
+
+    pub(crate) fn scan_reader_within<R: Read + Seek>(
+        &self,
+        mut reader: R,
+        config: &StreamConfig,
+        deadline: &Deadline,
+    ) -> Result<RiskReport> {
+        let Layout { text: range, roots } = layout(&mut reader)?;
+        let len = (range.end - range.start) as usize;
+        reader.seek(SeekFrom::Start(range.start)).map_err(io_error)?;
+        let mut reader = reader.take(len as u64);
+
+        let chunk = config.chunk_size.max(MIN_CHUNK_SIZE);
+        let retain = config.fits(len);
+        let mut instructions = if retain { Vec::with_capacity(len / INSN_SIZE) } else { Vec::new() };
+        let mut signatures = SignatureStream::new(self.signatures());
+        // An instruction cut by the chunk end is carried to the front.
+        let mut buf = vec![0u8; 2 * INSN_SIZE + chunk];
+        let mut carry = 0;
+        let mut offset = 0;
+        let mut count = 0;
+
+        loop {
+            let n = read_full(&mut reader, &mut buf[carry..carry + chunk])?;
+            if n == 0 {
+                break;
+            }
+            let end = offset + carry + n == len;
+            signatures.feed_text(&buf[carry..carry + n]);
+
+            let data = &buf[..carry + n];
+            let mut decoded = data.len();
+            for insn in Instructions::new(data) {
+                match insn {
+                    Ok(mut insn) => {
+                        insn.pc += (offset / INSN_SIZE) as u32;
+                        signatures.feed_instruction(&insn);
+                        if retain {
+                            instructions.push(insn);
+                        }
+                        count += 1;
+                    }
+                    Err(LenzError::ParseError(at)) => {
+                        let rest = data.len() - at;
+                        if end || rest >= 2 * INSN_SIZE || (rest >= INSN_SIZE && data[at] != LD_DW_IMM) {
+                            return Err(LenzError::ParseError(offset + at));
+                        }
+                        decoded = at;
+                    }
+                    Err(e) => return Err(e),
+                }
+            }
+            let filled = carry + n;
+            buf.copy_within(decoded..filled, 0);
+            carry = filled - decoded;
+            offset += decoded;
+        }
+        if carry > 0 {
+            return Err(LenzError::ParseError(offset));
+        }
+        metrics::record_scan(len, count);
+
+        let mut findings = Vec::new();
+        heuristics::signature_findings(self.signatures(), signatures.finish(), &mut findings);
+        if !retain {
+            return Ok(Self::report(&findings, AnalysisTier::Signatures.into()));
+        }
+        let ctx = ScanContext::from_instructions(instructions, roots);
+        if let Some(report) = self.match_family(&ctx, deadline) {
+            return Ok(report);
+        }
+        // Without the ELF the import index can not see relocated syscalls,
+        // so the pre-filter is not applied.
+        Ok(self.deeper_tiers(&ctx, findings, deadline, false, None))
+    }
+}
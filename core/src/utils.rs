@@ -1,5 +1,7 @@
 pub fn pad_buffer(buf: &[u8], len: usize) -> Vec<u8> {
-    let mut v = buf.to_vec();
+    // One allocation of the final size instead of a copy that is then grown.
+    let mut v = Vec::with_capacity(len);
+    v.extend_from_slice(&buf[..buf.len().min(len)]);
     v.resize(len, 0);
     v
-}
\ No newline at end of file
+}
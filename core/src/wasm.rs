@@ -0,0 +1,81 @@
+//! C ABI for running the engine as a WebAssembly module.
+//!
+//! The host reserves an input buffer with `lenz_alloc`, writes the program
+//! straight into linear memory and calls `lenz_scan`. The result is a
+//! little-endian `u32` length followed by that many bytes of JSON, either
+//! `{"report": ...}` or `{"error": ...}` like a `lenz-cli serve` batch item.
+//! Both buffers are released with `lenz_free`.
+//!
+//! `wasm32-unknown-unknown` has no clock, so scans run without a deadline;
+//! hosts bound them by terminating the worker running the module.
+
+use std::alloc::{self, Layout};
+use std::ptr::NonNull;
+use std::sync::OnceLock;
+use std::{ptr, slice};
+
+use serde_json::json;
+
+use crate::constants::ENGINE_VERSION;
+use crate::scanner::AuditEngine;
+
+fn engine() -> &'static AuditEngine {
+    static ENGINE: OnceLock<AuditEngine> = OnceLock::new();
+    ENGINE.get_or_init(AuditEngine::default)
+}
+
+fn layout(len: usize) -> Layout {
+    Layout::array::<u8>(len).expect("buffer size fits the address space")
+}
+
+/// Reserves `len` bytes of linear memory.
+#[no_mangle]
+pub extern "C" fn lenz_alloc(len: usize) -> *mut u8 {
+    if len == 0 {
+        return NonNull::dangling().as_ptr();
+    }
+    let ptr = unsafe { alloc::alloc(layout(len)) };
+    if ptr.is_null() {
+        alloc::handle_alloc_error(layout(len));
+    }
+    ptr
+}
+
+/// Releases a buffer returned by `lenz_alloc` or `lenz_scan`.
+///
+/// # Safety
+///
+/// `ptr` must come from one of those calls with the same `len`, and must not
+/// be used afterwards.
+#[no_mangle]
+pub unsafe extern "C" fn lenz_free(ptr: *mut u8, len: usize) {
+    if len != 0 {
+        alloc::dealloc(ptr, layout(len));
+    }
+}
+
+/// Scans the `len` bytes at `ptr` and returns the length-prefixed JSON
+/// result, `4 + length` bytes to be passed to `lenz_free`.
+///
+/// # Safety
+///
+/// `ptr` must point to `len` readable bytes, e.g. a buffer from `lenz_alloc`.
+#[no_mangle]
+pub unsafe extern "C" fn lenz_scan(ptr: *const u8, len: usize) -> *mut u8 {
+    let bytecode = if len == 0 { &[][..] } else { slice::from_raw_parts(ptr, len) };
+    let result = match engine().audit(bytecode) {
+        Ok(report) => json!({ "report": report }),
+        Err(e) => json!({ "error": e.to_string() }),
+    };
+    let body = serde_json::to_vec(&result).expect("report serializes");
+    let out = lenz_alloc(4 + body.len());
+    ptr::copy_nonoverlapping((body.len() as u32).to_le_bytes().as_ptr(), out, 4);
+    ptr::copy_nonoverlapping(body.as_ptr(), out.add(4), body.len());
+    out
+}
+
+/// `ENGINE_VERSION` of the module, for keying cached reports.
+#[no_mangle]
+pub extern "C" fn lenz_engine_version() -> u32 {
+    ENGINE_VERSION
+}
@@ -0,0 +1,185 @@
+//! Compact binary encoding of scan results for bulk responses.
+//!
+//! A batch is a fixed header, a table of entry offsets so any entry can be
+//! read without decoding the ones before it, and the entries back to back.
+//! All integers are little-endian; varints are unsigned LEB128.
+//!
+//! ```text
+//! batch      magic "LNZW", version u8, 3 reserved, count u32,
+//!            offset u32 per entry (from the start of the batch)
+//! report     kind u8 = 0, score u8, bits u8 (1 = safe, 2 = family),
+//!            primary flag bit + 1 u8 (0 = none), tier bitset u8,
+//!            reserved u8, evidence count u16, flag bitset u64,
+//!            evidence: flag bit u8 + varint offset,
+//!            family: similarity u8 + varint length + UTF-8 name
+//! error      kind u8 = 1, varint length + UTF-8 message
+//! ```
+//!
+//! Bits are `RiskFlag` and `AnalysisTier` discriminants. Decoders ignore
+//! bits they do not know, so new flags do not need a new version.
+
+use crate::error::{LenzError, Result};
+use crate::risk::{AnalysisTiers, Evidence, RiskFlag, RiskFlags, RiskReport};
+use crate::similarity::FamilyMatch;
+
+const MAGIC: [u8; 4] = *b"LNZW";
+pub const WIRE_VERSION: u8 = 1;
+/// Media type of an encoded batch.
+pub const CONTENT_TYPE: &str = "application/vnd.lenz.reports";
+
+const HEADER_LEN: usize = 12;
+const REPORT_HEADER_LEN: usize = 16;
+const KIND_REPORT: u8 = 0;
+const KIND_ERROR: u8 = 1;
+const SAFE: u8 = 1;
+const FAMILY: u8 = 2;
+
+fn put_varint(out: &mut Vec<u8>, mut v: u64) {
+    while v >= 0x80 {
+        out.push(v as u8 | 0x80);
+        v >>= 7;
+    }
+    out.push(v as u8);
+}
+
+fn put_str(out: &mut Vec<u8>, s: &str) {
+    put_varint(out, s.len() as u64);
+    out.extend_from_slice(s.as_bytes());
+}
+
+fn encode_report(out: &mut Vec<u8>, report: &RiskReport) {
+    let bits = if report.is_safe { SAFE } else { 0 } | if report.family.is_some() { FAMILY } else { 0 };
+    let tiers = report.tiers_completed.0;
+    out.extend_from_slice(&[
+        KIND_REPORT,
+        report.risk_score,
+        bits,
+        report.primary_risk.map_or(0, |f| f as u8 + 1),
+        tiers,
+        0,
+    ]);
+    out.extend_from_slice(&(report.evidence.len() as u16).to_le_bytes());
+    out.extend_from_slice(&report.flags.0.to_le_bytes());
+    for e in &report.evidence {
+        out.push(e.flag as u8);
+        put_varint(out, e.offset as u64);
+    }
+    if let Some(family) = &report.family {
+        out.push(family.similarity);
+        put_str(out, &family.family);
+    }
+}
+
+/// Encodes scan results in order; failed scans carry their error message.
+pub fn encode<'a, I>(results: I) -> Vec<u8>
+where
+    I: IntoIterator<Item = std::result::Result<&'a RiskReport, &'a str>>,
+    I::IntoIter: ExactSizeIterator,
+{
+    let results = results.into_iter();
+    let count = results.len();
+    let mut out = Vec::with_capacity(HEADER_LEN + count * (4 + REPORT_HEADER_LEN + 8));
+    out.extend_from_slice(&MAGIC);
+    out.extend_from_slice(&[WIRE_VERSION, 0, 0, 0]);
+    out.extend_from_slice(&(count as u32).to_le_bytes());
+    out.resize(HEADER_LEN + count * 4, 0);
+
+    for (i, result) in results.enumerate() {
+        let at = out.len() as u32;
+        out[HEADER_LEN + i * 4..HEADER_LEN + i * 4 + 4].copy_from_slice(&at.to_le_bytes());
+        match result {
+            Ok(report) => encode_report(&mut out, report),
+            Err(message) => {
+                out.push(KIND_ERROR);
+                put_str(&mut out, message);
+            }
+        }
+    }
+    out
+}
+
+struct Reader<'a> {
+    bytes: &'a [u8],
+    at: usize,
+}
+
+fn malformed() -> LenzError {
+    LenzError::SerializationError("malformed report batch".to_string())
+}
+
+impl<'a> Reader<'a> {
+    fn take(&mut self, n: usize) -> Result<&'a [u8]> {
+        let s = self.bytes.get(self.at..self.at.checked_add(n).ok_or_else(malformed)?).ok_or_else(malformed)?;
+        self.at += n;
+        Ok(s)
+    }
+
+    fn u8(&mut self) -> Result<u8> {
+        Ok(self.take(1)?[0])
+    }
+
+    fn varint(&mut self) -> Result<u64> {
+        let mut v = 0u64;
+        for shift in (0..64).step_by(7) {
+            let b = self.u8()?;
+            v |= ((b & 0x7f) as u64) << shift;
+            if b & 0x80 == 0 {
+                return Ok(v);
+            }
+        }
+        Err(malformed())
+    }
+
+    fn str(&mut self) -> Result<&'a str> {
+        let len = self.varint()? as usize;
+        std::str::from_utf8(self.take(len)?).map_err(|_| malformed())
+    }
+
+    fn report(&mut self) -> Result<RiskReport> {
+        let h = self.take(REPORT_HEADER_LEN - 1)?;
+        let evidence_count = u16::from_le_bytes([h[5], h[6]]) as usize;
+        let mut report = RiskReport {
+            risk_score: h[0],
+            is_safe: h[1] & SAFE != 0,
+            primary_risk: h[2].checked_sub(1).and_then(RiskFlag::from_bit),
+            flags: RiskFlags(u64::from_le_bytes(h[7..15].try_into().unwrap())),
+            tiers_completed: AnalysisTiers(h[3] & AnalysisTiers::ALL.0),
+            ..RiskReport::default()
+        };
+        for _ in 0..evidence_count {
+            let flag = self.u8()?;
+            let offset = u32::try_from(self.varint()?).map_err(|_| malformed())?;
+            if let Some(flag) = RiskFlag::from_bit(flag) {
+                report.evidence.push(Evidence { flag, offset });
+            }
+        }
+        if h[1] & FAMILY != 0 {
+            let similarity = self.u8()?;
+            report.family = Some(FamilyMatch { family: self.str()?.to_string(), similarity });
+        }
+        Ok(report)
+    }
+}
+
+/// Decodes every entry of a batch; failed scans yield their message.
+pub fn decode(bytes: &[u8]) -> Result<Vec<std::result::Result<RiskReport, String>>> {
+    if bytes.len() < HEADER_LEN || bytes[..4] != MAGIC {
+        return Err(malformed());
+    }
+    if bytes[4] != WIRE_VERSION {
+        return Err(LenzError::SerializationError(format!("unsupported report batch version {}", bytes[4])));
+    }
+    let count = u32::from_le_bytes(bytes[8..12].try_into().unwrap()) as usize;
+    let table = bytes.get(HEADER_LEN..HEADER_LEN + count.checked_mul(4).ok_or_else(malformed)?).ok_or_else(malformed)?;
+    table
+        .chunks_exact(4)
+        .map(|offset| {
+            let mut r = Reader { bytes, at: u32::from_le_bytes(offset.try_into().unwrap()) as usize };
+            match r.u8()? {
+                KIND_REPORT => r.report().map(Ok),
+                KIND_ERROR => Ok(Err(r.str()?.to_string())),
+                _ => Err(malformed()),
+            }
+        })
+        .collect()
+}
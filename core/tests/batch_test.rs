@@ -0,0 +1,51 @@
+#[cfg(test)]
+mod tests {
+    use std::panic::{self, AssertUnwindSafe};
+    use std::sync::mpsc;
+    use std::thread;
+    use std::time::Duration;
+
+    use lenz_core::{AuditEngine, BatchConfig, LenzError};
+
+    const EXIT: [u8; 8] = [0x95, 0, 0, 0, 0, 0, 0, 0];
+
+    #[test]
+    fn test_batch_reports_per_item_errors() {
+        let programs: Vec<Vec<u8>> = (0..64)
+            .map(|i| match i % 3 {
+                0 => Vec::new(),
+                1 => vec![0xff; 8],
+                _ => EXIT.to_vec(),
+            })
+            .collect();
+
+        let mut seen = vec![false; programs.len()];
+        let engine = AuditEngine::default();
+        let scanned = engine.scan_batch(programs.iter(), &BatchConfig::with_workers(4), |r| {
+            assert!(!std::mem::replace(&mut seen[r.index], true));
+            match r.index % 3 {
+                0 => assert_eq!(r.report.unwrap_err(), LenzError::EmptyBytecode),
+                1 => assert_eq!(r.report.unwrap_err(), LenzError::ParseError(0)),
+                _ => assert!(r.report.unwrap().is_safe),
+            }
+        });
+
+        assert_eq!(scanned, 64);
+        assert!(seen.into_iter().all(|s| s));
+    }
+
+    #[test]
+    fn test_sink_panic_propagates() {
+        let (done_tx, done_rx) = mpsc::channel();
+        thread::spawn(move || {
+            // Far more programs than the queues hold, so the feeder blocks.
+            let programs = std::iter::repeat(EXIT.to_vec()).take(1000);
+            let config = BatchConfig { workers: 2, queue_depth: 1 };
+            let result = panic::catch_unwind(AssertUnwindSafe(|| {
+                AuditEngine::default().scan_batch(programs, &config, |_| panic!("sink failed"))
+            }));
+            done_tx.send(result.is_err()).unwrap();
+        });
+        assert_eq!(done_rx.recv_timeout(Duration::from_secs(30)), Ok(true));
+    }
+}
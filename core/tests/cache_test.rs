@@ -0,0 +1,73 @@
+#[cfg(test)]
+mod tests {
+    use lenz_core::cache::{CacheVersion, LruCache};
+    use lenz_core::{AuditEngine, ProgramHash, RiskReport, ScanCache};
+
+    const EXIT: [u8; 8] = [0x95, 0, 0, 0, 0, 0, 0, 0];
+
+    #[test]
+    fn test_lru_evicts_least_recent() {
+        let mut lru = LruCache::new(2);
+        lru.insert(1, "a");
+        lru.insert(2, "b");
+        assert_eq!(lru.get(&1), Some(&"a"));
+        lru.insert(3, "c");
+        assert_eq!(lru.get(&2), None);
+        assert_eq!(lru.get(&1), Some(&"a"));
+        assert_eq!(lru.get(&3), Some(&"c"));
+        assert_eq!(lru.len(), 2);
+    }
+
+    #[test]
+    fn test_engine_serves_repeat_scans_from_cache() {
+        let engine = AuditEngine::default().with_cache(ScanCache::new(16));
+        let first = engine.audit(&EXIT).unwrap();
+        let second = engine.audit(&EXIT).unwrap();
+        assert_eq!(first.risk_score, second.risk_score);
+
+        let stats = engine.cache().unwrap().stats();
+        assert_eq!((stats.hits, stats.misses), (1, 1));
+    }
+
+    #[test]
+    fn test_disk_store_is_versioned() {
+        let dir = std::env::temp_dir().join(format!("lenz-cache-test-{}", std::process::id()));
+        let hash = ProgramHash::of(&EXIT);
+        let report = RiskReport { risk_score: 42, ..RiskReport::default() };
+
+        let cache = ScanCache::new(4).with_disk(&dir);
+        cache.set_version(CacheVersion { engine: 1, signatures: 1, ..CacheVersion::default() });
+        cache.insert(hash, &report).unwrap();
+
+        let reopened = ScanCache::new(4).with_disk(&dir);
+        reopened.set_version(CacheVersion { engine: 1, signatures: 1, ..CacheVersion::default() });
+        assert_eq!(reopened.get(&hash).unwrap().risk_score, 42);
+
+        reopened.set_version(CacheVersion { engine: 1, signatures: 2, ..CacheVersion::default() });
+        assert!(reopened.get(&hash).is_none());
+        reopened.prune().unwrap();
+        assert!(!dir.join("e1-s1").exists());
+
+        std::fs::remove_dir_all(&dir).unwrap();
+    }
+
+    #[test]
+    fn test_prune_keeps_foreign_entries() {
+        let dir = std::env::temp_dir().join(format!("lenz-cache-prune-test-{}", std::process::id()));
+        for name in ["e1-s1", "e1-s1-f0000002a-p", "e1-s2", "projects", "e01-s1", "e1-s1-f2a", "e1-s1-x"] {
+            std::fs::create_dir_all(dir.join(name)).unwrap();
+        }
+
+        let cache = ScanCache::new(4).with_disk(&dir);
+        cache.set_version(CacheVersion { engine: 1, signatures: 2, ..CacheVersion::default() });
+        cache.prune().unwrap();
+
+        assert!(!dir.join("e1-s1").exists());
+        assert!(!dir.join("e1-s1-f0000002a-p").exists());
+        for name in ["e1-s2", "projects", "e01-s1", "e1-s1-f2a", "e1-s1-x"] {
+            assert!(dir.join(name).exists(), "{} was removed", name);
+        }
+
+        std::fs::remove_dir_all(&dir).unwrap();
+    }
+}
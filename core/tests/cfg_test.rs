@@ -0,0 +1,75 @@
+#[cfg(test)]
+mod tests {
+    use lenz_core::cfg::ControlFlowGraph;
+    use lenz_core::disassembler::Disassembler;
+
+    fn insn(opcode: u8, regs: u8, off: i16, imm: i32) -> [u8; 8] {
+        let mut raw = [opcode, regs, 0, 0, 0, 0, 0, 0];
+        raw[2..4].copy_from_slice(&off.to_le_bytes());
+        raw[4..8].copy_from_slice(&imm.to_le_bytes());
+        raw
+    }
+
+    fn program(insns: &[[u8; 8]]) -> Vec<u8> {
+        insns.concat()
+    }
+
+    #[test]
+    fn test_diamond_and_loop() {
+        // 0: mov64 r1, 0
+        // 1: jeq r1, 0, +1     -> 3
+        // 2: add64 r1, 1
+        // 3: add64 r1, 1       (join)
+        // 4: jlt r1, 10, -2    -> 3 (loop)
+        // 5: exit
+        let code = program(&[
+            insn(0xb7, 0x01, 0, 0),
+            insn(0x15, 0x01, 1, 0),
+            insn(0x07, 0x01, 0, 1),
+            insn(0x07, 0x01, 0, 1),
+            insn(0xa5, 0x01, -2, 10),
+            insn(0x95, 0, 0, 0),
+        ]);
+        let insns = Disassembler::parse(&code).unwrap();
+        let cfg = ControlFlowGraph::build(&insns);
+
+        // Blocks: [0,1] [2] [3,4] [5]
+        assert_eq!(cfg.len(), 4);
+        assert_eq!(cfg.successors(0), &[2, 1]);
+        assert_eq!(cfg.successors(2), &[2, 3]);
+        assert_eq!(cfg.predecessors(2), &[0, 1, 2]);
+        assert_eq!(cfg.block_at(4), Some(2));
+        assert_eq!(cfg.dominators(), &[0, 0, 0, 2]);
+        assert!(cfg.dominates(0, 3));
+        assert!(!cfg.dominates(1, 2));
+
+        let loops = cfg.loops();
+        assert_eq!(loops.len(), 1);
+        assert_eq!(loops[0].header, 2);
+        assert_eq!(loops[0].latch, 2);
+        assert_eq!(loops[0].body, vec![2]);
+        assert_eq!(cfg.invalid_targets(), 0);
+    }
+
+    #[test]
+    fn test_internal_calls_and_bad_targets() {
+        // 0: call +2 (internal) -> 3
+        // 1: ja +100            (out of range)
+        // 2: exit
+        // 3: exit
+        let code = program(&[
+            insn(0x85, 0x10, 0, 2),
+            insn(0x05, 0, 100, 0),
+            insn(0x95, 0, 0, 0),
+            insn(0x95, 0, 0, 0),
+        ]);
+        let insns = Disassembler::parse(&code).unwrap();
+        let cfg = ControlFlowGraph::build(&insns);
+
+        // Blocks: [0,1] [2] [3]
+        assert_eq!(cfg.entries(), &[0, 2]);
+        assert_eq!(cfg.calls(), &[(0, 2)]);
+        assert_eq!(cfg.invalid_targets(), 1);
+        assert_eq!(cfg.dominators()[2], 2);
+    }
+}
@@ -0,0 +1,33 @@
+#[cfg(test)]
+mod tests {
+    use lenz_core::corpus::{self, Plant, ProgramSpec};
+    use lenz_core::disassembler::Disassembler;
+    use lenz_core::{AuditEngine, RiskFlag};
+
+    #[test]
+    fn test_generated_programs_are_valid_and_deterministic() {
+        let mut spec = ProgramSpec::new(7, 64 * 1024);
+        spec.branch_density = 0.3;
+        spec.call_density = 0.05;
+        let a = corpus::generate(&spec);
+        assert_eq!(a, corpus::generate(&spec));
+
+        let text = AuditEngine::program_text(&a).unwrap();
+        let insns = Disassembler::parse(text).unwrap();
+        assert!(insns.len() > 4000);
+
+        let report = AuditEngine::default().audit(&a).unwrap();
+        assert!(report.flags.is_empty(), "{:?}", report.flags);
+    }
+
+    #[test]
+    fn test_planted_patterns_are_detected() {
+        let mut spec = ProgramSpec::new(11, 16 * 1024);
+        spec.plants = vec![Plant::HardcodedKeyGate, Plant::HardcodedKeyMatch, Plant::MintTo];
+        let report = AuditEngine::default().audit(&corpus::generate(&spec)).unwrap();
+        assert!(report.flags.contains(RiskFlag::HoneypotPattern));
+        assert!(report.flags.contains(RiskFlag::BlacklistCheck));
+        assert!(report.flags.contains(RiskFlag::HiddenMint));
+        assert!(!report.is_safe);
+    }
+}
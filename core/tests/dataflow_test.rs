@@ -0,0 +1,174 @@
+#[cfg(test)]
+mod tests {
+    use std::io::Cursor;
+
+    use lenz_core::context::ScanContext;
+    use lenz_core::corpus::{self, ProgramSpec};
+    use lenz_core::dataflow;
+    use lenz_core::{AnalysisTiers, AuditEngine, Deadline, RiskFlag, StreamConfig};
+
+    fn insn(opcode: u8, dst: u8, src: u8, off: i16, imm: i32) -> [u8; 8] {
+        let mut raw = [opcode, (src << 4) | dst, 0, 0, 0, 0, 0, 0];
+        raw[2..4].copy_from_slice(&off.to_le_bytes());
+        raw[4..8].copy_from_slice(&imm.to_le_bytes());
+        raw
+    }
+
+    /// The entry passes the input to a helper that compares `chunks` input
+    /// words against key constants spilled through the stack, so the
+    /// instruction order matches no opcode signature.
+    fn key_check(branch: u8, chunks: usize) -> Vec<u8> {
+        let mut code = vec![
+            insn(0xbf, 6, 1, 0, 0), // mov64 r6, r1
+            insn(0x85, 0, 1, 0, 1), // call helper
+            insn(0x95, 0, 0, 0, 0),
+        ];
+        let reject = 3 + chunks * 7 + 2;
+        for c in 0..chunks {
+            let slot = -8 * (c as i16 + 1);
+            code.push(insn(0x18, 3, 0, 0, 0x1234_5678 + c as i32));
+            code.push(insn(0x00, 0, 0, 0, 0x7eed_0000 + c as i32));
+            code.push(insn(0x7b, 10, 3, slot, 0));
+            code.push(insn(0xb7, 4, 0, 0, 7));
+            code.push(insn(0x79, 2, 1, c as i16 * 8, 0));
+            code.push(insn(0x79, 5, 10, slot, 0));
+            let off = reject as i16 - code.len() as i16 - 1;
+            code.push(insn(branch, 2, 5, off, 0));
+        }
+        code.push(insn(0xb7, 0, 0, 0, 0));
+        code.push(insn(0x95, 0, 0, 0, 0));
+        code.push(insn(0xb7, 0, 0, 0, 1));
+        code.push(insn(0x95, 0, 0, 0, 0));
+        code.concat()
+    }
+
+    #[test]
+    fn test_finds_key_gate_through_call_and_stack() {
+        let code = key_check(0x5d, 4);
+        let ctx = ScanContext::new(&code).unwrap();
+        let found = dataflow::key_comparisons(&ctx, &Deadline::NONE).unwrap();
+        assert_eq!(found.iter().map(|c| c.pc).collect::<Vec<_>>(), vec![9, 16, 23, 30]);
+        assert!(found.iter().all(|c| c.requires_match() && c.function == found[0].function));
+
+        let report = AuditEngine::default().audit(&code).unwrap();
+        assert_eq!(report.primary_risk, Some(RiskFlag::HoneypotPattern));
+        assert_eq!(report.evidence[0].offset, 9 * 8);
+        assert_eq!(report.tiers_completed, AnalysisTiers::ALL);
+    }
+
+    fn section(name: u32, kind: u32, addr: usize, offset: usize, size: usize, link: u32) -> Vec<u8> {
+        let mut sh = vec![0u8; 64];
+        sh[0..4].copy_from_slice(&name.to_le_bytes());
+        sh[4..8].copy_from_slice(&kind.to_le_bytes());
+        sh[16..24].copy_from_slice(&(addr as u64).to_le_bytes());
+        sh[24..32].copy_from_slice(&(offset as u64).to_le_bytes());
+        sh[32..40].copy_from_slice(&(size as u64).to_le_bytes());
+        sh[40..44].copy_from_slice(&link.to_le_bytes());
+        sh
+    }
+
+    /// An ELF whose `.text` (at `TEXT_ADDR`) starts with a bare `exit` and
+    /// continues with `key_check`, entered at `entry` and exporting a
+    /// function at `exported`, both as slots.
+    fn elf_with_gate(entry: usize, exported: usize) -> Vec<u8> {
+        const TEXT_ADDR: usize = 0x1000;
+        let mut text = insn(0x95, 0, 0, 0, 0).to_vec();
+        text.extend(key_check(0x5d, 4));
+        let mut dynsym = vec![0u8; 48];
+        dynsym[24..28].copy_from_slice(&1u32.to_le_bytes());
+        dynsym[28] = 0x12; // global function
+        dynsym[30..32].copy_from_slice(&1u16.to_le_bytes());
+        dynsym[32..40].copy_from_slice(&((TEXT_ADDR + exported * 8) as u64).to_le_bytes());
+        let dynstr = b"\0process\0";
+        let shstrtab = b"\0.text\0.dynsym\0.dynstr\0.shstrtab\0";
+
+        let text_off = 64;
+        let dynsym_off = text_off + text.len();
+        let dynstr_off = dynsym_off + dynsym.len();
+        let strtab_off = dynstr_off + dynstr.len();
+        let shoff = (strtab_off + shstrtab.len() + 7) & !7;
+
+        let mut elf = vec![0u8; 64];
+        elf[..4].copy_from_slice(b"\x7fELF");
+        elf[4] = 2;
+        elf[5] = 1;
+        elf[18..20].copy_from_slice(&247u16.to_le_bytes());
+        elf[24..32].copy_from_slice(&((TEXT_ADDR + entry * 8) as u64).to_le_bytes());
+        elf[40..48].copy_from_slice(&(shoff as u64).to_le_bytes());
+        elf[58..60].copy_from_slice(&64u16.to_le_bytes());
+        elf[60..62].copy_from_slice(&5u16.to_le_bytes());
+        elf[62..64].copy_from_slice(&4u16.to_le_bytes());
+        for bytes in [&text[..], &dynsym, dynstr, shstrtab] {
+            elf.extend_from_slice(bytes);
+        }
+        elf.resize(shoff, 0);
+        elf.extend(section(0, 0, 0, 0, 0, 0));
+        elf.extend(section(1, 1, TEXT_ADDR, text_off, text.len(), 0));
+        elf.extend(section(7, 11, 0, dynsym_off, dynsym.len(), 3));
+        elf.extend(section(15, 3, 0, dynstr_off, dynstr.len(), 0));
+        elf.extend(section(23, 3, 0, strtab_off, shstrtab.len(), 0));
+        elf
+    }
+
+    #[test]
+    fn test_analyzes_from_elf_entrypoint_and_exports() {
+        // Neither the entrypoint nor the export is reachable from slot 0.
+        for (entry, exported) in [(1, 0), (0, 1)] {
+            let elf = elf_with_gate(entry, exported);
+            let ctx = ScanContext::new(&elf).unwrap();
+            assert_eq!(ctx.roots, vec![entry as u32, exported as u32]);
+            let cfg = ctx.cfg();
+            assert_eq!(cfg.roots(), &[0, 1]);
+            assert_eq!(cfg.dominators()[1], 1);
+
+            let found = dataflow::key_comparisons(&ctx, &Deadline::NONE).unwrap();
+            assert_eq!(found.iter().map(|c| c.pc).collect::<Vec<_>>(), vec![10, 17, 24, 31]);
+            let report = AuditEngine::default().audit(&elf).unwrap();
+            assert_eq!(report.primary_risk, Some(RiskFlag::HoneypotPattern));
+            let config = StreamConfig::with_budget(1 << 20);
+            assert_eq!(AuditEngine::default().scan_reader(Cursor::new(&elf), &config).unwrap(), report);
+        }
+    }
+
+    #[test]
+    fn test_call_past_the_end_is_not_followed() {
+        // The call target lies past the last slot; the block around slot
+        // 2 is unreachable.
+        let code = [
+            insn(0x85, 0, 1, 0, 3), // call past the end
+            insn(0x95, 0, 0, 0, 0),
+            insn(0xb7, 0, 0, 0, 0),
+            insn(0x95, 0, 0, 0, 0),
+        ]
+        .concat();
+        let ctx = ScanContext::new(&code).unwrap();
+        assert_eq!(dataflow::key_comparisons(&ctx, &Deadline::NONE), Some(Vec::new()));
+        let report = AuditEngine::default().audit(&code).unwrap();
+        assert!(report.flags.contains(RiskFlag::MalformedControlFlow));
+    }
+
+    #[test]
+    fn test_key_match_is_a_blacklist() {
+        let report = AuditEngine::default().audit(&key_check(0x1d, 4)).unwrap();
+        assert_eq!(report.flags.iter().collect::<Vec<_>>(), vec![RiskFlag::BlacklistCheck]);
+    }
+
+    #[test]
+    fn test_ignores_partial_key_comparisons() {
+        // A single 8-byte comparison is an instruction discriminator, not a key.
+        let report = AuditEngine::default().audit(&key_check(0x5d, 1)).unwrap();
+        assert!(report.flags.is_empty());
+        assert!(report.is_safe);
+    }
+
+    #[test]
+    fn test_unplanted_programs_have_no_authority_findings() {
+        for seed in 0..8 {
+            let mut spec = ProgramSpec::new(seed, 32 * 1024);
+            spec.call_density = 0.03;
+            let report = AuditEngine::default().audit(&corpus::generate(&spec)).unwrap();
+            assert!(!report.flags.contains(RiskFlag::HoneypotPattern), "seed {}", seed);
+            assert!(!report.flags.contains(RiskFlag::BlacklistCheck), "seed {}", seed);
+        }
+    }
+}
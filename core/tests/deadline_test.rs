@@ -0,0 +1,42 @@
+#[cfg(test)]
+mod tests {
+    use std::time::Duration;
+
+    use lenz_core::corpus::{self, Plant, ProgramSpec};
+    use lenz_core::{AnalysisTier, AnalysisTiers, AuditEngine, Deadline, ScanCache};
+
+    fn program() -> Vec<u8> {
+        let mut spec = ProgramSpec::new(3, 64 * 1024);
+        spec.plants = vec![Plant::HardcodedKeyGate];
+        corpus::generate(&spec)
+    }
+
+    #[test]
+    fn test_unbounded_scan_completes_every_tier() {
+        let report = AuditEngine::default().audit_within(&program(), Deadline::NONE).unwrap();
+        assert_eq!(report.tiers_completed, AnalysisTiers::ALL);
+        assert!(report.is_complete());
+    }
+
+    #[test]
+    fn test_expired_deadline_yields_partial_report() {
+        let engine = AuditEngine::default().with_timeout(Duration::ZERO).with_cache(ScanCache::new(4));
+        let report = engine.audit(&program()).unwrap();
+
+        // The signature tier still runs and finds the planted gate.
+        assert_eq!(report.tiers_completed, AnalysisTiers::from(AnalysisTier::Signatures));
+        assert_eq!(report.primary_risk_description(), "Honeypot Pattern");
+        assert!(!report.is_complete());
+        assert!(!report.is_safe);
+        // Budget-dependent reports are not cached.
+        assert!(engine.cache().unwrap().is_empty());
+    }
+
+    #[test]
+    fn test_deadline_expiry() {
+        assert!(!Deadline::NONE.expired());
+        assert!(Deadline::after(Duration::ZERO).expired());
+        assert!(!Deadline::after(Duration::from_secs(60)).expired());
+        assert_eq!(Deadline::NONE.remaining(), None);
+    }
+}
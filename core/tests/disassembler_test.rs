@@ -0,0 +1,59 @@
+#[cfg(test)]
+mod tests {
+    use lenz_core::disassembler::{Disassembler, OpKind};
+    use lenz_core::LenzError;
+
+    const PROGRAM: [u8; 32] = [
+        0x18, 0x01, 0x00, 0x00, 0x78, 0x56, 0x34, 0x12, // lddw r1, 0x1122334412345678
+        0x00, 0x00, 0x00, 0x00, 0x44, 0x33, 0x22, 0x11,
+        0x07, 0x01, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, // add64 r1, 1
+        0x95, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, // exit
+    ];
+
+    #[test]
+    fn test_decode_program() {
+        let insns = Disassembler::parse(&PROGRAM).unwrap();
+        assert_eq!(insns.len(), 3);
+        assert_eq!(insns[0].kind(), OpKind::LoadImm64);
+        assert_eq!(insns[0].imm, 0x1122334412345678);
+        assert_eq!(insns[1].pc, 2);
+        assert_eq!(insns[1].to_string(), "add64 r1, 1");
+        assert_eq!(insns[2].kind(), OpKind::Exit);
+    }
+
+    #[test]
+    fn test_invalid_opcode() {
+        let res = Disassembler::parse(&[0xff, 0, 0, 0, 0, 0, 0, 0]);
+        assert_eq!(res.unwrap_err(), LenzError::ParseError(0));
+    }
+
+    #[test]
+    fn test_truncated_ld_dw_imm() {
+        let res = Disassembler::parse(&PROGRAM[..8]);
+        assert_eq!(res.unwrap_err(), LenzError::ParseError(0));
+    }
+
+    #[test]
+    fn test_iter_streams_until_error() {
+        let mut data = PROGRAM.to_vec();
+        data.extend_from_slice(&[0x95, 0, 0]);
+        let mut iter = Disassembler::iter(&data);
+        assert_eq!(iter.by_ref().take_while(|r| r.is_ok()).count(), 3);
+        assert!(iter.next().is_none());
+    }
+
+    #[test]
+    fn test_size_hint_bounds_items() {
+        // An invalid opcode ends the stream however many slots follow.
+        let mut data = vec![0xff; 8];
+        data.extend_from_slice(&PROGRAM);
+        let iter = Disassembler::iter(&data);
+        assert_eq!(iter.size_hint(), (1, Some(5)));
+        assert_eq!(iter.count(), 1);
+
+        let iter = Disassembler::iter(&PROGRAM);
+        assert_eq!(iter.size_hint(), (1, Some(4)));
+        assert_eq!(iter.count(), 3);
+        assert_eq!(Disassembler::iter(&[]).size_hint(), (0, Some(0)));
+    }
+}
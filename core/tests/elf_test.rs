@@ -0,0 +1,85 @@
+#[cfg(test)]
+mod tests {
+    use lenz_core::context::ScanContext;
+    use lenz_core::elf::{ElfFile, PROGRAMDATA_HEADER_LEN, SHT_NOBITS};
+    use lenz_core::scanner::AuditEngine;
+    use lenz_core::LenzError;
+
+    const TEXT: [u8; 16] = [
+        0xb7, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, // mov64 r0, 0
+        0x95, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, // exit
+    ];
+
+    fn section(name: u32, kind: u32, offset: usize, size: usize) -> Vec<u8> {
+        let mut sh = vec![0u8; 64];
+        sh[0..4].copy_from_slice(&name.to_le_bytes());
+        sh[4..8].copy_from_slice(&kind.to_le_bytes());
+        sh[24..32].copy_from_slice(&(offset as u64).to_le_bytes());
+        sh[32..40].copy_from_slice(&(size as u64).to_le_bytes());
+        sh
+    }
+
+    fn build_elf() -> Vec<u8> {
+        let shstrtab = b"\0.text\0.shstrtab\0";
+        let text_off = 64;
+        let strtab_off = text_off + TEXT.len();
+        let shoff = strtab_off + shstrtab.len();
+
+        let mut elf = vec![0u8; 64];
+        elf[..4].copy_from_slice(b"\x7fELF");
+        elf[4] = 2;
+        elf[5] = 1;
+        elf[18..20].copy_from_slice(&247u16.to_le_bytes());
+        elf[40..48].copy_from_slice(&(shoff as u64).to_le_bytes());
+        elf[58..60].copy_from_slice(&64u16.to_le_bytes());
+        elf[60..62].copy_from_slice(&3u16.to_le_bytes());
+        elf[62..64].copy_from_slice(&2u16.to_le_bytes());
+        elf.extend_from_slice(&TEXT);
+        elf.extend_from_slice(shstrtab);
+        elf.extend(section(0, 0, 0, 0));
+        elf.extend(section(1, 1, text_off, TEXT.len()));
+        elf.extend(section(7, 3, strtab_off, shstrtab.len()));
+        elf
+    }
+
+    #[test]
+    fn test_text_section_is_borrowed() {
+        let data = build_elf();
+        let elf = ElfFile::parse(&data).unwrap();
+        let text = elf.text().unwrap();
+        assert_eq!(text, &TEXT);
+        assert_eq!(text.as_ptr(), data[64..].as_ptr());
+        assert!(elf.rodata().unwrap().is_empty());
+        assert!(elf.dynamic_symbols().unwrap().is_empty());
+    }
+
+    #[test]
+    fn test_programdata_prefix() {
+        let mut account = vec![0u8; PROGRAMDATA_HEADER_LEN];
+        account[0] = 3;
+        account.extend(build_elf());
+        assert_eq!(AuditEngine::program_text(&account).unwrap(), &TEXT);
+        assert!(AuditEngine::scan(&account).is_ok());
+    }
+
+    #[test]
+    fn test_truncated_section_table() {
+        let data = build_elf();
+        let elf = ElfFile::parse(&data[..data.len() - 10]).unwrap();
+        assert!(matches!(elf.text(), Err(LenzError::InvalidElf(_))));
+    }
+
+    #[test]
+    fn test_nobits_section_has_no_file_range() {
+        // A NOBITS `.text` whose range wraps around the address space.
+        let mut data = build_elf();
+        let text = data.len() - 2 * 64;
+        data[text + 4..text + 8].copy_from_slice(&SHT_NOBITS.to_le_bytes());
+        data[text + 24..text + 32].copy_from_slice(&(u64::MAX - 4).to_le_bytes());
+        let elf = ElfFile::parse(&data).unwrap();
+        assert_eq!(elf.text_section().unwrap().file_range(), 0..0);
+        assert!(elf.text().unwrap().is_empty());
+        assert!(ScanContext::new(&data).unwrap().instructions.is_empty());
+        assert!(AuditEngine::default().audit(&data).is_ok());
+    }
+}
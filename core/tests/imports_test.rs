@@ -0,0 +1,173 @@
+#[cfg(test)]
+mod tests {
+    use std::sync::Arc;
+
+    use lenz_core::context::ScanContext;
+    use lenz_core::imports::{self, syscall_hash, SOL_INVOKE_SIGNED_C};
+    use lenz_core::{AnalysisTiers, AuditEngine, ImportIndex, LenzError, ProgramHash, Pubkey, RiskFlag, ScanCache};
+
+    const TOKEN: &str = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA";
+
+    fn insn(opcode: u8, dst: u8, src: u8, off: i16, imm: i32) -> [u8; 8] {
+        let mut raw = [opcode, (src << 4) | dst, 0, 0, 0, 0, 0, 0];
+        raw[2..4].copy_from_slice(&off.to_le_bytes());
+        raw[4..8].copy_from_slice(&imm.to_le_bytes());
+        raw
+    }
+
+    fn syscall(name: &str) -> [u8; 8] {
+        insn(0x85, 0, 0, 0, syscall_hash(name) as i32)
+    }
+
+    /// An entry that optionally invokes another program, and a helper that
+    /// only lets one hardcoded signer through.
+    fn key_gate(cpi: bool) -> Vec<u8> {
+        let mut code = vec![insn(0xbf, 6, 1, 0, 0), insn(0x85, 0, 1, 0, 1 + cpi as i32)];
+        if cpi {
+            code.push(syscall("sol_invoke_signed_c"));
+        }
+        code.push(insn(0x95, 0, 0, 0, 0));
+        let reject = code.len() + 4 * 7 + 2;
+        for c in 0..4 {
+            let slot = -8 * (c as i16 + 1);
+            code.push(insn(0x18, 3, 0, 0, 0x1234_5678 + c as i32));
+            code.push(insn(0x00, 0, 0, 0, 0x7eed_0000 + c as i32));
+            code.push(insn(0x7b, 10, 3, slot, 0));
+            code.push(insn(0xb7, 4, 0, 0, 7));
+            code.push(insn(0x79, 2, 1, c as i16 * 8, 0));
+            code.push(insn(0x79, 5, 10, slot, 0));
+            let off = reject as i16 - code.len() as i16 - 1;
+            code.push(insn(0x5d, 2, 5, off, 0));
+        }
+        code.extend([insn(0xb7, 0, 0, 0, 0), insn(0x95, 0, 0, 0, 0), insn(0xb7, 0, 0, 0, 1), insn(0x95, 0, 0, 0, 0)]);
+        code.concat()
+    }
+
+    fn section(name: u32, kind: u32, offset: usize, size: usize, link: u32) -> Vec<u8> {
+        let mut sh = vec![0u8; 64];
+        sh[0..4].copy_from_slice(&name.to_le_bytes());
+        sh[4..8].copy_from_slice(&kind.to_le_bytes());
+        sh[16..24].copy_from_slice(&(offset as u64).to_le_bytes());
+        sh[24..32].copy_from_slice(&(offset as u64).to_le_bytes());
+        sh[32..40].copy_from_slice(&(size as u64).to_le_bytes());
+        sh[40..44].copy_from_slice(&link.to_le_bytes());
+        sh
+    }
+
+    /// A dynamically linked ELF: one `call -1` relocated against the
+    /// undefined `sol_invoke_signed_rust`, one against a local function,
+    /// and the Token program id in `.rodata`.
+    fn linked_elf() -> Vec<u8> {
+        let text = [insn(0x85, 0, 0, 0, -1), insn(0x85, 0, 0, 0, -1), insn(0x95, 0, 0, 0, 0)].concat();
+        let mut rodata = b"mint\0".to_vec();
+        rodata.extend(TOKEN.parse::<Pubkey>().unwrap().0);
+        let dynstr = b"\0sol_invoke_signed_rust\0entrypoint\0";
+        let mut dynsym = vec![0u8; 24 * 3];
+        dynsym[24..28].copy_from_slice(&1u32.to_le_bytes());
+        dynsym[28] = 0x10;
+        dynsym[48..52].copy_from_slice(&24u32.to_le_bytes());
+        dynsym[52] = 0x12;
+        dynsym[54..56].copy_from_slice(&1u16.to_le_bytes());
+        let shstrtab = b"\0.text\0.rodata\0.dynsym\0.dynstr\0.rel.dyn\0.shstrtab\0";
+
+        let text_off = 64;
+        let rodata_off = text_off + text.len();
+        let dynsym_off = (rodata_off + rodata.len() + 7) & !7;
+        let dynstr_off = dynsym_off + dynsym.len();
+        let rel_off = (dynstr_off + dynstr.len() + 7) & !7;
+        let mut rel = Vec::new();
+        for (at, symbol) in [(0u64, 1u64), (8, 2)] {
+            rel.extend((text_off as u64 + at).to_le_bytes());
+            rel.extend((symbol << 32 | 10).to_le_bytes());
+        }
+        let strtab_off = rel_off + rel.len();
+        let shoff = (strtab_off + shstrtab.len() + 7) & !7;
+
+        let mut elf = vec![0u8; 64];
+        elf[..4].copy_from_slice(b"\x7fELF");
+        elf[4] = 2;
+        elf[5] = 1;
+        elf[18..20].copy_from_slice(&247u16.to_le_bytes());
+        elf[40..48].copy_from_slice(&(shoff as u64).to_le_bytes());
+        elf[58..60].copy_from_slice(&64u16.to_le_bytes());
+        elf[60..62].copy_from_slice(&7u16.to_le_bytes());
+        elf[62..64].copy_from_slice(&6u16.to_le_bytes());
+        for (at, bytes) in [
+            (text_off, &text[..]),
+            (rodata_off, &rodata),
+            (dynsym_off, &dynsym),
+            (dynstr_off, dynstr),
+            (rel_off, &rel),
+            (strtab_off, shstrtab),
+        ] {
+            elf.resize(at, 0);
+            elf.extend_from_slice(bytes);
+        }
+        elf.resize(shoff, 0);
+        elf.extend(section(0, 0, 0, 0, 0));
+        elf.extend(section(1, 1, text_off, text.len(), 0));
+        elf.extend(section(7, 1, rodata_off, rodata.len(), 0));
+        elf.extend(section(15, 11, dynsym_off, dynsym.len(), 4));
+        elf.extend(section(23, 3, dynstr_off, dynstr.len(), 0));
+        elf.extend(section(31, 9, rel_off, rel.len(), 0));
+        elf.extend(section(40, 3, strtab_off, shstrtab.len(), 0));
+        elf
+    }
+
+    #[test]
+    fn test_syscall_hashes_match_the_runtime() {
+        assert_eq!(syscall_hash("abort"), 0xb6fc_1a11);
+        assert_eq!(syscall_hash("sol_log_"), 0x2075_59bd);
+        assert_eq!(imports::syscall_name(SOL_INVOKE_SIGNED_C), Some("sol_invoke_signed_c"));
+        assert_eq!(imports::syscall_name(0x1234), None);
+
+        assert_eq!(TOKEN.parse::<Pubkey>().unwrap().to_string(), TOKEN);
+        assert_eq!("Token".parse::<Pubkey>(), Err(LenzError::InvalidAddress("Token".to_string())));
+    }
+
+    #[test]
+    fn test_indexes_static_and_relocated_calls() {
+        let code = [
+            syscall("sol_log_"),
+            insn(0x85, 0, 1, 0, 1), // internal call
+            syscall("sol_invoke_signed_c"),
+            syscall("sol_log_"),
+            insn(0x95, 0, 0, 0, 0),
+        ]
+        .concat();
+        let index = ImportIndex::build(&ScanContext::new(&code).unwrap());
+        assert_eq!(index.calls(syscall_hash("sol_log_")), &[0, 24]);
+        assert_eq!(index.cpi_sites(), &[16]);
+        assert_eq!(index.syscalls().count(), 2);
+        assert!(index.may_invoke());
+
+        let elf = linked_elf();
+        let index = ImportIndex::build(&ScanContext::new(&elf).unwrap());
+        assert_eq!(index.syscalls().collect::<Vec<_>>(), vec![(syscall_hash("sol_invoke_signed_rust"), &[0u32][..])]);
+        assert_eq!(index.cpi_sites(), &[0]);
+        let token = TOKEN.parse().unwrap();
+        assert_eq!(index.references(&token), &[5]);
+        assert_eq!(imports::program_name(&token), Some("spl-token"));
+    }
+
+    #[test]
+    fn test_prefilter_skips_dataflow_without_cpi() {
+        let isolated = key_gate(false);
+        let invoking = key_gate(true);
+        for code in [&isolated, &invoking] {
+            let report = AuditEngine::default().audit(code).unwrap();
+            assert_eq!(report.primary_risk, Some(RiskFlag::HoneypotPattern));
+        }
+
+        let engine = AuditEngine::default().with_cache(ScanCache::new(8)).with_prefilter();
+        let report = engine.audit(&isolated).unwrap();
+        assert!(report.flags.is_empty());
+        assert_eq!(report.tiers_completed, AnalysisTiers::ALL);
+        assert_eq!(engine.audit(&invoking).unwrap().primary_risk, Some(RiskFlag::HoneypotPattern));
+
+        let cache = engine.cache().unwrap();
+        assert!(cache.version().prefilter);
+        let cached = cache.imports(&ProgramHash::of_program(&isolated)).unwrap();
+        assert!(Arc::ptr_eq(&cached, &engine.imports(&isolated).unwrap()));
+    }
+}
@@ -0,0 +1,136 @@
+#[cfg(test)]
+mod tests {
+    use std::time::Duration;
+
+    use lenz_core::corpus::{self, Plant, ProgramSpec};
+    use lenz_core::{AuditEngine, IndexBuilder, RiskFlag, SimilarityIndex};
+
+    fn program() -> Vec<u8> {
+        let mut spec = ProgramSpec::new(11, 64 * 1024);
+        spec.call_density = 0.02;
+        spec.plants = vec![Plant::HardcodedKeyMatch, Plant::HardcodedKeyGate, Plant::MintTo];
+        spec.elf = false;
+        corpus::generate(&spec)
+    }
+
+    /// Changes the immediate of one `mov64 imm` near the middle of `.text`.
+    fn patch(text: &mut [u8]) {
+        let mid = text.len() / 16 * 8;
+        let at = (mid..text.len()).step_by(8).find(|&i| text[i] == 0xb7).unwrap();
+        text[at + 4] ^= 0xff;
+    }
+
+    #[test]
+    fn test_rescan_matches_full_snapshot() {
+        let engine = AuditEngine::default();
+        let v1 = program();
+        let mut v2 = v1.clone();
+        patch(&mut v2);
+
+        let before = engine.snapshot(&v1).unwrap();
+        let (after, stats) = engine.rescan(&before, &v2).unwrap();
+        assert!(stats.functions > 10);
+        assert!(stats.reanalyzed > 0 && stats.reanalyzed < stats.functions / 2);
+        assert_eq!(after, engine.snapshot(&v2).unwrap());
+        assert_eq!(after.report, engine.audit(&v2).unwrap());
+        assert!(after.report.flags.contains(RiskFlag::HoneypotPattern));
+        assert!(after.functions.iter().all(|f| f.flow.is_some()));
+    }
+
+    fn insn(opcode: u8, dst: u8, src: u8, off: i16, imm: i32) -> [u8; 8] {
+        let mut raw = [opcode, (src << 4) | dst, 0, 0, 0, 0, 0, 0];
+        raw[2..4].copy_from_slice(&off.to_le_bytes());
+        raw[4..8].copy_from_slice(&imm.to_le_bytes());
+        raw
+    }
+
+    /// An entry that calls a helper comparing four input words against key
+    /// constants, passing it the input pointer only when `input` is set.
+    fn gate(input: bool) -> Vec<u8> {
+        let mut code = vec![
+            if input { insn(0xbf, 6, 1, 0, 0) } else { insn(0xb7, 1, 0, 0, 0) },
+            insn(0x85, 0, 1, 0, 1), // call helper
+            insn(0x95, 0, 0, 0, 0),
+        ];
+        for c in 0..4 {
+            code.push(insn(0x18, 3, 0, 0, 0x1234_5678 + c));
+            code.push(insn(0x00, 0, 0, 0, 0x7eed_0000 + c));
+            code.push(insn(0x79, 2, 1, c as i16 * 8, 0));
+            let off = (3 + 4 * 4 + 2) - code.len() as i16 - 1;
+            code.push(insn(0x5d, 2, 3, off, 0));
+        }
+        code.extend([insn(0xb7, 0, 0, 0, 0), insn(0x95, 0, 0, 0, 0)]);
+        code.extend([insn(0xb7, 0, 0, 0, 1), insn(0x95, 0, 0, 0, 0)]);
+        code.concat()
+    }
+
+    #[test]
+    fn test_rescan_reanalyzes_callees_whose_inputs_changed() {
+        // The helper is unchanged, but whether it sees the input depends on
+        // its caller.
+        let engine = AuditEngine::default();
+        let (with, without) = (gate(true), gate(false));
+        for (v1, v2) in [(&with, &without), (&without, &with)] {
+            let before = engine.snapshot(v1).unwrap();
+            let (after, stats) = engine.rescan(&before, v2).unwrap();
+            assert_eq!(stats.reanalyzed, 2);
+            assert_eq!(after, engine.snapshot(v2).unwrap());
+            assert_eq!(after.report, engine.audit(v2).unwrap());
+        }
+        assert!(engine.audit(&with).unwrap().flags.contains(RiskFlag::HoneypotPattern));
+        assert!(!engine.audit(&without).unwrap().flags.contains(RiskFlag::HoneypotPattern));
+    }
+
+    #[test]
+    fn test_rescan_ignores_calls_past_the_end() {
+        let engine = AuditEngine::default();
+        let v1 = [insn(0x85, 0, 1, 0, 3), insn(0x95, 0, 0, 0, 0), insn(0xb7, 0, 0, 0, 0), insn(0x95, 0, 0, 0, 0)];
+        let mut v2 = v1;
+        v2[2] = insn(0xb7, 0, 0, 0, 1);
+        let before = engine.snapshot(&v1.concat()).unwrap();
+        let (after, _) = engine.rescan(&before, &v2.concat()).unwrap();
+        assert_eq!(after, engine.snapshot(&v2.concat()).unwrap());
+        assert_eq!(after.report, engine.audit(&v2.concat()).unwrap());
+    }
+
+    #[test]
+    fn test_rescan_honors_families_and_timeout() {
+        let v1 = program();
+        let mut v2 = v1.clone();
+        patch(&mut v2);
+
+        let mut builder = IndexBuilder::new();
+        builder.add_family("drainer", &v1).unwrap();
+        let families = AuditEngine::default().with_families(SimilarityIndex::from_bytes(builder.build()).unwrap());
+        let (after, _) = families.rescan(&families.snapshot(&v1).unwrap(), &v2).unwrap();
+        assert!(after.report.family.is_some());
+        assert_eq!(after.report, families.audit(&v2).unwrap());
+
+        let hurried = AuditEngine::default().with_timeout(Duration::ZERO);
+        let before = AuditEngine::default().snapshot(&v1).unwrap();
+        let (after, _) = hurried.rescan(&before, &v2).unwrap();
+        assert!(!after.report.is_complete());
+        assert_eq!(after.report, hurried.audit(&v2).unwrap());
+        assert!(after.functions.iter().all(|f| f.flow.is_none()));
+    }
+
+    #[test]
+    fn test_unchanged_program_is_not_reanalyzed() {
+        let engine = AuditEngine::default();
+        let v1 = program();
+        let before = engine.snapshot(&v1).unwrap();
+        let (after, stats) = engine.rescan(&before, &v1).unwrap();
+        assert_eq!(stats.reanalyzed, 0);
+        assert_eq!(after, before);
+    }
+
+    #[test]
+    fn test_snapshot_round_trip() {
+        let engine = AuditEngine::default();
+        let snapshot = engine.snapshot(&program()).unwrap();
+        let path = std::env::temp_dir().join(format!("lenz-snapshot-{}.json", std::process::id()));
+        snapshot.save(&path).unwrap();
+        assert_eq!(lenz_core::ProgramSnapshot::load(&path).unwrap(), snapshot);
+        std::fs::remove_file(path).unwrap();
+    }
+}
@@ -0,0 +1,175 @@
+#[cfg(test)]
+mod tests {
+    use std::panic::{self, AssertUnwindSafe};
+    use std::sync::atomic::{AtomicU64, Ordering};
+    use std::sync::{mpsc, Arc};
+    use std::thread;
+    use std::time::Duration;
+
+    use lenz_core::ingest::{ChannelSource, Checkpoint, EventKind, Outcome, ReplayWriter};
+    use lenz_core::{AuditEngine, BatchConfig, DeployEvent, EventSource, IngestConfig, LenzError, ReplayFile};
+
+    /// `mov r0, id; exit`, distinct code per id.
+    fn program(id: i32) -> Vec<u8> {
+        let mut code = vec![0xb7, 0, 0, 0];
+        code.extend_from_slice(&id.to_le_bytes());
+        code.extend_from_slice(&[0x95, 0, 0, 0, 0, 0, 0, 0]);
+        code
+    }
+
+    fn event(slot: u64, code: i32) -> DeployEvent {
+        let kind = if slot % 2 == 0 { EventKind::Deploy } else { EventKind::Upgrade };
+        DeployEvent { program: format!("Prog{}", slot), kind, slot, data: program(code) }
+    }
+
+    fn replay(dir: &std::path::Path, events: &[DeployEvent]) -> std::path::PathBuf {
+        let path = dir.join("events.replay");
+        let mut writer = ReplayWriter::create(&path).unwrap();
+        events.iter().for_each(|e| writer.append(e).unwrap());
+        writer.finish().unwrap();
+        path
+    }
+
+    fn temp_dir(name: &str) -> std::path::PathBuf {
+        let dir = std::env::temp_dir().join(format!("lenz-ingest-{}-{}", name, std::process::id()));
+        let _ = std::fs::remove_dir_all(&dir);
+        std::fs::create_dir_all(&dir).unwrap();
+        dir
+    }
+
+    /// Fails after `limit` events, like a connection dropping mid-stream.
+    struct Interrupted<S> {
+        inner: S,
+        limit: usize,
+    }
+
+    impl<S: EventSource> EventSource for Interrupted<S> {
+        fn next_event(&mut self) -> lenz_core::Result<Option<DeployEvent>> {
+            if self.limit == 0 {
+                return Err(LenzError::RpcError("connection reset".to_string()));
+            }
+            self.limit -= 1;
+            self.inner.next_event()
+        }
+
+        fn position(&self) -> u64 {
+            self.inner.position()
+        }
+
+        fn seek(&mut self, position: u64) -> lenz_core::Result<()> {
+            self.inner.seek(position)
+        }
+    }
+
+    #[test]
+    fn test_replay_round_trip_and_dedupe() {
+        let dir = temp_dir("dedupe");
+        let events: Vec<_> = [1, 2, 1, 3, 2, 4].iter().enumerate().map(|(i, &c)| event(i as u64, c)).collect();
+        let path = replay(&dir, &events);
+
+        let mut source = ReplayFile::open(&path).unwrap();
+        for expected in &events {
+            assert_eq!(source.next_event().unwrap().as_ref(), Some(expected));
+        }
+        assert_eq!(source.next_event().unwrap(), None);
+
+        let config = IngestConfig { batch: BatchConfig::with_workers(2), ..IngestConfig::default() };
+        let mut scanned = Vec::new();
+        let stats = AuditEngine::default()
+            .ingest(ReplayFile::open(&path).unwrap(), &config, |r| {
+                if let Outcome::Scanned(report) = r.outcome {
+                    assert!(report.unwrap().is_safe);
+                    scanned.push(r.event.slot);
+                }
+            })
+            .unwrap();
+        scanned.sort_unstable();
+        assert_eq!(scanned, vec![0, 1, 3, 5]);
+        assert_eq!((stats.events, stats.scanned, stats.duplicates, stats.failed), (6, 4, 2, 0));
+        let _ = std::fs::remove_dir_all(&dir);
+    }
+
+    #[test]
+    fn test_resumes_from_checkpoint_without_rescanning() {
+        let dir = temp_dir("resume");
+        let events: Vec<_> = (0..40).map(|i| event(i, (i % 30) as i32)).collect();
+        let path = replay(&dir, &events);
+        let config = IngestConfig {
+            batch: BatchConfig::with_workers(3),
+            checkpoint: Some(dir.join("checkpoint")),
+            checkpoint_every: 4,
+            ..IngestConfig::default()
+        };
+        let engine = AuditEngine::default();
+
+        let source = Interrupted { inner: ReplayFile::open(&path).unwrap(), limit: 25 };
+        let mut first = Vec::new();
+        let err = engine.ingest(source, &config, |r| first.push(r.event.slot)).unwrap_err();
+        assert_eq!(err, LenzError::RpcError("connection reset".to_string()));
+        assert_eq!(first.len(), 25);
+        let checkpoint = Checkpoint::load(dir.join("checkpoint")).unwrap().unwrap();
+        assert_eq!(checkpoint.seen.len(), 25);
+
+        let mut second = Vec::new();
+        let stats = engine
+            .ingest(ReplayFile::open(&path).unwrap(), &config, |r| {
+                second.push((r.event.slot, matches!(r.outcome, Outcome::Duplicate)));
+            })
+            .unwrap();
+        second.sort_unstable();
+        // Slots 30.. redeploy the code of slots 0.. from the first run.
+        let expected: Vec<_> = (25..40).map(|i| (i, i >= 30)).collect();
+        assert_eq!(second, expected);
+        assert_eq!((stats.scanned, stats.duplicates), (5, 10));
+        let _ = std::fs::remove_dir_all(&dir);
+    }
+
+    #[test]
+    fn test_reading_is_bounded_by_the_queue() {
+        let (tx, rx) = mpsc::channel();
+        let read = Arc::new(AtomicU64::new(0));
+        struct Counting(ChannelSource, Arc<AtomicU64>);
+        impl EventSource for Counting {
+            fn next_event(&mut self) -> lenz_core::Result<Option<DeployEvent>> {
+                let event = self.0.next_event()?;
+                self.1.fetch_add(event.is_some() as u64, Ordering::SeqCst);
+                Ok(event)
+            }
+            fn position(&self) -> u64 {
+                self.0.position()
+            }
+        }
+        // The whole burst is available at once; only the queue limits reads.
+        (0..500).for_each(|i| tx.send(event(i, i as i32)).unwrap());
+        drop(tx);
+
+        let config = IngestConfig { batch: BatchConfig { workers: 2, queue_depth: 4 }, ..IngestConfig::default() };
+        let mut handled = 0;
+        let mut max_lag = 0;
+        let stats = AuditEngine::default()
+            .ingest(Counting(ChannelSource::new(rx), read.clone()), &config, |_| {
+                handled += 1;
+                max_lag = max_lag.max(read.load(Ordering::SeqCst) - handled);
+            })
+            .unwrap();
+        assert_eq!(stats.scanned, 500);
+        // Queued jobs, queued results, one per worker and one in the reader.
+        assert!(max_lag <= 4 + 4 + 2 + 1, "{} events read ahead", max_lag);
+    }
+
+    #[test]
+    fn test_sink_panic_propagates() {
+        let (done_tx, done_rx) = mpsc::channel();
+        thread::spawn(move || {
+            let (tx, rx) = mpsc::channel();
+            (0..200).for_each(|i| tx.send(event(i, i as i32)).unwrap());
+            drop(tx);
+            let config = IngestConfig { batch: BatchConfig { workers: 2, queue_depth: 1 }, ..IngestConfig::default() };
+            let result = panic::catch_unwind(AssertUnwindSafe(|| {
+                AuditEngine::default().ingest(ChannelSource::new(rx), &config, |_| panic!("sink failed"))
+            }));
+            done_tx.send(result.is_err()).unwrap();
+        });
+        assert_eq!(done_rx.recv_timeout(Duration::from_secs(30)), Ok(true));
+    }
+}
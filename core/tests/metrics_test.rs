@@ -0,0 +1,60 @@
+#[cfg(test)]
+mod tests {
+    use lenz_core::metrics::{self, Phase, PhaseStats, Stats, BUCKETS};
+    use lenz_core::AuditEngine;
+
+    fn phase_stats(phase: Phase, samples: &[(usize, u64)]) -> PhaseStats {
+        let mut buckets = vec![0; BUCKETS];
+        for &(bucket, n) in samples {
+            buckets[bucket] += n;
+        }
+        let count = buckets.iter().sum();
+        PhaseStats { phase, count, total_ns: count * 5_000, allocations: 3, buckets }
+    }
+
+    #[test]
+    fn test_quantiles_report_bucket_bounds() {
+        let stats = phase_stats(Phase::Signatures, &[(0, 90), (4, 9), (20, 1)]);
+        assert_eq!(stats.mean_ns(), 5_000);
+        assert_eq!(stats.quantile_ns(0.5), 1 << 10);
+        assert_eq!(stats.quantile_ns(0.95), 1 << 14);
+        assert_eq!(stats.quantile_ns(1.0), 1 << 30);
+        assert_eq!(phase_stats(Phase::Score, &[]).quantile_ns(0.5), 0);
+    }
+
+    #[test]
+    fn test_prometheus_histogram_is_cumulative() {
+        let stats = Stats {
+            scans: 2,
+            bytes: 4096,
+            instructions: 512,
+            phases: vec![phase_stats(Phase::ControlFlow, &[(0, 1), (2, 1)])],
+        };
+        let text = stats.to_prometheus();
+        assert!(text.contains("# TYPE lenz_scans_total counter\nlenz_scans_total 2\n"));
+        assert!(text.contains("lenz_scanned_bytes_total 4096\n"));
+        assert!(text.contains("lenz_phase_allocations_total{phase=\"control_flow\"} 3\n"));
+        assert!(text.contains("lenz_phase_duration_seconds_bucket{phase=\"control_flow\",le=\"0.000001024\"} 1\n"));
+        assert!(text.contains("lenz_phase_duration_seconds_bucket{phase=\"control_flow\",le=\"0.000004096\"} 2\n"));
+        assert!(text.contains("lenz_phase_duration_seconds_bucket{phase=\"control_flow\",le=\"+Inf\"} 2\n"));
+        assert!(text.contains("lenz_phase_duration_seconds_count{phase=\"control_flow\"} 2\n"));
+        let buckets = text.lines().filter(|l| l.starts_with("lenz_phase_duration_seconds_bucket")).count();
+        assert_eq!(buckets, BUCKETS);
+    }
+
+    #[test]
+    fn test_scans_record_phases_when_enabled() {
+        let code = [[0xb7, 0, 0, 0, 0, 0, 0, 0], [0x95, 0, 0, 0, 0, 0, 0, 0]].concat();
+        AuditEngine::default().audit(&code).unwrap();
+        let stats = metrics::snapshot();
+        if !metrics::ENABLED {
+            assert_eq!(stats, Stats::default());
+            return;
+        }
+        // Other tests scan concurrently, so only lower bounds hold.
+        assert!(stats.scans >= 1 && stats.instructions >= 2);
+        for phase in [Phase::Decode, Phase::Cfg, Phase::Signatures, Phase::ControlFlow, Phase::Dataflow, Phase::Score] {
+            assert!(stats.phase(phase).unwrap().count >= 1, "{:?}", phase);
+        }
+    }
+}
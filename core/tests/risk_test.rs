@@ -0,0 +1,47 @@
+#[cfg(test)]
+mod tests {
+    use lenz_core::risk::Evidence;
+    use lenz_core::{AnalysisTier, AnalysisTiers, RiskFlag, RiskFlags, RiskReport};
+
+    #[test]
+    fn test_json_shape_is_preserved() {
+        let mut flags = RiskFlags::default();
+        flags.insert(RiskFlag::HiddenMint);
+        flags.insert(RiskFlag::HoneypotPattern);
+        let report = RiskReport {
+            risk_score: 95,
+            is_safe: false,
+            primary_risk: Some(RiskFlag::HoneypotPattern),
+            flags,
+            evidence: vec![],
+            tiers_completed: AnalysisTiers::default(),
+            family: None,
+        };
+
+        let json = serde_json::to_string(&report).unwrap();
+        assert_eq!(
+            json,
+            r#"{"risk_score":95,"is_safe":false,"primary_risk":"Honeypot Pattern","flags":["Honeypot Pattern","Hidden Mint Logic"]}"#
+        );
+        assert_eq!(serde_json::from_str::<RiskReport>(&json).unwrap(), report);
+
+        let clean = serde_json::to_string(&RiskReport::default()).unwrap();
+        assert_eq!(clean, r#"{"risk_score":0,"is_safe":true,"primary_risk":"None","flags":[]}"#);
+    }
+
+    #[test]
+    fn test_evidence_round_trip_and_unknown_flags() {
+        let json = r#"{"risk_score":40,"is_safe":true,"primary_risk":"Blacklist Check",
+            "flags":["Blacklist Check","Some Future Flag"],
+            "evidence":[{"flag":"Blacklist Check","offset":128}],
+            "tiers_completed":["signatures","some_future_tier","dataflow"]}"#;
+        let report: RiskReport = serde_json::from_str(json).unwrap();
+        assert_eq!(report.flags.len(), 1);
+        assert_eq!(report.evidence, vec![Evidence { flag: RiskFlag::BlacklistCheck, offset: 128 }]);
+        assert_eq!(report.primary_risk_description(), "Blacklist Check");
+
+        let tiers = [AnalysisTier::Signatures, AnalysisTier::Dataflow].into_iter().collect::<AnalysisTiers>();
+        assert_eq!(report.tiers_completed, tiers);
+        assert!(serde_json::to_string(&report).unwrap().ends_with(r#""tiers_completed":["signatures","dataflow"]}"#));
+    }
+}
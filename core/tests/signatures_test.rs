@@ -0,0 +1,51 @@
+#[cfg(test)]
+mod tests {
+    use lenz_core::disassembler::Disassembler;
+    use lenz_core::signatures::SignatureDatabase;
+    use lenz_core::{AuditEngine, LenzError, RiskFlag};
+
+    const DB: &str = r#"{
+        "version": 7,
+        "signatures": [
+            { "id": "a", "category": "suspicious", "bytes": "b7 01 ?? ?? 2a" },
+            { "id": "b", "category": "hidden_mint", "bytes": "00 2a", "weight": 5 },
+            { "id": "c", "category": "honeypot", "opcodes": "b7 ?? 95" }
+        ]
+    }"#;
+
+    const CODE: [u8; 24] = [
+        0xb7, 0x01, 0x00, 0x00, 0x2a, 0x00, 0x00, 0x00, // mov64 r1, 42
+        0x07, 0x01, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, // add64 r1, 1
+        0x95, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, // exit
+    ];
+
+    #[test]
+    fn test_single_pass_matches() {
+        let db = SignatureDatabase::from_json(DB).unwrap();
+        assert_eq!(db.version, 7);
+        let insns = Disassembler::parse(&CODE).unwrap();
+        let mut found: Vec<(String, usize)> = db
+            .scan(&CODE, &insns)
+            .into_iter()
+            .map(|m| (db.signatures()[m.signature as usize].id.clone(), m.offset))
+            .collect();
+        found.sort();
+        assert_eq!(found, vec![("a".into(), 0), ("b".into(), 3), ("c".into(), 0)]);
+    }
+
+    #[test]
+    fn test_rejects_wildcard_only_pattern() {
+        let json = r#"{"version":1,"signatures":[{"id":"x","category":"honeypot","bytes":"?? ??"}]}"#;
+        assert!(matches!(SignatureDatabase::from_json(json), Err(LenzError::InvalidSignature(_))));
+    }
+
+    #[test]
+    fn test_engine_reports_signature_findings() {
+        let engine = AuditEngine::new(SignatureDatabase::from_json(DB).unwrap());
+        let report = engine.audit(&CODE).unwrap();
+        assert_eq!(report.primary_risk, Some(RiskFlag::HoneypotPattern));
+        assert_eq!(report.risk_score, 10 + 15 + 5 + 45);
+        assert!(!report.is_safe);
+        assert!(!SignatureDatabase::builtin().is_empty());
+    }
+}
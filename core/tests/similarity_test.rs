@@ -0,0 +1,95 @@
+#[cfg(test)]
+mod tests {
+    use std::time::Duration;
+
+    use lenz_core::context::ScanContext;
+    use lenz_core::corpus::{self, Plant, ProgramSpec};
+    use lenz_core::{AnalysisTier, AnalysisTiers, AuditEngine, Deadline, IndexBuilder, RiskFlag, SimilarityIndex};
+
+    fn program(seed: u64) -> Vec<u8> {
+        let mut spec = ProgramSpec::new(seed, 64 * 1024);
+        spec.call_density = 0.02;
+        spec.plants = vec![Plant::HardcodedKeyGate];
+        spec.elf = false;
+        corpus::generate(&spec)
+    }
+
+    /// Same code with every `mov` immediate and 64-bit constant replaced.
+    fn reskin(code: &[u8]) -> Vec<u8> {
+        let mut out = code.to_vec();
+        let mut at = 0;
+        while at < out.len() {
+            match out[at] {
+                0xb7 => out[at + 4] ^= 0x5a,
+                0x18 => {
+                    out[at + 4] ^= 0xa5;
+                    out[at + 12] ^= 0x3c;
+                    at += 8;
+                }
+                _ => {}
+            }
+            at += 8;
+        }
+        out
+    }
+
+    fn index() -> SimilarityIndex {
+        let mut builder = IndexBuilder::new();
+        builder.add_family("drainer", &program(21)).unwrap();
+        SimilarityIndex::from_bytes(builder.build()).unwrap()
+    }
+
+    #[test]
+    fn test_reskinned_clone_matches_family() {
+        let index = index();
+        assert_eq!(index.families(), ["drainer"]);
+
+        let clone = reskin(&program(21));
+        assert_ne!(clone, program(21));
+        let found = index.nearest_program(&clone).unwrap().unwrap();
+        assert_eq!(found.family, "drainer");
+        assert!(found.similarity >= 95, "similarity {}", found.similarity);
+
+        let unrelated = index.nearest_program(&program(22)).unwrap();
+        assert!(unrelated.map_or(true, |m| m.similarity < index.threshold()));
+    }
+
+    #[test]
+    fn test_engine_short_circuits_on_known_family() {
+        let engine = AuditEngine::default().with_families(index());
+        assert_ne!(engine.cache_version().families, 0);
+
+        let report = engine.audit(&reskin(&program(21))).unwrap();
+        assert_eq!(report.primary_risk, Some(RiskFlag::KnownMaliciousFamily));
+        assert_eq!(report.risk_score, 100);
+        assert_eq!(report.family.as_ref().unwrap().family, "drainer");
+        assert!(report.is_complete());
+
+        let report = engine.audit(&program(22)).unwrap();
+        assert_eq!(report.family, None);
+        assert!(!report.flags.contains(RiskFlag::KnownMaliciousFamily));
+    }
+
+    #[test]
+    fn test_family_matching_honors_the_deadline() {
+        let clone = reskin(&program(21));
+        let ctx = ScanContext::new(&clone).unwrap();
+        assert_eq!(index().nearest_within(&ctx, &Deadline::after(Duration::ZERO)), None);
+
+        let engine = AuditEngine::default().with_families(index()).with_timeout(Duration::ZERO);
+        let report = engine.audit(&clone).unwrap();
+        assert_eq!(report.family, None);
+        assert_eq!(report.tiers_completed, AnalysisTiers::from(AnalysisTier::Signatures));
+        assert!(!report.is_complete());
+    }
+
+    #[test]
+    fn test_rejects_malformed_index() {
+        let mut builder = IndexBuilder::new();
+        builder.add_family("drainer", &program(21)).unwrap();
+        let mut bytes = builder.build();
+        bytes.pop();
+        assert!(SimilarityIndex::from_bytes(bytes).is_err());
+        assert!(SimilarityIndex::from_bytes(b"LNZFAM".to_vec()).is_err());
+    }
+}
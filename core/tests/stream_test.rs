@@ -0,0 +1,109 @@
+#[cfg(test)]
+mod tests {
+    use std::io::Cursor;
+
+    use lenz_core::corpus::{self, Plant, ProgramSpec};
+    use lenz_core::disassembler::Disassembler;
+    use lenz_core::signatures::{SignatureMatch, SignatureStream};
+    use lenz_core::{AnalysisTier, AnalysisTiers, AuditEngine, LenzError, RiskFlag, SignatureDatabase, StreamConfig};
+
+    fn planted(seed: u64, size: usize, elf: bool) -> Vec<u8> {
+        let mut spec = ProgramSpec::new(seed, size);
+        spec.plants = vec![Plant::MintTo, Plant::HardcodedKeyGate, Plant::MintTo];
+        spec.elf = elf;
+        corpus::generate(&spec)
+    }
+
+    #[test]
+    fn test_stream_matches_first_signature_hits() {
+        let db = SignatureDatabase::builtin();
+        let text = planted(7, 24 * 1024, false);
+        let insns = Disassembler::parse(&text).unwrap();
+        let mut expected = Vec::new();
+        for m in db.scan(&text, &insns) {
+            if !expected.iter().any(|e: &SignatureMatch| e.signature == m.signature) {
+                expected.push(m);
+            }
+        }
+        assert_eq!(expected.len(), 2);
+
+        // Pieces of every size up to a few instructions cut every pattern.
+        for piece in 1..=20 {
+            let mut stream = SignatureStream::new(&db);
+            text.chunks(piece).for_each(|c| stream.feed_text(c));
+            insns.iter().for_each(|i| stream.feed_instruction(i));
+            assert_eq!(stream.finish(), expected, "piece {}", piece);
+        }
+    }
+
+    #[test]
+    fn test_chunked_scan_matches_audit() {
+        let engine = AuditEngine::default();
+        for (seed, elf) in [(1, true), (2, false), (3, true)] {
+            let program = planted(seed, 64 * 1024 + seed as usize * 8, elf);
+            let expected = engine.audit(&program).unwrap();
+            for chunk_size in [4099, 10_000] {
+                let config = StreamConfig { chunk_size, budget: 64 << 20 };
+                assert_eq!(engine.scan_reader(Cursor::new(&program), &config).unwrap(), expected);
+            }
+        }
+
+        let mut account = vec![0u8; lenz_core::elf::PROGRAMDATA_HEADER_LEN];
+        account[0] = 3;
+        account.extend(planted(4, 8 * 1024, true));
+        let config = StreamConfig::with_budget(16 << 20);
+        assert_eq!(engine.scan_reader(Cursor::new(&account), &config).unwrap(), engine.audit(&account).unwrap());
+    }
+
+    #[test]
+    fn test_over_budget_scans_degrade_to_signatures() {
+        let program = planted(5, 256 * 1024, true);
+        let full = AuditEngine::default().audit(&program).unwrap();
+
+        let engine = AuditEngine::default().with_memory_budget(64 * 1024);
+        let report = engine.audit(&program).unwrap();
+        assert_eq!(report.tiers_completed, AnalysisTiers::from(AnalysisTier::Signatures));
+        assert!(!report.is_safe && !report.is_complete());
+        assert!(report.flags.contains(RiskFlag::HiddenMint) && report.flags.contains(RiskFlag::HoneypotPattern));
+        assert_eq!(report.evidence, full.evidence);
+
+        // Programs that fit take the regular path.
+        let small = planted(6, 4096, true);
+        assert_eq!(engine.audit(&small).unwrap(), AuditEngine::default().audit(&small).unwrap());
+    }
+
+    #[test]
+    fn test_chunked_scan_errors_match_audit() {
+        let engine = AuditEngine::default();
+        let config = StreamConfig { chunk_size: 4096, budget: 1 << 20 };
+        let mut text = planted(8, 4096, false);
+        // `lddw` cut short by the end of the program.
+        text.extend_from_slice(&[0x18, 0, 0, 0, 0, 0, 0, 0]);
+        let err = engine.scan_reader(Cursor::new(&text), &config).unwrap_err();
+        assert_eq!(err, engine.audit(&text).unwrap_err());
+        assert_eq!(err, LenzError::ParseError(4096));
+
+        text.truncate(4096);
+        text[4000] = 0xff;
+        assert_eq!(engine.scan_reader(Cursor::new(&text), &config), Err(LenzError::ParseError(4000)));
+        assert_eq!(engine.scan_reader(Cursor::new(&[]), &config), Err(LenzError::EmptyBytecode));
+    }
+
+    #[test]
+    fn test_overflowing_elf_offsets_are_invalid() {
+        let engine = AuditEngine::default();
+        let config = StreamConfig::with_budget(1 << 20);
+        let elf = planted(9, 4096, true);
+        let shoff = u64::from_le_bytes(elf[40..48].try_into().unwrap()) as usize;
+        let shstrndx = u16::from_le_bytes(elf[62..64].try_into().unwrap()) as usize;
+        // The section header offset, then the offsets of `.text` (section
+        // 1) and of the section name table.
+        for at in [40, shoff + 64 + 24, shoff + shstrndx * 64 + 24] {
+            let mut bad = elf.clone();
+            bad[at..at + 8].copy_from_slice(&(u64::MAX - 8).to_le_bytes());
+            let err = engine.scan_reader(Cursor::new(&bad), &config).unwrap_err();
+            assert!(matches!(err, LenzError::InvalidElf(_)));
+            assert_eq!(err, engine.audit(&bad).unwrap_err());
+        }
+    }
+}
@@ -0,0 +1,36 @@
+#[cfg(all(test, feature = "wasm"))]
+mod tests {
+    use lenz_core::wasm::{lenz_alloc, lenz_engine_version, lenz_free, lenz_scan};
+    use lenz_core::{corpus, AuditEngine, LenzError, ENGINE_VERSION};
+    use serde_json::{json, Value};
+
+    /// Drives the exports the way the SDK does: copy in, scan, read the
+    /// length-prefixed result, free both buffers.
+    fn scan(bytecode: &[u8]) -> Value {
+        unsafe {
+            let input = lenz_alloc(bytecode.len());
+            std::ptr::copy_nonoverlapping(bytecode.as_ptr(), input, bytecode.len());
+            let out = lenz_scan(input, bytecode.len());
+            lenz_free(input, bytecode.len());
+
+            let len = u32::from_le_bytes(std::slice::from_raw_parts(out, 4).try_into().unwrap()) as usize;
+            let result = serde_json::from_slice(std::slice::from_raw_parts(out.add(4), len)).unwrap();
+            lenz_free(out, 4 + len);
+            result
+        }
+    }
+
+    #[test]
+    fn test_scan_matches_native_report() {
+        let program = corpus::generate(&corpus::ProgramSpec::new(7, 16 * 1024));
+        let report = AuditEngine::default().audit(&program).unwrap();
+        assert_eq!(scan(&program), json!({ "report": report }));
+        assert_eq!(lenz_engine_version(), ENGINE_VERSION);
+    }
+
+    #[test]
+    fn test_scan_reports_errors() {
+        assert_eq!(scan(&[]), json!({ "error": LenzError::EmptyBytecode.to_string() }));
+        assert_eq!(scan(&[0xff; 8]), json!({ "error": LenzError::ParseError(0).to_string() }));
+    }
+}
@@ -0,0 +1,58 @@
+#[cfg(test)]
+mod tests {
+    use lenz_core::corpus::{self, ProgramSpec};
+    use lenz_core::risk::Evidence;
+    use lenz_core::{wire, AnalysisTier, AuditEngine, FamilyMatch, RiskFlag, RiskFlags, RiskReport};
+
+    fn reports() -> Vec<RiskReport> {
+        let engine = AuditEngine::default();
+        let mut reports: Vec<_> = (0..16)
+            .map(|seed| engine.audit(&corpus::generate(&ProgramSpec::new(seed, 16 * 1024))).unwrap())
+            .collect();
+        reports.push(RiskReport {
+            risk_score: 100,
+            is_safe: false,
+            primary_risk: Some(RiskFlag::KnownMaliciousFamily),
+            flags: [RiskFlag::KnownMaliciousFamily].into_iter().collect(),
+            evidence: vec![Evidence { flag: RiskFlag::HiddenMint, offset: u32::MAX }],
+            tiers_completed: AnalysisTier::Signatures.into(),
+            family: Some(FamilyMatch { family: "drainer-v2".to_string(), similarity: 93 }),
+        });
+        reports.push(RiskReport::default());
+        reports
+    }
+
+    #[test]
+    fn test_round_trips_reports_and_errors() {
+        let reports = reports();
+        let results: Vec<Result<&RiskReport, &str>> =
+            reports.iter().map(Ok).chain([Err("Bytecode is empty")]).collect();
+        let decoded = wire::decode(&wire::encode(results.iter().copied())).unwrap();
+
+        assert_eq!(decoded.len(), results.len());
+        for (got, want) in decoded.iter().zip(&results) {
+            assert_eq!(got.as_ref().map_err(String::as_str), want.map(|r| r));
+        }
+    }
+
+    #[test]
+    fn test_is_smaller_than_json() {
+        let reports = reports();
+        let binary = wire::encode(reports.iter().map(Ok));
+        let json = serde_json::to_vec(&reports).unwrap();
+        assert!(binary.len() * 3 < json.len(), "{} vs {} bytes", binary.len(), json.len());
+    }
+
+    #[test]
+    fn test_ignores_unknown_flags_and_rejects_corruption() {
+        let report = RiskReport { flags: RiskFlags(1 << 40 | 1), ..RiskReport::default() };
+        let encoded = wire::encode([Ok(&report)]);
+        assert_eq!(wire::decode(&encoded).unwrap()[0].as_ref().unwrap().flags, report.flags);
+
+        assert!(wire::decode(&encoded[..encoded.len() - 1]).is_err());
+        let mut future = encoded.clone();
+        future[4] = wire::WIRE_VERSION + 1;
+        assert!(wire::decode(&future).is_err());
+        assert!(wire::decode(b"LNZW").is_err());
+    }
+}
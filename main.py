@@ -1,5 +1,10 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
 import random
+import struct
 import subprocess
 import time
 from datetime import datetime, timedelta
@@ -568,6 +573,158 @@ FILLER_LOGS = [
     "chore: clean up build artifacts"
 ]
 
+# ==============================================================================
+# [5. SYNTHETIC PROGRAM CORPUS]
+# ==============================================================================
+# Mirrors `core/src/corpus.rs`: seeded SBF programs with planted patterns
+# whose expected findings are known up front.
+
+INSN_SIZE = 8
+BRANCH_OPCODES = [0x15, 0x55, 0x25, 0xa5, 0x05]
+FAR_JUMP = 32000
+
+# Plant kind -> RiskFlag description the engine is expected to report.
+PLANTS = {
+    "key_gate": "Honeypot Pattern",
+    "blacklist": "Blacklist Check",
+    "hidden_mint": "Hidden Mint Logic",
+}
+
+def sbf_insn(opcode, dst=0, src=0, off=0, imm=0):
+    return struct.pack("<BBhi", opcode, (src << 4) | (dst & 0x0f), off, imm)
+
+def plant_code(kind, rng):
+    if kind == "hidden_mint":
+        # Serialization of a Token `MintTo` instruction tag.
+        return [sbf_insn(0x72, 10, 0, -16, 7), sbf_insn(0x7b, 10, 6, -15)]
+
+    # Signer compared against a hardcoded key, 8 bytes at a time.
+    branch = 0x5d if kind == "key_gate" else 0x1d
+    out = []
+    for chunk in range(4):
+        key = rng.getrandbits(64)
+        out.append(sbf_insn(0x79, 2, 1, chunk * 8))
+        out.append(sbf_insn(0x18, 3, 0, 0, struct.unpack("<i", struct.pack("<I", key & 0xffffffff))[0]))
+        out.append(sbf_insn(0x00, 0, 0, 0, struct.unpack("<i", struct.pack("<I", key >> 32))[0]))
+        out.append(sbf_insn(branch, 2, 3, 13 - chunk * 4))
+    out += [sbf_insn(0x05, off=2), sbf_insn(0xb7, 0, 0, 0, 1), sbf_insn(0x95)]
+    return out
+
+def generate_program(seed, size, branch_density, call_density, plants):
+    """Returns (.text bytes, [(plant kind, .text offset)])."""
+    rng = random.Random(seed)
+    slots = max(size // INSN_SIZE, 2)
+    code, patch, planted = [], [], []
+    # Plants are spread evenly through the program.
+    at = [(k + 1) * slots // (len(plants) + 1) for k in range(len(plants))]
+
+    while len(code) + 1 < slots:
+        if len(planted) < len(plants) and len(code) >= at[len(planted)]:
+            kind = plants[len(planted)]
+            planted.append((kind, len(code) * INSN_SIZE))
+            code += plant_code(kind, rng)
+            continue
+
+        dst, src = rng.randrange(10), rng.randrange(10)
+        if rng.random() < branch_density:
+            patch.append(len(code))
+            code.append(sbf_insn(rng.choice(BRANCH_OPCODES), dst, src, 0, rng.randrange(64)))
+        elif rng.random() < call_density:
+            patch.append(len(code))
+            code.append(sbf_insn(0x85, 0, 1))
+        elif rng.random() < 0.05 and len(code) + 2 < slots:
+            code.append(sbf_insn(0x18, dst, 0, 0, rng.randrange(-2**31, 2**31)))
+            code.append(sbf_insn(0x00, 0, 0, 0, rng.randrange(-2**31, 2**31)))
+        else:
+            code.append(rng.choice([
+                lambda: sbf_insn(0x79, dst, src, rng.randrange(32) * 8),
+                lambda: sbf_insn(0x7b, 10, src, -(rng.randrange(32) + 1) * 8),
+                lambda: sbf_insn(0xbf, dst, src),
+                lambda: sbf_insn(0xb7, dst, 0, 0, rng.randrange(1 << 16)),
+                lambda: sbf_insn(0x0f, dst, src),
+                lambda: sbf_insn(0x57, dst, 0, 0, rng.randrange(256)),
+            ])())
+    code.append(sbf_insn(0x95))
+
+    # Mostly short forward jumps, sometimes anywhere within `off` range.
+    # Opcode 0x00 only ever appears as the second slot of an `lddw`.
+    for pc in patch:
+        if rng.random() < 0.8:
+            target = pc + 1 + rng.randrange(32)
+        else:
+            target = pc - FAR_JUMP + rng.randrange(2 * FAR_JUMP)
+        target = min(max(target, 0), len(code) - 1)
+        while code[target][0] == 0x00:
+            target += 1
+        rel = target - pc - 1
+        insn = bytearray(code[pc])
+        if insn[0] == 0x85:
+            insn[4:8] = struct.pack("<i", rel)
+        else:
+            insn[2:4] = struct.pack("<h", rel)
+        code[pc] = bytes(insn)
+
+    return b"".join(code), planted
+
+def wrap_elf(text, rodata=b""):
+    """Wraps `.text` and `.rodata` into a minimal SBF ELF shared object."""
+    shstrtab = b"\0.text\0.rodata\0.shstrtab\0"
+    text_off = 64
+    rodata_off = text_off + len(text)
+    strtab_off = rodata_off + len(rodata)
+    shoff = (strtab_off + len(shstrtab) + 7) & ~7
+
+    header = b"\x7fELF" + bytes([2, 1, 1]) + bytes(9)
+    header += struct.pack("<HHIQQQIHHHHHH", 3, 247, 1, text_off, 0, shoff, 0, 64, 0, 0, 64, 4, 3)
+    body = (header + text + rodata + shstrtab).ljust(shoff, b"\0")
+
+    def section(name, kind, flags, offset, size):
+        return struct.pack("<IIQQQQIIQQ", name, kind, flags, offset, offset, size, 0, 0, 0, 0)
+
+    return body + section(0, 0, 0, 0, 0) + section(1, 1, 0x6, text_off, len(text)) \
+        + section(7, 1, 0x2, rodata_off, len(rodata)) + section(15, 3, 0, strtab_off, len(shstrtab))
+
+def corpus_spec(seed, index, args):
+    """Derives one program's parameters from the corpus seed and its index."""
+    rng = random.Random(f"{seed}:{index}")
+    plants = [kind for kind in args.plants if rng.random() < args.plant_rate]
+    return {
+        "file": f"prog-{index:06d}.so",
+        "seed": rng.getrandbits(64),
+        "size": rng.randrange(args.min_size, args.max_size + 1) & ~(INSN_SIZE - 1),
+        "branch_density": args.branch_density,
+        "call_density": args.call_density,
+        "plants": plants,
+    }
+
+def write_corpus_program(job):
+    out_dir, spec = job
+    text, planted = generate_program(spec["seed"], spec["size"], spec["branch_density"], spec["call_density"], spec["plants"])
+    data = wrap_elf(text)
+    with open(os.path.join(out_dir, spec["file"]), "wb") as f:
+        f.write(data)
+    return dict(
+        spec,
+        bytes=len(data),
+        sha256=hashlib.sha256(data).hexdigest(),
+        expected=[{"flag": PLANTS[kind], "offset": offset} for kind, offset in planted],
+    )
+
+def generate_corpus(args):
+    os.makedirs(args.out, exist_ok=True)
+    jobs = [(args.out, corpus_spec(args.seed, i, args)) for i in range(args.count)]
+    with multiprocessing.Pool(args.workers) as pool:
+        programs = list(pool.imap(write_corpus_program, jobs, chunksize=16))
+
+    manifest = {
+        "seed": args.seed,
+        "count": args.count,
+        "programs": programs,
+    }
+    create_file(os.path.join(args.out, "manifest.json"), json.dumps(manifest, indent=2) + "\n")
+    planted = sum(len(p["expected"]) for p in programs)
+    print(f"[*] CORPUS: {len(programs)} programs, {planted} planted patterns -> {args.out}")
+
 def run_git(args, env=None):
     subprocess.run(args, cwd=REPO_DIR, env=env, check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
@@ -578,63 +735,165 @@ def create_file(path, content):
     with open(full_path, "w", encoding='utf-8') as f:
         f.write(content)
 
-if __name__ == "__main__":
-    print(f"[*] INITIALIZING {PROJECT_NAME.upper()} PROTOCOL (RUST CORE + TS SDK)...")
-    print(f"[*] USER: {USER_NAME} <{USER_EMAIL}>")
-    print(f"[*] PROGRAM ID: {PROGRAM_ID}")
-    print(f"[*] DATE RANGE: {START_DATE.strftime('%Y-%m-%d')} ~ {END_DATE.strftime('%Y-%m-%d')}")
-    
-    # 1. Init
-    if not os.path.exists(REPO_DIR): os.makedirs(REPO_DIR)
-    if not os.path.exists(os.path.join(REPO_DIR, ".git")):
-        run_git(["git", "init"])
-        run_git(["git", "config", "user.name", USER_NAME])
-        run_git(["git", "config", "user.email", USER_EMAIL])
-        run_git(["git", "checkout", "-b", "main"])
+def git_output(args):
+    res = subprocess.run(args, cwd=REPO_DIR, check=False, capture_output=True, text=True)
+    return res.stdout.strip() if res.returncode == 0 else None
 
-    # 2. Timeline Mapping (Uniform Distribution)
+def build_timestamps():
+    # Timeline Mapping (Uniform Distribution)
     total_seconds = (END_DATE - START_DATE).total_seconds()
     step = total_seconds / TARGET_COMMITS
     timestamps = []
-    
+
     for i in range(TARGET_COMMITS):
         base_time = START_DATE + timedelta(seconds=i*step)
         jitter = random.uniform(-0.2 * step, 0.2 * step)
         final_time = base_time + timedelta(seconds=jitter)
-        
+
         # Working Hours Logic (09:00 ~ 22:00)
         if final_time.hour < 9:
             final_time = final_time.replace(hour=9, minute=random.randint(0,59))
         elif final_time.hour > 22:
              final_time = final_time.replace(hour=22, minute=random.randint(0,59))
-             
+
         timestamps.append(final_time)
     timestamps.sort()
+    return timestamps
 
-    # 3. Execution Loop
+def build_history(timestamps):
+    """Plans every commit in memory as (message, datetime, {path: content})."""
+    history = []
+    readme = None
     task_idx = 0
-    for i, ts_dt in enumerate(timestamps):
-        ts = ts_dt.strftime('%Y-%m-%d %H:%M:%S')
-        # Use explicit date flag for reliability
-        env = os.environ.copy()
-        env["GIT_AUTHOR_DATE"] = ts
-        env["GIT_COMMITTER_DATE"] = ts
-        
+    for ts_dt in timestamps:
         # Logic: Tasks first, then Fillers
         if task_idx < len(TASKS):
             msg, files = TASKS[task_idx]
-            for f_path, f_content in files:
-                create_file(f_path, f_content)
+            changes = dict(files)
             task_idx += 1
         else:
             msg = random.choice(FILLER_LOGS)
-            with open(os.path.join(REPO_DIR, "README.md"), "a", encoding='utf-8') as f:
-                f.write(f"\n")
+            if readme is None:
+                readme_path = os.path.join(REPO_DIR, "README.md")
+                readme = open(readme_path, encoding='utf-8').read() if os.path.exists(readme_path) else ""
+            changes = {"README.md": readme + "\n"}
+        readme = changes.get("README.md", readme)
+        history.append((msg, ts_dt, changes))
+    return history
+
+def git_date(dt):
+    # Naive timestamps are local time, as with GIT_AUTHOR_DATE.
+    epoch = int(time.mktime(dt.timetuple()))
+    return f"{epoch} {time.strftime('%z', time.localtime(epoch))}"
+
+class FastImportWriter:
+    """Serializes commits as a `git fast-import` stream, writing each distinct blob once."""
+
+    def __init__(self, out):
+        self.out = out
+        self.blobs = {}
+        self.next_mark = 1
+
+    def _mark(self):
+        mark = self.next_mark
+        self.next_mark += 1
+        return mark
+
+    def blob(self, content):
+        data = content.encode('utf-8')
+        key = hashlib.sha1(data).digest()
+        mark = self.blobs.get(key)
+        if mark is None:
+            mark = self.blobs[key] = self._mark()
+            self.out.write(b"blob\nmark :%d\ndata %d\n%s\n" % (mark, len(data), data))
+        return mark
+
+    def commit(self, ref, msg, when, changes, parent=None):
+        files = [(path, self.blob(content)) for path, content in changes.items()]
+        ident = f"{USER_NAME} <{USER_EMAIL}> {git_date(when)}"
+        msg_data = msg.encode('utf-8')
+        out = [f"commit {ref}", f"mark :{self._mark()}", f"author {ident}", f"committer {ident}"]
+        self.out.write(("\n".join(out) + "\n").encode('utf-8'))
+        self.out.write(b"data %d\n%s\n" % (len(msg_data), msg_data))
+        if parent:
+            self.out.write(f"from {parent}\n".encode('utf-8'))
+        for path, mark in files:
+            self.out.write(f"M 100644 :{mark} {path}\n".encode('utf-8'))
+        self.out.write(b"\n")
+
+def write_history(history):
+    """Streams the planned history into a single `git fast-import` process."""
+    ref = git_output(["git", "symbolic-ref", "HEAD"]) or "refs/heads/main"
+    # An existing branch must be named explicitly or the import starts a new root.
+    parent = f"{ref}^0" if git_output(["git", "rev-parse", "--verify", "-q", ref]) else None
+    # Only the generated paths are checked out afterwards; refuse to overwrite
+    # uncommitted edits to any of them.
+    paths = sorted({path for _, _, changes in history for path in changes})
+    dirty = git_output(["git", "status", "--porcelain", "--untracked-files=no", "--", *paths])
+    if dirty:
+        raise SystemExit(f"[!] uncommitted changes to generated files, commit or stash them first:\n{dirty}")
+
+    proc = subprocess.Popen(["git", "fast-import", "--quiet", "--date-format=raw"], cwd=REPO_DIR, stdin=subprocess.PIPE)
+    writer = FastImportWriter(proc.stdin)
+    for i, (msg, ts_dt, changes) in enumerate(history):
+        writer.commit(ref, msg, ts_dt, changes, parent if i == 0 else None)
+        print(f"[{i+1}/{len(history)}] {ts_dt.strftime('%Y-%m-%d %H:%M:%S')} - {msg}")
+    proc.stdin.close()
+    if proc.wait() != 0:
+        raise SystemExit("[!] git fast-import failed")
+
+    # fast-import only moves refs; bring the generated files up to date and
+    # leave everything else in the working tree alone.
+    run_git(["git", "checkout", ref, "--", *paths])
+    return len(writer.blobs)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=f"{PROJECT_NAME.upper()} repository and corpus generator")
+    sub = parser.add_subparsers(dest="mode")
+    corpus = sub.add_parser("corpus", help="emit synthetic SBF programs with a manifest of expected findings")
+    corpus.add_argument("--seed", type=int, default=0)
+    corpus.add_argument("--count", type=int, default=1000)
+    corpus.add_argument("--out", default="corpus")
+    corpus.add_argument("--min-size", type=int, default=4 * 1024, help="minimum .text size in bytes")
+    corpus.add_argument("--max-size", type=int, default=256 * 1024, help="maximum .text size in bytes")
+    corpus.add_argument("--branch-density", type=float, default=0.1)
+    corpus.add_argument("--call-density", type=float, default=0.01)
+    corpus.add_argument("--plants", type=lambda s: s.split(","), default=list(PLANTS),
+                        help=f"comma separated plant kinds ({', '.join(PLANTS)})")
+    corpus.add_argument("--plant-rate", type=float, default=0.3, help="probability of each plant per program")
+    corpus.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    if args.mode == "corpus":
+        unknown = set(args.plants) - set(PLANTS)
+        if unknown:
+            parser.error(f"unknown plant kinds: {', '.join(sorted(unknown))}")
+        if args.min_size > args.max_size:
+            parser.error("--min-size exceeds --max-size")
+    return args
 
-        run_git(["git", "add", "."], env=env)
-        # Using explicit --date for maximum robustness against timezone issues
-        run_git(["git", "commit", "-m", msg, "--date", ts], env=env)
-        
-        print(f"[{i+1}/{TARGET_COMMITS}] {ts} - {msg}")
+if __name__ == "__main__":
+    args = parse_args()
+    if args.mode == "corpus":
+        generate_corpus(args)
+        raise SystemExit(0)
+
+    print(f"[*] INITIALIZING {PROJECT_NAME.upper()} PROTOCOL (RUST CORE + TS SDK)...")
+    print(f"[*] USER: {USER_NAME} <{USER_EMAIL}>")
+    print(f"[*] PROGRAM ID: {PROGRAM_ID}")
+    print(f"[*] DATE RANGE: {START_DATE.strftime('%Y-%m-%d')} ~ {END_DATE.strftime('%Y-%m-%d')}")
+    
+    # 1. Init
+    if not os.path.exists(REPO_DIR): os.makedirs(REPO_DIR)
+    if not os.path.exists(os.path.join(REPO_DIR, ".git")):
+        run_git(["git", "init"])
+        run_git(["git", "config", "user.name", USER_NAME])
+        run_git(["git", "config", "user.email", USER_EMAIL])
+        run_git(["git", "checkout", "-b", "main"])
+
+    # 2. Plan the whole history in memory
+    history = build_history(build_timestamps())
+
+    # 3. Stream it to git
+    blobs = write_history(history)
 
-    print(f"\n[*] DONE. {PROJECT_NAME.upper()} Protocol repository generated successfully.")
\ No newline at end of file
+    print(f"\n[*] DONE. {PROJECT_NAME.upper()} Protocol repository generated successfully ({len(history)} commits, {blobs} unique blobs).")
@@ -1,13 +1,130 @@
 use anchor_lang::prelude::*;
 declare_id!("Audit11111111111111111111111111111111111111");
 
+/// Attestations a registry keeps; older ones are overwritten.
+pub const REGISTRY_CAPACITY: usize = 1024;
+/// Most attestations `register_scans` accepts in one instruction.
+pub const MAX_BATCH: usize = 16;
+/// Highest risk score the engine reports (`lenz_core::MAX_RISK_SCORE`).
+pub const MAX_RISK_SCORE: u8 = 100;
+
 #[program]
 pub mod lenz_program {
     use super::*;
-    pub fn register_scan(_ctx: Context<RegisterScan>) -> Result<()> {
+
+    /// Takes ownership of a registry account created in the same
+    /// transaction with `ScanRegistry::SPACE` bytes. It is larger than the
+    /// 10 KiB an `init` constraint may allocate.
+    pub fn initialize_registry(ctx: Context<InitializeRegistry>) -> Result<()> {
+        let mut registry = ctx.accounts.registry.load_init()?;
+        registry.authority = ctx.accounts.authority.key();
+        Ok(())
+    }
+
+    pub fn register_scan(ctx: Context<RegisterScan>, attestation: AttestationInput) -> Result<()> {
+        let slot = Clock::get()?.slot;
+        ctx.accounts.registry.load_mut()?.push(&attestation, slot)
+    }
+
+    /// Records up to `MAX_BATCH` attestations with one account borrow.
+    pub fn register_scans(ctx: Context<RegisterScan>, attestations: Vec<AttestationInput>) -> Result<()> {
+        require!(attestations.len() <= MAX_BATCH, LenzProgramError::BatchTooLarge);
+        let slot = Clock::get()?.slot;
+        let mut registry = ctx.accounts.registry.load_mut()?;
+        for attestation in &attestations {
+            registry.push(attestation, slot)?;
+        }
         Ok(())
     }
 }
 
+/// Scan result as submitted by the registry authority.
+#[derive(AnchorSerialize, AnchorDeserialize, Clone, Copy, Debug)]
+pub struct AttestationInput {
+    /// SHA3-256 of the scanned program code (`lenz_core::ProgramHash`).
+    pub program_hash: [u8; 32],
+    pub score: u8,
+    /// `lenz_core::RiskFlags` bitset.
+    pub flags: u64,
+    pub engine_version: u32,
+}
+
+#[zero_copy]
+#[derive(Default, Debug)]
+pub struct Attestation {
+    pub program_hash: [u8; 32],
+    pub flags: u64,
+    /// Slot the attestation was recorded at.
+    pub slot: u64,
+    pub engine_version: u32,
+    pub score: u8,
+    pub _padding: [u8; 3],
+}
+
+/// Fixed-size ring buffer of attestations. On-chain access maps the account
+/// data in place; off-chain readers fetch single entries with a data slice
+/// at `ScanRegistry::attestation_offset` instead of the whole account.
+#[account(zero_copy)]
+pub struct ScanRegistry {
+    pub authority: Pubkey,
+    /// Attestations ever recorded. Sequence number `n` lives at index
+    /// `n % REGISTRY_CAPACITY` until `n + REGISTRY_CAPACITY` overwrites it.
+    pub head: u64,
+    pub attestations: [Attestation; REGISTRY_CAPACITY],
+}
+
+impl ScanRegistry {
+    /// Account size including the discriminator.
+    pub const SPACE: usize = 8 + std::mem::size_of::<ScanRegistry>();
+
+    /// Byte offset of `head` in the account data.
+    pub const HEAD_OFFSET: usize = 8 + 32;
+
+    /// Byte offset in the account data of the entry holding `sequence`.
+    pub const fn attestation_offset(sequence: u64) -> usize {
+        Self::HEAD_OFFSET + 8 + (sequence % REGISTRY_CAPACITY as u64) as usize * std::mem::size_of::<Attestation>()
+    }
+
+    pub fn push(&mut self, input: &AttestationInput, slot: u64) -> Result<()> {
+        require!(input.score <= MAX_RISK_SCORE, LenzProgramError::InvalidScore);
+        let index = (self.head % REGISTRY_CAPACITY as u64) as usize;
+        self.attestations[index] = Attestation {
+            program_hash: input.program_hash,
+            flags: input.flags,
+            slot,
+            engine_version: input.engine_version,
+            score: input.score,
+            _padding: [0; 3],
+        };
+        self.head += 1;
+        Ok(())
+    }
+
+    /// Attestation with sequence number `sequence`, if not yet overwritten.
+    pub fn get(&self, sequence: u64) -> Option<&Attestation> {
+        (sequence < self.head && self.head - sequence <= REGISTRY_CAPACITY as u64)
+            .then(|| &self.attestations[(sequence % REGISTRY_CAPACITY as u64) as usize])
+    }
+}
+
+#[derive(Accounts)]
+pub struct InitializeRegistry<'info> {
+    #[account(zero)]
+    pub registry: AccountLoader<'info, ScanRegistry>,
+    pub authority: Signer<'info>,
+}
+
 #[derive(Accounts)]
-pub struct RegisterScan {}
\ No newline at end of file
+pub struct RegisterScan<'info> {
+    #[account(mut, has_one = authority)]
+    pub registry: AccountLoader<'info, ScanRegistry>,
+    pub authority: Signer<'info>,
+}
+
+#[error_code]
+pub enum LenzProgramError {
+    #[msg("Risk score exceeds the maximum")]
+    InvalidScore,
+    #[msg("Too many attestations in one instruction")]
+    BatchTooLarge,
+}
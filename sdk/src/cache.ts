@@ -0,0 +1,253 @@
+import { RiskReport } from './types';
+
+/**
+ * A report together with the program state it was computed from.
+ */
+export interface CachedReport {
+    report: RiskReport;
+    /** Hex SHA-256 of the scanned program data */
+    dataHash: string;
+    /** Slot the program was last deployed at, if it is upgradeable */
+    slot: number | null;
+    /** Time the report was computed or last confirmed, in ms */
+    storedAt: number;
+}
+
+/**
+ * Backing storage for `ReportCache`. Implementations own their size bound
+ * and evict least recently used entries when it is reached.
+ */
+export interface CacheStore {
+    get(key: string): Promise<CachedReport | undefined>;
+    set(key: string, value: CachedReport): Promise<void>;
+    delete(key: string): Promise<void>;
+    clear(): Promise<void>;
+}
+
+/**
+ * In-memory LRU store, the default for Node services.
+ */
+export class MemoryCacheStore implements CacheStore {
+    // Map iteration order is insertion order, so the first key is the LRU.
+    private entries = new Map<string, CachedReport>();
+
+    constructor(private readonly maxSize: number = 1000) {}
+
+    public get size(): number {
+        return this.entries.size;
+    }
+
+    public async get(key: string): Promise<CachedReport | undefined> {
+        const value = this.entries.get(key);
+        if (value) {
+            this.entries.delete(key);
+            this.entries.set(key, value);
+        }
+        return value;
+    }
+
+    public async set(key: string, value: CachedReport): Promise<void> {
+        this.entries.delete(key);
+        this.entries.set(key, value);
+        while (this.entries.size > this.maxSize) {
+            const oldest = this.entries.keys().next().value as string;
+            this.entries.delete(oldest);
+        }
+    }
+
+    public async delete(key: string): Promise<void> {
+        this.entries.delete(key);
+    }
+
+    public async clear(): Promise<void> {
+        this.entries.clear();
+    }
+}
+
+interface StoredRecord {
+    key: string;
+    value: CachedReport;
+    accessedAt: number;
+}
+
+function request<T>(req: IDBRequest<T>): Promise<T> {
+    return new Promise((resolve, reject) => {
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => reject(req.error);
+    });
+}
+
+/**
+ * IndexedDB-backed LRU store for browser wallets, so reports survive
+ * page reloads.
+ */
+export class IndexedDBCacheStore implements CacheStore {
+    private db: Promise<IDBDatabase> | null = null;
+
+    constructor(
+        private readonly maxSize: number = 1000,
+        private readonly dbName: string = 'lenz',
+        private readonly storeName: string = 'reports'
+    ) {}
+
+    private open(): Promise<IDBDatabase> {
+        if (!this.db) {
+            const req = indexedDB.open(this.dbName, 1);
+            req.onupgradeneeded = () => {
+                const store = req.result.createObjectStore(this.storeName, { keyPath: 'key' });
+                store.createIndex('accessedAt', 'accessedAt');
+            };
+            this.db = request(req);
+        }
+        return this.db;
+    }
+
+    private async store(mode: IDBTransactionMode): Promise<IDBObjectStore> {
+        const db = await this.open();
+        return db.transaction(this.storeName, mode).objectStore(this.storeName);
+    }
+
+    public async get(key: string): Promise<CachedReport | undefined> {
+        const store = await this.store('readwrite');
+        const record: StoredRecord | undefined = await request(store.get(key));
+        if (!record) {
+            return undefined;
+        }
+        record.accessedAt = Date.now();
+        await request(store.put(record));
+        return record.value;
+    }
+
+    public async set(key: string, value: CachedReport): Promise<void> {
+        const store = await this.store('readwrite');
+        await request(store.put({ key, value, accessedAt: Date.now() }));
+
+        let excess = (await request(store.count())) - this.maxSize;
+        if (excess <= 0) {
+            return;
+        }
+        const cursors = store.index('accessedAt').openCursor();
+        await new Promise<void>((resolve, reject) => {
+            cursors.onerror = () => reject(cursors.error);
+            cursors.onsuccess = () => {
+                const cursor = cursors.result;
+                if (!cursor || excess-- <= 0) {
+                    resolve();
+                    return;
+                }
+                cursor.delete();
+                cursor.continue();
+            };
+        });
+    }
+
+    public async delete(key: string): Promise<void> {
+        const store = await this.store('readwrite');
+        await request(store.delete(key));
+    }
+
+    public async clear(): Promise<void> {
+        const store = await this.store('readwrite');
+        await request(store.clear());
+    }
+}
+
+export interface ReportCacheOptions {
+    /** Storage backend, defaults to a `MemoryCacheStore` of `maxSize` */
+    store?: CacheStore;
+    /** Time a report is served without checking the chain, in ms */
+    ttlMs?: number;
+    /** Maximum entries kept by the default store */
+    maxSize?: number;
+    /** Serve expired reports immediately and refresh them in the background */
+    staleWhileRevalidate?: boolean;
+    /** Clock, overridable for tests */
+    now?: () => number;
+}
+
+export interface CacheLookup {
+    report: RiskReport;
+    /** Whether the TTL has expired and the report needs revalidation */
+    stale: boolean;
+}
+
+/**
+ * Client-side report cache keyed by address and validated against the
+ * program data hash and last-deployed slot.
+ */
+export class ReportCache {
+    public readonly ttlMs: number;
+    public readonly staleWhileRevalidate: boolean;
+    private store: CacheStore;
+    private now: () => number;
+
+    constructor(options: ReportCacheOptions = {}) {
+        this.store = options.store ?? new MemoryCacheStore(options.maxSize ?? 1000);
+        this.ttlMs = options.ttlMs ?? 60_000;
+        this.staleWhileRevalidate = options.staleWhileRevalidate ?? false;
+        this.now = options.now ?? Date.now;
+    }
+
+    /**
+     * Returns the cached report for `address` without touching the chain:
+     * fresh entries always, expired ones only in stale-while-revalidate mode.
+     */
+    public async lookup(address: string): Promise<CacheLookup | undefined> {
+        const entry = await this.store.get(address);
+        if (!entry) {
+            return undefined;
+        }
+        const stale = this.now() - entry.storedAt >= this.ttlMs;
+        if (stale && !this.staleWhileRevalidate) {
+            return undefined;
+        }
+        return { report: entry.report, stale };
+    }
+
+    /**
+     * Returns the cached report if it was computed from the same program
+     * data and deployment slot, restarting its TTL. A mismatching entry is
+     * dropped.
+     */
+    public async match(
+        address: string,
+        dataHash: string,
+        slot: number | null
+    ): Promise<RiskReport | undefined> {
+        const entry = await this.store.get(address);
+        if (!entry) {
+            return undefined;
+        }
+        if (entry.dataHash !== dataHash || entry.slot !== slot) {
+            await this.store.delete(address);
+            return undefined;
+        }
+        await this.store.set(address, { ...entry, storedAt: this.now() });
+        return entry.report;
+    }
+
+    public async put(
+        address: string,
+        dataHash: string,
+        slot: number | null,
+        report: RiskReport
+    ): Promise<void> {
+        await this.store.set(address, { report, dataHash, slot, storedAt: this.now() });
+    }
+
+    public async invalidate(address: string): Promise<void> {
+        await this.store.delete(address);
+    }
+
+    public async clear(): Promise<void> {
+        await this.store.clear();
+    }
+}
+
+/**
+ * Hex SHA-256 of `data` using WebCrypto, available in browsers and Node.
+ */
+export async function sha256Hex(data: Uint8Array): Promise<string> {
+    const digest = await crypto.subtle.digest('SHA-256', data as BufferSource);
+    return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+}
@@ -1,15 +1,66 @@
-import { Connection, PublicKey } from '@solana/web3.js';
-import { ScanConfig, RiskReport } from './types';
-import BN from 'bn.js';
+import { AccountInfo, Connection, PublicKey } from '@solana/web3.js';
+import { ScanConfig, RiskReport, LenzClientOptions } from './types';
+import { ConcurrencyLimiter } from './limiter';
+import { ReportCache, sha256Hex } from './cache';
+import { IndexerClient, IndexerResult } from './indexer';
+import { BytecodeScanner } from './wasm';
+
+/** Maximum number of accounts `getMultipleAccountsInfo` accepts per call. */
+const MAX_ACCOUNTS_PER_REQUEST = 100;
+
+const BPF_LOADER_UPGRADEABLE = new PublicKey('BPFLoaderUpgradeab1e11111111111111111111111');
+/** `UpgradeableLoaderState` discriminants. */
+const LOADER_STATE_PROGRAM = 2;
+const LOADER_STATE_PROGRAM_DATA = 3;
+
+interface PendingScan {
+    index: number;
+    address: string;
+    executable: boolean;
+    /** Account holding the code: the `ProgramData` account if upgradeable */
+    code: AccountInfo<Buffer>;
+    dataHash: string;
+    slot: number | null;
+}
+
+interface Deferred<T> {
+    promise: Promise<T>;
+    resolve: (value: T) => void;
+    reject: (reason: unknown) => void;
+}
+
+function deferred<T>(): Deferred<T> {
+    let resolve!: (value: T) => void;
+    let reject!: (reason: unknown) => void;
+    const promise = new Promise<T>((res, rej) => {
+        resolve = res;
+        reject = rej;
+    });
+    return { promise, resolve, reject };
+}
 
 /**
  * Main SDK Client for LENZ Security Layer.
  */
 export class LenzClient {
     private connection: Connection;
+    private batchSize: number;
+    private limiter: ConcurrencyLimiter;
+    private inFlight = new Map<string, Promise<RiskReport>>();
+    private cache: ReportCache | undefined;
+    private indexer: IndexerClient | undefined;
+    private scanner: BytecodeScanner | undefined;
 
-    constructor(connection: Connection) {
+    constructor(connection: Connection, options: LenzClientOptions = {}) {
         this.connection = connection;
+        this.batchSize = Math.min(
+            Math.max(options.batchSize ?? MAX_ACCOUNTS_PER_REQUEST, 1),
+            MAX_ACCOUNTS_PER_REQUEST
+        );
+        this.limiter = new ConcurrencyLimiter(options.maxConcurrency ?? 4);
+        this.cache = options.cache;
+        this.indexer = options.endpoint ? new IndexerClient(options.endpoint) : undefined;
+        this.scanner = options.scanner;
     }
 
     /**
@@ -19,12 +70,205 @@ export class LenzClient {
         address: string,
         config?: ScanConfig
     ): Promise<RiskReport> {
-        console.log(`[LENZ] Scanning address: ${address}`);
-        
-        // Mock scan logic
-        // In real impl, this would query the Lenz Indexer Node
+        const [report] = await this.scanAddresses([address], config);
+        return report;
+    }
+
+    /**
+     * Scans many addresses, fetching their accounts in chunked
+     * `getMultipleAccountsInfo` calls. Concurrent requests for the same
+     * address share one fetch, and at most `maxConcurrency` RPC calls run
+     * at a time. With a `ReportCache` configured, fresh reports are served
+     * without touching the chain.
+     */
+    public async scanAddresses(
+        addresses: string[],
+        config?: ScanConfig
+    ): Promise<RiskReport[]> {
+        const pending = new Map<string, Deferred<RiskReport>>();
+        const reports = addresses.map(address => {
+            const existing = this.inFlight.get(address);
+            if (existing) {
+                return existing;
+            }
+            const entry = deferred<RiskReport>();
+            pending.set(address, entry);
+            this.inFlight.set(address, entry.promise);
+            return entry.promise;
+        });
+
+        void this.resolve(pending, config);
+        return Promise.all(reports);
+    }
+
+    private async resolve(
+        pending: Map<string, Deferred<RiskReport>>,
+        config?: ScanConfig
+    ): Promise<void> {
+        const cache = this.cache;
+        const lookups = await Promise.all(
+            [...pending.keys()].map(address =>
+                cache ? cache.lookup(address).catch(() => undefined) : undefined
+            )
+        );
+
+        const queued: string[] = [];
+        let k = 0;
+        for (const [address, entry] of pending) {
+            const cached = lookups[k++];
+            if (cached) {
+                // Stale reports are answered now and refreshed below.
+                entry.resolve(cached.report);
+                if (!cached.stale) {
+                    this.inFlight.delete(address);
+                    continue;
+                }
+            }
+            queued.push(address);
+        }
+
+        for (let i = 0; i < queued.length; i += this.batchSize) {
+            const chunk = queued.slice(i, i + this.batchSize);
+            void this.limiter
+                .run(() => this.scanChunk(chunk, config))
+                .then(
+                    reports => chunk.forEach((address, j) => pending.get(address)!.resolve(reports[j])),
+                    err => chunk.forEach(address => pending.get(address)!.reject(err))
+                )
+                .finally(() => chunk.forEach(address => this.inFlight.delete(address)));
+        }
+    }
+
+    private async scanChunk(
+        addresses: string[],
+        config?: ScanConfig
+    ): Promise<RiskReport[]> {
+        if (config?.verbose) {
+            console.log(`[LENZ] Fetching ${addresses.length} accounts`);
+        }
+        const keys = addresses.map(address => new PublicKey(address));
+        const accounts = await this.connection.getMultipleAccountsInfo(keys);
+        const programData = await this.fetchProgramData(accounts);
+
+        const reports: RiskReport[] = new Array(addresses.length);
+        const misses: PendingScan[] = [];
+        await Promise.all(addresses.map(async (address, i) => {
+            const account = accounts[i];
+            if (!account) {
+                reports[i] = {
+                    address,
+                    riskScore: 100,
+                    isSafe: false,
+                    flags: ['Account Not Found'],
+                    timestamp: Date.now()
+                };
+                return;
+            }
+            const code = programData[i] ?? account;
+            const scan: PendingScan = {
+                index: i,
+                address,
+                executable: account.executable,
+                code,
+                dataHash: '',
+                slot: deploymentSlot(code)
+            };
+            if (this.cache) {
+                scan.dataHash = await sha256Hex(code.data);
+                const cached = await this.cache.match(address, scan.dataHash, scan.slot).catch(() => undefined);
+                if (cached) {
+                    reports[i] = cached;
+                    return;
+                }
+            }
+            misses.push(scan);
+        }));
+
+        const fresh = await this.analyze(misses);
+        await Promise.all(misses.map(async (scan, j) => {
+            reports[scan.index] = fresh[j];
+            await this.cache?.put(scan.address, scan.dataHash, scan.slot, fresh[j]).catch(() => undefined);
+        }));
+        return reports;
+    }
+
+    /**
+     * Resolves the `ProgramData` account behind each upgradeable program
+     * account with a single extra RPC call.
+     */
+    private async fetchProgramData(
+        accounts: (AccountInfo<Buffer> | null)[]
+    ): Promise<(AccountInfo<Buffer> | null)[]> {
+        const targets = accounts.map(account =>
+            account &&
+            account.owner.equals(BPF_LOADER_UPGRADEABLE) &&
+            account.data.length >= 36 &&
+            account.data.readUInt32LE(0) === LOADER_STATE_PROGRAM
+                ? new PublicKey(account.data.subarray(4, 36))
+                : null
+        );
+        const keys = targets.filter((key): key is PublicKey => key !== null);
+        if (keys.length === 0) {
+            return targets.map(() => null);
+        }
+        const fetched = await this.connection.getMultipleAccountsInfo(keys);
+        let next = 0;
+        return targets.map(key => (key ? fetched[next++] : null));
+    }
+
+    /**
+     * Analyzes programs with the configured in-process scanner, or else on
+     * the indexer node in one batch request; without either, a placeholder
+     * report is produced locally.
+     */
+    private async analyze(scans: PendingScan[]): Promise<RiskReport[]> {
+        const reports = scans.map(scan => this.buildReport(scan.address));
+        const programs = scans.filter(scan => scan.executable);
+        const results = programs.length > 0
+            ? await this.engineResults(programs.map(scan => scan.code.data))
+            : undefined;
+        if (!results) {
+            return reports;
+        }
+
+        programs.forEach((scan, j) => {
+            const result = results[j];
+            reports[scans.indexOf(scan)] = 'report' in result
+                ? {
+                    address: scan.address,
+                    riskScore: result.report.risk_score,
+                    isSafe: result.report.is_safe,
+                    primaryRisk: result.report.primary_risk,
+                    flags: result.report.flags,
+                    tiersCompleted: result.report.tiers_completed,
+                    knownFamily: result.report.family?.family,
+                    timestamp: Date.now()
+                }
+                : {
+                    address: scan.address,
+                    riskScore: 100,
+                    isSafe: false,
+                    flags: ['Analysis Failed'],
+                    timestamp: Date.now()
+                };
+        });
+        return reports;
+    }
+
+    private async engineResults(programs: Uint8Array[]): Promise<IndexerResult[] | undefined> {
+        const scanner = this.scanner;
+        if (scanner) {
+            return Promise.all(programs.map(program =>
+                scanner.scan(program).catch((err): IndexerResult => ({ error: String(err) }))
+            ));
+        }
+        return this.indexer?.scanBatch(programs);
+    }
+
+    private buildReport(address: string): RiskReport {
+        // Mock scan logic for accounts not analyzed by an indexer node
         const isSafe = true;
-        
+
         return {
             address,
             riskScore: 10,
@@ -34,3 +278,18 @@ export class LenzClient {
         };
     }
 }
+
+/**
+ * Slot a `ProgramData` account was last deployed at, or `null` for
+ * accounts that are not upgradeable program data.
+ */
+function deploymentSlot(account: AccountInfo<Buffer>): number | null {
+    if (
+        !account.owner.equals(BPF_LOADER_UPGRADEABLE) ||
+        account.data.length < 12 ||
+        account.data.readUInt32LE(0) !== LOADER_STATE_PROGRAM_DATA
+    ) {
+        return null;
+    }
+    return Number(account.data.readBigUInt64LE(4));
+}
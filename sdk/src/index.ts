@@ -1,2 +1,7 @@
 export * from './client';
-export * from './types';
\ No newline at end of file
+export * from './types';
+export * from './limiter';
+export * from './cache';
+export * from './indexer';
+export * from './wire';
+export * from './wasm';
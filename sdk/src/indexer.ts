@@ -0,0 +1,75 @@
+import { ReportBatch, WIRE_CONTENT_TYPE } from './wire';
+
+/**
+ * Report as produced by the Rust engine (`lenz_core::RiskReport`).
+ */
+export interface EngineReport {
+    risk_score: number;
+    is_safe: boolean;
+    primary_risk: string;
+    flags: string[];
+    evidence?: { flag: string; offset: number }[];
+    /** Tiers that finished within the scan budget */
+    tiers_completed?: string[];
+    /** Known-bad family the program is a clone of */
+    family?: { family: string; similarity: number };
+}
+
+export type IndexerResult = { report: EngineReport } | { error: string };
+
+/**
+ * Client for a Lenz indexer node (`lenz-cli serve`).
+ */
+export class IndexerClient {
+    private endpoint: string;
+
+    constructor(endpoint: string) {
+        this.endpoint = endpoint.replace(/\/+$/, '');
+    }
+
+    public async health(): Promise<{ status: string; engine_version: number; signatures_version: number }> {
+        const res = await fetch(`${this.endpoint}/health`);
+        if (!res.ok) {
+            throw new Error(`[LENZ] Indexer health check failed with HTTP ${res.status}`);
+        }
+        return res.json();
+    }
+
+    /**
+     * Scans many programs in one request. Results are in input order; with
+     * a binary response they are views decoded on access.
+     */
+    public async scanBatch(programs: Uint8Array[]): Promise<IndexerResult[]> {
+        if (programs.length === 0) {
+            return [];
+        }
+        const size = programs.reduce((n, p) => n + 4 + p.length, 0);
+        const body = new Uint8Array(size);
+        const view = new DataView(body.buffer);
+        let offset = 0;
+        for (const program of programs) {
+            view.setUint32(offset, program.length, true);
+            body.set(program, offset + 4);
+            offset += 4 + program.length;
+        }
+
+        const res = await fetch(`${this.endpoint}/scan/batch`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/octet-stream',
+                'Accept': `${WIRE_CONTENT_TYPE}, application/json`
+            },
+            body
+        });
+        if (!res.ok) {
+            throw new Error(`[LENZ] Indexer scan failed with HTTP ${res.status}`);
+        }
+        const results: IndexerResult[] = res.headers.get('Content-Type')?.startsWith(WIRE_CONTENT_TYPE)
+            ? [...new ReportBatch(await res.arrayBuffer())]
+            : await res.json();
+        if (results.length !== programs.length) {
+            throw new Error('[LENZ] Indexer returned a mismatched batch');
+        }
+        return results;
+    }
+}
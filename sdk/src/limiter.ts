@@ -0,0 +1,38 @@
+/**
+ * Bounds the number of concurrently running async tasks.
+ */
+export class ConcurrencyLimiter {
+    private active = 0;
+    private queue: Array<() => void> = [];
+
+    constructor(private readonly maxConcurrency: number) {
+        if (maxConcurrency < 1) {
+            throw new Error('maxConcurrency must be at least 1');
+        }
+    }
+
+    /** Number of tasks currently running. */
+    public get running(): number {
+        return this.active;
+    }
+
+    public async run<T>(task: () => Promise<T>): Promise<T> {
+        if (this.active >= this.maxConcurrency) {
+            // The finishing task hands its slot over without releasing it,
+            // so no caller arriving in between can take it.
+            await new Promise<void>(resolve => this.queue.push(resolve));
+        } else {
+            this.active++;
+        }
+        try {
+            return await task();
+        } finally {
+            const next = this.queue.shift();
+            if (next) {
+                next();
+            } else {
+                this.active--;
+            }
+        }
+    }
+}
@@ -1,5 +1,7 @@
 import { PublicKey } from '@solana/web3.js';
 import BN from 'bn.js';
+import type { ReportCache } from './cache';
+import type { BytecodeScanner } from './wasm';
 
 export interface ScanConfig {
     /** Timeout in milliseconds */
@@ -8,10 +10,31 @@ export interface ScanConfig {
     verbose?: boolean;
 }
 
+export interface LenzClientOptions {
+    /** Accounts per `getMultipleAccountsInfo` call (max 100) */
+    batchSize?: number;
+    /** Maximum concurrent RPC requests */
+    maxConcurrency?: number;
+    /** Report cache consulted before scanning */
+    cache?: ReportCache;
+    /** Base URL of a Lenz indexer node (`lenz-cli serve`) */
+    endpoint?: string;
+    /**
+     * Scans program code in-process (a `LocalScanner` or `ScanPool`) instead
+     * of on an indexer node
+     */
+    scanner?: BytecodeScanner;
+}
+
 export interface RiskReport {
     address: string;
     riskScore: number;
     isSafe: boolean;
+    primaryRisk?: string;
     flags: string[];
+    /** Analysis tiers completed within the scan budget, when known */
+    tiersCompleted?: string[];
+    /** Known-bad family the program is a clone of, when the indexer has one */
+    knownFamily?: string;
     timestamp: number;
 }
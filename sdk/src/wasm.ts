@@ -0,0 +1,325 @@
+import { EngineReport, IndexerResult } from './indexer';
+
+/**
+ * Exports of the `lenz-core` WebAssembly module (`core/src/wasm.rs`).
+ */
+interface EngineExports {
+    memory: WebAssembly.Memory;
+    lenz_alloc(len: number): number;
+    lenz_free(ptr: number, len: number): void;
+    lenz_scan(ptr: number, len: number): number;
+    lenz_engine_version(): number;
+}
+
+/** File name of the engine module shipped next to the compiled SDK. */
+export const ENGINE_WASM = 'lenz_core.wasm';
+
+/**
+ * Engine module to load: compiled, as bytes, or a file path or URL to read
+ * it from. Defaults to the module bundled with the SDK (Node.js only).
+ */
+export type WasmSource = WebAssembly.Module | BufferSource | string | URL;
+
+/**
+ * Analyzes program code in-process.
+ */
+export interface BytecodeScanner {
+    /** Resolves to the engine report, or the error the engine returned */
+    scan(data: Uint8Array): Promise<IndexerResult>;
+}
+
+function isNode(): boolean {
+    return typeof process !== 'undefined' && process.versions?.node !== undefined;
+}
+
+async function readSource(location: string | URL): Promise<BufferSource> {
+    if (isNode() && !/^https?:/i.test(location.toString())) {
+        const { readFile } = await import('fs/promises');
+        return readFile(location);
+    }
+    const res = await fetch(location);
+    if (!res.ok) {
+        throw new Error(`[LENZ] Failed to fetch the engine module: HTTP ${res.status}`);
+    }
+    return res.arrayBuffer();
+}
+
+/**
+ * Compiles the engine module once so it can be shared with workers.
+ */
+export async function compileEngine(source?: WasmSource): Promise<WebAssembly.Module> {
+    if (source instanceof WebAssembly.Module) {
+        return source;
+    }
+    if (source === undefined) {
+        if (!isNode()) {
+            throw new Error(`[LENZ] Pass the location of ${ENGINE_WASM} outside Node.js`);
+        }
+        const { join } = await import('path');
+        return WebAssembly.compile(await readSource(join(__dirname, ENGINE_WASM)));
+    }
+    const bytes = typeof source === 'string' || source instanceof URL ? await readSource(source) : source;
+    return WebAssembly.compile(bytes);
+}
+
+const decoder = new TextDecoder();
+
+function scanWith(engine: EngineExports, data: Uint8Array): IndexerResult {
+    // Pointers are unsigned; views are taken after each call into the module
+    // because growing its memory detaches earlier ones.
+    const input = engine.lenz_alloc(data.length) >>> 0;
+    new Uint8Array(engine.memory.buffer, input, data.length).set(data);
+    const out = engine.lenz_scan(input, data.length) >>> 0;
+    engine.lenz_free(input, data.length);
+
+    const len = new DataView(engine.memory.buffer, out, 4).getUint32(0, true);
+    const json = decoder.decode(new Uint8Array(engine.memory.buffer, out + 4, len));
+    engine.lenz_free(out, 4 + len);
+    return JSON.parse(json);
+}
+
+function unwrap(result: IndexerResult): EngineReport {
+    if ('error' in result) {
+        throw new Error(`[LENZ] Scan failed: ${result.error}`);
+    }
+    return result.report;
+}
+
+/**
+ * The Lenz engine running in-process as a WebAssembly module. Program code
+ * is written straight into the module's memory. Scans run on the calling
+ * thread; use a `ScanPool` to keep them off the UI thread.
+ */
+export class LocalScanner implements BytecodeScanner {
+    private module: WebAssembly.Module;
+    private engine: Promise<EngineExports> | undefined;
+
+    private constructor(module: WebAssembly.Module) {
+        this.module = module;
+    }
+
+    public static async load(source?: WasmSource): Promise<LocalScanner> {
+        const scanner = new LocalScanner(await compileEngine(source));
+        await scanner.instance();
+        return scanner;
+    }
+
+    /** `ENGINE_VERSION` the module was built with */
+    public async engineVersion(): Promise<number> {
+        return (await this.instance()).lenz_engine_version();
+    }
+
+    /**
+     * Scans program code, rejecting if the engine can not analyze it.
+     */
+    public async scanBytes(data: Uint8Array): Promise<EngineReport> {
+        return unwrap(await this.scan(data));
+    }
+
+    public async scan(data: Uint8Array): Promise<IndexerResult> {
+        const engine = await this.instance();
+        try {
+            return scanWith(engine, data);
+        } catch (err) {
+            // A trap leaves the instance in an unknown state; start over.
+            this.engine = undefined;
+            throw err;
+        }
+    }
+
+    private instance(): Promise<EngineExports> {
+        this.engine ??= WebAssembly.instantiate(this.module, {}).then(
+            instance => instance.exports as unknown as EngineExports
+        );
+        return this.engine;
+    }
+}
+
+/**
+ * A worker running `worker.js` of this package: a `Worker` in browsers or
+ * a `worker_threads` worker in Node.js.
+ */
+export type ScanWorker = {
+    postMessage(message: unknown, transfer?: ArrayBuffer[]): void;
+    terminate(): unknown;
+} & (
+    | { on(event: string, listener: (value: any) => void): unknown }
+    | { addEventListener(type: string, listener: (event: any) => void): void }
+);
+
+/** Messages exchanged between a `ScanPool` and its workers */
+export type WorkerRequest = { module: WebAssembly.Module } | { id: number; data: Uint8Array };
+export type WorkerResponse = { id: number; result: IndexerResult } | { id: number; failure: string };
+
+export interface ScanPoolOptions {
+    /** Workers to run, by default one less than the hardware threads */
+    size?: number;
+    /** Engine module, compiled once and shared by all workers */
+    source?: WasmSource;
+    /** Starts a worker running `worker.js`; required outside Node.js */
+    createWorker?: () => ScanWorker;
+}
+
+export interface PoolScanOptions {
+    /**
+     * Move the buffer behind `data` to the worker instead of copying it.
+     * The buffer, and every view of it, is unusable afterwards.
+     */
+    transfer?: boolean;
+}
+
+interface Job {
+    id: number;
+    data: Uint8Array;
+    transfer: boolean;
+    resolve: (result: IndexerResult) => void;
+    reject: (reason: unknown) => void;
+}
+
+interface Slot {
+    worker: ScanWorker;
+    job: Job | undefined;
+}
+
+function listen(
+    worker: ScanWorker,
+    onMessage: (message: WorkerResponse) => void,
+    onError: (error: unknown) => void
+): void {
+    if ('on' in worker) {
+        worker.on('message', onMessage);
+        worker.on('error', onError);
+    } else {
+        worker.addEventListener('message', (event: MessageEvent) => onMessage(event.data));
+        worker.addEventListener('error', onError);
+    }
+}
+
+function nodeWorker(): ScanWorker {
+    if (!isNode()) {
+        throw new Error('[LENZ] Pass `createWorker` to run a scan pool outside Node.js');
+    }
+    const { Worker } = require('worker_threads') as typeof import('worker_threads');
+    const { join } = require('path') as typeof import('path');
+    return new Worker(join(__dirname, 'worker.js'));
+}
+
+function hardwareThreads(): number {
+    if (typeof navigator !== 'undefined' && navigator.hardwareConcurrency) {
+        return navigator.hardwareConcurrency;
+    }
+    return isNode() ? (require('os') as typeof import('os')).cpus().length : 2;
+}
+
+/**
+ * Runs the WebAssembly engine on a pool of worker threads so scans never
+ * block the calling thread. Each worker scans one program at a time and
+ * queued programs go to the first idle worker. Call `close` when done;
+ * idle workers keep a Node.js process alive.
+ */
+export class ScanPool implements BytecodeScanner {
+    private module: WebAssembly.Module;
+    private createWorker: () => ScanWorker;
+    private slots: Slot[] = [];
+    private queue: Job[] = [];
+    private nextId = 0;
+    private closed = false;
+
+    private constructor(module: WebAssembly.Module, createWorker: () => ScanWorker, size: number) {
+        this.module = module;
+        this.createWorker = createWorker;
+        for (let i = 0; i < size; i++) {
+            this.slots.push(this.spawn());
+        }
+    }
+
+    public static async create(options: ScanPoolOptions = {}): Promise<ScanPool> {
+        const module = await compileEngine(options.source);
+        const size = Math.max(options.size ?? hardwareThreads() - 1, 1);
+        return new ScanPool(module, options.createWorker ?? nodeWorker, size);
+    }
+
+    public get size(): number {
+        return this.slots.length;
+    }
+
+    /**
+     * Scans program code on a worker, rejecting if the engine can not
+     * analyze it.
+     */
+    public async scanBytes(data: Uint8Array, options?: PoolScanOptions): Promise<EngineReport> {
+        return unwrap(await this.scan(data, options));
+    }
+
+    public scan(data: Uint8Array, options: PoolScanOptions = {}): Promise<IndexerResult> {
+        if (this.closed) {
+            return Promise.reject(new Error('[LENZ] Scan pool is closed'));
+        }
+        return new Promise((resolve, reject) => {
+            this.queue.push({ id: this.nextId++, data, transfer: options.transfer ?? false, resolve, reject });
+            this.dispatch();
+        });
+    }
+
+    /**
+     * Stops all workers, rejecting queued and running scans.
+     */
+    public async close(): Promise<void> {
+        this.closed = true;
+        const err = new Error('[LENZ] Scan pool is closed');
+        this.queue.splice(0).forEach(job => job.reject(err));
+        await Promise.all(this.slots.map(slot => {
+            slot.job?.reject(err);
+            slot.job = undefined;
+            return slot.worker.terminate();
+        }));
+    }
+
+    private spawn(): Slot {
+        const slot: Slot = { worker: this.createWorker(), job: undefined };
+        listen(slot.worker, message => this.settle(slot, message), error => this.fail(slot, error));
+        slot.worker.postMessage({ module: this.module } satisfies WorkerRequest);
+        return slot;
+    }
+
+    private dispatch(): void {
+        for (const slot of this.slots) {
+            if (this.queue.length === 0) {
+                return;
+            }
+            if (slot.job) {
+                continue;
+            }
+            const job = this.queue.shift()!;
+            slot.job = job;
+            const request: WorkerRequest = { id: job.id, data: job.data };
+            slot.worker.postMessage(request, job.transfer ? [job.data.buffer as ArrayBuffer] : []);
+        }
+    }
+
+    private settle(slot: Slot, message: WorkerResponse): void {
+        const job = slot.job;
+        if (!job || job.id !== message.id) {
+            return;
+        }
+        slot.job = undefined;
+        if ('result' in message) {
+            job.resolve(message.result);
+        } else {
+            job.reject(new Error(`[LENZ] Scan failed: ${message.failure}`));
+        }
+        this.dispatch();
+    }
+
+    /** The worker died: fail its scan and replace it. */
+    private fail(slot: Slot, error: unknown): void {
+        slot.job?.reject(error instanceof Error ? error : new Error(`[LENZ] Scan worker failed: ${String(error)}`));
+        slot.job = undefined;
+        if (this.closed) {
+            return;
+        }
+        void slot.worker.terminate();
+        this.slots[this.slots.indexOf(slot)] = this.spawn();
+        this.dispatch();
+    }
+}
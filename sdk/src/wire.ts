@@ -0,0 +1,175 @@
+/**
+ * Decoder for binary report batches (`lenz_core::wire`). Reports are read
+ * in place from one `ArrayBuffer`; fields are decoded when accessed.
+ */
+import type { EngineReport, IndexerResult } from './indexer';
+
+/** Media type of a binary report batch */
+export const WIRE_CONTENT_TYPE = 'application/vnd.lenz.reports';
+export const WIRE_VERSION = 1;
+
+/** `RiskFlag` descriptions by bit index */
+export const RISK_FLAGS = [
+    'Honeypot Pattern',
+    'Blacklist Check',
+    'Hidden Mint Logic',
+    'Suspicious Code Pattern',
+    'Indirect Control Flow',
+    'Malformed Control Flow',
+    'Known Malicious Family'
+];
+
+/** `AnalysisTier` names by bit index */
+export const ANALYSIS_TIERS = ['signatures', 'control_flow', 'dataflow'];
+
+const MAGIC = 0x574e5a4c; // "LNZW"
+const HEADER_LEN = 12;
+const KIND_REPORT = 0;
+const SAFE = 1;
+const FAMILY = 2;
+
+const decoder = new TextDecoder();
+
+function bitNames(bits: number, names: string[]): string[] {
+    const out: string[] = [];
+    for (let i = 0; i < names.length; i++) {
+        if (bits & (1 << i)) {
+            out.push(names[i]);
+        }
+    }
+    return out;
+}
+
+/** Reads a LEB128 varint at `at`, returning the value and the next offset. */
+function varint(view: DataView, at: number): [number, number] {
+    let value = 0;
+    let scale = 1;
+    for (;;) {
+        const byte = view.getUint8(at++);
+        value += (byte & 0x7f) * scale;
+        if ((byte & 0x80) === 0) {
+            return [value, at];
+        }
+        scale *= 128;
+    }
+}
+
+/**
+ * One report of a batch. Implements `EngineReport` with getters that
+ * decode from the batch buffer on every access.
+ */
+export class ReportView implements EngineReport {
+    private view: DataView;
+    private at: number;
+
+    constructor(view: DataView, at: number) {
+        this.view = view;
+        this.at = at;
+    }
+
+    get risk_score(): number {
+        return this.view.getUint8(this.at + 1);
+    }
+
+    get is_safe(): boolean {
+        return (this.view.getUint8(this.at + 2) & SAFE) !== 0;
+    }
+
+    get primary_risk(): string {
+        const bit = this.view.getUint8(this.at + 3) - 1;
+        return RISK_FLAGS[bit] ?? 'None';
+    }
+
+    get tiers_completed(): string[] {
+        return bitNames(this.view.getUint8(this.at + 4), ANALYSIS_TIERS);
+    }
+
+    get flags(): string[] {
+        // Only the low word holds known flags.
+        return bitNames(this.view.getUint32(this.at + 8, true), RISK_FLAGS);
+    }
+
+    get evidence(): { flag: string; offset: number }[] {
+        const out: { flag: string; offset: number }[] = [];
+        let at = this.at + 16;
+        for (let n = this.evidenceCount(); n > 0; n--) {
+            const flag = RISK_FLAGS[this.view.getUint8(at)];
+            const [offset, next] = varint(this.view, at + 1);
+            at = next;
+            if (flag) {
+                out.push({ flag, offset });
+            }
+        }
+        return out;
+    }
+
+    get family(): { family: string; similarity: number } | undefined {
+        if ((this.view.getUint8(this.at + 2) & FAMILY) === 0) {
+            return undefined;
+        }
+        let at = this.at + 16;
+        for (let n = this.evidenceCount(); n > 0; n--) {
+            at = varint(this.view, at + 1)[1];
+        }
+        const similarity = this.view.getUint8(at);
+        const [len, start] = varint(this.view, at + 1);
+        const name = new Uint8Array(this.view.buffer, this.view.byteOffset + start, len);
+        return { family: decoder.decode(name), similarity };
+    }
+
+    /** Plain object copy, e.g. for caching or `postMessage` */
+    public toJSON(): EngineReport {
+        const { risk_score, is_safe, primary_risk, flags, evidence, tiers_completed, family } = this;
+        return { risk_score, is_safe, primary_risk, flags, evidence, tiers_completed, family };
+    }
+
+    private evidenceCount(): number {
+        return this.view.getUint16(this.at + 6, true);
+    }
+}
+
+/**
+ * A decoded-on-demand batch of scan results. Construction only checks the
+ * header; entries are located through the offset table when requested.
+ */
+export class ReportBatch {
+    private view: DataView;
+    public readonly length: number;
+
+    constructor(buffer: ArrayBuffer, byteOffset = 0, byteLength = buffer.byteLength - byteOffset) {
+        this.view = new DataView(buffer, byteOffset, byteLength);
+        if (byteLength < HEADER_LEN || this.view.getUint32(0, true) !== MAGIC) {
+            throw new Error('[LENZ] Malformed report batch');
+        }
+        const version = this.view.getUint8(4);
+        if (version !== WIRE_VERSION) {
+            throw new Error(`[LENZ] Unsupported report batch version ${version}`);
+        }
+        this.length = this.view.getUint32(8, true);
+        if (HEADER_LEN + this.length * 4 > byteLength) {
+            throw new Error('[LENZ] Malformed report batch');
+        }
+    }
+
+    /**
+     * Result `i`: a lazily decoded report, or the engine error.
+     */
+    public get(i: number): IndexerResult {
+        if (!Number.isInteger(i) || i < 0 || i >= this.length) {
+            throw new RangeError(`[LENZ] Report ${i} out of range`);
+        }
+        const at = this.view.getUint32(HEADER_LEN + i * 4, true);
+        if (this.view.getUint8(at) === KIND_REPORT) {
+            return { report: new ReportView(this.view, at) };
+        }
+        const [len, start] = varint(this.view, at + 1);
+        const message = new Uint8Array(this.view.buffer, this.view.byteOffset + start, len);
+        return { error: decoder.decode(message) };
+    }
+
+    public *[Symbol.iterator](): IterableIterator<IndexerResult> {
+        for (let i = 0; i < this.length; i++) {
+            yield this.get(i);
+        }
+    }
+}
@@ -0,0 +1,39 @@
+/**
+ * Entry point of a `ScanPool` worker: instantiates the engine module sent
+ * by the pool and answers scan requests.
+ */
+import { LocalScanner, WorkerRequest, WorkerResponse } from './wasm';
+
+let scanner: Promise<LocalScanner> | undefined;
+
+function handle(message: WorkerRequest, reply: (response: WorkerResponse) => void): void {
+    if ('module' in message) {
+        scanner = LocalScanner.load(message.module);
+        return;
+    }
+    const { id, data } = message;
+    if (!scanner) {
+        reply({ id, failure: 'engine module not received' });
+        return;
+    }
+    scanner
+        .then(s => s.scan(data))
+        .then(
+            result => reply({ id, result }),
+            err => reply({ id, failure: err instanceof Error ? err.message : String(err) })
+        );
+}
+
+const port = typeof process !== 'undefined' && process.versions?.node !== undefined
+    ? (require('worker_threads') as typeof import('worker_threads')).parentPort
+    : null;
+
+if (port) {
+    port.on('message', (message: WorkerRequest) => handle(message, response => port.postMessage(response)));
+} else {
+    const scope = self as unknown as {
+        postMessage(message: unknown): void;
+        addEventListener(type: 'message', listener: (event: MessageEvent<WorkerRequest>) => void): void;
+    };
+    scope.addEventListener('message', event => handle(event.data, response => scope.postMessage(response)));
+}
@@ -0,0 +1,105 @@
+import { MemoryCacheStore, ReportCache, sha256Hex } from '../src/cache';
+import { LenzClient } from '../src/client';
+import { RiskReport } from '../src/types';
+import { Connection, Keypair, PublicKey } from '@solana/web3.js';
+
+function report(address: string): RiskReport {
+    return { address, riskScore: 10, isSafe: true, flags: [], timestamp: 0 };
+}
+
+describe('ReportCache', () => {
+    it('should evict least recently used entries', async () => {
+        const store = new MemoryCacheStore(2);
+        const cache = new ReportCache({ store });
+        await cache.put('a', 'h', null, report('a'));
+        await cache.put('b', 'h', null, report('b'));
+        await cache.lookup('a');
+        await cache.put('c', 'h', null, report('c'));
+
+        expect(store.size).toBe(2);
+        expect(await cache.lookup('b')).toBeUndefined();
+        expect(await cache.lookup('a')).toBeDefined();
+    });
+
+    it('should expire entries after the TTL', async () => {
+        let now = 0;
+        const cache = new ReportCache({ ttlMs: 100, now: () => now });
+        await cache.put('a', 'h', null, report('a'));
+
+        expect((await cache.lookup('a'))?.stale).toBe(false);
+        now = 100;
+        expect(await cache.lookup('a')).toBeUndefined();
+    });
+
+    it('should serve stale entries in stale-while-revalidate mode', async () => {
+        let now = 0;
+        const cache = new ReportCache({ ttlMs: 100, staleWhileRevalidate: true, now: () => now });
+        await cache.put('a', 'h', null, report('a'));
+        now = 500;
+
+        expect((await cache.lookup('a'))?.stale).toBe(true);
+    });
+
+    it('should invalidate on a new hash or deployment slot', async () => {
+        const cache = new ReportCache();
+        await cache.put('a', 'h1', 7, report('a'));
+
+        expect(await cache.match('a', 'h1', 7)).toBeDefined();
+        expect(await cache.match('a', 'h1', 8)).toBeUndefined();
+        expect(await cache.lookup('a')).toBeUndefined();
+    });
+
+    it('should hash with SHA-256', async () => {
+        expect(await sha256Hex(new Uint8Array())).toBe(
+            'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855'
+        );
+    });
+});
+
+describe('LenzClient with ReportCache', () => {
+    function countingConnection() {
+        const counter = { calls: 0 };
+        const connection = {
+            getMultipleAccountsInfo: async (keys: PublicKey[]) => {
+                counter.calls++;
+                return keys.map(() => ({
+                    data: Buffer.from([1, 2, 3]),
+                    executable: false,
+                    lamports: 1,
+                    owner: PublicKey.default,
+                    rentEpoch: 0
+                }));
+            }
+        };
+        return { connection: connection as unknown as Connection, counter };
+    }
+
+    it('should answer fresh reports without RPC calls', async () => {
+        const { connection, counter } = countingConnection();
+        const client = new LenzClient(connection, { cache: new ReportCache() });
+        const address = Keypair.generate().publicKey.toBase58();
+
+        const first = await client.scanAddress(address);
+        const second = await client.scanAddress(address);
+
+        expect(counter.calls).toBe(1);
+        expect(second).toEqual(first);
+    });
+
+    it('should refresh stale reports in the background', async () => {
+        let now = 0;
+        const cache = new ReportCache({ ttlMs: 10, staleWhileRevalidate: true, now: () => now });
+        const { connection, counter } = countingConnection();
+        const client = new LenzClient(connection, { cache });
+        const address = Keypair.generate().publicKey.toBase58();
+
+        const first = await client.scanAddress(address);
+        now = 100;
+        const stale = await client.scanAddress(address);
+        expect(stale).toBe(first);
+
+        await new Promise(resolve => setTimeout(resolve, 50));
+        expect(counter.calls).toBe(2);
+        expect((await cache.lookup(address))?.stale).toBe(false);
+    });
+});
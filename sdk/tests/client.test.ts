@@ -1,5 +1,34 @@
 import { RiskReport } from '../src/types';
-import { Connection } from '@solana/web3.js';
+import { LenzClient } from '../src/client';
+import { ConcurrencyLimiter } from '../src/limiter';
+import { Connection, Keypair, PublicKey } from '@solana/web3.js';
+
+function fakeConnection(delayMs = 0) {
+    const calls: PublicKey[][] = [];
+    let active = 0;
+    let peak = 0;
+    const connection = {
+        getMultipleAccountsInfo: async (keys: PublicKey[]) => {
+            calls.push(keys);
+            active++;
+            peak = Math.max(peak, active);
+            await new Promise(resolve => setTimeout(resolve, delayMs));
+            active--;
+            return keys.map((_, i) => (i % 2 === 0 ? {
+                data: Buffer.alloc(0),
+                executable: true,
+                lamports: 1,
+                owner: PublicKey.default,
+                rentEpoch: 0
+            } : null));
+        }
+    };
+    return { connection: connection as unknown as Connection, calls, peak: () => peak };
+}
+
+function addresses(n: number): string[] {
+    return Array.from({ length: n }, () => Keypair.generate().publicKey.toBase58());
+}
 
 describe('Lenz SDK', () => {
     describe('Types', () => {
@@ -20,5 +49,108 @@ describe('Lenz SDK', () => {
             const conn = new Connection('https://api.devnet.solana.com');
             expect(conn).toBeDefined();
         });
+
+        it('should fetch accounts in chunks', async () => {
+            const { connection, calls } = fakeConnection();
+            const client = new LenzClient(connection, { batchSize: 10 });
+            const input = addresses(25);
+            const reports = await client.scanAddresses(input);
+
+            expect(calls.map(c => c.length)).toEqual([10, 10, 5]);
+            expect(reports.map(r => r.address)).toEqual(input);
+            expect(reports[1].flags).toContain('Account Not Found');
+        });
+
+        it('should coalesce concurrent requests for the same address', async () => {
+            const { connection, calls } = fakeConnection(10);
+            const client = new LenzClient(connection);
+            const [address] = addresses(1);
+            const [a, b, [c, d]] = await Promise.all([
+                client.scanAddress(address),
+                client.scanAddress(address),
+                client.scanAddresses([address, address])
+            ]);
+
+            expect(calls).toHaveLength(1);
+            expect(a).toBe(b);
+            expect(c).toBe(d);
+            expect(a).toBe(c);
+        });
+
+        it('should bound concurrent RPC requests', async () => {
+            const { connection, calls, peak } = fakeConnection(5);
+            const client = new LenzClient(connection, { batchSize: 1, maxConcurrency: 2 });
+            await client.scanAddresses(addresses(8));
+
+            expect(calls).toHaveLength(8);
+            expect(peak()).toBe(2);
+        });
+
+        it('should reject invalid addresses', async () => {
+            const { connection } = fakeConnection();
+            const client = new LenzClient(connection);
+            await expect(client.scanAddress('not-a-key')).rejects.toThrow();
+        });
+    });
+
+    describe('Indexer', () => {
+        afterEach(() => {
+            jest.restoreAllMocks();
+        });
+
+        it('should analyze programs in one batch request', async () => {
+            const fetchMock = jest.spyOn(global, 'fetch').mockResolvedValue(new Response(JSON.stringify([
+                { report: { risk_score: 55, is_safe: false, primary_risk: 'Honeypot Pattern', flags: ['Honeypot Pattern'] } },
+                { error: 'Failed to parse instruction at offset 0' }
+            ])));
+            const connection = {
+                getMultipleAccountsInfo: async (keys: PublicKey[]) => keys.map(() => ({
+                    data: Buffer.from([1, 2, 3]),
+                    executable: true,
+                    lamports: 1,
+                    owner: PublicKey.default,
+                    rentEpoch: 0
+                }))
+            } as unknown as Connection;
+            const client = new LenzClient(connection, { endpoint: 'http://127.0.0.1:7878/' });
+            const [risky, failed] = await client.scanAddresses(addresses(2));
+
+            expect(fetchMock).toHaveBeenCalledTimes(1);
+            expect(fetchMock.mock.calls[0][0]).toBe('http://127.0.0.1:7878/scan/batch');
+            expect(risky.riskScore).toBe(55);
+            expect(risky.primaryRisk).toBe('Honeypot Pattern');
+            expect(failed.flags).toEqual(['Analysis Failed']);
+        });
+    });
+
+    describe('ConcurrencyLimiter', () => {
+        it('should reject a zero limit', () => {
+            expect(() => new ConcurrencyLimiter(0)).toThrow();
+        });
+
+        it('should not let a new caller take a slot handed to a waiter', async () => {
+            const limiter = new ConcurrencyLimiter(1);
+            let running = 0;
+            let peak = 0;
+            const task = async () => {
+                running++;
+                peak = Math.max(peak, running);
+                await Promise.resolve();
+                running--;
+            };
+
+            let release!: () => void;
+            const gate = new Promise<void>(resolve => (release = resolve));
+            const first = limiter.run(() => gate);
+            const waiter = limiter.run(task);
+            // Runs after the first task's slot is handed over but before the
+            // waiter resumes.
+            const late = gate.then(() => limiter.run(task));
+            release();
+            await Promise.all([first, waiter, late]);
+
+            expect(peak).toBe(1);
+            expect(limiter.running).toBe(0);
+        });
     });
 });
@@ -0,0 +1,125 @@
+import { EventEmitter } from 'events';
+import { Connection, Keypair, PublicKey } from '@solana/web3.js';
+import { LenzClient } from '../src/client';
+import { IndexerResult } from '../src/indexer';
+import { BytecodeScanner, ScanPool, ScanWorker, WorkerRequest } from '../src/wasm';
+
+/** Smallest valid WebAssembly module: the magic number and version. */
+const EMPTY_MODULE = new Uint8Array([0x00, 0x61, 0x73, 0x6d, 0x01, 0x00, 0x00, 0x00]);
+
+/**
+ * In-process stand-in for `worker.js` that reports the program length as
+ * its risk score, and fails on empty programs.
+ */
+class FakeWorker extends EventEmitter {
+    static started = 0;
+    static active = 0;
+    static peak = 0;
+    modules = 0;
+
+    constructor() {
+        super();
+        FakeWorker.started++;
+    }
+
+    postMessage(message: WorkerRequest): void {
+        if ('module' in message) {
+            this.modules++;
+            return;
+        }
+        FakeWorker.active++;
+        FakeWorker.peak = Math.max(FakeWorker.peak, FakeWorker.active);
+        setTimeout(() => {
+            FakeWorker.active--;
+            if (message.data[0] === 0xff) {
+                this.emit('error', new Error('worker crashed'));
+                return;
+            }
+            const result: IndexerResult = message.data.length === 0
+                ? { error: 'Bytecode is empty' }
+                : { report: { risk_score: message.data.length, is_safe: true, primary_risk: '', flags: [] } };
+            this.emit('message', { id: message.id, result });
+        }, 5);
+    }
+
+    terminate(): Promise<number> {
+        return Promise.resolve(0);
+    }
+}
+
+function fakePool(size: number): Promise<ScanPool> {
+    return ScanPool.create({ size, source: EMPTY_MODULE, createWorker: () => new FakeWorker() as ScanWorker });
+}
+
+describe('WebAssembly engine', () => {
+    beforeEach(() => {
+        FakeWorker.started = 0;
+        FakeWorker.peak = 0;
+    });
+
+    describe('ScanPool', () => {
+        it('should spread scans over its workers', async () => {
+            const pool = await fakePool(2);
+            const programs = [1, 2, 3, 4, 5].map(n => new Uint8Array(n));
+            const reports = await Promise.all(programs.map(p => pool.scanBytes(p)));
+
+            expect(reports.map(r => r.risk_score)).toEqual([1, 2, 3, 4, 5]);
+            expect(FakeWorker.started).toBe(2);
+            expect(FakeWorker.peak).toBe(2);
+            await pool.close();
+        });
+
+        it('should reject engine errors', async () => {
+            const pool = await fakePool(1);
+            await expect(pool.scanBytes(new Uint8Array(0))).rejects.toThrow('Bytecode is empty');
+            await expect(pool.scan(new Uint8Array(0))).resolves.toEqual({ error: 'Bytecode is empty' });
+            await pool.close();
+        });
+
+        it('should replace a crashed worker', async () => {
+            const pool = await fakePool(1);
+            const crashed = pool.scanBytes(new Uint8Array([0xff]));
+            const next = pool.scanBytes(new Uint8Array(3));
+
+            await expect(crashed).rejects.toThrow('worker crashed');
+            await expect(next).resolves.toMatchObject({ risk_score: 3 });
+            expect(FakeWorker.started).toBe(2);
+            await pool.close();
+        });
+
+        it('should reject scans after close', async () => {
+            const pool = await fakePool(1);
+            await pool.close();
+            await expect(pool.scanBytes(new Uint8Array(1))).rejects.toThrow('closed');
+        });
+    });
+
+    describe('Client', () => {
+        it('should analyze programs with an in-process scanner', async () => {
+            const scanner: BytecodeScanner = {
+                scan: async data => data.length > 1
+                    ? { report: { risk_score: 70, is_safe: false, primary_risk: 'Honeypot Pattern', flags: ['Honeypot Pattern'] } }
+                    : { error: 'Failed to parse instruction at offset 0' }
+            };
+            const connection = {
+                getMultipleAccountsInfo: async (keys: PublicKey[]) => keys.map((_, i) => ({
+                    data: Buffer.alloc(i + 1),
+                    executable: true,
+                    lamports: 1,
+                    owner: PublicKey.default,
+                    rentEpoch: 0
+                }))
+            } as unknown as Connection;
+            const fetchMock = jest.spyOn(global, 'fetch');
+            const client = new LenzClient(connection, { scanner, endpoint: 'http://127.0.0.1:7878' });
+            const keys = [Keypair.generate(), Keypair.generate()].map(k => k.publicKey.toBase58());
+            const [failed, risky] = await client.scanAddresses(keys);
+
+            expect(fetchMock).not.toHaveBeenCalled();
+            expect(failed.flags).toEqual(['Analysis Failed']);
+            expect(risky.riskScore).toBe(70);
+            expect(risky.isSafe).toBe(false);
+            fetchMock.mockRestore();
+        });
+    });
+});
@@ -0,0 +1,80 @@
+import { IndexerClient } from '../src/indexer';
+import { ReportBatch, ReportView, WIRE_CONTENT_TYPE } from '../src/wire';
+
+/**
+ * `lenz_core::wire::encode` of a scanned report, an error, and a family
+ * match, in that order.
+ */
+const FIXTURE =
+    '4c4e5a570100000003000000180000002d000000400000000037000107000200030000000000000000ac0201080111' +
+    '42797465636f646520697320656d707479006402070000000040000000000000005b07647261696e6572';
+
+function decodeHex(hex: string): Uint8Array {
+    return new Uint8Array(hex.match(/../g)!.map(b => parseInt(b, 16)));
+}
+
+function batch(hex = FIXTURE): ReportBatch {
+    const bytes = decodeHex(hex);
+    // Decode from the middle of a larger buffer, as with pooled allocations.
+    const buffer = new Uint8Array(bytes.length + 16);
+    buffer.set(bytes, 8);
+    return new ReportBatch(buffer.buffer, 8, bytes.length);
+}
+
+describe('Wire format', () => {
+    it('should decode reports lazily', () => {
+        const reports = batch();
+        expect(reports.length).toBe(3);
+
+        const first = reports.get(0);
+        expect('report' in first && first.report).toBeInstanceOf(ReportView);
+        if (!('report' in first)) {
+            throw new Error('expected a report');
+        }
+        expect(first.report.risk_score).toBe(55);
+        expect(first.report.is_safe).toBe(false);
+        expect(first.report.primary_risk).toBe('Honeypot Pattern');
+        expect(first.report.flags).toEqual(['Honeypot Pattern', 'Blacklist Check']);
+        expect(first.report.evidence).toEqual([
+            { flag: 'Honeypot Pattern', offset: 300 },
+            { flag: 'Blacklist Check', offset: 8 }
+        ]);
+        expect(first.report.tiers_completed).toEqual(['signatures', 'control_flow', 'dataflow']);
+        expect(first.report.family).toBeUndefined();
+    });
+
+    it('should decode errors and family matches', () => {
+        const [, failed, family] = [...batch()];
+        expect(failed).toEqual({ error: 'Bytecode is empty' });
+        expect('report' in family && (family.report as ReportView).toJSON()).toEqual({
+            risk_score: 100,
+            is_safe: false,
+            primary_risk: 'Known Malicious Family',
+            flags: ['Known Malicious Family'],
+            evidence: [],
+            tiers_completed: [],
+            family: { family: 'drainer', similarity: 91 }
+        });
+    });
+
+    it('should reject foreign or truncated batches', () => {
+        expect(() => batch('00'.repeat(12))).toThrow('Malformed');
+        expect(() => batch(FIXTURE.slice(0, 24))).toThrow('Malformed');
+        expect(() => batch('4c4e5a5702' + FIXTURE.slice(10))).toThrow('version 2');
+        expect(() => batch().get(3)).toThrow(RangeError);
+    });
+
+    it('should negotiate binary batches with an indexer', async () => {
+        const fetchMock = jest.spyOn(global, 'fetch').mockResolvedValue(new Response(decodeHex(FIXTURE), {
+            headers: { 'Content-Type': WIRE_CONTENT_TYPE }
+        }));
+        const results = await new IndexerClient('http://127.0.0.1:7878').scanBatch([
+            new Uint8Array(8), new Uint8Array(0), new Uint8Array(8)
+        ]);
+
+        const headers = fetchMock.mock.calls[0][1]!.headers as Record<string, string>;
+        expect(headers['Accept']).toContain(WIRE_CONTENT_TYPE);
+        expect(results.map(r => ('report' in r ? r.report.risk_score : r.error))).toEqual([55, 'Bytecode is empty', 100]);
+        fetchMock.mockRestore();
+    });
+});